@@ -30,11 +30,16 @@ def classFactory(iface):  # pylint: disable=invalid-name
     :param iface: A QGIS interface instance.
     :type iface: QgsInterface
     """
-    try:
-        from .core.terra_antiqua import TerraAntiqua
-        from .core.cache_manager import cache_manager
-        cache_manager.start_background_init()
-        return TerraAntiqua(iface)
-    except Exception:
-        from .core.terra_antiqua_stub import TerraAntiquaStub
-        return TerraAntiquaStub(iface)
+    # The tools are imported when they are first used, so only check (without importing them) that
+    # their dependencies are installed
+    from .core.dependency_checker import check_dependencies
+    if check_dependencies():
+        try:
+            from .core.terra_antiqua import TerraAntiqua
+            from .core.cache_manager import cache_manager
+            cache_manager.start_background_init()
+            return TerraAntiqua(iface)
+        except Exception:
+            pass
+    from .core.terra_antiqua_stub import TerraAntiquaStub
+    return TerraAntiquaStub(iface)
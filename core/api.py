@@ -0,0 +1,433 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Headless API of Terra Antiqua.
+
+The functions of this module run the tools of the plugin without their dialogs, e.g. in batch scripts or
+worker processes. Each function takes a parameter object (see parameters.py) and returns the path of the
+output, or None if processing was canceled. Failures raise TaProcessingError; the details are logged by the
+feedback.
+
+The tools use the QGIS core library and its processing framework, so a QgsApplication must be initialized
+before calling them::
+
+    from qgis.core import QgsApplication
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    from terra_antiqua.core.api import create_sea
+    from terra_antiqua.core.parameters import TaCreateSeaParameters, TaFeatureValue
+
+    create_sea(TaCreateSeaParameters("topo.tif", "seas.shp", "topo_with_seas.tif",
+                                     max_depth=TaFeatureValue(-5000, override='"depth"')))
+
+The progress and the cancellation go through the feedback: pass a TaConsoleFeedback with a progress
+callback, and call its setCanceled(True) from another thread to cancel processing.
+"""
+
+import dataclasses
+import os
+import tempfile
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsExpressionContext,
+    QgsExpressionContextUtils,
+    QgsVectorLayer
+)
+
+from .compile_tb import TaCompileTopoBathyEngine
+from .create_tb import TaCreateTopoBathyEngine
+from .logger import TaConsoleFeedback
+from .modify_tb import TaModifyTopoBathyEngine
+from .parameters import (
+    TaAssignPlateIdsParameters,
+    TaCalculateBathymetryParameters,
+    TaCompileTopoBathyParameters,
+    TaCopyPasteRasterParameters,
+    TaCreateMountainRangeParameters,
+    TaCreateSeaParameters,
+    TaFillGapsParameters,
+    TaIsostaticCompensationParameters,
+    TaModifyTopoBathyParameters,
+    TaReconstructRasterParameters,
+    TaReconstructVectorLayerParameters,
+    TaSetPaleoshorelinesParameters,
+    TaSetSeaLevelParameters,
+    TaSmoothRasterParameters
+)
+from .reconstruct_rasters import TaReconstructRastersEngine
+from .reconstruct_vector_layers import TaReconstructVectorLayersEngine
+from .set_pls import TaSetPaleoshorelinesEngine
+from .standard_proc import TaStandardProcessingEngine
+from .utils import isPathValid, toRasterLayer
+
+
+class TaProcessingError(Exception):
+    """Raised when a tool of the headless API fails."""
+    pass
+
+
+class TaHeadlessAlgorithm:
+    """
+    Runs the computation of a tool without its dialog. It provides to the tool what TaBaseAlgorithm provides
+    in the plugin: the feedback, the crs, the expression context and the cancellation.
+
+    :param params: Parameters of the tool.
+    :param feedback: Feedback receiving the messages and the progress. Defaults to a TaConsoleFeedback.
+    :type feedback: TaConsoleFeedback.
+    :param crs: Coordinate reference system of the input layers. Defaults to WGS84.
+    :type crs: QgsCoordinateReferenceSystem.
+    """
+
+    def __init__(self, params, feedback=None, crs=None):
+        self.__name__ = self.__class__.__name__
+        self.params = params
+        self.feedback = feedback if feedback is not None else TaConsoleFeedback()
+        self.failed = False
+        if crs is None or not crs.isValid():
+            crs = QgsCoordinateReferenceSystem('EPSG:4326')
+        self.crs = crs
+        self.context = self.getExpressionContext()
+        self.processing_output = 'TEMPORARY_OUTPUT'
+        self.temp_dir = tempfile.gettempdir()
+
+    @property
+    def killed(self):
+        return self.feedback.canceled
+
+    def kill(self):
+        # The tools kill themselves when they fail; a cancellation only cancels the feedback
+        self.failed = True
+        self.feedback.setCanceled(True)
+
+    def getExpressionContext(self, layer: QgsVectorLayer = None):
+        context = QgsExpressionContext()
+        if not layer:
+            context.appendScope(QgsExpressionContextUtils.globalScope())
+        else:
+            context.appendScopes(
+                QgsExpressionContextUtils.globalProjectLayerScopes(layer))
+        return context
+
+    def execute(self, method):
+        """
+        Runs a method of the tool.
+
+        :return: The output path, or None if processing was canceled.
+        :rtype: str.
+        """
+        initProcessing()
+        output_path = method(self)
+        if output_path is None and self.failed:
+            raise TaProcessingError(f"{self.__name__} failed. See the log for details.")
+        return output_path
+
+
+class TaHeadlessCompileTopoBathy(TaCompileTopoBathyEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessCreateTopoBathy(TaCreateTopoBathyEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessModifyTopoBathy(TaModifyTopoBathyEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessSetPaleoshorelines(TaSetPaleoshorelinesEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessStandardProcessing(TaStandardProcessingEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessReconstructRasters(TaReconstructRastersEngine, TaHeadlessAlgorithm):
+    pass
+
+
+class TaHeadlessReconstructVectorLayers(TaReconstructVectorLayersEngine, TaHeadlessAlgorithm):
+    pass
+
+
+def initProcessing():
+    """Initializes the processing framework, which the tools use, if the script has not done it."""
+    if QgsApplication.processingRegistry().algorithmById("native:densifygeometriesgivenaninterval") is None:
+        from processing.core.Processing import Processing
+        Processing.initialize()
+
+
+def withOutputPath(params, default_name):
+    """
+    Returns the parameters with the output path set to a file in the temporary directory if it is not set,
+    and checks that the output path is a writable GeoTIFF file.
+    """
+    if not params.output_path:
+        params = dataclasses.replace(params, output_path=os.path.join(tempfile.gettempdir(), default_name))
+    valid, message = isPathValid(params.output_path, 'geotiff')
+    if not valid:
+        raise TaProcessingError(message)
+    return params
+
+
+def inputCrs(layer):
+    """Returns the crs of an input raster given as a layer or as a file. The output rasters get this crs."""
+    return toRasterLayer(layer).crs()
+
+
+def fill_gaps(params: TaFillGapsParameters, feedback=None):
+    """
+    Fills the gaps (no data cells) of a raster by interpolation or with a fixed value.
+
+    :param params: Parameters of the tool.
+    :type params: TaFillGapsParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_interpolated.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.fillRasterGaps)
+
+
+def createFeatures(params, feedback, method):
+    params = withOutputPath(params, 'PaleoDEM_withCreatedFeatures.tif')
+    # The layer is loaded once, so that its crs is also used for the features
+    topo_layer = toRasterLayer(params.input_raster)
+    params = dataclasses.replace(params, input_raster=topo_layer)
+    return TaHeadlessCreateTopoBathy(params, feedback, topo_layer.crs()).execute(method)
+
+
+def create_sea(params: TaCreateSeaParameters, feedback=None):
+    """
+    Creates seas in a topography raster from the polygons of a mask layer.
+
+    :param params: Parameters of the tool.
+    :type params: TaCreateSeaParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    def run(algorithm):
+        algorithm.loadInputs()
+        return algorithm.createSea() if not algorithm.killed else None
+    return createFeatures(params, feedback, run)
+
+
+def create_mountain_range(params: TaCreateMountainRangeParameters, feedback=None):
+    """
+    Creates mountain ranges in a topography raster from the polygons of a mask layer.
+
+    :param params: Parameters of the tool.
+    :type params: TaCreateMountainRangeParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    def run(algorithm):
+        algorithm.loadInputs()
+        return algorithm.createMountainRange() if not algorithm.killed else None
+    return createFeatures(params, feedback, run)
+
+
+def compile_topo_bathy(params: TaCompileTopoBathyParameters, feedback=None):
+    """
+    Compiles several topography and bathymetry rasters into one.
+
+    :param params: Parameters of the tool.
+    :type params: TaCompileTopoBathyParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'Compiled_DEM_Topo+Bathy.tif')
+    crs = inputCrs(params.input_rasters[0]) if params.input_rasters else None
+    return TaHeadlessCompileTopoBathy(params, feedback, crs).execute(TaCompileTopoBathyEngine.compileRasters)
+
+
+def set_paleoshorelines(params: TaSetPaleoshorelinesParameters, feedback=None):
+    """
+    Sets the paleoshorelines of a topography raster: the land areas below sea level are emerged and the sea
+    areas above sea level are submerged.
+
+    :param params: Parameters of the tool.
+    :type params: TaSetPaleoshorelinesParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_Paleoshorelines_set.tif')
+    return TaHeadlessSetPaleoshorelines(params, feedback, inputCrs(params.input_raster)).execute(
+        TaSetPaleoshorelinesEngine.setPaleoshorelines)
+
+
+def modify_topo_bathy(params: TaModifyTopoBathyParameters, feedback=None):
+    """
+    Modifies the topography inside the polygons of a mask layer with a formula or by rescaling it.
+
+    :param params: Parameters of the tool.
+    :type params: TaModifyTopoBathyParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_modified_topography.tif')
+    return TaHeadlessModifyTopoBathy(params, feedback, inputCrs(params.input_raster)).execute(
+        TaModifyTopoBathyEngine.modifyTopography)
+
+
+def copy_paste_raster(params: TaCopyPasteRasterParameters, feedback=None):
+    """
+    Copies the values of a raster inside the polygons of a mask layer into another raster.
+
+    :param params: Parameters of the tool.
+    :type params: TaCopyPasteRasterParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_with_copied_values.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.pasteRasterValues)
+
+
+def smooth_raster(params: TaSmoothRasterParameters, feedback=None):
+    """
+    Smoothes a raster, or the areas of a raster inside the polygons of a mask layer.
+
+    :param params: Parameters of the tool.
+    :type params: TaSmoothRasterParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_smoothed.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.smoothRasterValues)
+
+
+def isostatic_compensation(params: TaIsostaticCompensationParameters, feedback=None):
+    """
+    Compensates the bedrock topography for the removal of a part of the ice load.
+
+    :param params: Parameters of the tool.
+    :type params: TaIsostaticCompensationParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_isost_compensated.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.compensateIsostasy)
+
+
+def set_sea_level(params: TaSetSeaLevelParameters, feedback=None):
+    """
+    Raises or lowers the sea level of a topography raster.
+
+    :param params: Parameters of the tool.
+    :type params: TaSetSeaLevelParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_with_Sea_Level_changed.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.changeSeaLevel)
+
+
+def calculate_bathymetry(params: TaCalculateBathymetryParameters, feedback=None):
+    """
+    Calculates the ocean depth from the age of the ocean floor.
+
+    :param params: Parameters of the tool.
+    :type params: TaCalculateBathymetryParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output raster, or None if processing was canceled.
+    :rtype: str.
+    """
+    params = withOutputPath(params, 'PaleoDEM_with_calculated_bathymetry.tif')
+    return TaHeadlessStandardProcessing(params, feedback, inputCrs(params.input_raster)).execute(
+        TaStandardProcessingEngine.ageToBathymetry)
+
+
+def assign_plate_ids(params: TaAssignPlateIdsParameters, feedback=None):
+    """
+    Assigns the IDs of the plates of a plate model to the features of a vector layer.
+
+    :param params: Parameters of the tool.
+    :type params: TaAssignPlateIdsParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output file, or None if processing was canceled.
+    :rtype: str.
+    """
+    if not params.output_path:
+        raise TaProcessingError("No output path is given.")
+    return TaHeadlessStandardProcessing(params, feedback).execute(
+        TaStandardProcessingEngine.partitionFeaturesIntoPlates)
+
+
+def reconstruct_raster(params: TaReconstructRasterParameters, feedback=None):
+    """
+    Reconstructs a topography raster to a past age, or to each age of a sequence, with a plate model.
+    The model files and the present-day rasters are downloaded by the cache manager if needed.
+
+    :param params: Parameters of the tool.
+    :type params: TaReconstructRasterParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output file (or folder for a sequence), or None if processing was canceled.
+    :rtype: str.
+    """
+    if not params.output_path:
+        raise TaProcessingError("No output path is given.")
+    return TaHeadlessReconstructRasters(params, feedback).execute(TaReconstructRastersEngine.reconstructTopography)
+
+
+def reconstruct_vector_layer(params: TaReconstructVectorLayerParameters, feedback=None):
+    """
+    Reconstructs a vector layer, or a layer of a plate model, to a past age.
+    The model files are downloaded by the cache manager if needed.
+
+    :param params: Parameters of the tool.
+    :type params: TaReconstructVectorLayerParameters.
+    :param feedback: Feedback receiving the messages and the progress.
+    :type feedback: TaConsoleFeedback.
+
+    :return: The path of the output file, or None if processing was canceled.
+    :rtype: str.
+    """
+    if not params.output_path:
+        raise TaProcessingError("No output path is given.")
+    return TaHeadlessReconstructVectorLayers(params, feedback).execute(
+        TaReconstructVectorLayersEngine.reconstructVectorLayer)
@@ -17,7 +17,8 @@ from qgis.core import (QgsExpressionContext,
                        QgsVectorLayer,
                        QgsSettings)
 
-from .utils import isPathValid
+from .utils import isPathValid, TaMemoryMonitor
+from .parameters import TaFeatureValue
 
 
 class TaBaseAlgorithm(QThread):
@@ -32,6 +33,8 @@ class TaBaseAlgorithm(QThread):
         self.killed = False
         self.progress_count = 0
         self.started.connect(self.onRun)
+        self.memory_monitor = None
+        self.finished.connect(self.reportMemoryUsage)
         self.dlg = dlg
         self.context = self.getExpressionContext()
         self.qgis_version = self.context.variable("qgis_short_version")
@@ -172,6 +175,17 @@ class TaBaseAlgorithm(QThread):
                 QgsExpressionContextUtils.globalProjectLayerScopes(layer))
         return context
 
+    @staticmethod
+    def widgetValue(widget):
+        """
+        Returns the value of a widget with a data defined override button (TaSpinBox or TaExpressionWidget)
+        and its override.
+
+        :rtype: TaFeatureValue.
+        """
+        value = widget.spinBox.value() if hasattr(widget, "spinBox") else widget.lineEdit.value()
+        return TaFeatureValue(value, widget.overrideButton.toProperty())
+
     @property
     def set_progress(self):
         return self.progress_count
@@ -196,3 +210,23 @@ class TaBaseAlgorithm(QThread):
 
     def onRun(self):
         self.out_file_path = self.getOutFilePath()
+        self.memory_monitor = TaMemoryMonitor()
+        self.memory_monitor.start()
+
+    def reportMemoryUsage(self, *args):
+        """Logs the peak memory used by the process while the algorithm was running."""
+        monitor = self.memory_monitor
+        if monitor is None:
+            return
+        self.memory_monitor = None
+        monitor.stop()
+        monitor.wait()
+        if monitor.start_memory is None:
+            return
+        mb = 1024 * 1024
+        self.feedback.info("Peak memory use{}: {:.0f} MB ({:.0f} MB above the {:.0f} MB in use before {} started).".format(
+            " (sampled every {} s)".format(monitor.interval) if monitor.sampled else "",
+            monitor.peak_memory / mb,
+            (monitor.peak_memory - monitor.start_memory) / mb,
+            monitor.start_memory / mb,
+            self.__name__))
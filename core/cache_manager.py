@@ -4,28 +4,86 @@ from appdirs import user_data_dir
 from plate_model_manager import PlateModelManager, PresentDayRasterManager, PlateModel
 from plate_model_manager.exceptions import ServerUnavailable
 from plate_model_manager.utils.download import FileDownloader
+from PyQt5.QtCore import QSettings
 import logging
 import os
 import shutil
 import fnmatch
 import glob
 import threading
+import time
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .download_manager import TaDownloadJob, TaDownloadManager
+from .reconstruction_cache import TaReconstructionCache, fileFingerprint
+
+DEFAULT_MODEL_CACHE_SIZE_MB = 1024
+# The snapshot of the model manifest is refreshed from the server when it is older than this
+DEFAULT_MANIFEST_TTL_HOURS = 24
+# Timeout (connect, read) in seconds of the background refresh of the model manifest
+MANIFEST_TIMEOUT = (5, 30)
+# Directory stamps are recomputed at most once per interval (in seconds), so that painting a combo box
+# with many models does not stat the model directories for every item
+STAMP_INTERVAL = 1.0
+
+
+def directoryStamp(path, depth=1):
+    """
+    Return a stamp of a directory that changes whenever a file or directory is added, removed or
+    modified in it or in its subdirectories down to the given depth.
+
+    :param path: Path of the directory.
+    :type path: str.
+    :param depth: Number of levels of subdirectories included.
+    :type depth: int.
+
+    :return: Sorted (name, size, modification time) entries, or None if the directory does not exist.
+    :rtype: tuple.
+    """
+    try:
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                if depth > 0 and entry.is_dir():
+                    entries.append((entry.name, directoryStamp(entry.path, depth - 1)))
+        return tuple(sorted(entries, key=lambda entry: entry[0]))
+    except OSError:
+        return None
+
 
 class _CacheSignals(QObject):
     """Qt signals for TaCacheManager (must live on a QObject)."""
     initialized = pyqtSignal()
     server_unavailable = pyqtSignal()
+    # Emitted on the main thread when the lists of models change after a refresh of the model manifest
+    models_updated = pyqtSignal()
 
 
 class _CacheInitThread(QThread):
     """Background thread that runs the slow cache-manager initialization."""
 
+    # Emitted once the manifest is loaded, before the background refresh of the manifest
+    loaded = pyqtSignal()
+    # Emitted with the plate model manager of the refreshed manifest, which is used from the main thread
+    manifest_refreshed = pyqtSignal(object)
+
     def __init__(self, cache_mgr, parent=None):
         super().__init__(parent)
         self._cache_mgr = cache_mgr
 
     def run(self):
         self._cache_mgr._do_initialize()
+        self.loaded.emit()
+        # The dialogs can already be populated from the snapshot while the manifest is refreshed
+        if self._cache_mgr._manifest_refresh_needed:
+            pm_manager = self._cache_mgr.fetch_manifest_update()
+            if pm_manager is not None:
+                self.manifest_refreshed.emit(pm_manager)
 
 
 class TaCacheManager:
@@ -48,11 +106,17 @@ class TaCacheManager:
         data_dir = user_data_dir("QGIS3", "QGIS")
         self.model_data_dir = os.path.join(data_dir, "plugins", "terra_antiqua", "models")
         self.raster_data_dir = os.path.join(data_dir, "plugins", "terra_antiqua", "rasters")
+        self.reconstruction_data_dir = os.path.join(data_dir, "plugins", "terra_antiqua", "reconstructions")
+        # Last model manifest fetched from the server, used at startup so that it never waits on the network
+        self.manifest_snapshot_path = os.path.join(data_dir, "plugins", "terra_antiqua", "models_manifest.json")
         
         # Create directories if they don't exist
         os.makedirs(self.model_data_dir, exist_ok=True)
         os.makedirs(self.raster_data_dir, exist_ok=True)
         
+        # Cache of reconstructed rasters
+        self.reconstruction_cache = TaReconstructionCache(self.reconstruction_data_dir)
+        
         self.pmm_logger = logging.getLogger('pmm')
         self.pmm_logger.setLevel(logging.DEBUG)
         
@@ -62,17 +126,28 @@ class TaCacheManager:
         self._init_thread = None
         self.signals = _CacheSignals()
         self._server_unavailable = False
+        self._manifest_refresh_needed = False
         
         # Defaults for attributes set during _do_initialize()
         self.pm_manager = None
         self.raster_manager = None
         self.model_list = []
         self.display_model_list = []
+        # Held while the plate model manager and the lists of models are swapped or read together
+        self._manifest_lock = threading.RLock()
         
-        # Caches to avoid repeated filesystem scans and network I/O
+        # Caches to avoid repeated filesystem scans and network I/O. Every entry holds the stamp of
+        # the directories it was computed from and is recomputed only when they change
         self._local_model_names_cache = None
         self._raster_available_cache = {}
         self._icon_tooltip_cache = {}
+        self._stamps = {}
+        
+        # Parsed rotation models and feature collections, shared by all algorithms. Keyed by
+        # (model name, layer name) and holding (file fingerprint, size of the files, object),
+        # least recently used first
+        self._model_objects = OrderedDict()
+        self._model_objects_lock = threading.Lock()
     
     @property
     def is_initialized(self):
@@ -84,7 +159,8 @@ class TaCacheManager:
         if self._initialized or self._init_thread is not None:
             return
         self._init_thread = _CacheInitThread(self)
-        self._init_thread.finished.connect(self._on_init_finished)
+        self._init_thread.loaded.connect(self._on_init_finished)
+        self._init_thread.manifest_refreshed.connect(self._use_refreshed_manifest)
         self._init_thread.start()
     
     def _on_init_finished(self):
@@ -96,26 +172,107 @@ class TaCacheManager:
         self.signals.initialized.emit()
     
     def _do_initialize(self):
-        """Perform the slow initialization (runs in a background thread)."""
-        try:
-            self.pm_manager = PlateModelManager()
-            self.raster_manager = PresentDayRasterManager(raster_manifest=os.path.join(os.path.dirname(__file__), "../resources/present_day_rasters.json"))
-        except ServerUnavailable:
-            self.pm_manager = PlateModelManager(os.path.join(os.path.dirname(__file__), "../resources/empty_json.json"))
-            self.raster_manager = PresentDayRasterManager(raster_manifest=os.path.join(os.path.dirname(__file__), "../resources/empty_json.json"))
-            self._server_unavailable = True
+        """
+        Perform the initialization (runs in a background thread).
         
+        The model manifest is loaded from the snapshot saved by the last successful refresh, which takes
+        no network access; the snapshot is refreshed afterwards if it is older than the TTL
+        (see refresh_manifest). The server is only waited on when there is no snapshot yet.
+        """
+        self.raster_manager = PresentDayRasterManager(raster_manifest=os.path.join(os.path.dirname(__file__), "../resources/present_day_rasters.json"))
         self.raster_manager.set_data_dir(self.raster_data_dir)
-
-        self.model_list = self.pm_manager.get_available_model_names()
-        if not self.model_list:
-            self.model_list = ["default"]
-        self.model_list.remove("default")
-        self.display_model_list = [self.get_display_name(model) for model in self.model_list]
+        
+        pm_manager = None
+        if os.path.isfile(self.manifest_snapshot_path):
+            try:
+                pm_manager = PlateModelManager(self.manifest_snapshot_path)
+                self._manifest_refresh_needed = self._manifest_age() > self.manifest_ttl
+            except Exception:
+                # A corrupted snapshot is replaced by a fresh manifest
+                pm_manager = None
+        if pm_manager is None:
+            try:
+                pm_manager = self._fetch_manifest()
+            except ServerUnavailable:
+                pm_manager = PlateModelManager(os.path.join(os.path.dirname(__file__), "../resources/empty_json.json"))
+                self._server_unavailable = True
+        self._set_plate_model_manager(pm_manager)
         
         self._initialized = True
         self._init_event.set()
     
+    def _set_plate_model_manager(self, pm_manager):
+        """Use a plate model manager and update the lists of models from its manifest."""
+        model_list = pm_manager.get_available_model_names()
+        if "default" in model_list:
+            model_list.remove("default")
+        display_model_list = [self.get_display_name(model) for model in model_list]
+        with self._manifest_lock:
+            self.pm_manager = pm_manager
+            self.model_list, self.display_model_list = model_list, display_model_list
+    
+    @property
+    def manifest_ttl(self):
+        """Age (in seconds) after which the snapshot of the model manifest is refreshed from the server."""
+        ttl_hours = QSettings("TerraAntiqua", "Terra Antiqua").value(
+            "manifest_ttl_hours", DEFAULT_MANIFEST_TTL_HOURS, type=float)
+        return max(float(ttl_hours), 0) * 3600
+    
+    def _manifest_age(self):
+        """Age (in seconds) of the snapshot of the model manifest."""
+        return time.time() - os.path.getmtime(self.manifest_snapshot_path)
+    
+    def _fetch_manifest(self):
+        """
+        Fetch the model manifest from the server and save it as the snapshot.
+        
+        :raises ServerUnavailable: If the server cannot be reached.
+        :return: Plate model manager of the fetched manifest.
+        :rtype: PlateModelManager.
+        """
+        pm_manager = PlateModelManager(timeout=MANIFEST_TIMEOUT)
+        temp_path = self.manifest_snapshot_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(pm_manager.models, f)
+        os.replace(temp_path, self.manifest_snapshot_path)
+        return pm_manager
+    
+    def fetch_manifest_update(self):
+        """
+        Refresh the snapshot of the model manifest from the server, without using it yet (it can run in
+        a background thread). If the server cannot be reached, the refresh is tried again at the next start.
+        
+        :return: Plate model manager of the refreshed manifest, or None if it could not be fetched.
+        :rtype: PlateModelManager.
+        """
+        try:
+            pm_manager = self._fetch_manifest()
+        except Exception as e:
+            self.pmm_logger.debug(f"The model manifest could not be refreshed: {e}")
+            return None
+        self._manifest_refresh_needed = False
+        return pm_manager
+    
+    def refresh_manifest(self):
+        """
+        Refresh the snapshot of the model manifest from the server and use it (must be called from the
+        main thread). If the server cannot be reached, the current manifest is kept.
+        
+        :return: True if the manifest was refreshed.
+        :rtype: bool.
+        """
+        pm_manager = self.fetch_manifest_update()
+        if pm_manager is None:
+            return False
+        self._use_refreshed_manifest(pm_manager)
+        return True
+    
+    def _use_refreshed_manifest(self, pm_manager):
+        """Slot called on the main thread to use a refreshed manifest and let the dialogs repopulate their models."""
+        self._set_plate_model_manager(pm_manager)
+        self.invalidate_cache()
+        self.signals.models_updated.emit()
+    
     def _ensure_initialized(self):
         """Block the calling thread until initialization is complete.
         
@@ -129,17 +286,39 @@ class TaCacheManager:
         else:
             self._init_event.wait()
         
+    def _directory_stamp(self, path, depth=1):
+        """Stamp of a directory (see directoryStamp), recomputed at most once every STAMP_INTERVAL seconds."""
+        now = time.monotonic()
+        cached = self._stamps.get((path, depth))
+        if cached is not None and now - cached[0] < STAMP_INTERVAL:
+            return cached[1]
+        stamp = directoryStamp(path, depth)
+        self._stamps[(path, depth)] = (now, stamp)
+        return stamp
+    
+    def _models_stamp(self):
+        """Stamp of the model directory, which changes when a model is downloaded, updated or deleted."""
+        return self._directory_stamp(self.model_data_dir, depth=2)
+    
+    def _raster_stamp(self, raster_name):
+        """Stamp of the directory of a present-day raster."""
+        return self._directory_stamp(os.path.join(self.raster_data_dir, self.available_rasters[raster_name]))
+    
     def _get_local_model_names(self):
         """Cached wrapper for pm_manager.get_local_available_model_names."""
-        if self._local_model_names_cache is None:
-            self._local_model_names_cache = self.pm_manager.get_local_available_model_names(self.model_data_dir)
-        return list(self._local_model_names_cache)
+        stamp = self._models_stamp()
+        if self._local_model_names_cache is None or self._local_model_names_cache[0] != stamp:
+            with self._manifest_lock:
+                pm_manager = self.pm_manager
+            self._local_model_names_cache = (stamp, pm_manager.get_local_available_model_names(self.model_data_dir))
+        return list(self._local_model_names_cache[1])
     
     def invalidate_cache(self):
         """Clear all cached lookups so the next access re-queries the filesystem / network."""
         self._local_model_names_cache = None
         self._raster_available_cache.clear()
         self._icon_tooltip_cache.clear()
+        self._stamps.clear()
     
     def get_display_name(self, model_name):
         """Convert model name to a more readable format."""
@@ -156,8 +335,11 @@ class TaCacheManager:
     def get_icon_and_tooltip(self, model_or_raster_name):
         """Get the icon and tooltip for a model or raster (cached)."""
         self._ensure_initialized()
-        if model_or_raster_name in self._icon_tooltip_cache:
-            return self._icon_tooltip_cache[model_or_raster_name]
+        is_raster = model_or_raster_name in self.available_rasters
+        stamp = self._raster_stamp(model_or_raster_name) if is_raster else self._models_stamp()
+        cached = self._icon_tooltip_cache.get(model_or_raster_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
         result = ("", "")
         if model_or_raster_name is not None:
             if model_or_raster_name in self.get_available_rasters():
@@ -171,14 +353,16 @@ class TaCacheManager:
                         result = ("🛠️", "Custom model")
                     elif cache_manager.is_model_available_locally(model_name):
                         result = ("✅", "Already downloaded")
-        self._icon_tooltip_cache[model_or_raster_name] = result
+        self._icon_tooltip_cache[model_or_raster_name] = (stamp, result)
         return result
     
     def get_custom_model_names(self):
         """Return the names of locally available models as a list."""
         self._ensure_initialized()
         local_models = self._get_local_model_names()
-        for model in self.model_list:
+        with self._manifest_lock:
+            model_list = self.model_list
+        for model in model_list:
             if model in local_models:
                 local_models.remove(model)
         return local_models
@@ -186,7 +370,8 @@ class TaCacheManager:
     def get_available_models(self, required_layers=[]):
         """Return a list of available models, filtering by required layers."""
         self._ensure_initialized()
-        available_models = self.display_model_list.copy()
+        with self._manifest_lock:
+            available_models = self.display_model_list.copy()
         local_models = self.get_custom_model_names()
         available_models.extend(local_models)
 
@@ -199,8 +384,9 @@ class TaCacheManager:
         """Check if a model is available locally."""
         self._ensure_initialized()
         local_models = self._get_local_model_names()
-        index = self.display_model_list.index(display_model_name)
-        model_name = self.model_list[index]
+        with self._manifest_lock:
+            index = self.display_model_list.index(display_model_name)
+            model_name = self.model_list[index]
         return model_name in local_models
     
     def is_model_custom(self, model_name):
@@ -224,10 +410,11 @@ class TaCacheManager:
             model_name = display_model_name
             model = PlateModel(model_name, data_dir=self.model_data_dir, readonly=True)
         else:
-            index = self.display_model_list.index(display_model_name)
-            model_name = self.model_list[index]
-            model = self.pm_manager.get_model(model_name, self.model_data_dir)
-        self.invalidate_cache()
+            with self._manifest_lock:
+                index = self.display_model_list.index(display_model_name)
+                model_name = self.model_list[index]
+                pm_manager = self.pm_manager
+            model = pm_manager.get_model(model_name, self.model_data_dir)
         return model
     
     def get_model_bigtime(self, model_name):
@@ -257,33 +444,37 @@ class TaCacheManager:
         if feedback: feedback.progress += 10
         
         if feedback: self.pmm_logger.removeHandler(feedback.log_handler)
-        self.invalidate_cache()
+        self._stamps.clear()
         return rotation_model
 
     def download_all_layers(self, model_name, feedback=None):
         if feedback: self.pmm_logger.addHandler(feedback.log_handler)
         
         model = self.get_model(model_name)
-        layers = model.get_avail_layers()
+        available_layers = model.get_avail_layers()
         
         if feedback: feedback.progress += 10
         
-        for layer in self.possible_layers:
-            layer = layer.replace(" ", "")
-            if layer in layers:
-                model.get_layer(layer, return_none_if_not_exist=True)
-                if self.is_model_custom(model_name) and feedback:
+        # The layers are stored in separate folders, so they can be downloaded at the same time
+        layers = [layer.replace(" ", "") for layer in self.possible_layers
+                  if layer.replace(" ", "") in available_layers]
+        is_custom = self.is_model_custom(model_name)
+        with ThreadPoolExecutor(max_workers=max(len(layers), 1)) as pool:
+            futures = [pool.submit(model.get_layer, layer, return_none_if_not_exist=True) for layer in layers]
+            for layer, future in zip(layers, futures):
+                future.result()
+                if is_custom and feedback:
                     feedback.debug(f"Layer '{layer}' for model '{model_name}' available locally, no need to download.")
                 if feedback: feedback.progress += 5
         
         if feedback: self.pmm_logger.removeHandler(feedback.log_handler)
-        self.invalidate_cache()
+        self._stamps.clear()
     
     def get_layer(self, model_name, layer_name, feedback=None):
         model = self.get_model(model_name)
         layer_name = layer_name.replace(" ", "")
         result = model.get_layer(layer_name, return_none_if_not_exist=True)
-        self.invalidate_cache()
+        self._stamps.clear()
         return result
     
     def get_available_rasters(self):
@@ -297,14 +488,18 @@ class TaCacheManager:
     def is_raster_available_locally(self, raster_name):
         """Check if a raster is already downloaded (cached)."""
         self._ensure_initialized()
-        if raster_name in self._raster_available_cache:
-            return self._raster_available_cache[raster_name]
+        stamp = self._raster_stamp(raster_name)
+        cached = self._raster_available_cache.get(raster_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
         internal_name = self.available_rasters[raster_name]
         if internal_name not in self.raster_manager.rasters:
             raster_dir = os.path.join(self.raster_data_dir, internal_name)
             result = os.path.isdir(raster_dir) and any(
-                f for f in os.listdir(raster_dir) if not f.startswith('.')
+                f for f in os.listdir(raster_dir) if not f.startswith('.') and not f.endswith(('.part', '.part.json'))
             )
+        elif self._get_downloaded_raster(internal_name) is not None:
+            result = True
         else:
             downloader = FileDownloader(
                 self.raster_manager.rasters[internal_name],
@@ -313,7 +508,7 @@ class TaCacheManager:
                 large_file_hint=True,
             )
             result = not downloader.check_if_file_need_update()
-        self._raster_available_cache[raster_name] = result
+        self._raster_available_cache[raster_name] = (stamp, result)
         return result
     
     def download_raster(self, raster, feedback=None):
@@ -322,18 +517,62 @@ class TaCacheManager:
         internal_name = self.available_rasters[raster]
         if internal_name not in self.raster_manager.rasters:
             files = glob.glob(f"{self.raster_data_dir}/{internal_name}/*")
-            files = [f for f in files if not os.path.basename(f).startswith('.')]
+            files = [f for f in files if not os.path.basename(f).startswith('.') and not f.endswith(('.part', '.part.json'))]
             if files:
                 if feedback: self.pmm_logger.removeHandler(feedback.log_handler)
                 return files[0]
             raise FileNotFoundError(
                 f"Raster '{internal_name}' is not available on the server and no local copy was found."
             )
-        output_filename = self.raster_manager.get_raster(internal_name)
-        if feedback: self.pmm_logger.removeHandler(feedback.log_handler)
-        self.invalidate_cache()
+        try:
+            output_filename = self._get_downloaded_raster(internal_name)
+            if output_filename is None:
+                if os.path.exists(os.path.join(self.raster_data_dir, internal_name, ".metadata.json")):
+                    # Downloaded with the Plate Model Manager by an earlier version of the plugin
+                    output_filename = self.raster_manager.get_raster(internal_name)
+                else:
+                    output_filename = self._download_raster_file(internal_name, feedback)
+        finally:
+            if feedback: self.pmm_logger.removeHandler(feedback.log_handler)
+            self._stamps.clear()
         return output_filename
     
+    def _get_downloaded_raster(self, internal_name):
+        """Return the path of a raster downloaded with _download_raster_file, or None if it is not there."""
+        record_path = os.path.join(self.raster_data_dir, internal_name, ".download.json")
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self.raster_data_dir, internal_name, record.get("file", ""))
+        if record.get("url") != self.raster_manager.rasters.get(internal_name) or not os.path.isfile(path):
+            return None
+        return path
+    
+    def _download_raster_file(self, internal_name, feedback=None):
+        """
+        Download a present-day raster with the download manager: an interrupted download is resumed the next
+        time, and the progress is logged every 10 %. The URL and file name are recorded in .download.json.
+        """
+        url = self.raster_manager.rasters[internal_name]
+        file_name = os.path.basename(urlparse(url).path)
+        path = os.path.join(self.raster_data_dir, internal_name, file_name)
+        reported = [-1]
+        
+        def progress(done, total):
+            if feedback and total:
+                step = int(10 * done / total)
+                if step > reported[0]:
+                    reported[0] = step
+                    feedback.info(f"{file_name}: {done / 2**20:.0f} of {total / 2**20:.0f} MB downloaded.")
+        
+        TaDownloadManager().download([TaDownloadJob(url, path)], progress,
+                                     is_canceled=(lambda: feedback.canceled) if feedback else None)
+        with open(os.path.join(self.raster_data_dir, internal_name, ".download.json"), "w") as f:
+            json.dump({"url": url, "file": file_name}, f)
+        return path
+    
     def delete_raster(self, raster_name):
         """Delete a raster from the local storage."""
         internal_name = self.available_rasters[raster_name]
@@ -374,7 +613,74 @@ class TaCacheManager:
         self._ensure_initialized()
         model = self.get_model(model_name)
         model.purge()
+        self.invalidate_model_objects(model_name)
         self.invalidate_cache()
+    
+    @property
+    def model_objects_size_limit(self):
+        """Maximum total size (in bytes) of the files whose parsed objects are kept in memory."""
+        limit_mb = QSettings("TerraAntiqua", "Terra Antiqua").value(
+            "model_cache_mb", DEFAULT_MODEL_CACHE_SIZE_MB, type=int)
+        return max(int(limit_mb), 0) * 1024 * 1024
+    
+    def _get_model_object(self, model_name, layer_name, files, parse):
+        """
+        Return the parsed object of a set of model files, parsing them only if they have not been parsed
+        before or have changed on disk since. The least recently used objects are dropped when the total
+        size of their files exceeds model_objects_size_limit.
+        """
+        if not files:
+            return None
+        fingerprint = fileFingerprint(files)
+        key = (model_name, layer_name)
+        with self._model_objects_lock:
+            entry = self._model_objects.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._model_objects.move_to_end(key)
+                return entry[2]
+        model_object = parse(files)
+        size = sum(item[1] for item in fingerprint)
+        with self._model_objects_lock:
+            self._model_objects[key] = (fingerprint, size, model_object)
+            self._model_objects.move_to_end(key)
+            size_limit = self.model_objects_size_limit
+            total = sum(entry[1] for entry in self._model_objects.values())
+            while total > size_limit and len(self._model_objects) > 1:
+                _, (_, dropped_size, _) = self._model_objects.popitem(last=False)
+                total -= dropped_size
+        return model_object
+    
+    def parse_rotation_model(self, model_name, rotation_files):
+        """Return the rotation files of a model (see download_model) parsed into a pygplates.RotationModel."""
+        import pygplates
+        return self._get_model_object(model_name, "Rotations", rotation_files, pygplates.RotationModel)
+    
+    def parse_feature_collections(self, model_name, layer_name, layer_files):
+        """
+        Return the files of a layer of a model (see get_layer) parsed into a list of pygplates.FeatureCollection,
+        or None if the model does not have the layer.
+        """
+        import pygplates
+        if isinstance(layer_files, str):
+            layer_files = [layer_files]
+        return self._get_model_object(model_name, layer_name.replace(" ", ""), layer_files,
+                                      lambda files: [pygplates.FeatureCollection(f) for f in files])
+    
+    def get_rotation_model(self, model_name, feedback=None):
+        """Return the parsed rotation model of a model, downloading it if needed."""
+        return self.parse_rotation_model(model_name, self.download_model(model_name, feedback))
+    
+    def get_feature_collections(self, model_name, layer_name, feedback=None):
+        """Return the parsed features of a layer of a model, downloading them if needed."""
+        return self.parse_feature_collections(model_name, layer_name,
+                                              self.get_layer(model_name, layer_name, feedback))
+    
+    def invalidate_model_objects(self, model_name=None):
+        """Drop the parsed objects of a model, or of all models if no model name is given."""
+        with self._model_objects_lock:
+            for key in list(self._model_objects):
+                if model_name is None or key[0] == model_name:
+                    del self._model_objects[key]
         
 cache_manager = TaCacheManager()
     
\ No newline at end of file
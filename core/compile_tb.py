@@ -17,39 +17,49 @@ import shutil
 import numpy as np
 
 from .utils import (
-    vectorToRaster,
+    vectorToRasterWindow,
     modRescale,
     bufferAroundGeometries,
     TaVectorFileWriter,
     reprojectVectorLayer,
-    polygonsToPolylines
+    polygonsToPolylines,
+    toRasterLayer,
+    toVectorLayer
 )
 from .base_algorithm import TaBaseAlgorithm
+from .raster_io import processRasterInTiles
+from .parameters import TaCompileTopoBathyParameters
 
 
-class TaCompileTopoBathy(TaBaseAlgorithm):
+class TaCompileTopoBathyEngine:
+    """
+    Compiles several topography and bathymetry rasters into one, with the parameters of self.params
+    (TaCompileTopoBathyParameters).
 
-    def __init__(self, dlg):
-        super().__init__(dlg)
-        self.remove_overlap = None
+    The class that inherits it provides the feedback, the crs and the cancellation: TaCompileTopoBathy in
+    the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
+    items = None
+    mask_layer = None
+    remove_overlap = None
 
-
-    def getParameters(self):
+    def loadInputs(self):
         self.items=[]
-        self.feedback.info(f"{self.dlg.tableWidget.rowCount()} layers will be merged in the following order:")
+        if not self.params.input_rasters:
+            self.feedback.error("There are no layers to compile.")
+            self.kill()
+            return
+        self.feedback.info(f"{len(self.params.input_rasters)} layers will be merged in the following order:")
 
-        self.remove_overlap = self.dlg.removeOverlapBathyCheckBox.isChecked()
-        if self.remove_overlap:
-            self.mask_layer = self.dlg.maskComboBox.currentLayer()
-        else:
-            self.mask_layer = None
-        for i in range(self.dlg.tableWidget.rowCount()):
+        self.mask_layer = toVectorLayer(self.params.mask_layer) if self.params.mask_layer else None
+        self.remove_overlap = self.mask_layer is not None
+        for i, input_raster in enumerate(self.params.input_rasters):
             if self.killed:
                 break
-            layer = self.dlg.tableWidget.cellWidget(i,0).currentLayer()
-            if self.remove_overlap and self.mask_layer:
-                mask_applied = self.dlg.tableWidget.cellWidget(i, 2).findChild(QtWidgets.QWidget,
-                                                                               name = "apply_mask_checkbox").isChecked()
+            layer = toRasterLayer(input_raster)
+            if self.remove_overlap and i < len(self.params.apply_mask):
+                mask_applied = bool(self.params.apply_mask[i])
             else:
                 mask_applied = False
             item = {
@@ -106,41 +116,42 @@ class TaCompileTopoBathy(TaBaseAlgorithm):
                 self.kill()
                 break
 
-    def run(self):
-        self.getParameters()
+    def compileRasters(self):
+        """
+        :return: The path of the output raster, or None if processing failed or was canceled.
+        :rtype: str.
+        """
+        self.loadInputs()
+        if self.killed:
+            return None
         raster_size = (self.items[0].get('Layer').dataProvider().ySize(),
                       self.items[0].get('Layer').dataProvider().xSize())
-        compiled_array = np.empty(raster_size)
-        compiled_array[:] = np.nan
-        unit_progress = 90/len(self.items)
+        # Buffer and border layers used to remove overlapping bathymetry, by item index
+        overlap_masks = {}
+        geotransforms = []
+        for item in self.items:
+            ds = gdal.Open(item.get("Layer").source())
+            geotransforms.append(ds.GetGeoTransform() if ds is not None else None)
+            ds = None
+        unit_progress = 10/len(self.items)
         for i in range(len(self.items), 0, -1):
             if self.killed:
                 break
             item = self.items[i-1]
-            self.feedback.info(f"Compiling {item.get('Layer').name()} raster layer.")
 
-            try:
-                ds = gdal.Open(item.get("Layer").source())
-                data_array = ds.GetRasterBand(1).ReadAsArray()
-            except Exception as e:
+            if geotransforms[i-1] is None:
                 self.feedback.error(f"Compiling {item.get('Layer').name()} failed.")
                 self.feedback.error("You need to check, if you have access to this layer's storage location (should not\
                                     be stored on the cloud.")
                 self.kill()
                 continue
-            # Set nodata values to np.nan
-            no_data_value = ds.GetRasterBand(1).GetNoDataValue()
-            if no_data_value != np.nan:
-                data_array[data_array==no_data_value] = np.nan
-            compiled_array[np.isfinite(data_array)] = data_array[np.isfinite(data_array)]
 
             if self.remove_overlap and item.get("Mask_Applied"):
-                geotransform = ds.GetGeoTransform()
                 self.feedback.info(f"Creating buffer around polygon \
                                    geometries for removing overlapping bathymetry, to be applied to \
                                    {item.get('Layer').name()} layer.")
-                buffer_distance = self.dlg.bufferDistanceForRemoveOverlapBath.value()
-                if self.dlg.selectedFeaturesCheckBox.isChecked():
+                buffer_distance = self.params.buffer_distance
+                if self.params.selected_features_only:
                     features = list(self.mask_layer.getSelectedFeatures())
                     temp_layer = QgsVectorLayer(f"Polygon?crs={self.crs.authid()}",
                                                 "Selected mask features", "memory")
@@ -177,54 +188,90 @@ class TaCompileTopoBathy(TaBaseAlgorithm):
                     #Get polygon borders for removing artefats beneath them
                     polyline_layer = polygonsToPolylines(self.mask_layer)
 
-                buffer_array = vectorToRaster(
-                    buffer_layer,
-                    geotransform,
-                    raster_size[1],
-                    raster_size[0],
-                    field_to_burn = None,
-                    no_data = 0
-                    )
-
-                #Rasterize polygon borders for removing negative (artefact) values beneath them.
-                masks_border_array = vectorToRaster(
-                    polyline_layer,
-                    geotransform,
-                    raster_size[1],
-                    raster_size[0],
-                    field_to_burn=None,
-                    no_data = 0
-                    )
-
-
-                #Remove negative values inside the buffered regions
-                self.feedback.info("Removing bathymetry values from the gaps between continental blocks." )
-                compiled_array[(buffer_array == 1)*(compiled_array< -1000)==1] = np.nan
-                compiled_array[(masks_border_array== 1)*(compiled_array< -1000)==1] = np.nan
+                overlap_masks[i-1] = (buffer_layer, polyline_layer)
 
             self.feedback.progress += unit_progress
 
+        def compileTile(arrays, window):
+            compiled_array = np.empty(arrays[0].shape, dtype=np.float32)
+            compiled_array[:] = np.nan
+            for i in range(len(self.items), 0, -1):
+                data_array = arrays[i-1]
+                compiled_array[np.isfinite(data_array)] = data_array[np.isfinite(data_array)]
+
+                if i-1 in overlap_masks:
+                    buffer_layer, polyline_layer = overlap_masks[i-1]
+                    buffer_array, _ = vectorToRasterWindow(
+                        buffer_layer,
+                        geotransforms[i-1],
+                        raster_size[1],
+                        raster_size[0],
+                        no_data = 0,
+                        window = window
+                        )
+
+                    #Rasterize polygon borders for removing negative (artefact) values beneath them.
+                    masks_border_array, _ = vectorToRasterWindow(
+                        polyline_layer,
+                        geotransforms[i-1],
+                        raster_size[1],
+                        raster_size[0],
+                        no_data = 0,
+                        window = window
+                        )
 
+                    #Remove negative values inside the buffered regions
+                    compiled_array[(buffer_array == 1)*(compiled_array< -1000)==1] = np.nan
+                    compiled_array[(masks_border_array== 1)*(compiled_array< -1000)==1] = np.nan
+            return compiled_array
 
         if not self.killed:
-            output_raster = gdal.GetDriverByName("GTiff").Create(self.out_file_path,
-                                                                 raster_size[1],
-                                                                 raster_size[0],
-                                                                 1,
-                                                                 gdal.GDT_Float32)
-
-            ds = gdal.Open(self.items[0].get("Layer").source())
-            geotransform = ds.GetGeoTransform()
-            ds = None
-            output_raster.SetGeoTransform(geotransform)
-            output_raster.SetProjection(self.crs.toWkt())
-            output_raster.GetRasterBand(1).WriteArray(compiled_array)
-            output_raster.GetRasterBand(1).SetNoDataValue(np.nan)
-            output_raster = None
+            self.feedback.info("Compiling the raster layers.")
+            if overlap_masks:
+                self.feedback.info("Removing bathymetry values from the gaps between continental blocks." )
+            try:
+                # The layers are compiled tile by tile, so that large rasters do not need to fit into memory
+                processRasterInTiles([item.get("Layer") for item in self.items],
+                                     self.params.output_path,
+                                     compileTile,
+                                     bytes_per_pixel=4*len(self.items) + 24,
+                                     projection=self.crs.toWkt(),
+                                     feedback=self.feedback,
+                                     runtime_percentage=80)
+            except Exception as e:
+                self.feedback.error("Compiling the raster layers failed with the following error:")
+                self.feedback.error(e)
+                self.kill()
 
+        if not self.killed:
             self.feedback.progress = 100
+            return self.params.output_path
+        return None
 
-            self.finished.emit(True, self.out_file_path)
+
+class TaCompileTopoBathy(TaCompileTopoBathyEngine, TaBaseAlgorithm):
+
+    def run(self):
+        self.params = self.getParameters()
+        out_file_path = self.compileRasters()
+        if out_file_path:
+            self.finished.emit(True, out_file_path)
         else:
             self.finished.emit(False, "")
 
+    def getParameters(self):
+        """Returns the parameters set in the dialog (TaCompileTopoBathyParameters)."""
+        remove_overlap = self.dlg.removeOverlapBathyCheckBox.isChecked()
+        input_rasters = []
+        apply_mask = []
+        for i in range(self.dlg.tableWidget.rowCount()):
+            input_rasters.append(self.dlg.tableWidget.cellWidget(i,0).currentLayer())
+            apply_mask.append(remove_overlap and self.dlg.tableWidget.cellWidget(i, 2).findChild(
+                QtWidgets.QWidget, name = "apply_mask_checkbox").isChecked())
+        return TaCompileTopoBathyParameters(
+            input_rasters=input_rasters,
+            output_path=self.out_file_path,
+            mask_layer=self.dlg.maskComboBox.currentLayer() if remove_overlap else None,
+            apply_mask=apply_mask,
+            buffer_distance=self.dlg.bufferDistanceForRemoveOverlapBath.value(),
+            selected_features_only=self.dlg.selectedFeaturesCheckBox.isChecked())
@@ -4,19 +4,41 @@
 
 import sys
 import importlib
+import importlib.util
 import site
 from pathlib import Path
 
 from PyQt5.QtCore import QThread, pyqtSignal
 
 
+# Top-level modules of the third-party packages imported by the plugin (the other packages of
+# requirements.txt are their dependencies)
+REQUIRED_MODULES = [
+    "appdirs",
+    "plate_model_manager",
+    "gplately",
+    "pygplates",
+    "agegrid",
+    "netCDF4",
+    "scipy",
+]
+
+
+def missing_dependencies():
+    """Return the required modules that cannot be found, without importing them."""
+    missing = []
+    for module in REQUIRED_MODULES:
+        try:
+            if importlib.util.find_spec(module) is None:
+                missing.append(module)
+        except (ImportError, ValueError):
+            missing.append(module)
+    return missing
+
+
 def check_dependencies():
     """Return True if the plugin's third-party dependencies are installed."""
-    try:
-        from .terra_antiqua import TerraAntiqua  # noqa: F401
-    except ImportError:
-        return False
-    return True
+    return not missing_dependencies()
 
 
 class DependencyInstallThread(QThread):
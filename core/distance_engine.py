@@ -0,0 +1,182 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Distances to coastlines (feature outlines) calculated in memory with numpy and scipy.
+
+Two methods are available:
+    - 'vertices': distance to the nearest vertex of the (densified) outline, found with a KD-tree.
+    In geographic coordinates the vertices and points are placed on a unit sphere, so that the
+    nearest vertex is the nearest along the great circle.
+    - 'raster': distance to the nearest pixel outside a polygon mask, found with a Euclidean distance
+    transform of the raster.
+
+All distances are returned in km. The module does not depend on QGIS, so it can be used in worker processes.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.ndimage import distance_transform_edt
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def unitSphereCoordinates(lon, lat):
+    """Converts longitudes and latitudes (in degrees) to cartesian coordinates on a unit sphere."""
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chordToKm(chord):
+    """Converts chord lengths on a unit sphere to great circle distances in km."""
+    return 2 * np.arcsin(np.minimum(chord / 2, 1)) * EARTH_RADIUS_KM
+
+
+def geometryVertices(geometry):
+    """
+    Returns the x and y coordinates of all vertices of an OGR geometry.
+
+    :param geometry: Geometry to extract the vertices from.
+    :type geometry: ogr.Geometry.
+
+    :return: x and y coordinates.
+    :rtype: tuple.
+    """
+    if geometry.GetGeometryCount() > 0:
+        parts = [geometryVertices(geometry.GetGeometryRef(i)) for i in range(geometry.GetGeometryCount())]
+        return (np.concatenate([part[0] for part in parts]),
+                np.concatenate([part[1] for part in parts]))
+    points = geometry.GetPoints() or []
+    vertices = np.array([point[:2] for point in points], dtype=np.float64).reshape(-1, 2)
+    return vertices[:, 0], vertices[:, 1]
+
+
+def distanceToVertices(x, y, vertex_x, vertex_y, geographic, km_per_unit=1.0):
+    """
+    Calculates the distance from points to the nearest of a set of vertices.
+
+    :param x, y: Coordinates of the points.
+    :type x, y: np.ndarray.
+    :param vertex_x, vertex_y: Coordinates of the vertices.
+    :type vertex_x, vertex_y: np.ndarray.
+    :param geographic: If True the coordinates are longitudes and latitudes and great circle distances
+    on a spherical Earth are returned, otherwise the distances are planar.
+    :type geographic: bool.
+    :param km_per_unit: Length of a map unit in km. Used only for planar distances.
+    :type km_per_unit: float.
+
+    :return: Distances in km.
+    :rtype: np.ndarray.
+    """
+    if geographic:
+        points = unitSphereCoordinates(x, y)
+        vertices = unitSphereCoordinates(vertex_x, vertex_y)
+    else:
+        points = np.column_stack((x, y))
+        vertices = np.column_stack((vertex_x, vertex_y))
+    distances, _ = cKDTree(vertices).query(points)
+    if geographic:
+        return chordToKm(distances)
+    return distances * km_per_unit
+
+
+def distanceTransform(coast_mask, geotransform, geographic, km_per_unit=1.0, return_indices=False):
+    """
+    Calculates the distance from each pixel of a raster to the nearest coast pixel.
+
+    In planar coordinates this is the Euclidean distance transform of the raster. In geographic coordinates
+    the nearest coast pixel is found in pixel space and the great circle distance to it is returned, which
+    is exact along meridians and slightly overestimates the distance at high latitudes elsewhere.
+
+    :param coast_mask: Mask of the coast (or any target) pixels.
+    :type coast_mask: np.ndarray.
+    :param geotransform: Geotransform of the raster (north-up, without rotation).
+    :type geotransform: tuple.
+    :param geographic: Whether the raster is in geographic coordinates.
+    :type geographic: bool.
+    :param km_per_unit: Length of a map unit in km. Used only for planar distances.
+    :type km_per_unit: float.
+    :param return_indices: Whether the row and column indices of the nearest coast pixels should be returned as well.
+    :type return_indices: bool.
+
+    :return: Float32 distances in km (infinite if there are no coast pixels) and, if return_indices is True,
+    the indices of the nearest coast pixels (None if there are no coast pixels).
+    :rtype: np.ndarray or tuple.
+    """
+    if not coast_mask.any():
+        distances = np.full(coast_mask.shape, np.inf, dtype=np.float32)
+        return (distances, None) if return_indices else distances
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    if not geographic:
+        distances, indices = distance_transform_edt(~coast_mask, sampling=(abs(yres), abs(xres)),
+                                                    return_indices=True)
+        distances = (distances * km_per_unit).astype(np.float32)
+        return (distances, (indices[0], indices[1])) if return_indices else distances
+
+    nearest_rows, nearest_cols = distance_transform_edt(~coast_mask, return_distances=False, return_indices=True)
+    lat = upy + (np.arange(coast_mask.shape[0], dtype=np.float64) + 0.5) * yres
+    lon = upx + (np.arange(coast_mask.shape[1], dtype=np.float64) + 0.5) * xres
+    distances = np.empty(coast_mask.shape, dtype=np.float32)
+    # Row by row, to keep the temporary arrays small
+    for row in range(coast_mask.shape[0]):
+        points = unitSphereCoordinates(lon, np.full(lon.shape, lat[row]))
+        coast = unitSphereCoordinates(lon[nearest_cols[row]], lat[nearest_rows[row]])
+        distances[row] = chordToKm(np.sqrt(((points - coast) ** 2).sum(axis=1)))
+    return (distances, (nearest_rows, nearest_cols)) if return_indices else distances
+
+
+def outlineDistanceTransform(polygon_mask, geotransform, geographic, km_per_unit=1.0):
+    """
+    Calculates the distance from each pixel inside a polygon to its outline, i.e. to the nearest pixel
+    outside the polygon. The pixels around the mask are treated as lying outside the polygon.
+
+    :param polygon_mask: Mask of the pixels inside the polygon.
+    :type polygon_mask: np.ndarray.
+    :param geotransform: Geotransform of the mask.
+    :type geotransform: tuple.
+    :param geographic: Whether the raster is in geographic coordinates.
+    :type geographic: bool.
+    :param km_per_unit: Length of a map unit in km. Used only for planar distances.
+    :type km_per_unit: float.
+
+    :return: Float32 distances in km (zero outside the polygon) and the row and column indices of the
+    nearest pixels outside the polygon, clipped to the extent of the mask.
+    :rtype: tuple.
+    """
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    padded = np.pad(polygon_mask, 1, constant_values=False)
+    padded_geotransform = (upx - xres, xres, xskew, upy - yres, yskew, yres)
+    distances, (nearest_rows, nearest_cols) = distanceTransform(~padded, padded_geotransform, geographic,
+                                                                km_per_unit, return_indices=True)
+    nearest_rows = np.clip(nearest_rows[1:-1, 1:-1] - 1, 0, polygon_mask.shape[0] - 1)
+    nearest_cols = np.clip(nearest_cols[1:-1, 1:-1] - 1, 0, polygon_mask.shape[1] - 1)
+    return distances[1:-1, 1:-1], (nearest_rows, nearest_cols)
+
+
+def distanceToOutline(polygon_mask, geotransform, x, y, geographic, km_per_unit=1.0):
+    """
+    Calculates the distance from points inside a polygon to its outline, using the distance transform of
+    the polygon mask (see outlineDistanceTransform).
+
+    :param polygon_mask: Mask of the pixels inside the polygon.
+    :type polygon_mask: np.ndarray.
+    :param geotransform: Geotransform of the mask.
+    :type geotransform: tuple.
+    :param x, y: Coordinates of the points.
+    :type x, y: np.ndarray.
+    :param geographic: Whether the coordinates are geographic.
+    :type geographic: bool.
+    :param km_per_unit: Length of a map unit in km. Used only for planar distances.
+    :type km_per_unit: float.
+
+    :return: Distances in km.
+    :rtype: np.ndarray.
+    """
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    distances, _ = outlineDistanceTransform(polygon_mask, geotransform, geographic, km_per_unit)
+    cols = np.clip(np.floor((np.asarray(x) - upx) / xres).astype(np.int64), 0, polygon_mask.shape[1] - 1)
+    rows = np.clip(np.floor((np.asarray(y) - upy) / yres).astype(np.int64), 0, polygon_mask.shape[0] - 1)
+    return distances[rows, cols].astype(np.float64)
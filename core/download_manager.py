@@ -0,0 +1,221 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Parallel, resumable HTTP downloads.
+
+Files are downloaded into a ".part" file next to their destination. The ETag (or Last-Modified date)
+of the response is stored next to it, so that an interrupted download is resumed with a Range request
+if the file has not changed on the server, and restarted otherwise. Finished files are checked against
+their expected size and SHA-256 checksum (when known) before they are moved to their destination.
+
+TaDownloadManager downloads several files at the same time in a pool of threads and reports the
+number of bytes downloaded so far. The cache manager uses it to download the present-day rasters.
+
+The module only uses the standard library, so it does not depend on QGIS.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_TIMEOUT = 60
+DEFAULT_WORKERS = 4
+
+
+class TaDownloadError(IOError):
+    """Raised when a file cannot be downloaded or fails its checks."""
+
+
+class TaDownloadCanceled(Exception):
+    """Raised when a download is canceled. The partial file is kept, so the download can be resumed."""
+
+
+class TaDownloadJob:
+    """A file to download: its URL, destination path and, if known, its size and SHA-256 checksum."""
+
+    def __init__(self, url, path, sha256=None, size=None):
+        self.url = url
+        self.path = path
+        self.sha256 = sha256.lower() if sha256 else None
+        self.size = size
+
+    @property
+    def part_path(self):
+        return self.path + ".part"
+
+    @property
+    def state_path(self):
+        return self.path + ".part.json"
+
+
+def fileSha256(path, chunk_size=CHUNK_SIZE):
+    """Returns the SHA-256 checksum of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _removeFiles(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def downloadFile(job, progress=None, is_canceled=None, chunk_size=CHUNK_SIZE, timeout=DEFAULT_TIMEOUT):
+    """
+    Downloads a file, resuming a previous partial download of it if possible.
+
+    :param job: The file to download.
+    :type job: TaDownloadJob.
+    :param progress: Called with the number of bytes received (and with the number of bytes already on disk
+    when a download is resumed), and with the total size of the file once it is known (keyword total).
+    :type progress: callable.
+    :param is_canceled: Called between chunks; the download stops with TaDownloadCanceled if it returns True.
+    :type is_canceled: callable.
+    :param chunk_size: Number of bytes read at once.
+    :type chunk_size: int.
+    :param timeout: Timeout of the connection in seconds.
+    :type timeout: float.
+
+    :return: The destination path.
+    :rtype: str.
+    """
+    if os.path.exists(job.path) and (job.sha256 is None or fileSha256(job.path) == job.sha256):
+        if progress is not None:
+            size = os.path.getsize(job.path)
+            progress(size, total=size)
+        return job.path
+    os.makedirs(os.path.dirname(os.path.abspath(job.path)), exist_ok=True)
+
+    offset = 0
+    headers = {}
+    state = {}
+    if os.path.exists(job.part_path) and os.path.exists(job.state_path):
+        try:
+            with open(job.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        validator = state.get("etag") or state.get("last_modified")
+        if state.get("url") == job.url and validator:
+            offset = os.path.getsize(job.part_path)
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
+    request = urllib.request.Request(job.url, headers=headers)
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except Exception as e:
+        raise TaDownloadError(f"Cannot download {job.url}: {e}") from e
+
+    with response:
+        if offset and response.status == 206 and \
+                response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            mode = "ab"
+        else:
+            # The server sent the whole file (the file changed or ranges are not supported)
+            offset = 0
+            mode = "wb"
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length is not None else job.size
+        if job.size is not None and total is not None and total != job.size:
+            raise TaDownloadError(f"{job.url} has {total} bytes, {job.size} were expected.")
+        with open(job.state_path, "w") as f:
+            json.dump({"url": job.url,
+                       "etag": response.headers.get("ETag"),
+                       "last_modified": response.headers.get("Last-Modified")}, f)
+
+        digest = hashlib.sha256() if job.sha256 else None
+        if digest is not None and offset:
+            with open(job.part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    digest.update(chunk)
+        if progress is not None:
+            progress(offset, total=total)
+
+        received = offset
+        with open(job.part_path, mode) as f:
+            while True:
+                if is_canceled is not None and is_canceled():
+                    raise TaDownloadCanceled(job.url)
+                try:
+                    chunk = response.read(chunk_size)
+                except Exception as e:
+                    raise TaDownloadError(f"The download of {job.url} was interrupted: {e}") from e
+                if not chunk:
+                    break
+                f.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                received += len(chunk)
+                if progress is not None:
+                    progress(len(chunk))
+
+    if total is not None and received != total:
+        raise TaDownloadError(f"The download of {job.url} is incomplete ({received} of {total} bytes).")
+    if digest is not None and digest.hexdigest() != job.sha256:
+        _removeFiles(job.part_path, job.state_path)
+        raise TaDownloadError(f"The checksum of {job.url} does not match, the file is corrupted.")
+    os.replace(job.part_path, job.path)
+    _removeFiles(job.state_path)
+    return job.path
+
+
+class TaDownloadManager:
+    """Downloads several files at the same time, reporting the number of bytes downloaded in total."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+    def download(self, jobs, progress=None, is_canceled=None):
+        """
+        Downloads files in parallel threads.
+
+        :param jobs: Files to download.
+        :type jobs: list of TaDownloadJob.
+        :param progress: Called with the number of bytes downloaded so far and the total number of bytes
+        (None until the sizes of all files are known), from the download threads.
+        :type progress: callable.
+        :param is_canceled: Called between chunks; the downloads stop if it returns True.
+        :type is_canceled: callable.
+
+        :return: The destination paths, in the order of the jobs. If a download fails, the first error
+        is raised once the other downloads have finished.
+        :rtype: list.
+        """
+        lock = threading.Lock()
+        totals = {}
+        done = [0]
+
+        def jobProgress(index):
+            def callback(count, total=None):
+                with lock:
+                    if total is not None or index not in totals:
+                        totals[index] = total
+                    done[0] += count
+                    if progress is not None:
+                        known = len(totals) == len(jobs) and None not in totals.values()
+                        progress(done[0], sum(totals.values()) if known else None)
+            return callback
+
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+            futures = [pool.submit(downloadFile, job, jobProgress(index), is_canceled,
+                                   self.chunk_size, self.timeout)
+                       for index, job in enumerate(jobs)]
+            errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [future.result() for future in futures]
@@ -0,0 +1,375 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Per-feature computations of the Feature Creator tool that do not depend on QGIS.
+
+The functions in this module use only numpy, scipy and GDAL/OGR, so that they can be run in worker
+processes. Each task describes a single feature and its result is a patch (a pixel window of the raster
+with new values and masks), which is merged into the output raster on the main thread.
+"""
+
+import numpy as np
+from osgeo import gdal, ogr
+from scipy.ndimage import gaussian_filter
+
+from .distance_engine import (
+    geometryVertices,
+    distanceToVertices,
+    distanceToOutline,
+    outlineDistanceTransform
+)
+
+
+def rasterizeGeometry(geometry, geotransform, width, height, options=None):
+    """
+    Rasterizes an OGR geometry into a boolean mask.
+
+    :param geometry: Geometry to rasterize.
+    :type geometry: ogr.Geometry.
+    :param geotransform: Geotransform of the target raster (or raster window).
+    :type geotransform: tuple.
+    :param width: Number of columns of the target raster.
+    :type width: int.
+    :param height: Number of rows of the target raster.
+    :type height: int.
+    :param options: gdal.RasterizeLayer options (e.g. ['ALL_TOUCHED=TRUE']).
+    :type options: list.
+
+    :return: Mask of the pixels covered by the geometry.
+    :rtype: np.ndarray.
+    """
+    ogr_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+    ogr_layer = ogr_ds.CreateLayer('geometry', None, ogr.wkbUnknown)
+    ogr_feature = ogr.Feature(ogr_layer.GetLayerDefn())
+    ogr_feature.SetGeometry(geometry)
+    ogr_layer.CreateFeature(ogr_feature)
+    ogr_feature = None
+
+    raster = gdal.GetDriverByName('MEM').Create('', width, height, 1, gdal.GDT_Byte)
+    raster.SetGeoTransform(geotransform)
+    gdal.RasterizeLayer(raster, [1], ogr_layer, burn_values=[1],
+                        options=options if options is not None else [])
+    mask = raster.GetRasterBand(1).ReadAsArray() == 1
+    raster = None
+    ogr_layer = None
+    ogr_ds = None
+    return mask
+
+
+def featureSeed(feature_id):
+    """
+    Returns the seed of the random numbers of a feature, so that a feature gets the same random points and
+    ruggedness whether it is created in a worker process or on the main thread. Features that are not saved
+    yet have negative ids, which are mapped to non-negative seeds.
+
+    :param feature_id: Id of the feature.
+    :type feature_id: int.
+
+    :rtype: int.
+    """
+    return int(feature_id) % 2 ** 64
+
+
+def randomPixels(mask, point_density, pixel_area, rng):
+    """
+    Picks random pixels inside a mask. At most one point is created per pixel, which is equivalent to
+    keeping a minimum distance of one pixel between random points.
+
+    :param mask: Mask of the pixels to pick from.
+    :type mask: np.ndarray.
+    :param point_density: Number of points per unit area.
+    :type point_density: float.
+    :param pixel_area: Area of a pixel in the same units as the point density.
+    :type pixel_area: float.
+    :param rng: Random number generator.
+    :type rng: np.random.Generator.
+
+    :return: Row and column indices of the picked pixels.
+    :rtype: tuple.
+    """
+    rows, cols = np.nonzero(mask)
+    count = min(int(round(point_density * pixel_area * rows.size)), rows.size)
+    chosen = np.sort(rng.choice(rows.size, count, replace=False))
+    return rows[chosen], cols[chosen]
+
+
+def pixelCentres(rows, cols, geotransform):
+    """Returns the map coordinates of the centres of pixels."""
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    return upx + (cols + 0.5) * xres, upy + (rows + 0.5) * yres
+
+
+def _featureWindow(task):
+    """Returns the geometry of the feature of a task, the geotransform of its pixel window and its mask."""
+    window = task["window"]
+    rows, cols = window
+    upx, xres, xskew, upy, yskew, yres = task["geotransform"]
+    window_geotransform = (upx + cols.start * xres, xres, xskew,
+                           upy + rows.start * yres, yskew, yres)
+    width, height = cols.stop - cols.start, rows.stop - rows.start
+
+    geometry = ogr.CreateGeometryFromWkb(task["wkb"])
+    mask = rasterizeGeometry(geometry, window_geotransform, width, height)
+    return geometry, window_geotransform, mask
+
+
+def _featurePoints(task):
+    """
+    Rasterizes the feature of a task and creates random points inside it with their distances to the
+    feature outline and the initial raster values beneath them.
+    """
+    geometry, window_geotransform, mask = _featureWindow(task)
+    geometry.Segmentize(task["densify_interval"])
+
+    rng = np.random.default_rng(task["seed"])
+    pixel_area = abs(window_geotransform[1] * window_geotransform[5])
+    point_rows, point_cols = randomPixels(mask, task["point_density"], pixel_area, rng)
+    x, y = pixelCentres(point_rows, point_cols, window_geotransform)
+    if task["distance_method"] == "raster":
+        distances = distanceToOutline(mask, window_geotransform, x, y, task["geographic"], task["km_per_unit"])
+    else:
+        vertex_x, vertex_y = geometryVertices(geometry)
+        if vertex_x.size == 0:
+            raise ValueError("The feature outline has no vertices.")
+        distances = distanceToVertices(x, y, vertex_x, vertex_y, task["geographic"], task["km_per_unit"])
+    initial = task["initial_values"][point_rows, point_cols]
+    return geometry, window_geotransform, mask, (point_rows, point_cols), distances, initial, rng
+
+
+def _boundingDistances(distances, threshold):
+    """Returns the minimum and maximum of the distances greater than a threshold, or None if there are none."""
+    far = distances[distances > threshold]
+    if far.size == 0:
+        return None
+    return far.min(), far.max()
+
+
+def _rescaleDistances(distances, bounds, min_value, max_value):
+    """Linearly maps distances from the range of bounds onto the range between min_value and max_value."""
+    min_dist, max_dist = bounds
+    span = max_dist - min_dist
+    if span == 0:
+        return np.full(np.shape(distances), min_value, dtype=np.float64)
+    return (max_value - min_value) * (np.asarray(distances) - min_dist) / span + min_value
+
+
+def seaDepths(distances, shelf_width, slope_width, min_depth, max_depth, max_shelf_depth, fill_slope=False):
+    """
+    Evaluates the depth profile of a sea. The depth increases linearly across the shelf (from 0 at the
+    coastline to max_shelf_depth) and beyond the continental slope from min_depth to max_depth at the
+    point farthest from the coast.
+
+    :param distances: Distances to the coastline in km.
+    :type distances: np.ndarray.
+    :param fill_slope: If True the depths on the continental slope are interpolated linearly between
+    the shelf and the basin, otherwise they are left empty (NaN).
+    :type fill_slope: bool.
+
+    :return: Depths, or None if no distance is beyond the shelf.
+    :rtype: np.ndarray.
+    """
+    bounds = _boundingDistances(distances, shelf_width)
+    if bounds is None:
+        return None
+    depths = np.full(distances.shape, np.nan)
+    deep = distances > shelf_width + slope_width
+    shelf = distances <= shelf_width
+    depths[deep] = _rescaleDistances(distances[deep], bounds, min_depth, max_depth)
+    if shelf_width > 0:
+        depths[shelf] = max_shelf_depth * distances[shelf] / shelf_width
+    if fill_slope and slope_width > 0:
+        slope = ~deep * ~shelf
+        shelf_edge = max_shelf_depth if shelf_width > 0 else 0
+        slope_foot = _rescaleDistances(shelf_width + slope_width, bounds, min_depth, max_depth)
+        depths[slope] = shelf_edge + (slope_foot - shelf_edge) * (distances[slope] - shelf_width) / slope_width
+    return depths
+
+
+def mountainElevations(distances, slope_width, min_elev, max_elev, edge_elevations=None):
+    """
+    Evaluates the elevation profile of a mountain range. Beyond the mountain slope the elevation
+    increases linearly from min_elev to max_elev at the point farthest from the boundary.
+
+    :param distances: Distances to the mountain boundary in km.
+    :type distances: np.ndarray.
+    :param edge_elevations: Elevations at the mountain boundary. If given, the elevations on the slope are
+    interpolated linearly between them and the foot of the ridge, otherwise they are left empty (NaN).
+    :type edge_elevations: np.ndarray.
+
+    :return: Elevations, or None if no distance is beyond the slope.
+    :rtype: np.ndarray.
+    """
+    bounds = _boundingDistances(distances, slope_width)
+    if bounds is None:
+        return None
+    elevations = np.full(distances.shape, np.nan)
+    ridge = distances > slope_width
+    elevations[ridge] = _rescaleDistances(distances[ridge], bounds, min_elev, max_elev)
+    if edge_elevations is not None and slope_width > 0:
+        slope = ~ridge
+        ridge_foot = _rescaleDistances(slope_width, bounds, min_elev, max_elev)
+        edge = edge_elevations[slope]
+        elevations[slope] = edge + (ridge_foot - edge) * distances[slope] / slope_width
+    return elevations
+
+
+def keepDeeper(depths, initial):
+    """Keeps the initial depths where they are deeper than the calculated ones. Initial values of 0 and NaN are ignored."""
+    return np.where((depths > initial) * (initial != 0), initial, depths)
+
+
+def keepHigher(elevations, initial):
+    """Keeps the initial elevations where they are higher than the calculated ones. Initial values of 0 and NaN are ignored."""
+    return np.where((elevations < initial) * (initial != 0), initial, elevations)
+
+
+def addRuggedness(elevations, ruggedness, rng, noise=None):
+    """
+    Introduces ruggedness: the elevations are changed randomly by up to the given percentage.
+
+    :param noise: Random values between -1 and 1 to scale the changes with. Independent uniform values
+    are drawn if not given.
+    :type noise: np.ndarray.
+    """
+    if noise is None:
+        noise = rng.uniform(-1, 1, elevations.shape)
+    max_bound = np.abs(elevations * ruggedness / 100)
+    return elevations + np.floor(noise * max_bound)
+
+
+def createSeaPatch(task):
+    """
+    Computes the bathymetry of a sea inside a single feature polygon at random points.
+
+    :param task: Description of the feature with the following keys: wkb (polygon geometry), window
+    (row and column slices of the raster covering the feature), geotransform (of the full raster),
+    initial_values (raster values inside the window), densify_interval, point_density, geographic,
+    km_per_unit, distance_method ('vertices' or 'raster', see distance_engine), seed, keep_initial
+    and the sea parameters shelf_width, slope_width, min_depth, max_depth and max_shelf_depth.
+    :type task: dict.
+
+    :return: Patch with the keys window, mask (pixels inside the polygon), values (depths of the random
+    points, NaN elsewhere), boundary (pixels on the polygon outline) and warning (set if the depths could not be calculated).
+    :rtype: dict.
+    """
+    geometry, window_geotransform, mask, points, distances, initial, rng = _featurePoints(task)
+    patch = {"window": task["window"], "mask": mask, "values": None, "boundary": None, "warning": None}
+
+    depths = seaDepths(distances, task["shelf_width"], task["slope_width"], task["min_depth"],
+                       task["max_depth"], task["max_shelf_depth"])
+    if depths is None:
+        patch["warning"] = "The distances between the shoreline and depth points are not calculated."
+        return patch
+    if task["keep_initial"]:
+        depths = keepDeeper(depths, initial)
+
+    values = np.full(mask.shape, np.nan, dtype=np.float32)
+    values[points] = depths
+    patch["values"] = values
+    patch["boundary"] = rasterizeGeometry(geometry.Boundary(), window_geotransform, mask.shape[1], mask.shape[0])
+    return patch
+
+
+def createMountainPatch(task):
+    """
+    Computes the topography of a mountain range inside a single feature polygon at random points.
+
+    :param task: Description of the feature (see createSeaPatch) with the mountain parameters
+    slope_width, min_elev, max_elev and ruggedness instead of the sea parameters.
+    :type task: dict.
+
+    :return: Patch (see createSeaPatch) without boundary.
+    :rtype: dict.
+    """
+    geometry, window_geotransform, mask, points, distances, initial, rng = _featurePoints(task)
+    patch = {"window": task["window"], "mask": mask, "values": None, "boundary": None, "warning": None}
+
+    elevations = mountainElevations(distances, task["slope_width"], task["min_elev"], task["max_elev"])
+    if elevations is None:
+        patch["warning"] = "The distances between the mountain boundary and elevation points are not calculated."
+        return patch
+    if task["keep_initial"]:
+        elevations = keepHigher(elevations, initial)
+    elevations = addRuggedness(elevations, task["ruggedness"], rng)
+
+    values = np.full(mask.shape, np.nan, dtype=np.float32)
+    values[points] = elevations
+    patch["values"] = values
+    return patch
+
+
+def _featureDistances(task):
+    """Rasterizes the feature of a task and calculates the distance from every pixel inside it to its outline."""
+    geometry, window_geotransform, mask = _featureWindow(task)
+    distances, nearest_outside = outlineDistanceTransform(mask, window_geotransform,
+                                                          task["geographic"], task["km_per_unit"])
+    return geometry, window_geotransform, mask, distances[mask], nearest_outside
+
+
+def createSeaRasterPatch(task):
+    """
+    Computes the bathymetry of a sea for every pixel inside a single feature polygon, using the distance
+    transform of the rasterized polygon instead of random points. The continental slope is interpolated
+    linearly between the shelf and the basin, so the patch does not need to be interpolated.
+
+    :param task: Description of the feature (see createSeaPatch). densify_interval, point_density and
+    distance_method are not used.
+    :type task: dict.
+
+    :return: Patch (see createSeaPatch).
+    :rtype: dict.
+    """
+    geometry, window_geotransform, mask, distances, _ = _featureDistances(task)
+    patch = {"window": task["window"], "mask": mask, "values": None, "boundary": None, "warning": None}
+
+    depths = seaDepths(distances, task["shelf_width"], task["slope_width"], task["min_depth"],
+                       task["max_depth"], task["max_shelf_depth"], fill_slope=True)
+    if depths is None:
+        patch["warning"] = "The feature is narrower than the shelf width."
+        return patch
+    if task["keep_initial"]:
+        depths = keepDeeper(depths, task["initial_values"][mask])
+
+    values = np.full(mask.shape, np.nan, dtype=np.float32)
+    values[mask] = depths
+    patch["values"] = values
+    patch["boundary"] = rasterizeGeometry(geometry.Boundary(), window_geotransform, mask.shape[1], mask.shape[0])
+    return patch
+
+
+def createMountainRasterPatch(task):
+    """
+    Computes the topography of a mountain range for every pixel inside a single feature polygon, using
+    the distance transform of the rasterized polygon instead of random points. The mountain slope is
+    interpolated linearly between the topography around the feature and the foot of the ridge.
+
+    :param task: Description of the feature (see createMountainPatch).
+    :type task: dict.
+
+    :return: Patch (see createSeaPatch) without boundary.
+    :rtype: dict.
+    """
+    geometry, window_geotransform, mask, distances, nearest_outside = _featureDistances(task)
+    patch = {"window": task["window"], "mask": mask, "values": None, "boundary": None, "warning": None}
+
+    initial_values = task["initial_values"]
+    edge_elevations = np.nan_to_num(initial_values[nearest_outside][mask])
+    elevations = mountainElevations(distances, task["slope_width"], task["min_elev"], task["max_elev"],
+                                    edge_elevations=edge_elevations)
+    if elevations is None:
+        patch["warning"] = "The feature is narrower than the mountain slope."
+        return patch
+    if task["keep_initial"]:
+        elevations = keepHigher(elevations, initial_values[mask])
+    # Neighbouring pixels get correlated changes, so that the surface is rugged rather than noisy
+    rng = np.random.default_rng(task["seed"])
+    noise = gaussian_filter(rng.uniform(-1, 1, mask.shape), sigma=2)
+    noise /= max(np.abs(noise).max(), np.finfo(noise.dtype).tiny)
+    elevations = addRuggedness(elevations, task["ruggedness"], rng, noise=noise[mask])
+
+    values = np.full(mask.shape, np.nan, dtype=np.float32)
+    values[mask] = elevations
+    patch["values"] = values
+    return patch
@@ -119,3 +119,132 @@ class TaFeedback(QtCore.QObject):
     def setCanceled(self, value:bool):
         self.canceled =value
         self.progress_count = 0
+
+
+class TaConsoleFeedback:
+    """
+    Feedback for running the tools without their dialogs (see api.py). The messages are sent to a Python
+    logger instead of the log browser of a dialog, and the progress to an optional callback.
+
+    :param name: Name of the logger.
+    :type name: str.
+    :param progress_callback: Function called with the progress (0-100) whenever it changes.
+    :type progress_callback: callable.
+    """
+
+    def __init__(self, name="terra_antiqua", progress_callback=None):
+        self.canceled = False
+        self.logger = logging.getLogger(name)
+        # Handler passed to the loggers of the libraries used by the tools (e.g. plate_model_manager)
+        self.log_handler = logging.NullHandler()
+        self.progress_count = 0
+        self.progress_callback = progress_callback
+        self.Critical = self.critical
+        self.Error = self.error
+        self.Warning = self.warning
+        self.Info = self.info
+        self.Debug = self.debug
+
+    def debug(self, record):
+        self.logger.debug(record)
+
+    def info(self, record):
+        if not self.canceled:
+            self.logger.info(record)
+
+    def warning(self, record):
+        self.logger.warning(record)
+
+    def error(self, record):
+        self.logger.error(record)
+
+    def critical(self, record):
+        self.logger.critical(record)
+
+    def setProgress(self, progress_value):
+        self.progress = progress_value
+
+    @property
+    def progress(self):
+        return self.progress_count
+
+    @progress.setter
+    def progress(self, progress_value):
+        self.progress_count = progress_value
+        if progress_value and self.progress_callback is not None:
+            self.progress_callback(int(self.progress_count))
+
+    def setCanceled(self, value: bool):
+        self.canceled = value
+        self.progress_count = 0
+
+
+class TaProcessingLogHandler(logging.Handler):
+    """Handler sending the messages of the libraries used by the tools to a QgsProcessingFeedback."""
+
+    def __init__(self, feedback):
+        logging.Handler.__init__(self)
+        self.feedback = feedback
+
+    def emit(self, record):
+        self.feedback.pushInfo(self.format(record))
+
+
+class TaProcessingFeedback:
+    """
+    Feedback for running the tools as algorithms of the processing framework (see processing_provider.py).
+    The messages, the progress and the cancellation go through the QgsProcessingFeedback of the algorithm,
+    so that they are shown in the processing dialog, in the Graphical Modeler and by qgis_process.
+
+    :param feedback: Feedback of the processing algorithm.
+    :type feedback: QgsProcessingFeedback.
+    """
+
+    def __init__(self, feedback):
+        self.feedback = feedback
+        self._canceled = False
+        self.log_handler = TaProcessingLogHandler(feedback)
+        self.log_handler.setLevel(logging.INFO)
+        self.progress_count = 0
+        self.Critical = self.critical
+        self.Error = self.error
+        self.Warning = self.warning
+        self.Info = self.info
+        self.Debug = self.debug
+
+    @property
+    def canceled(self):
+        return self._canceled or self.feedback.isCanceled()
+
+    def debug(self, record):
+        self.feedback.pushDebugInfo(str(record))
+
+    def info(self, record):
+        if not self.canceled:
+            self.feedback.pushInfo(str(record))
+
+    def warning(self, record):
+        self.feedback.reportError(str(record), False)
+
+    def error(self, record):
+        self.feedback.reportError(str(record), False)
+
+    def critical(self, record):
+        self.feedback.reportError(str(record), True)
+
+    def setProgress(self, progress_value):
+        self.progress = progress_value
+
+    @property
+    def progress(self):
+        return self.progress_count
+
+    @progress.setter
+    def progress(self, progress_value):
+        self.progress_count = progress_value
+        if progress_value:
+            self.feedback.setProgress(int(self.progress_count))
+
+    def setCanceled(self, value: bool):
+        self._canceled = value
+        self.progress_count = 0
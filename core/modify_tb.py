@@ -10,7 +10,6 @@ from osgeo import (
 
 from qgis.core import (
     QgsVectorFileWriter,
-    QgsVectorLayer,
     NULL,
     QgsExpressionContext,
     QgsExpressionContextUtils
@@ -21,39 +20,45 @@ import numpy as np
 from numpy import * #This is to import math functions to use in formula
 
 from .utils import (
-     vectorToRaster,
      modFormula,
      modRescale,
-     polygonOverlapCheck
+     polygonOverlapCheck,
+     TaFeatureRasterizer,
+     featureValue,
+     toRasterLayer,
+     toVectorLayer
      )
 from .base_algorithm import TaBaseAlgorithm
-
-
-class TaModifyTopoBathy(TaBaseAlgorithm):
-
-
-    def __init__(self, dlg):
-        super().__init__(dlg)
-        self.vlayer = None
-        self.topo = None
-        self.fields = None
-        self.features = None
-        self.feats_count = None
-        self.geotransform = None
-        self.ncols = None
-        self.nrows = None
-        self.path = None
-        self.out_file = None
-        self.context = None
-
-    def getParameters(self):
+from .raster_io import asFloat32
+from .parameters import TaModifyTopoBathyParameters
+
+
+class TaModifyTopoBathyEngine:
+    """
+    Modifies the topography inside the polygons of a mask layer with a formula or by rescaling it, with the
+    parameters of self.params (TaModifyTopoBathyParameters).
+
+    The class that inherits it provides the feedback, the crs and the cancellation: TaModifyTopoBathy in
+    the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
+    vlayer = None
+    topo = None
+    fields = None
+    features = None
+    feats_count = None
+    geotransform = None
+    ncols = None
+    nrows = None
+
+    def loadInputs(self):
         self.feedback.info('The processing algorithm has started.')
 
         # Get the topography as an array
         self.feedback.info('Getting the raster layer')
-        topo_layer = self.dlg.baseTopoBox.currentLayer()
+        topo_layer = toRasterLayer(self.params.input_raster)
         topo_ds = gdal.Open(topo_layer.dataProvider().dataSourceUri())
-        self.topo = topo_ds.GetRasterBand(1).ReadAsArray()
+        self.topo = asFloat32(topo_ds.GetRasterBand(1).ReadAsArray())
         self.geotransform = topo_ds.GetGeoTransform()  # this geotransform is used to rasterize extracted masks below
         self.nrows, self.ncols = np.shape(self.topo)
 
@@ -64,7 +69,7 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
 
         # Get the vector masks
         self.feedback.info('Getting the vector layer')
-        self.vlayer = self.dlg.masksBox.currentLayer()
+        self.vlayer = toVectorLayer(self.params.mask_layer)
 
         if self.vlayer.isValid():
             self.feedback.info('The mask layer is loaded properly')
@@ -75,7 +80,7 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
             self.fields = self.vlayer.fields().toList()
 
             #Check if the input layer contains overlapping features
-            if self.dlg.selectedFeaturesBox.isChecked():
+            if self.params.selected_features_only:
                 overlaps = polygonOverlapCheck(self.vlayer, selected_only=True,
                                                feedback=self.feedback,
                                                run_time=10)
@@ -88,14 +93,14 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
                 self.feedback.warning("The topography of overlapping areas\
                                       will be modified multiple times.")
         if not self.killed:
-            if self.dlg.selectedFeaturesBox.isChecked():
-                self.features = self.vlayer.getSelectedFeatures()
+            if self.params.selected_features_only:
+                self.features = list(self.vlayer.getSelectedFeatures())
                 self.feats_count = self.vlayer.selectedFeatureCount()
                 if self.feats_count == 0:
                     self.feedback.error("You did not select any feature.")
                     self.kill()
             else:
-                self.features = self.vlayer.getFeatures()
+                self.features = list(self.vlayer.getFeatures())
                 self.feats_count = self.vlayer.featureCount()
                 if self.feats_count ==0:
                     self.feedback.error("The layer you selected as an input\
@@ -107,40 +112,42 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
         else:
             return False
 
-    def run(self):
+    def modifyTopography(self):
+        """
+        :return: The path of the output raster, or None if processing failed or was canceled.
+        :rtype: str.
+        """
+        ok = False
         if not self.killed:
-            retrieved = self.getParameters()
+            retrieved = self.loadInputs()
             if retrieved:
-                # Check if the formula mode of topography modification is checked
+                # Check if the formula mode of topography modification is selected
                 # Otherwise minimum and maximum values will be used to calculate the formula
-                mode = self.dlg.modificationModeComboBox.currentText()
-                if mode == 'Modify with formula':
+                if self.params.mode == "formula":
                     modified_array, ok = self.modifyWithFormula(80)
                 else:
                     modified_array, ok = self.modifyWithMinAndMax(80)
 
-
-        if not self.killed:
-            if ok:
-                # Write the resulting raster array to a raster file
-                driver = gdal.GetDriverByName('GTiff')
-                if os.path.exists(self.out_file_path):
-                    driver.Delete(self.out_file_path)
-
-                raster = driver.Create(self.out_file_path, self.ncols, self.nrows, 1, gdal.GDT_Float32)
-                raster.SetGeoTransform(self.geotransform)
-                raster.SetProjection(self.crs.toWkt())
-                raster.GetRasterBand(1).WriteArray(modified_array)
-                raster = None
-                self.finished.emit(True, self.out_file_path)
-                self.feedback.progress = 100
-
-            else:
-                self.feedback.error("The plugin did not succeed because one or more parameters were set incorrectly.")
-                self.feedback.error("Please, check the log above.")
-                self.finished.emit(False, "")
-        else:
-            self.finished.emit(False, "")
+        if self.killed:
+            return None
+        if not ok:
+            self.feedback.error("The plugin did not succeed because one or more parameters were set incorrectly.")
+            self.feedback.error("Please, check the log above.")
+            return None
+
+        # Write the resulting raster array to a raster file
+        out_file_path = self.params.output_path
+        driver = gdal.GetDriverByName('GTiff')
+        if os.path.exists(out_file_path):
+            driver.Delete(out_file_path)
+
+        raster = driver.Create(out_file_path, self.ncols, self.nrows, 1, gdal.GDT_Float32)
+        raster.SetGeoTransform(self.geotransform)
+        raster.SetProjection(self.crs.toWkt())
+        raster.GetRasterBand(1).WriteArray(modified_array)
+        raster = None
+        self.feedback.progress = 100
+        return out_file_path
 
     def modifyWithFormula(self, run_time = None):
         if run_time:
@@ -150,14 +157,14 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
         mask_number = 0
 
         H = self.topo
-        for feat in self.features:
+        # Rasterize all the masks at once
+        rasterizer = TaFeatureRasterizer(self.features, self.geotransform, self.ncols, self.nrows)
+        for index, feat in enumerate(self.features):
             if self.killed:
                 break
             mask_number += 1
             self.context.setFeature(feat)
-            formula, ok = self.dlg.formulaField.overrideButton.toProperty().value(self.context)
-            if not ok:
-                formula = self.dlg.formulaField.lineEdit.value()
+            formula = featureValue(self.params.formula, self.context)
 
             # Check if the formula field contains the formula
             if formula == NULL or ('H' in formula) is False:
@@ -176,46 +183,27 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
                 self.feedback.debug("Formula for mask number {} is:\
                                     {}".format(mask_number, formula))
 
-            if self.dlg.min_maxValueCheckBox.isChecked():
-                min_value, ok = self.dlg.minValueSpin.overrideButton.toProperty().value(self.context)
-                if not ok and not self.dlg.maxValueSpin.spinBox.value() - self.dlg.minValueSpin.spinBox.value()==0:
-                    min_value = self.dlg.minValueSpin.spinBox.value()
-                else:
-                    min_value = None
-                max_value, ok = self.dlg.maxValueSpin.overrideButton.toProperty().value(self.context)
-                if not ok and not self.dlg.maxValueSpin.spinBox.value() - self.dlg.minValueSpin.spinBox.value()==0:
-                    max_value = self.dlg.maxValueSpin.spinBox.value()
-                else:
-                    max_value = None
-            else:
+            # Each limit constrains the modified values on its own
+            min_value = featureValue(self.params.min_value, self.context) \
+                if self.params.min_value is not None else None
+            max_value = featureValue(self.params.max_value, self.context) \
+                if self.params.max_value is not None else None
+            # Equal limits (e.g. both left at 0) do not constrain the values
+            if min_value is not None and min_value == max_value:
                 min_value = None
                 max_value = None
 
-            # Create a temporary layer to store the extracted masks
-            temp_layer = QgsVectorLayer(f'Polygon?crs={self.crs.authid()}', 'extracted_masks', 'memory')
-            temp_dp = temp_layer.dataProvider()
-            temp_dp.addAttributes(self.fields)
-            temp_layer.updateFields()
-
-            temp_dp.addFeature(feat)
-            temp_dp = None
-
-
             if not self.killed:
-                # Rasterize extracted masks
-                r_masks = vectorToRaster(
-                    temp_layer,
-                    self.geotransform,
-                    self.ncols,
-                    self.nrows,
-                    field_to_burn=None,
-                    no_data=0
-                    )
-                v_layer = None
+                # Get the mask of the feature within its bounding box
+                r_masks, window = rasterizer.mask(index)
+                if r_masks is None:
+                    self.feedback.warning("Mask {} does not overlap the raster.".format(mask_number))
+                    continue
 
                 # Modify the topography
-                in_array = H[r_masks == 1]
-                H[r_masks == 1] = modFormula(in_array, formula, min_value, max_value)
+                H_window = H[window]
+                in_array = H_window[r_masks]
+                H_window[r_masks] = modFormula(in_array, formula, min_value, max_value)
 
             # Send progress feedback
             self.feedback.progress += total/ self.feats_count
@@ -231,17 +219,15 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
             total = 100
         mask_number = 0
         H = self.topo
-        for feat in self.features:
+        # Rasterize all the masks at once
+        rasterizer = TaFeatureRasterizer(self.features, self.geotransform, self.ncols, self.nrows)
+        for index, feat in enumerate(self.features):
             if self.killed:
                 break
             mask_number += 1
             self.context.setFeature(feat)
-            fmin, ok = self.dlg.newMinValueSpin.overrideButton.toProperty().value(self.context)
-            if not ok:
-                fmin = self.dlg.newMinValueSpin.spinBox.value()
-            fmax, ok = self.dlg.newMaxValueSpin.overrideButton.toProperty().value(self.context)
-            if not ok:
-                fmax = self.dlg.newMaxValueSpin.spinBox.value()
+            fmin = featureValue(self.params.new_min, self.context)
+            fmax = featureValue(self.params.new_max, self.context)
 
             # Check if the min and max fields contain any value
             if fmin == NULL or fmax == NULL:
@@ -252,30 +238,16 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
                               "maximum values are specified correctly in the plugin dialog.")
                 continue
 
-            # Create a temporary layer to store the extracted masks
-            temp_layer = QgsVectorLayer(f'Polygon?crs={self.crs.authid()}', 'extracted_masks', 'memory')
-            temp_dp = temp_layer.dataProvider()
-            temp_dp.addAttributes(self.fields)
-            temp_layer.updateFields()
-
-            temp_dp.addFeature(feat)
-            temp_dp = None
-
-
-            # Rasterize extracted masks
-            r_masks = vectorToRaster(
-                temp_layer,
-                self.geotransform,
-                self.ncols,
-                self.nrows,
-                field_to_burn=None,
-                no_data=0
-                )
-            v_layer = None
+            # Get the mask of the feature within its bounding box
+            r_masks, window = rasterizer.mask(index)
+            if r_masks is None:
+                self.feedback.warning("Mask {} does not overlap the raster.".format(mask_number))
+                continue
 
             # Modify the topography
-            in_array = H[r_masks == 1]
-            H[r_masks == 1] = modRescale(in_array, fmin, fmax)
+            H_window = H[window]
+            in_array = H_window[r_masks]
+            H_window[r_masks] = modRescale(in_array, fmin, fmax)
 
             # Send progress feedback
             self.feedback.progress += total/ self.feats_count
@@ -286,3 +258,24 @@ class TaModifyTopoBathy(TaBaseAlgorithm):
             return (None, False)
 
 
+class TaModifyTopoBathy(TaModifyTopoBathyEngine, TaBaseAlgorithm):
+
+    def run(self):
+        constrained = self.dlg.min_maxValueCheckBox.isChecked()
+        self.params = TaModifyTopoBathyParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            mask_layer=self.dlg.masksBox.currentLayer(),
+            output_path=self.out_file_path,
+            selected_features_only=self.dlg.selectedFeaturesBox.isChecked(),
+            mode="formula" if self.dlg.modificationModeComboBox.currentText() == 'Modify with formula'
+            else "rescale",
+            formula=self.widgetValue(self.dlg.formulaField),
+            min_value=self.widgetValue(self.dlg.minValueSpin) if constrained else None,
+            max_value=self.widgetValue(self.dlg.maxValueSpin) if constrained else None,
+            new_min=self.widgetValue(self.dlg.newMinValueSpin),
+            new_max=self.widgetValue(self.dlg.newMaxValueSpin))
+        out_file_path = self.modifyTopography()
+        if out_file_path:
+            self.finished.emit(True, out_file_path)
+        else:
+            self.finished.emit(False, "")
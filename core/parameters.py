@@ -0,0 +1,362 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Parameters of the Terra Antiqua tools.
+
+Each tool of the headless API (see api.py) takes one of these parameter objects. The dialogs of the plugin
+fill the same objects from their widgets, so that a tool gives the same result when it is run from a script
+or from its dialog.
+
+Input layers can be given as QGIS layers or as paths to files.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+GLOBAL_EXTENT = (-180, 180, -90, 90)
+
+
+@dataclass
+class TaFeatureValue:
+    """
+    Value of a parameter of the features created from a mask layer. The value can be overridden for each
+    feature with an expression (e.g. the name of a field of the mask layer), like the data defined override
+    buttons of the dialogs.
+
+    :param value: Default value (a number, or a formula for TaModifyTopoBathyParameters).
+    :param override: Expression (str) or QgsProperty evaluated for each feature. If it is not set or
+    does not give a value for a feature, the default value is used.
+    """
+    value: Any
+    override: Any = None
+
+
+@dataclass
+class TaFillGapsParameters:
+    """
+    Parameters of fill_gaps.
+
+    :param input_raster: Raster with gaps (no data cells) to fill.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param filling_type: "interpolation" or "fixed_value".
+    :param method: Interpolation engine, "gdal" (inverse distance weighting) or "native" (nearest neighbour
+    with relaxation).
+    :param fill_value: Value of the filled cells if filling_type is "fixed_value".
+    :param mask_layer: Polygon layer; if given, only the gaps inside its polygons are filled.
+    :param smoothing_type: "Gaussian filter" or "Uniform filter" to smooth the filled raster, None not to smooth it.
+    :param smoothing_factor: Smoothing factor (1-5).
+    """
+    input_raster: Any
+    output_path: Optional[str] = None
+    filling_type: str = "interpolation"
+    method: str = "gdal"
+    fill_value: float = 0
+    mask_layer: Any = None
+    smoothing_type: Optional[str] = None
+    smoothing_factor: int = 1
+
+
+@dataclass
+class TaCreateSeaParameters:
+    """
+    Parameters of create_sea. The depths and widths can be overridden for each feature (see TaFeatureValue).
+
+    :param input_raster: Topography raster in which the seas are created.
+    :param mask_layer: Polygon layer outlining the seas.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param selected_features_only: Create only the selected features of the mask layer.
+    :param shelf_width: Width of the continental shelf in km.
+    :param slope_width: Width of the continental slope in km.
+    :param min_depth: Minimum depth of the sea in m.
+    :param max_depth: Maximum depth of the sea in m.
+    :param max_shelf_depth: Depth of the shelf edge in m.
+    :param keep_deeper: Keep the initial bathymetry where it is deeper than the created one.
+    :param generation_method: "points" (random points and interpolation) or "raster" (distance transform
+    of the rasterized polygons).
+    :param distance_method: "vertices" (distances to the outline vertices) or "raster" (distance transform).
+    :param processes: Number of parallel processes creating the features; 1 creates them one after another.
+    """
+    input_raster: Any
+    mask_layer: Any
+    output_path: Optional[str] = None
+    selected_features_only: bool = False
+    shelf_width: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(150))
+    slope_width: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(100))
+    min_depth: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(-4000))
+    max_depth: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(-5750))
+    max_shelf_depth: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(-200))
+    keep_deeper: bool = True
+    generation_method: str = "points"
+    distance_method: str = "vertices"
+    processes: int = 1
+
+
+@dataclass
+class TaCreateMountainRangeParameters:
+    """
+    Parameters of create_mountain_range. The elevations, ruggedness and slope width can be overridden for
+    each feature (see TaFeatureValue).
+
+    :param input_raster: Topography raster in which the mountain ranges are created.
+    :param mask_layer: Polygon layer outlining the mountain ranges.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param selected_features_only: Create only the selected features of the mask layer.
+    :param slope_width: Width of the mountain slope in km.
+    :param min_elev: Minimum elevation in m.
+    :param max_elev: Maximum elevation in m.
+    :param ruggedness: Ruggedness of the topography in % of the elevation.
+    :param keep_higher: Keep the initial topography where it is higher than the created one.
+    :param generation_method, distance_method, processes: See TaCreateSeaParameters.
+    """
+    input_raster: Any
+    mask_layer: Any
+    output_path: Optional[str] = None
+    selected_features_only: bool = False
+    slope_width: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(5))
+    min_elev: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(3000))
+    max_elev: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(5000))
+    ruggedness: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(30))
+    keep_higher: bool = True
+    generation_method: str = "points"
+    distance_method: str = "vertices"
+    processes: int = 1
+
+
+@dataclass
+class TaReconstructRasterParameters:
+    """
+    Parameters of reconstruct_raster (reconstruction of topography rasters with gplately).
+
+    :param model_name: Name of the plate model (see TaCacheManager.model_list).
+    :param input_raster: Name of a present-day raster (a key of TaCacheManager.available_rasters), or a raster
+    layer or file.
+    :param reconstruction_time: Age of the reconstructed raster in Ma. For a sequence, the age of the last one.
+    :param output_path: Output file, or output folder for a sequence.
+    :param input_time: Age of the input raster in Ma.
+    :param start_time: Age of the first raster of a sequence. If None, one raster is reconstructed.
+    :param time_step: Time step of a sequence in Ma.
+    :param resampling_resolution: Resolution (in degrees) the input raster is resampled to before the
+    reconstruction; None not to resample it.
+    :param interpolation: Order of the interpolation used to resample the input raster (0-5).
+    :param extent: (west, east, south, north) the result is clipped to.
+    :param threads: Number of threads (and of processes for a sequence).
+    :param output_format: "netcdf" or "cog" (see raster_export).
+    """
+    model_name: str
+    input_raster: Any
+    reconstruction_time: int
+    output_path: str
+    input_time: float = 0.0
+    start_time: Optional[int] = None
+    time_step: int = 10
+    resampling_resolution: Optional[float] = None
+    interpolation: int = 1
+    extent: Tuple[float, float, float, float] = GLOBAL_EXTENT
+    threads: int = 1
+    output_format: str = "netcdf"
+
+    @property
+    def is_sequence(self):
+        return self.start_time is not None
+
+
+@dataclass
+class TaReconstructVectorLayerParameters:
+    """
+    Parameters of reconstruct_vector_layer.
+
+    :param model_name: Name of the plate model (see TaCacheManager.model_list).
+    :param input_layer: Name of a layer of the model (e.g. "Coastlines"), or a vector layer or file.
+    :param reconstruction_time: Age of the reconstructed layer in Ma.
+    :param output_path: Output file.
+    :param input_time: Age of the input layer in Ma (only for layers that are not layers of the model).
+    """
+    model_name: str
+    input_layer: Any
+    reconstruction_time: int
+    output_path: str
+    input_time: float = 0.0
+
+
+@dataclass
+class TaCompileTopoBathyParameters:
+    """
+    Parameters of compile_topo_bathy.
+
+    :param input_rasters: Rasters to compile, all of the same size. Where they overlap, the values of the
+    first raster are kept.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param mask_layer: Polygon layer of the continental blocks. If given, the bathymetry deeper than 1000 m
+    in the gaps between the blocks is removed from the rasters whose flag is set in apply_mask.
+    :param apply_mask: Flag of each input raster.
+    :param buffer_distance: Width of the buffer around the blocks (in map units).
+    :param selected_features_only: Use only the selected features of the mask layer.
+    """
+    input_rasters: List[Any]
+    output_path: Optional[str] = None
+    mask_layer: Any = None
+    apply_mask: List[bool] = field(default_factory=list)
+    buffer_distance: float = 0.5
+    selected_features_only: bool = False
+
+
+@dataclass
+class TaSetPaleoshorelinesParameters:
+    """
+    Parameters of set_paleoshorelines.
+
+    :param input_raster: Topography raster.
+    :param mask_layer: Polygon layer of the paleo-land areas.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param mode: "interpolate" (the cells to emerge or submerge are interpolated) or "rescale" (they are
+    rescaled between 0 and max_elev or max_depth).
+    :param max_elev: Maximum elevation of the emerged areas in m (rescale mode).
+    :param max_depth: Maximum depth of the submerged areas in m (rescale mode).
+    """
+    input_raster: Any
+    mask_layer: Any
+    output_path: Optional[str] = None
+    mode: str = "interpolate"
+    max_elev: float = 2
+    max_depth: float = -5
+
+
+@dataclass
+class TaModifyTopoBathyParameters:
+    """
+    Parameters of modify_topo_bathy. The values can be overridden for each feature (see TaFeatureValue).
+
+    :param input_raster: Topography raster.
+    :param mask_layer: Polygon layer of the areas to modify.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param selected_features_only: Modify only the areas of the selected features.
+    :param mode: "formula" or "rescale".
+    :param formula: Formula of the new values, with H the initial values (formula mode).
+    :param min_value, max_value: Only the values above min_value and below max_value are modified (formula
+    mode). Each limit can be None on its own; equal limits do not constrain the values.
+    :param new_min, new_max: Final minimum and maximum of the values (rescale mode).
+    """
+    input_raster: Any
+    mask_layer: Any
+    output_path: Optional[str] = None
+    selected_features_only: bool = False
+    mode: str = "formula"
+    formula: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(""))
+    min_value: Optional[TaFeatureValue] = None
+    max_value: Optional[TaFeatureValue] = None
+    new_min: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(0))
+    new_max: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(0))
+
+
+@dataclass
+class TaCopyPasteRasterParameters:
+    """
+    Parameters of copy_paste_raster.
+
+    :param input_raster: Raster the values are pasted into.
+    :param source_raster: Raster the values are copied from, of the same size as the input raster.
+    :param mask_layer: Polygon layer of the areas to copy.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param selected_features_only: Copy only the areas of the selected features.
+    """
+    input_raster: Any
+    source_raster: Any
+    mask_layer: Any
+    output_path: Optional[str] = None
+    selected_features_only: bool = False
+
+
+@dataclass
+class TaSmoothRasterParameters:
+    """
+    Parameters of smooth_raster.
+
+    :param input_raster: Raster to smooth.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param smoothing_type: "Gaussian filter" or "Uniform filter".
+    :param smoothing_factor: Smoothing factor (1-5). It can be overridden for each feature of the mask layer.
+    :param mask_layer: Polygon layer; if given, only the areas inside its polygons are smoothed.
+    :param selected_features_only: Smooth only the areas of the selected features.
+    :param paleoshorelines_layer: Polygon layer of the paleo-land areas; if given, the shorelines are kept
+    where they are.
+    """
+    input_raster: Any
+    output_path: Optional[str] = None
+    smoothing_type: str = "Gaussian filter"
+    smoothing_factor: TaFeatureValue = field(default_factory=lambda: TaFeatureValue(1))
+    mask_layer: Any = None
+    selected_features_only: bool = False
+    paleoshorelines_layer: Any = None
+
+
+@dataclass
+class TaIsostaticCompensationParameters:
+    """
+    Parameters of isostatic_compensation.
+
+    :param input_raster: Bedrock topography raster.
+    :param ice_raster: Ice surface topography raster.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    :param ice_amount: Amount of the ice to remove in %.
+    :param mask_layer: Polygon layer; if given, the topography is compensated only inside its polygons.
+    :param selected_features_only: Use only the selected features of the mask layer.
+    :param polar_regions_only: Use only the features of the mask layer named after the polar regions
+    (Greenland, Antarctica...).
+    """
+    input_raster: Any
+    ice_raster: Any
+    output_path: Optional[str] = None
+    ice_amount: float = 30
+    mask_layer: Any = None
+    selected_features_only: bool = False
+    polar_regions_only: bool = False
+
+
+@dataclass
+class TaSetSeaLevelParameters:
+    """
+    Parameters of set_sea_level.
+
+    :param input_raster: Topography raster.
+    :param shift: Rise (positive) or fall (negative) of the sea level in m.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    """
+    input_raster: Any
+    shift: float = 100
+    output_path: Optional[str] = None
+
+
+@dataclass
+class TaCalculateBathymetryParameters:
+    """
+    Parameters of calculate_bathymetry.
+
+    :param input_raster: Ocean floor age raster.
+    :param reconstruction_time: Age of the calculated bathymetry in Ma.
+    :param age_raster_time: Age of the age raster in Ma.
+    :param output_path: Path of the output GeoTIFF. Defaults to a file in the temporary directory.
+    """
+    input_raster: Any
+    reconstruction_time: int = 0
+    age_raster_time: int = 0
+    output_path: Optional[str] = None
+
+
+@dataclass
+class TaAssignPlateIdsParameters:
+    """
+    Parameters of assign_plate_ids.
+
+    :param input_layer: Vector layer or file whose features get plate IDs.
+    :param model_name: Name of the plate model.
+    :param output_path: Output file.
+    :param reconstruction_time: Age of the input layer in Ma.
+    :param partition_method: "Split into plates" or "Most overlapping plate".
+    """
+    input_layer: Any
+    model_name: str
+    output_path: str
+    reconstruction_time: int = 0
+    partition_method: str = "Split into plates"
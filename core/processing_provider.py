@@ -0,0 +1,802 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Processing provider of Terra Antiqua.
+
+The tools of the plugin are registered as algorithms of the QGIS processing framework, so that they can be
+run from the Processing Toolbox, chained in the Graphical Modeler, run in batch mode and run from the
+command line with qgis_process, e.g.::
+
+    qgis_process run terra_antiqua:set_sea_level --INPUT=topo.tif --SHIFT=-120 --OUTPUT=topo_lowstand.tif
+
+The algorithms run the same computations as the dialogs, through the headless API (see api.py). The heavy
+dependencies of the tools are only imported when an algorithm is run, so that registering the provider does
+not slow down the startup of QGIS.
+
+The parameters that the dialogs let override for each feature of the mask layer (e.g. the depth of the
+created seas) are dynamic parameters: they can be set to a field or an expression of the mask layer.
+"""
+
+import os
+
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtGui import QIcon
+
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingFeatureSourceDefinition,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterExtent,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterFolderDestination,
+    QgsProcessingParameterMultipleLayers,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterRasterDestination,
+    QgsProcessingParameterRasterLayer,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorDestination,
+    QgsProcessingParameters,
+    QgsProcessingProvider,
+    QgsCoordinateReferenceSystem,
+    QgsPropertyDefinition
+)
+
+from .parameters import (
+    GLOBAL_EXTENT,
+    TaAssignPlateIdsParameters,
+    TaCalculateBathymetryParameters,
+    TaCompileTopoBathyParameters,
+    TaCopyPasteRasterParameters,
+    TaCreateMountainRangeParameters,
+    TaCreateSeaParameters,
+    TaFeatureValue,
+    TaFillGapsParameters,
+    TaIsostaticCompensationParameters,
+    TaModifyTopoBathyParameters,
+    TaReconstructRasterParameters,
+    TaReconstructVectorLayerParameters,
+    TaSetPaleoshorelinesParameters,
+    TaSetSeaLevelParameters,
+    TaSmoothRasterParameters
+)
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(__file__))
+HELP_DIR = os.path.join(PLUGIN_DIR, 'help_text')
+MAIN_ICON = os.path.join(PLUGIN_DIR, 'icon_main.png')
+
+
+class TaProcessingAlgorithm(QgsProcessingAlgorithm):
+    """
+    Base class of the Terra Antiqua processing algorithms. The subclasses define their parameters in
+    initAlgorithm, and in toolParameters() build the parameter object of their tool (see parameters.py) from
+    the parameters of the algorithm. The tool is run by the function of the headless API named by
+    api_function.
+    """
+
+    alg_name = None
+    display_name = None
+    group_name = None
+    group_id = None
+    help_file = None
+    icon_path = MAIN_ICON
+    api_function = None
+
+    def tr(self, string):
+        return QCoreApplication.translate('TaProcessingAlgorithm', string)
+
+    def createInstance(self):
+        return type(self)()
+
+    def name(self):
+        return self.alg_name
+
+    def displayName(self):
+        return self.tr(self.display_name)
+
+    def group(self):
+        return self.tr(self.group_name)
+
+    def groupId(self):
+        return self.group_id
+
+    def icon(self):
+        return QIcon(self.icon_path)
+
+    def shortHelpString(self):
+        if not self.help_file:
+            return ''
+        try:
+            with open(os.path.join(HELP_DIR, self.help_file), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return ''
+
+    def toolParameters(self, parameters, context):
+        """
+        Returns the parameter object of the tool.
+
+        :param parameters: Parameters of the algorithm.
+        :type parameters: dict.
+        :param context: Processing context.
+        :type context: QgsProcessingContext.
+        """
+        raise NotImplementedError
+
+    def processAlgorithm(self, parameters, context, feedback):
+        # The tools are imported here, so that loading the provider does not import their dependencies
+        from . import api
+        from .logger import TaProcessingFeedback
+        params = self.toolParameters(parameters, context)
+        try:
+            output_path = getattr(api, self.api_function)(params, TaProcessingFeedback(feedback))
+        except api.TaProcessingError as e:
+            raise QgsProcessingException(str(e))
+        if output_path is None:
+            return {}
+        return {'OUTPUT': output_path}
+
+    # Helpers used by the subclasses to define their parameters and read their values
+
+    def addMaskParameter(self, description='Mask layer', optional=False):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            'MASK',
+            self.tr(description),
+            [QgsProcessing.TypeVectorPolygon],
+            optional=optional))
+
+    def addFeatureValueParameter(self, name, description, default=None,
+                                 number_type=QgsProcessingParameterNumber.Double,
+                                 minimum=None, maximum=None, optional=False):
+        """
+        Adds a numeric parameter that can be overridden for each feature of the mask layer, with a field or
+        an expression of the mask layer.
+        """
+        parameter = QgsProcessingParameterNumber(name, self.tr(description), number_type, default, optional)
+        if minimum is not None:
+            parameter.setMinimum(minimum)
+        if maximum is not None:
+            parameter.setMaximum(maximum)
+        property_type = QgsPropertyDefinition.Integer if number_type == QgsProcessingParameterNumber.Integer \
+            else QgsPropertyDefinition.Double
+        parameter.setIsDynamic(True)
+        parameter.setDynamicPropertyDefinition(QgsPropertyDefinition(name, self.tr(description), property_type))
+        parameter.setDynamicLayerParameterName('MASK')
+        self.addParameter(parameter)
+
+    def maskLayer(self, parameters, context, name='MASK'):
+        """Returns the mask layer (None if it is not set) and whether only its selected features are used."""
+        layer = self.parameterAsVectorLayer(parameters, name, context)
+        definition = parameters.get(name)
+        selected_only = isinstance(definition, QgsProcessingFeatureSourceDefinition) and \
+            definition.selectedFeaturesOnly
+        return layer, selected_only
+
+    def featureValue(self, parameters, name, context, number_type=float):
+        """
+        Returns the value of a parameter added with addFeatureValueParameter. If the parameter is set to a
+        field or an expression, the expression is evaluated for each feature by the tool, and the default
+        value of the parameter is used for the features it does not give a value for.
+        """
+        if QgsProcessingParameters.isDynamic(parameters, name):
+            default = self.parameterDefinition(name).defaultValue()
+            return TaFeatureValue(number_type(default) if default is not None else None, parameters[name])
+        if parameters.get(name) is None:
+            return None
+        if number_type is int:
+            return TaFeatureValue(self.parameterAsInt(parameters, name, context))
+        return TaFeatureValue(self.parameterAsDouble(parameters, name, context))
+
+    def enumValue(self, parameters, name, context, values):
+        return values[self.parameterAsEnum(parameters, name, context)]
+
+
+class TaCompileTopoBathyAlgorithm(TaProcessingAlgorithm):
+    alg_name = 'compile_topo_bathy'
+    display_name = 'Compile Topo/Bathymetry'
+    group_name = 'Topography and bathymetry'
+    group_id = 'topo_bathy'
+    help_file = 'compile_tb.html'
+    icon_path = ':/compile_tb_icon.png'
+    api_function = 'compile_topo_bathy'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterMultipleLayers(
+            'INPUT',
+            self.tr('Rasters to compile (in order of priority)'),
+            QgsProcessing.TypeRaster))
+        self.addMaskParameter('Continental blocks', optional=True)
+        self.addParameter(QgsProcessingParameterMultipleLayers(
+            'MASKED_RASTERS',
+            self.tr('Rasters to mask with the continental blocks'),
+            QgsProcessing.TypeRaster,
+            optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            'BUFFER_DISTANCE',
+            self.tr('Buffer distance around the continental blocks'),
+            QgsProcessingParameterNumber.Double,
+            0.5,
+            minValue=0))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Compiled raster')))
+
+    def toolParameters(self, parameters, context):
+        rasters = self.parameterAsLayerList(parameters, 'INPUT', context)
+        masked = [layer.source() for layer in self.parameterAsLayerList(parameters, 'MASKED_RASTERS', context)]
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaCompileTopoBathyParameters(
+            input_rasters=rasters,
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            mask_layer=mask_layer,
+            apply_mask=[layer.source() in masked for layer in rasters],
+            buffer_distance=self.parameterAsDouble(parameters, 'BUFFER_DISTANCE', context),
+            selected_features_only=selected_only)
+
+
+class TaSetPaleoshorelinesAlgorithm(TaProcessingAlgorithm):
+    alg_name = 'set_paleoshorelines'
+    display_name = 'Set Paleoshorelines'
+    group_name = 'Topography and bathymetry'
+    group_id = 'topo_bathy'
+    help_file = 'set_pls.html'
+    icon_path = ':/set_pls_icon.png'
+    api_function = 'set_paleoshorelines'
+    modes = ['interpolate', 'rescale']
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Topography raster')))
+        self.addMaskParameter('Paleoshorelines (paleo-land areas)')
+        self.addParameter(QgsProcessingParameterEnum(
+            'MODE',
+            self.tr('Emerged and submerged areas'),
+            [self.tr('Interpolate'), self.tr('Rescale')],
+            defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'MAX_ELEV', self.tr('Maximum elevation of the emerged areas (rescale)'),
+            QgsProcessingParameterNumber.Double, 2))
+        self.addParameter(QgsProcessingParameterNumber(
+            'MAX_DEPTH', self.tr('Maximum depth of the submerged areas (rescale)'),
+            QgsProcessingParameterNumber.Double, -5))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        return TaSetPaleoshorelinesParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            mask_layer=self.parameterAsVectorLayer(parameters, 'MASK', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            mode=self.enumValue(parameters, 'MODE', context, self.modes),
+            max_elev=self.parameterAsDouble(parameters, 'MAX_ELEV', context),
+            max_depth=self.parameterAsDouble(parameters, 'MAX_DEPTH', context))
+
+
+class TaModifyTopoBathyAlgorithm(TaProcessingAlgorithm):
+    alg_name = 'modify_topo_bathy'
+    display_name = 'Modify Topo/Bathymetry'
+    group_name = 'Topography and bathymetry'
+    group_id = 'topo_bathy'
+    help_file = 'modify_tb.html'
+    icon_path = ':/modify_tb_icon.png'
+    api_function = 'modify_topo_bathy'
+    modes = ['formula', 'rescale']
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Topography raster')))
+        self.addMaskParameter()
+        self.addParameter(QgsProcessingParameterEnum(
+            'MODE',
+            self.tr('Modification mode'),
+            [self.tr('Modify with formula'), self.tr('Rescale')],
+            defaultValue=0))
+        formula = QgsProcessingParameterString('FORMULA', self.tr('Formula (H is the initial value)'),
+                                               optional=True)
+        formula.setIsDynamic(True)
+        formula.setDynamicPropertyDefinition(QgsPropertyDefinition(
+            'FORMULA', self.tr('Formula'), QgsPropertyDefinition.String))
+        formula.setDynamicLayerParameterName('MASK')
+        self.addParameter(formula)
+        self.addFeatureValueParameter('MIN_VALUE', 'Modify only the values above (formula)', optional=True)
+        self.addFeatureValueParameter('MAX_VALUE', 'Modify only the values below (formula)', optional=True)
+        self.addFeatureValueParameter('NEW_MIN', 'New minimum value (rescale)', 0)
+        self.addFeatureValueParameter('NEW_MAX', 'New maximum value (rescale)', 0)
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        if QgsProcessingParameters.isDynamic(parameters, 'FORMULA'):
+            formula = TaFeatureValue('', parameters['FORMULA'])
+        else:
+            formula = TaFeatureValue(self.parameterAsString(parameters, 'FORMULA', context))
+        return TaModifyTopoBathyParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            mask_layer=mask_layer,
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            selected_features_only=selected_only,
+            mode=self.enumValue(parameters, 'MODE', context, self.modes),
+            formula=formula,
+            min_value=self.featureValue(parameters, 'MIN_VALUE', context),
+            max_value=self.featureValue(parameters, 'MAX_VALUE', context),
+            new_min=self.featureValue(parameters, 'NEW_MIN', context),
+            new_max=self.featureValue(parameters, 'NEW_MAX', context))
+
+
+class TaCreateFeaturesAlgorithm(TaProcessingAlgorithm):
+    """Base class of the algorithms of Create Topo/Bathymetry."""
+    group_name = 'Topography and bathymetry'
+    group_id = 'topo_bathy'
+    help_file = 'create_tb.html'
+    icon_path = ':/feat_create_icon.png'
+    generation_methods = ['points', 'raster']
+    distance_methods = ['vertices', 'raster']
+
+    def addGenerationParameters(self):
+        generation = QgsProcessingParameterEnum(
+            'GENERATION_METHOD',
+            self.tr('Generation method'),
+            [self.tr('Random points and interpolation'), self.tr('Distance transform of the raster')],
+            defaultValue=0)
+        distance = QgsProcessingParameterEnum(
+            'DISTANCE_METHOD',
+            self.tr('Distance calculation'),
+            [self.tr('Distances to the outline vertices'), self.tr('Distance transform of the raster')],
+            defaultValue=0)
+        processes = QgsProcessingParameterNumber(
+            'PROCESSES', self.tr('Number of parallel processes'), QgsProcessingParameterNumber.Integer, 1,
+            minValue=1)
+        for parameter in (generation, distance, processes):
+            parameter.setFlags(parameter.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(parameter)
+
+    def generationParameters(self, parameters, context):
+        return {
+            'generation_method': self.enumValue(parameters, 'GENERATION_METHOD', context, self.generation_methods),
+            'distance_method': self.enumValue(parameters, 'DISTANCE_METHOD', context, self.distance_methods),
+            'processes': self.parameterAsInt(parameters, 'PROCESSES', context)}
+
+
+class TaCreateSeaAlgorithm(TaCreateFeaturesAlgorithm):
+    alg_name = 'create_sea'
+    display_name = 'Create sea'
+    api_function = 'create_sea'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Topography raster')))
+        self.addMaskParameter('Sea outlines')
+        self.addFeatureValueParameter('SHELF_WIDTH', 'Shelf width (km)', 150, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('SLOPE_WIDTH', 'Continental slope width (km)', 100,
+                                      QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('MIN_DEPTH', 'Minimum depth (m)', -4000, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('MAX_DEPTH', 'Maximum depth (m)', -5750, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('MAX_SHELF_DEPTH', 'Shelf edge depth (m)', -200,
+                                      QgsProcessingParameterNumber.Integer)
+        self.addParameter(QgsProcessingParameterBoolean(
+            'KEEP_DEEPER', self.tr('Keep the initial bathymetry where it is deeper'), True))
+        self.addGenerationParameters()
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaCreateSeaParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            mask_layer=mask_layer,
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            selected_features_only=selected_only,
+            shelf_width=self.featureValue(parameters, 'SHELF_WIDTH', context, int),
+            slope_width=self.featureValue(parameters, 'SLOPE_WIDTH', context, int),
+            min_depth=self.featureValue(parameters, 'MIN_DEPTH', context, int),
+            max_depth=self.featureValue(parameters, 'MAX_DEPTH', context, int),
+            max_shelf_depth=self.featureValue(parameters, 'MAX_SHELF_DEPTH', context, int),
+            keep_deeper=self.parameterAsBoolean(parameters, 'KEEP_DEEPER', context),
+            **self.generationParameters(parameters, context))
+
+
+class TaCreateMountainRangeAlgorithm(TaCreateFeaturesAlgorithm):
+    alg_name = 'create_mountain_range'
+    display_name = 'Create mountain range'
+    api_function = 'create_mountain_range'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Topography raster')))
+        self.addMaskParameter('Mountain range outlines')
+        self.addFeatureValueParameter('SLOPE_WIDTH', 'Slope width (km)', 5, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('MIN_ELEV', 'Minimum elevation (m)', 3000, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('MAX_ELEV', 'Maximum elevation (m)', 5000, QgsProcessingParameterNumber.Integer)
+        self.addFeatureValueParameter('RUGGEDNESS', 'Ruggedness (%)', 30, QgsProcessingParameterNumber.Integer,
+                                      minimum=0, maximum=100)
+        self.addParameter(QgsProcessingParameterBoolean(
+            'KEEP_HIGHER', self.tr('Keep the initial topography where it is higher'), True))
+        self.addGenerationParameters()
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaCreateMountainRangeParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            mask_layer=mask_layer,
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            selected_features_only=selected_only,
+            slope_width=self.featureValue(parameters, 'SLOPE_WIDTH', context, int),
+            min_elev=self.featureValue(parameters, 'MIN_ELEV', context, int),
+            max_elev=self.featureValue(parameters, 'MAX_ELEV', context, int),
+            ruggedness=self.featureValue(parameters, 'RUGGEDNESS', context, int),
+            keep_higher=self.parameterAsBoolean(parameters, 'KEEP_HIGHER', context),
+            **self.generationParameters(parameters, context))
+
+
+class TaStandardProcessingAlgorithm(TaProcessingAlgorithm):
+    """Base class of the algorithms of Standard Processing."""
+    group_name = 'Standard processing'
+    group_id = 'standard_processing'
+    icon_path = ':/std_proc_icon.png'
+    smoothing_types = ['Gaussian filter', 'Uniform filter']
+
+
+class TaFillGapsAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'fill_gaps'
+    display_name = 'Fill gaps'
+    help_file = 'fill_gaps.html'
+    api_function = 'fill_gaps'
+    filling_types = ['interpolation', 'fixed_value']
+    methods = ['gdal', 'native']
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Raster with gaps')))
+        self.addParameter(QgsProcessingParameterEnum(
+            'FILLING_TYPE', self.tr('Filling type'),
+            [self.tr('Interpolation'), self.tr('Fixed value')], defaultValue=0))
+        self.addParameter(QgsProcessingParameterEnum(
+            'METHOD', self.tr('Interpolation engine'),
+            [self.tr('GDAL (inverse distance weighting)'), self.tr('Native (nearest neighbour)')], defaultValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'FILL_VALUE', self.tr('Fill value (fixed value)'), QgsProcessingParameterNumber.Double, 0))
+        self.addMaskParameter('Fill only the gaps inside the polygons of', optional=True)
+        self.addParameter(QgsProcessingParameterEnum(
+            'SMOOTHING_TYPE', self.tr('Smooth the filled raster with'),
+            [self.tr('Gaussian filter'), self.tr('Uniform filter')], optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            'SMOOTHING_FACTOR', self.tr('Smoothing factor'), QgsProcessingParameterNumber.Integer, 1,
+            minValue=1, maxValue=5))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        smoothing = parameters.get('SMOOTHING_TYPE')
+        return TaFillGapsParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            filling_type=self.enumValue(parameters, 'FILLING_TYPE', context, self.filling_types),
+            method=self.enumValue(parameters, 'METHOD', context, self.methods),
+            fill_value=self.parameterAsDouble(parameters, 'FILL_VALUE', context),
+            mask_layer=self.parameterAsVectorLayer(parameters, 'MASK', context),
+            smoothing_type=self.enumValue(parameters, 'SMOOTHING_TYPE', context, self.smoothing_types)
+            if smoothing is not None else None,
+            smoothing_factor=self.parameterAsInt(parameters, 'SMOOTHING_FACTOR', context))
+
+
+class TaCopyPasteRasterAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'copy_paste_raster'
+    display_name = 'Copy/Paste raster'
+    help_file = 'copy_paste.html'
+    api_function = 'copy_paste_raster'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Raster to paste the values into')))
+        self.addParameter(QgsProcessingParameterRasterLayer('SOURCE', self.tr('Raster to copy the values from')))
+        self.addMaskParameter('Areas to copy')
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaCopyPasteRasterParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            source_raster=self.parameterAsRasterLayer(parameters, 'SOURCE', context),
+            mask_layer=mask_layer,
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            selected_features_only=selected_only)
+
+
+class TaSmoothRasterAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'smooth_raster'
+    display_name = 'Smooth raster'
+    help_file = 'smoothing.html'
+    api_function = 'smooth_raster'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Raster to smooth')))
+        self.addParameter(QgsProcessingParameterEnum(
+            'SMOOTHING_TYPE', self.tr('Smoothing filter'),
+            [self.tr('Gaussian filter'), self.tr('Uniform filter')], defaultValue=0))
+        self.addMaskParameter('Smooth only the areas inside the polygons of', optional=True)
+        self.addFeatureValueParameter('SMOOTHING_FACTOR', 'Smoothing factor', 1, QgsProcessingParameterNumber.Integer,
+                                      minimum=1, maximum=5)
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            'PALEOSHORELINES', self.tr('Paleoshorelines to keep'), [QgsProcessing.TypeVectorPolygon],
+            optional=True))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaSmoothRasterParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            smoothing_type=self.enumValue(parameters, 'SMOOTHING_TYPE', context, self.smoothing_types),
+            smoothing_factor=self.featureValue(parameters, 'SMOOTHING_FACTOR', context, int),
+            mask_layer=mask_layer,
+            selected_features_only=selected_only,
+            paleoshorelines_layer=self.parameterAsVectorLayer(parameters, 'PALEOSHORELINES', context))
+
+
+class TaIsostaticCompensationAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'isostatic_compensation'
+    display_name = 'Isostatic compensation'
+    help_file = 'isostat_cp.html'
+    api_function = 'isostatic_compensation'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Bedrock topography raster')))
+        self.addParameter(QgsProcessingParameterRasterLayer('ICE', self.tr('Ice surface topography raster')))
+        self.addParameter(QgsProcessingParameterNumber(
+            'ICE_AMOUNT', self.tr('Amount of the ice to remove (%)'), QgsProcessingParameterNumber.Double, 30,
+            minValue=0, maxValue=100))
+        self.addMaskParameter('Compensate only inside the polygons of', optional=True)
+        self.addParameter(QgsProcessingParameterBoolean(
+            'POLAR_REGIONS_ONLY', self.tr('Use only the polar regions of the mask layer'), False))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        mask_layer, selected_only = self.maskLayer(parameters, context)
+        return TaIsostaticCompensationParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            ice_raster=self.parameterAsRasterLayer(parameters, 'ICE', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            ice_amount=self.parameterAsDouble(parameters, 'ICE_AMOUNT', context),
+            mask_layer=mask_layer,
+            selected_features_only=selected_only,
+            polar_regions_only=self.parameterAsBoolean(parameters, 'POLAR_REGIONS_ONLY', context))
+
+
+class TaSetSeaLevelAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'set_sea_level'
+    display_name = 'Set sea level'
+    help_file = 'set_sl.html'
+    api_function = 'set_sea_level'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Topography raster')))
+        self.addParameter(QgsProcessingParameterNumber(
+            'SHIFT', self.tr('Sea level rise (positive) or fall (negative) in m'),
+            QgsProcessingParameterNumber.Double, 100))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        return TaSetSeaLevelParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            shift=self.parameterAsDouble(parameters, 'SHIFT', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context))
+
+
+class TaCalculateBathymetryAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'calculate_bathymetry'
+    display_name = 'Calculate bathymetry'
+    help_file = 'calc_bathy.html'
+    api_function = 'calculate_bathymetry'
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterRasterLayer('INPUT', self.tr('Ocean floor age raster')))
+        self.addParameter(QgsProcessingParameterNumber(
+            'RECONSTRUCTION_TIME', self.tr('Age of the calculated bathymetry (Ma)'),
+            QgsProcessingParameterNumber.Integer, 0, minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'AGE_RASTER_TIME', self.tr('Age of the age raster (Ma)'),
+            QgsProcessingParameterNumber.Integer, 0, minValue=0))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Output raster')))
+
+    def toolParameters(self, parameters, context):
+        return TaCalculateBathymetryParameters(
+            input_raster=self.parameterAsRasterLayer(parameters, 'INPUT', context),
+            reconstruction_time=self.parameterAsInt(parameters, 'RECONSTRUCTION_TIME', context),
+            age_raster_time=self.parameterAsInt(parameters, 'AGE_RASTER_TIME', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context))
+
+
+class TaAssignPlateIdsAlgorithm(TaStandardProcessingAlgorithm):
+    alg_name = 'assign_plate_ids'
+    display_name = 'Assign plate IDs'
+    help_file = 'assign_plate_ids.html'
+    api_function = 'assign_plate_ids'
+    partition_methods = ['Split into plates', 'Most overlapping plate']
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource('INPUT', self.tr('Input layer')))
+        # The models are listed by the cache manager only when the algorithm is run, see TaCacheManager
+        self.addParameter(QgsProcessingParameterString('MODEL', self.tr('Plate model name')))
+        self.addParameter(QgsProcessingParameterNumber(
+            'RECONSTRUCTION_TIME', self.tr('Age of the input layer (Ma)'),
+            QgsProcessingParameterNumber.Integer, 0, minValue=0))
+        self.addParameter(QgsProcessingParameterEnum(
+            'PARTITION_METHOD', self.tr('Partition method'),
+            [self.tr(method) for method in self.partition_methods], defaultValue=0))
+        self.addParameter(QgsProcessingParameterVectorDestination('OUTPUT', self.tr('Output layer')))
+
+    def toolParameters(self, parameters, context):
+        return TaAssignPlateIdsParameters(
+            input_layer=self.parameterAsVectorLayer(parameters, 'INPUT', context),
+            model_name=self.parameterAsString(parameters, 'MODEL', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            reconstruction_time=self.parameterAsInt(parameters, 'RECONSTRUCTION_TIME', context),
+            partition_method=self.enumValue(parameters, 'PARTITION_METHOD', context, self.partition_methods))
+
+
+class TaReconstructionAlgorithm(TaProcessingAlgorithm):
+    """Base class of the algorithms reconstructing layers with a plate model."""
+    group_name = 'Reconstruction'
+    group_id = 'reconstruction'
+
+    def addModelParameter(self):
+        # The models are listed by the cache manager only when the algorithm is run, so that loading the
+        # provider does not fetch the model manifest
+        self.addParameter(QgsProcessingParameterString('MODEL', self.tr('Plate model name')))
+
+    def addRasterReconstructionParameters(self):
+        self.addModelParameter()
+        self.addParameter(QgsProcessingParameterString(
+            'INPUT', self.tr('Present-day raster (name of an available raster, or path of a raster file)')))
+        self.addParameter(QgsProcessingParameterNumber(
+            'INPUT_TIME', self.tr('Age of the input raster (Ma)'), QgsProcessingParameterNumber.Double, 0,
+            minValue=0))
+        resolution = QgsProcessingParameterNumber(
+            'RESOLUTION', self.tr('Resample the input raster to a resolution of (degrees)'),
+            QgsProcessingParameterNumber.Double, optional=True, minValue=0)
+        interpolation = QgsProcessingParameterNumber(
+            'INTERPOLATION', self.tr('Order of the interpolation of the resampling'),
+            QgsProcessingParameterNumber.Integer, 1, minValue=0, maxValue=5)
+        extent = QgsProcessingParameterExtent('EXTENT', self.tr('Extent of the result'), optional=True)
+        threads = QgsProcessingParameterNumber(
+            'THREADS', self.tr('Number of threads'), QgsProcessingParameterNumber.Integer, 1, minValue=1)
+        for parameter in (resolution, interpolation, extent, threads):
+            parameter.setFlags(parameter.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(parameter)
+
+    def rasterReconstructionParameters(self, parameters, context):
+        if parameters.get('EXTENT') is not None:
+            rectangle = self.parameterAsExtent(parameters, 'EXTENT', context,
+                                               QgsCoordinateReferenceSystem('EPSG:4326'))
+            extent = (rectangle.xMinimum(), rectangle.xMaximum(), rectangle.yMinimum(), rectangle.yMaximum())
+        else:
+            extent = GLOBAL_EXTENT
+        return {
+            'model_name': self.parameterAsString(parameters, 'MODEL', context),
+            'input_raster': self.parameterAsString(parameters, 'INPUT', context),
+            'input_time': self.parameterAsDouble(parameters, 'INPUT_TIME', context),
+            'resampling_resolution': self.parameterAsDouble(parameters, 'RESOLUTION', context)
+            if parameters.get('RESOLUTION') is not None else None,
+            'interpolation': self.parameterAsInt(parameters, 'INTERPOLATION', context),
+            'extent': extent,
+            'threads': self.parameterAsInt(parameters, 'THREADS', context)}
+
+
+class TaReconstructRasterAlgorithm(TaReconstructionAlgorithm):
+    alg_name = 'reconstruct_raster'
+    display_name = 'Reconstruct raster'
+    help_file = 'reconstruct_topography.html'
+    icon_path = ':/raster_layers_icon.png'
+    api_function = 'reconstruct_raster'
+
+    def initAlgorithm(self, config=None):
+        self.addRasterReconstructionParameters()
+        self.addParameter(QgsProcessingParameterNumber(
+            'RECONSTRUCTION_TIME', self.tr('Reconstruction time (Ma)'), QgsProcessingParameterNumber.Integer,
+            0, minValue=0))
+        self.addParameter(QgsProcessingParameterRasterDestination('OUTPUT', self.tr('Reconstructed raster')))
+
+    def toolParameters(self, parameters, context):
+        output_path = self.parameterAsOutputLayer(parameters, 'OUTPUT', context)
+        return TaReconstructRasterParameters(
+            reconstruction_time=self.parameterAsInt(parameters, 'RECONSTRUCTION_TIME', context),
+            output_path=output_path,
+            output_format='netcdf' if output_path.lower().endswith('.nc') else 'cog',
+            **self.rasterReconstructionParameters(parameters, context))
+
+
+class TaReconstructRasterSequenceAlgorithm(TaReconstructionAlgorithm):
+    alg_name = 'reconstruct_raster_sequence'
+    display_name = 'Reconstruct raster sequence'
+    help_file = 'reconstruct_topography.html'
+    icon_path = ':/raster_layers_icon.png'
+    api_function = 'reconstruct_raster'
+    output_formats = ['netcdf', 'cog']
+
+    def initAlgorithm(self, config=None):
+        self.addRasterReconstructionParameters()
+        self.addParameter(QgsProcessingParameterNumber(
+            'START_TIME', self.tr('Age of the first raster (Ma)'), QgsProcessingParameterNumber.Integer,
+            0, minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'END_TIME', self.tr('Age of the last raster (Ma)'), QgsProcessingParameterNumber.Integer,
+            100, minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'TIME_STEP', self.tr('Time step (Ma)'), QgsProcessingParameterNumber.Integer, 10, minValue=1))
+        self.addParameter(QgsProcessingParameterEnum(
+            'FORMAT', self.tr('Output format'),
+            [self.tr('NetCDF'), self.tr('Cloud optimized GeoTIFF')], defaultValue=0))
+        self.addParameter(QgsProcessingParameterFolderDestination('OUTPUT', self.tr('Output folder')))
+
+    def toolParameters(self, parameters, context):
+        return TaReconstructRasterParameters(
+            reconstruction_time=self.parameterAsInt(parameters, 'END_TIME', context),
+            output_path=self.parameterAsFileOutput(parameters, 'OUTPUT', context),
+            start_time=self.parameterAsInt(parameters, 'START_TIME', context),
+            time_step=self.parameterAsInt(parameters, 'TIME_STEP', context),
+            output_format=self.enumValue(parameters, 'FORMAT', context, self.output_formats),
+            **self.rasterReconstructionParameters(parameters, context))
+
+
+class TaReconstructVectorLayerAlgorithm(TaReconstructionAlgorithm):
+    alg_name = 'reconstruct_vector_layer'
+    display_name = 'Reconstruct vector layer'
+    help_file = 'reconstruct_vector_layers.html'
+    icon_path = ':/vector_layers_icon.svg'
+    api_function = 'reconstruct_vector_layer'
+
+    def initAlgorithm(self, config=None):
+        self.addModelParameter()
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            'INPUT', self.tr('Vector layer to reconstruct (if no layer of the model is given)'), optional=True))
+        self.addParameter(QgsProcessingParameterString(
+            'MODEL_LAYER', self.tr('Layer of the model to reconstruct (e.g. Coastlines)'), optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            'INPUT_TIME', self.tr('Age of the input layer (Ma)'), QgsProcessingParameterNumber.Double, 0,
+            minValue=0))
+        self.addParameter(QgsProcessingParameterNumber(
+            'RECONSTRUCTION_TIME', self.tr('Reconstruction time (Ma)'), QgsProcessingParameterNumber.Integer,
+            0, minValue=0))
+        self.addParameter(QgsProcessingParameterVectorDestination('OUTPUT', self.tr('Reconstructed layer')))
+
+    def toolParameters(self, parameters, context):
+        model_layer = self.parameterAsString(parameters, 'MODEL_LAYER', context)
+        input_layer = model_layer or self.parameterAsVectorLayer(parameters, 'INPUT', context)
+        if not input_layer:
+            raise QgsProcessingException(self.tr('Either a vector layer or a layer of the model must be given.'))
+        return TaReconstructVectorLayerParameters(
+            model_name=self.parameterAsString(parameters, 'MODEL', context),
+            input_layer=input_layer,
+            reconstruction_time=self.parameterAsInt(parameters, 'RECONSTRUCTION_TIME', context),
+            output_path=self.parameterAsOutputLayer(parameters, 'OUTPUT', context),
+            input_time=self.parameterAsDouble(parameters, 'INPUT_TIME', context))
+
+
+class TaProcessingProvider(QgsProcessingProvider):
+    """Registers the tools of Terra Antiqua in the processing framework."""
+
+    algorithms = [
+        TaReconstructRasterAlgorithm,
+        TaReconstructRasterSequenceAlgorithm,
+        TaReconstructVectorLayerAlgorithm,
+        TaCompileTopoBathyAlgorithm,
+        TaSetPaleoshorelinesAlgorithm,
+        TaModifyTopoBathyAlgorithm,
+        TaCreateSeaAlgorithm,
+        TaCreateMountainRangeAlgorithm,
+        TaFillGapsAlgorithm,
+        TaCopyPasteRasterAlgorithm,
+        TaSmoothRasterAlgorithm,
+        TaIsostaticCompensationAlgorithm,
+        TaSetSeaLevelAlgorithm,
+        TaCalculateBathymetryAlgorithm,
+        TaAssignPlateIdsAlgorithm,
+    ]
+
+    def id(self):
+        return 'terra_antiqua'
+
+    def name(self):
+        return 'Terra Antiqua'
+
+    def icon(self):
+        return QIcon(MAIN_ICON)
+
+    def loadAlgorithms(self):
+        for algorithm in self.algorithms:
+            self.addAlgorithm(algorithm())
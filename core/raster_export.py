@@ -0,0 +1,200 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Export of global longitude/latitude grids (e.g. gplately rasters) to compressed NetCDF4 and
+Cloud-Optimized GeoTIFF files.
+
+The arrays are written in blocks of rows. Grids whose latitudes increase from the first row (south up)
+are flipped for GeoTIFF by reading the blocks through a reversed view of the array, so that at most one
+block is copied at a time. NetCDF files store the latitudes in the order of the array and are never flipped.
+
+The module does not depend on QGIS, so it can be used in worker processes.
+"""
+
+import os
+import uuid
+
+import numpy as np
+from osgeo import gdal, osr
+
+OUTPUT_FORMATS = {
+    "netcdf": ".nc",
+    "cog": ".tif",
+}
+# Size of the blocks of rows written at once
+BLOCK_BYTES = 64 * 1024 * 1024
+# Chunks of NetCDF files and tiles of GeoTIFF files (in pixels)
+CHUNK_SIZE = 512
+
+
+def rowBlocks(nrows, ncols, itemsize, block_bytes=BLOCK_BYTES, multiple=1):
+    """
+    Splits the rows of an array into blocks that fit into a number of bytes.
+
+    :param nrows, ncols: Shape of the array.
+    :type nrows, ncols: int.
+    :param itemsize: Size of one value in bytes.
+    :type itemsize: int.
+    :param block_bytes: Maximum size of a block in bytes.
+    :type block_bytes: int.
+    :param multiple: The number of rows of a block is rounded down to a multiple of this (e.g. the chunk size),
+    but is never smaller than it.
+    :type multiple: int.
+
+    :return: Start and end rows of the blocks.
+    :rtype: generator.
+    """
+    block_rows = max(block_bytes // max(ncols * itemsize, 1), 1)
+    block_rows = max(block_rows // multiple, 1) * multiple
+    for start in range(0, nrows, block_rows):
+        yield start, min(start + block_rows, nrows)
+
+
+def writeBand(band, data, flip=False):
+    """
+    Writes an array into a GDAL band in blocks of rows.
+
+    :param band: Band to write into.
+    :type band: gdal.Band.
+    :param data: Array with the same shape as the band.
+    :type data: np.ndarray.
+    :param flip: If True, the rows are written in reverse order (the last row of the array at the top).
+    :type flip: bool.
+    """
+    nrows, ncols = data.shape
+    rows = data[::-1] if flip else data
+    for start, end in rowBlocks(nrows, ncols, data.itemsize):
+        band.WriteArray(np.ascontiguousarray(rows[start:end]), 0, start)
+
+
+def gridGeotransform(lons, lats):
+    """
+    Returns the north-up geotransform of a grid given by the coordinates of its pixel centres.
+
+    :param lons, lats: Longitudes and latitudes of the pixel centres (evenly spaced, in either order).
+    :type lons, lats: np.ndarray.
+
+    :return: The geotransform, and True if the rows of the grid must be flipped (latitudes increasing).
+    :rtype: tuple.
+    """
+    pixel_width = abs(lons[-1] - lons[0]) / max(lons.size - 1, 1)
+    pixel_height = abs(lats[-1] - lats[0]) / max(lats.size - 1, 1)
+    west = min(lons[0], lons[-1]) - pixel_width / 2
+    north = max(lats[0], lats[-1]) + pixel_height / 2
+    return (west, pixel_width, 0, north, 0, -pixel_height), bool(lats[-1] > lats[0])
+
+
+def outputExtension(output_format):
+    """Returns the file extension of an output format ("netcdf" or "cog")."""
+    return OUTPUT_FORMATS[output_format]
+
+
+def writeNetCDF(path, data, lons, lats, compression_level=4, variable_name="z"):
+    """
+    Writes a longitude/latitude grid into a NetCDF4 file, compressed with zlib and byte shuffling and
+    chunked in tiles of CHUNK_SIZE pixels, so that parts of the grid can be read without decompressing
+    all of it. An existing file at the path is overwritten.
+
+    :param path: Output path.
+    :type path: str.
+    :param data: Grid values, one row per latitude.
+    :type data: np.ndarray.
+    :param lons, lats: Longitudes and latitudes of the pixel centres.
+    :type lons, lats: np.ndarray.
+    :param compression_level: zlib compression level (1-9).
+    :type compression_level: int.
+    :param variable_name: Name of the data variable.
+    :type variable_name: str.
+    """
+    import netCDF4
+
+    nrows, ncols = data.shape
+    dtype = data.dtype if np.issubdtype(data.dtype, np.floating) else np.dtype(np.float32)
+    chunks = (min(CHUNK_SIZE, nrows), min(CHUNK_SIZE, ncols))
+    with netCDF4.Dataset(path, "w", format="NETCDF4") as dataset:
+        dataset.Conventions = "CF-1.7"
+        dataset.createDimension("lat", nrows)
+        dataset.createDimension("lon", ncols)
+        lat = dataset.createVariable("lat", "f8", ("lat",))
+        lat.units = "degrees_north"
+        lat.standard_name = "latitude"
+        lat[:] = lats
+        lon = dataset.createVariable("lon", "f8", ("lon",))
+        lon.units = "degrees_east"
+        lon.standard_name = "longitude"
+        lon[:] = lons
+        values = dataset.createVariable(variable_name, dtype, ("lat", "lon"), zlib=True,
+                                        complevel=compression_level, shuffle=True, chunksizes=chunks,
+                                        fill_value=np.nan)
+        values.set_auto_mask(False)
+        for start, end in rowBlocks(nrows, ncols, dtype.itemsize, multiple=chunks[0]):
+            values[start:end, :] = data[start:end].astype(dtype, copy=False)
+
+
+def writeCOG(path, data, lons, lats, overview_resampling="AVERAGE", threads=None):
+    """
+    Writes a longitude/latitude grid into a Cloud-Optimized GeoTIFF: a tiled, DEFLATE-compressed GeoTIFF
+    with overviews, which QGIS can display at any scale without reading the full resolution grid.
+    The grid is first written in blocks of rows into a temporary tiled GeoTIFF next to the output, from
+    which GDAL builds the overviews and the final file. An existing file at the path is overwritten.
+
+    :param path: Output path.
+    :type path: str.
+    :param data: Grid values, one row per latitude.
+    :type data: np.ndarray.
+    :param lons, lats: Longitudes and latitudes of the pixel centres.
+    :type lons, lats: np.ndarray.
+    :param overview_resampling: Resampling method of the overviews.
+    :type overview_resampling: str.
+    :param threads: Number of threads GDAL uses to compress the file. Defaults to all the CPUs, which
+    should only be used when a single file is written at a time.
+    :type threads: int.
+    """
+    nrows, ncols = data.shape
+    geotransform, flip = gridGeotransform(lons, lats)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(path)), f".{uuid.uuid4().hex}.tif")
+    try:
+        temp_raster = gdal.GetDriverByName("GTiff").Create(
+            temp_path, ncols, nrows, 1, gdal.GDT_Float32,
+            options=["TILED=YES", f"BLOCKXSIZE={CHUNK_SIZE}", f"BLOCKYSIZE={CHUNK_SIZE}",
+                     "COMPRESS=LZW", "BIGTIFF=IF_SAFER"])
+        temp_raster.SetGeoTransform(geotransform)
+        temp_raster.SetProjection(srs.ExportToWkt())
+        band = temp_raster.GetRasterBand(1)
+        band.SetNoDataValue(np.nan)
+        writeBand(band, data, flip=flip)
+        band = None
+        if os.path.exists(path):
+            gdal.GetDriverByName("GTiff").Delete(path)
+        out_raster = gdal.GetDriverByName("COG").CreateCopy(
+            path, temp_raster,
+            options=["COMPRESS=DEFLATE", "PREDICTOR=YES", f"BLOCKSIZE={CHUNK_SIZE}", "OVERVIEWS=AUTO",
+                     f"RESAMPLING={overview_resampling}", "BIGTIFF=IF_SAFER", f"NUM_THREADS={threads if threads else 'ALL_CPUS'}"])
+        if out_raster is None:
+            raise RuntimeError(f"GDAL could not create {path}: {gdal.GetLastErrorMsg()}")
+        out_raster = None
+    finally:
+        temp_raster = None
+        if os.path.exists(temp_path):
+            gdal.GetDriverByName("GTiff").Delete(temp_path)
+
+
+def writeGrid(path, data, lons, lats, output_format="netcdf", threads=None):
+    """
+    Writes a longitude/latitude grid in one of the output formats.
+
+    :param output_format: "netcdf" (compressed NetCDF4) or "cog" (Cloud-Optimized GeoTIFF).
+    :type output_format: str.
+    :param threads: Number of threads used to write a COG (see writeCOG).
+    :type threads: int.
+    """
+    if output_format == "netcdf":
+        writeNetCDF(path, data, lons, lats)
+    elif output_format == "cog":
+        writeCOG(path, data, lons, lats, threads=threads)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
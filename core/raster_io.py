@@ -0,0 +1,505 @@
+# Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+# Full copyright notice in file: terra_antiqua.py
+
+"""
+Raster input/output helpers shared by the algorithms.
+
+Intermediate stages of the algorithms pass numpy arrays and geotransforms to each other
+and use GDAL in-memory datasets (MEM driver or /vsimem/ paths) where GDAL needs a dataset.
+The disk is only touched when reading the inputs and writing the final outputs.
+
+Rasters that do not fit into memory are processed in horizontal strips (tiles) with a halo of
+overlapping rows (see processRasterInTiles). The memory budget for one tile is read from
+the "tile_budget_mb" key of the Terra Antiqua settings.
+"""
+
+import os
+import uuid
+
+import numpy as np
+from osgeo import gdal
+from PyQt5.QtCore import QSettings
+from qgis.core import QgsRasterLayer
+
+DEFAULT_TILE_BUDGET_MB = 1024
+
+
+def readRaster(source, band_number=1, nodata_to_nan=False):
+    """
+    Reads a band of a raster into a numpy array.
+
+    :param source: A raster layer or a path to a raster file.
+    :type source: QgsRasterLayer or str.
+    :param band_number: Number of the band to read.
+    :type band_number: int.
+    :param nodata_to_nan: If True, NoData values of the band are set to np.nan.
+    :type nodata_to_nan: bool.
+
+    :return: The array, geotransform, projection (wkt) and NoData value of the band.
+    :rtype: tuple.
+    """
+    source = rasterSource(source)
+    raster_ds = gdal.Open(source)
+    if raster_ds is None:
+        raise FileNotFoundError("Could not open the raster {}.".format(source))
+    band = raster_ds.GetRasterBand(band_number)
+    in_array = band.ReadAsArray()
+    no_data_value = band.GetNoDataValue()
+    geotransform = raster_ds.GetGeoTransform()
+    projection = raster_ds.GetProjection()
+    band = None
+    raster_ds = None
+
+    if nodata_to_nan:
+        in_array = nodataToNan(in_array, no_data_value)
+
+    return in_array, geotransform, projection, no_data_value
+
+
+def asFloat32(in_array):
+    """
+    Returns the array as Float32, without copying it if it is already Float32. Raster data is kept in
+    Float32 throughout the algorithms (outputs are written as GDT_Float32), so that no Float64 copies
+    of full rasters are made.
+
+    :param in_array: Input array.
+    :type in_array: np.ndarray.
+
+    :rtype: np.ndarray.
+    """
+    return in_array.astype(np.float32, copy=False)
+
+
+def nodataToNan(in_array, no_data_value):
+    """
+    Sets NoData values of an array to np.nan. The array is converted to Float32 first.
+
+    :param in_array: Input array.
+    :type in_array: np.ndarray.
+    :param no_data_value: NoData value to replace. Nothing is replaced if it is None or np.nan.
+    :type no_data_value: float.
+
+    :return: Array with NoData values set to np.nan.
+    :rtype: np.ndarray.
+    """
+    in_array = asFloat32(in_array)
+    if no_data_value is not None and not np.isnan(no_data_value):
+        in_array[in_array == no_data_value] = np.nan
+    return in_array
+
+
+def createMemDataset(in_array, geotransform=None, projection=None,
+                     no_data_value=np.nan, data_type=gdal.GDT_Float32):
+    """
+    Creates an in-memory (MEM) single band dataset holding a copy of an array.
+
+    :param in_array: Array to write to the dataset.
+    :type in_array: np.ndarray.
+    :param geotransform: Geotransform of the dataset.
+    :type geotransform: tuple.
+    :param projection: Projection of the dataset (wkt).
+    :type projection: str.
+    :param no_data_value: NoData value of the band. Not set if None.
+    :type no_data_value: float.
+    :param data_type: GDAL data type of the band.
+
+    :return: The in-memory dataset.
+    :rtype: gdal.Dataset.
+    """
+    nrows, ncols = in_array.shape
+    mem_ds = gdal.GetDriverByName('MEM').Create('', ncols, nrows, 1, data_type)
+    if geotransform is not None:
+        mem_ds.SetGeoTransform(geotransform)
+    if projection:
+        mem_ds.SetProjection(projection)
+    band = mem_ds.GetRasterBand(1)
+    if no_data_value is not None:
+        band.SetNoDataValue(no_data_value)
+    band.WriteArray(in_array)
+    band = None
+    return mem_ds
+
+
+def vsimemPath(name):
+    """
+    Returns a unique /vsimem/ path, for intermediate rasters that need a file name
+    (e.g. to be loaded as a QgsRasterLayer) but should not be written to the disk.
+
+    :param name: Base name of the file (e.g. 'Interpolated_raster.tif').
+    :type name: str.
+
+    :return: Path inside GDAL's in-memory file system.
+    :rtype: str.
+    """
+    return "/vsimem/terra_antiqua/{}_{}".format(uuid.uuid4().hex, name)
+
+
+def writeRaster(path, out_array, geotransform, projection,
+                no_data_value=np.nan, data_type=gdal.GDT_Float32):
+    """
+    Writes an array into a single band GeoTIFF. An existing file at the path is overwritten.
+
+    :param path: Output path. Can be a /vsimem/ path.
+    :type path: str.
+    :param out_array: Array to write.
+    :type out_array: np.ndarray.
+    :param geotransform: Geotransform of the raster.
+    :type geotransform: tuple.
+    :param projection: Projection of the raster (wkt).
+    :type projection: str.
+    :param no_data_value: NoData value of the band. Not set if None.
+    :type no_data_value: float.
+    :param data_type: GDAL data type of the band.
+
+    :return: The output path.
+    :rtype: str.
+    """
+    deleteRaster(path)
+    nrows, ncols = out_array.shape
+    out_raster = gdal.GetDriverByName('GTiff').Create(path, ncols, nrows, 1, data_type)
+    out_raster.SetGeoTransform(geotransform)
+    if projection:
+        out_raster.SetProjection(projection)
+    out_band = out_raster.GetRasterBand(1)
+    if no_data_value is not None:
+        out_band.SetNoDataValue(no_data_value)
+    out_band.WriteArray(out_array)
+    out_band.FlushCache()
+    out_band = None
+    out_raster = None
+    return path
+
+
+def deleteRaster(path):
+    """
+    Deletes a raster file, from the disk or from /vsimem/, if it exists.
+
+    :param path: Path of the raster.
+    :type path: str.
+    """
+    if path.startswith('/vsimem/'):
+        if gdal.VSIStatL(path) is not None:
+            gdal.Unlink(path)
+    elif os.path.exists(path):
+        gdal.GetDriverByName('GTiff').Delete(path)
+
+
+def replaceRaster(source_path, target_path, no_data_value=np.nan, budget=None):
+    """
+    Copies the first band of a raster into the first band of another raster of the same size,
+    tile by tile, and deletes the copied raster.
+
+    :param source_path: Path of the raster to copy.
+    :type source_path: str.
+    :param target_path: Path of the raster to update.
+    :type target_path: str.
+    :param no_data_value: NoData value of the updated band. Not set if None.
+    :type no_data_value: float.
+    :param budget: Memory budget in bytes. Defaults to tileBudget().
+    :type budget: int.
+    """
+    source_ds = gdal.Open(source_path)
+    target_ds = gdal.Open(target_path, gdal.GA_Update)
+    target_band = target_ds.GetRasterBand(1)
+    if no_data_value is not None:
+        target_band.SetNoDataValue(no_data_value)
+    for window, inner in iterTiles(source_ds.RasterXSize, source_ds.RasterYSize, 4, budget=budget):
+        target_band.WriteArray(readWindow(source_ds, window), 0, window[0].start)
+    target_band.FlushCache()
+    target_band = None
+    target_ds = None
+    source_ds = None
+    deleteRaster(source_path)
+
+
+def sampleArray(in_array, geotransform, x, y, method="nearest", no_data_value=None):
+    """
+    Samples raster values at points directly from an in-memory array.
+
+    :param in_array: Raster array.
+    :type in_array: np.ndarray.
+    :param geotransform: Geotransform of the raster (north-up, without rotation).
+    :type geotransform: tuple.
+    :param x, y: Coordinates of the points in the crs of the raster.
+    :type x, y: np.ndarray.
+    :param method: 'nearest' to take the value of the pixel containing the point, or 'bilinear' to
+    interpolate between the centres of the four surrounding pixels.
+    :type method: str.
+    :param no_data_value: Pixel value that is treated as missing.
+
+    :return: Sampled values. Points outside the raster or on missing pixels get NaN.
+    :rtype: np.ndarray.
+    """
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    height, width = in_array.shape
+    col = (np.asarray(x, dtype=np.float64) - upx) / xres
+    row = (np.asarray(y, dtype=np.float64) - upy) / yres
+    values = np.full(col.shape, np.nan)
+    inside = (col >= 0) * (col < width) * (row >= 0) * (row < height)
+
+    if method == "nearest":
+        values[inside] = in_array[row[inside].astype(np.int64), col[inside].astype(np.int64)]
+        if no_data_value is not None:
+            values[values == no_data_value] = np.nan
+    elif method == "bilinear":
+        # Pixel centres are at half-integer positions; points near the edges use the edge pixels
+        col = np.clip(col[inside] - 0.5, 0, width - 1)
+        row = np.clip(row[inside] - 0.5, 0, height - 1)
+        col0 = np.minimum(col.astype(np.int64), max(width - 2, 0))
+        row0 = np.minimum(row.astype(np.int64), max(height - 2, 0))
+        col1 = np.minimum(col0 + 1, width - 1)
+        row1 = np.minimum(row0 + 1, height - 1)
+        col_weight = col - col0
+        row_weight = row - row0
+        corners = [in_array[row0, col0], in_array[row0, col1], in_array[row1, col0], in_array[row1, col1]]
+        corners = [np.where(corner == no_data_value, np.nan, corner) if no_data_value is not None else corner
+                   for corner in corners]
+        values[inside] = ((corners[0] * (1 - col_weight) + corners[1] * col_weight) * (1 - row_weight)
+                          + (corners[2] * (1 - col_weight) + corners[3] * col_weight) * row_weight)
+    else:
+        raise ValueError("Unknown sampling method: {}".format(method))
+    return values
+
+
+def rasterSource(source):
+    """
+    Returns the path of a raster layer, or the source itself if it is already a path.
+
+    :param source: A raster layer or a path to a raster file.
+    :type source: QgsRasterLayer or str.
+
+    :rtype: str.
+    """
+    if isinstance(source, QgsRasterLayer):
+        return source.dataProvider().dataSourceUri()
+    return source
+
+
+def tileBudget():
+    """
+    Returns the memory budget (in bytes) for one tile of tiled processing. It is set with the
+    "tile_budget_mb" key of the Terra Antiqua settings (QSettings("TerraAntiqua", "Terra Antiqua")).
+
+    :rtype: int.
+    """
+    budget_mb = QSettings("TerraAntiqua", "Terra Antiqua").value(
+        "tile_budget_mb", DEFAULT_TILE_BUDGET_MB, type=int)
+    return max(int(budget_mb), 1) * 1024 * 1024
+
+
+def tileRows(width, height, bytes_per_pixel, halo=0, budget=None):
+    """
+    Returns the number of rows of a tile (horizontal strip) that fits into the memory budget.
+    A tile is never smaller than its halo, so that the overlapping rows do not dominate the reads.
+
+    :param width: Number of columns of the raster.
+    :type width: int.
+    :param height: Number of rows of the raster.
+    :type height: int.
+    :param bytes_per_pixel: Memory used by the processing per pixel, with all the temporary arrays.
+    :type bytes_per_pixel: int.
+    :param halo: Number of overlapping rows read above and below each tile.
+    :type halo: int.
+    :param budget: Memory budget in bytes. Defaults to tileBudget().
+    :type budget: int.
+
+    :rtype: int.
+    """
+    budget = tileBudget() if budget is None else budget
+    rows = budget // max(width * bytes_per_pixel, 1) - 2 * halo
+    return int(min(max(rows, halo, 1), height))
+
+
+def iterTiles(width, height, bytes_per_pixel, halo=0, budget=None):
+    """
+    Yields the windows of the horizontal strips of a raster.
+
+    :param width: Number of columns of the raster.
+    :type width: int.
+    :param height: Number of rows of the raster.
+    :type height: int.
+    :param bytes_per_pixel: Memory used by the processing per pixel, with all the temporary arrays.
+    :type bytes_per_pixel: int.
+    :param halo: Number of overlapping rows read above and below each tile.
+    :type halo: int.
+    :param budget: Memory budget in bytes. Defaults to tileBudget().
+    :type budget: int.
+
+    :return: Pairs of the window to read (with the halo) in the raster and the part of it that
+    belongs to the tile, in the coordinates of the read window. Windows are tuples of (rows, columns) slices.
+    :rtype: generator.
+    """
+    tile_rows = tileRows(width, height, bytes_per_pixel, halo, budget)
+    for start in range(0, height, tile_rows):
+        stop = min(start + tile_rows, height)
+        read_start = max(start - halo, 0)
+        read_stop = min(stop + halo, height)
+        yield ((slice(read_start, read_stop), slice(0, width)),
+               (slice(start - read_start, stop - read_start), slice(0, width)))
+
+
+def readWindow(raster_ds, window, band_number=1):
+    """
+    Reads a window of a raster band.
+
+    :param raster_ds: Raster dataset.
+    :type raster_ds: gdal.Dataset.
+    :param window: Window to read, a tuple of (rows, columns) slices.
+    :type window: tuple.
+    :param band_number: Number of the band to read.
+    :type band_number: int.
+
+    :rtype: np.ndarray.
+    """
+    rows, cols = window
+    return raster_ds.GetRasterBand(band_number).ReadAsArray(
+        cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+
+
+def openRasters(sources):
+    """
+    Opens rasters of the same size (read only).
+
+    :param sources: Rasters (layers or paths).
+    :type sources: list.
+
+    :return: The datasets.
+    :rtype: list.
+    """
+    datasets = []
+    for source in sources:
+        path = rasterSource(source)
+        raster_ds = gdal.Open(path)
+        if raster_ds is None:
+            raise FileNotFoundError("Could not open the raster {}.".format(path))
+        datasets.append(raster_ds)
+    width = datasets[0].RasterXSize
+    height = datasets[0].RasterYSize
+    for raster_ds in datasets[1:]:
+        if (raster_ds.RasterXSize, raster_ds.RasterYSize) != (width, height):
+            raise ValueError("The input rasters should have the same size.")
+    return datasets
+
+
+def readRasterInTiles(sources, bytes_per_pixel=16, halo=0, nodata_to_nan=True, budget=None):
+    """
+    Reads one or more rasters of the same size tile by tile (horizontal strips), e.g. to compute
+    statistics of rasters that do not fit into memory.
+
+    :param sources: Input rasters (layers or paths).
+    :type sources: list.
+    :param bytes_per_pixel: Memory used by the processing per pixel, with all the temporary arrays.
+    :type bytes_per_pixel: int.
+    :param halo: Number of overlapping rows read above and below each tile.
+    :type halo: int.
+    :param nodata_to_nan: If True, NoData values are set to np.nan.
+    :type nodata_to_nan: bool.
+    :param budget: Memory budget in bytes. Defaults to tileBudget().
+    :type budget: int.
+
+    :return: Tuples of the list of arrays read for each input, the window they were read from and
+    the part of it that belongs to the tile (see iterTiles).
+    :rtype: generator.
+    """
+    datasets = openRasters(sources)
+    no_data_values = [raster_ds.GetRasterBand(1).GetNoDataValue() for raster_ds in datasets]
+    for window, inner in iterTiles(datasets[0].RasterXSize, datasets[0].RasterYSize,
+                                   bytes_per_pixel, halo, budget):
+        arrays = [readWindow(raster_ds, window) for raster_ds in datasets]
+        if nodata_to_nan:
+            arrays = [nodataToNan(array, value) for array, value in zip(arrays, no_data_values)]
+        yield arrays, window, inner
+
+
+def processRasterInTiles(sources, out_path, function, halo=0, bytes_per_pixel=16,
+                         projection=None, no_data_value=np.nan, nodata_to_nan=True,
+                         feedback=None, runtime_percentage=None, budget=None):
+    """
+    Applies a function to one or more rasters of the same size tile by tile (horizontal strips)
+    and writes the result tile by tile, so that the memory used is bounded by the tile budget.
+    Filters that look at neighbouring pixels need a halo at least as large as their radius.
+
+    :param sources: Input rasters (layers or paths). They should have the same size.
+    :type sources: list.
+    :param out_path: Output path. It can be the path of one of the inputs, which is then updated
+    when the processing has finished (it is left unchanged if the processing is canceled).
+    :type out_path: str.
+    :param function: Called as function(arrays, window) with the list of arrays read for each input and
+    the window (rows, columns) they were read from. It should return an array of the same shape.
+    :type function: callable.
+    :param halo: Number of overlapping rows read above and below each tile.
+    :type halo: int.
+    :param bytes_per_pixel: Memory used by the function per pixel, with all the temporary arrays.
+    :type bytes_per_pixel: int.
+    :param projection: Projection of the output (wkt). Defaults to the projection of the first input.
+    :type projection: str.
+    :param no_data_value: NoData value of the output band.
+    :type no_data_value: float.
+    :param nodata_to_nan: If True, NoData values of the inputs are set to np.nan before calling the function.
+    :type nodata_to_nan: bool.
+    :param feedback: Feedback object to report progress and check for cancellation.
+    :type feedback: TaFeedback.
+    :param runtime_percentage: Percentage of the total algorithm run time that the processing takes.
+    :type runtime_percentage: float.
+    :param budget: Memory budget in bytes. Defaults to tileBudget().
+    :type budget: int.
+
+    :return: The output path, or None if the processing was canceled.
+    :rtype: str.
+    """
+    paths = [rasterSource(source) for source in sources]
+    datasets = openRasters(paths)
+    no_data_values = [raster_ds.GetRasterBand(1).GetNoDataValue() for raster_ds in datasets]
+    width = datasets[0].RasterXSize
+    height = datasets[0].RasterYSize
+
+    # If the output is also an input, the result is written into a temporary raster first and
+    # copied into the input only when the processing has finished, so that a canceled or failed
+    # run does not leave the input half overwritten and the halo of each tile is read unchanged.
+    in_place = out_path in paths
+    write_path = "{}.{}.tmp.tif".format(out_path, uuid.uuid4().hex) if in_place else out_path
+    deleteRaster(write_path)
+    out_ds = gdal.GetDriverByName('GTiff').Create(write_path, width, height, 1, gdal.GDT_Float32,
+                                                  options=['BIGTIFF=IF_SAFER'])
+    out_ds.SetGeoTransform(datasets[0].GetGeoTransform())
+    out_ds.SetProjection(projection if projection else datasets[0].GetProjection())
+    out_band = out_ds.GetRasterBand(1)
+    if no_data_value is not None:
+        out_band.SetNoDataValue(no_data_value)
+
+    tiles = list(iterTiles(width, height, bytes_per_pixel, halo, budget))
+    progress_unit = (runtime_percentage if runtime_percentage else 0) / len(tiles)
+    canceled = False
+    try:
+        for window, inner in tiles:
+            if feedback is not None and feedback.canceled:
+                canceled = True
+                break
+            arrays = [readWindow(raster_ds, window) for raster_ds in datasets]
+            if nodata_to_nan:
+                arrays = [nodataToNan(array, value) for array, value in zip(arrays, no_data_values)]
+            out_array = function(arrays, window)
+            arrays = None
+            out_band.WriteArray(out_array[inner], 0, window[0].start + inner[0].start)
+            out_array = None
+            if feedback is not None and progress_unit:
+                feedback.progress += progress_unit
+    except Exception:
+        out_band = None
+        out_ds = None
+        if in_place:
+            deleteRaster(write_path)
+        raise
+    out_band.FlushCache()
+    out_band = None
+    out_ds = None
+    datasets = None
+
+    if in_place:
+        if canceled:
+            deleteRaster(write_path)
+        else:
+            replaceRaster(write_path, out_path, no_data_value, budget)
+
+    return None if canceled else out_path
@@ -7,24 +7,482 @@ from PyQt5 import QtCore, QtGui
 from qgis.core import QgsRasterLayer
 
 from .base_algorithm import TaBaseAlgorithm
-from .utils import clipArrayToExtent, convertAgeToDepth
+from .utils import convertAgeToDepth, createProcessPool, terminateProcessPool, toRasterLayer
 from .cache_manager import cache_manager
+from .reconstruction_cache import arrayFingerprint, fileFingerprint
+from .raster_export import outputExtension, writeGrid
+from .reconstruction_worker import clipArrayToExtent, initWorker, reconstructSlice
+from .parameters import GLOBAL_EXTENT, TaReconstructRasterParameters
 
-from agegrid.run_paleo_age_grids import run_paleo_age_grids
-
+from concurrent.futures import wait, FIRST_COMPLETED
 import os
 import shutil
+import tempfile
+import numpy as np
 
 try:
     import gplately
 except Exception:
     # This fixes error on MacOS were gplately tries to create a log file in a protected directory
-    import tempfile
     original_dir = os.getcwd()
     os.chdir(tempfile.gettempdir())
     import gplately
 
-class TaReconstructRasters(TaBaseAlgorithm):
+class TaReconstructRastersEngine:
+    """
+    Reconstructs topography rasters to past ages with gplately, with the parameters of self.params
+    (TaReconstructRasterParameters).
+
+    The class that inherits it provides the feedback, the temporary directory and the cancellation:
+    TaReconstructRasters in the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
+
+    def reconstructTopography(self):
+        """
+        Reconstructs the input raster to the reconstruction time, or to each time of a sequence, and saves
+        the result to the output file or folder.
+
+        :return: The output path, or None if the reconstruction failed or was canceled.
+        :rtype: str.
+        """
+        model_name = self.params.model_name
+        reconstruction_time = self.params.reconstruction_time
+        input_time = self.params.input_time
+        save_multiple_rasters = self.params.is_sequence
+        if save_multiple_rasters:
+            start_time = self.params.start_time
+            end_time = self.params.reconstruction_time
+            time_step = self.params.time_step
+        resampling = self.params.resampling_resolution is not None
+        resampling_resolution = self.params.resampling_resolution
+        interpolationMethod = self.params.interpolation
+        extent = tuple(self.params.extent)
+        n_threads = self.params.threads
+        output_format = self.params.output_format
+        extension = outputExtension(output_format)
+        output_path = self.params.output_path
+        # Present-day rasters of the cache manager are given by their names, other rasters as layers or files
+        raster = self.params.input_raster
+        local = isinstance(raster, QgsRasterLayer) or os.path.isfile(str(raster))
+        if local:
+            local_layer = toRasterLayer(raster)
+
+        # Downloading rotation model files
+        if not self.killed:
+            try:
+                if reconstruction_time != input_time or save_multiple_rasters:
+                    self.feedback.info(f"Downloading {model_name} model if needed...")
+                    rotation_model = cache_manager.download_model(model_name, self.feedback)
+                    cache_manager.download_all_layers(model_name, self.feedback)
+                    topology_features = cache_manager.get_layer(model_name, "Topologies", self.feedback)
+                    static_polygons = cache_manager.get_layer(model_name, "StaticPolygons", self.feedback)
+                    cobs = cache_manager.get_layer(model_name, "COBs", self.feedback)
+                    if cobs is None:
+                        self.feedback.info("Using static polygons instead.")
+                    # Parsed models are kept by the cache manager, so repeated runs skip the parsing
+                    model = gplately.PlateReconstruction(
+                        cache_manager.parse_rotation_model(model_name, rotation_model),
+                        cache_manager.parse_feature_collections(model_name, "Topologies", topology_features),
+                        cache_manager.parse_feature_collections(model_name, "StaticPolygons", static_polygons))
+                else:
+                    rotation_model = None
+                    model = None
+            except Exception:
+                self.feedback.error(f"There was an error while downloading the {model_name} model files.")
+                self.kill()
+
+        # Obtaning input layer
+        if not self.killed:
+            if not local:
+                try:
+                    self.feedback.info("Downloading present day topography raster...")
+                    data = cache_manager.download_raster(raster, self.feedback)
+                    with gdal.config_option('GDAL_PAM_ENABLED', 'NO'):
+                        local_layer = QgsRasterLayer(data, data, 'gdal')
+                except Exception:
+                    self.feedback.error("There was an error while downloading the input raster.")
+                    self.kill()
+
+        if save_multiple_rasters:
+            times = list(range(start_time, end_time + time_step, time_step))
+        elif reconstruction_time != input_time:
+            times = [reconstruction_time]
+        else:
+            times = []
+
+        # Looking up previously reconstructed rasters in the cache. The defaults are used when the
+        # run was killed before the lookup
+        cache_keys = {}
+        cached_times = []
+        need_input = False
+        partitioning = None
+        input_data = None
+        if not self.killed:
+            if times:
+                partitioning_files = cobs if cobs else static_polygons
+                partitioning = (model_name, "COBs" if cobs else "StaticPolygons", partitioning_files)
+            reconstruction_cache = cache_manager.reconstruction_cache
+            input_source = local_layer.source()
+            input_extent = local_layer.extent()
+            input_extent = (input_extent.xMinimum(), input_extent.xMaximum(), input_extent.yMaximum(), input_extent.yMinimum())
+            if times and reconstruction_cache.enabled:
+                try:
+                    if os.path.isfile(input_source):
+                        input_fingerprint = fileFingerprint(input_source)
+                    else:
+                        # Inputs that are not plain files are identified by their content, which is read once
+                        # for the key and the reconstruction
+                        input_data = gdal.Open(input_source).GetRasterBand(1).ReadAsArray()
+                        input_fingerprint = arrayFingerprint(input_data)
+                    for t in times:
+                        cache_keys[t] = reconstruction_cache.make_key(rotation_model, input_fingerprint, input_time,
+                                                                      resampling_resolution if resampling else None,
+                                                                      interpolationMethod if resampling else None,
+                                                                      partitioning_files, t)
+                except Exception:
+                    self.feedback.warning("The cache of reconstructed rasters could not be read, all rasters will be reconstructed.")
+                    cache_keys = {}
+            cached_times = [t for t in times if t in cache_keys and reconstruction_cache.contains(cache_keys[t])]
+            if cached_times:
+                self.feedback.info(f"{len(cached_times)} of {len(times)} reconstructed rasters found in the cache.")
+            need_input = len(cached_times) < len(times) or not times
+
+        # Reading and resampling the input raster. When all rasters are found in the cache, this is only done
+        # if one of them cannot be read after all
+        topo_raster, partitioning_features = None, None
+        if not self.killed and need_input:
+            topo_raster, partitioning_features = self.prepareInput(input_source, input_extent, input_time,
+                                                                   resampling_resolution, interpolationMethod,
+                                                                   model, partitioning, input_data)
+        input_data = None
+
+        if save_multiple_rasters:
+            # Reconstructing, clipping and exporting the time steps one by one, so that only one
+            # reconstructed raster is held in memory at a time
+            if not self.killed:
+                try:
+                    if not os.path.exists(output_path):
+                        os.makedirs(output_path)
+                except Exception:
+                    self.feedback.error(f"Cannot create the output folder {output_path}.")
+                    self.kill()
+            progress_step = 30 / max(len(times), 1)
+            # Time steps that are not cached are reconstructed in parallel processes when more than one
+            # thread is available, and saved by the processes as they are finished
+            uncached_times = [t for t in times if t not in cached_times]
+            pool, futures, pool_input_path = None, {}, None
+            if not self.killed and need_input and min(n_threads, len(uncached_times)) > 1:
+                pool, futures, pool_input_path = self.startSlicePool(
+                    uncached_times, n_threads, topo_raster, input_time,
+                    (rotation_model, topology_features, static_polygons), partitioning_files,
+                    None if extent == GLOBAL_EXTENT else extent, output_path, output_format,
+                    model_name, cache_keys)
+            parallel_times = set(futures.values())
+            try:
+                for t in times:
+                    if self.killed:
+                        break
+                    if t in parallel_times:
+                        continue
+                    reconstructed_raster = self.loadFromCache(cache_keys.get(t)) if t in cached_times else None
+                    if reconstructed_raster is None and topo_raster is None:
+                        self.feedback.warning(f"The cached raster reconstructed to {t} Ma could not be read.")
+                        topo_raster, partitioning_features = self.prepareInput(input_source, input_extent, input_time,
+                                                                               resampling_resolution, interpolationMethod,
+                                                                               model, partitioning)
+                        if self.killed:
+                            break
+                    try:
+                        if reconstructed_raster is not None:
+                            self.feedback.info(f"Raster reconstructed to {t} Ma loaded from the cache.")
+                        else:
+                            self.feedback.info(f"Reconstructing raster to {t} Ma...")
+                            reconstructed_raster = topo_raster.reconstruct(t, threads=n_threads,
+                                                    partitioning_features=partitioning_features)
+                            self.storeInCache(cache_keys.get(t), reconstructed_raster)
+                    except Exception:
+                        self.feedback.error(f"There was an error while reconstructing raster to {t} Ma.")
+                        self.kill()
+                        break
+                    try:
+                        if extent != GLOBAL_EXTENT:
+                            clipArrayToExtent(reconstructed_raster, extent)
+                    except Exception:
+                        self.feedback.error("There was an error while clipping the raster.")
+                        self.kill()
+                        break
+                    file_path = os.path.join(output_path, f"Topography_{model_name}_{t}.0Ma{extension}")
+                    if not self.exportRaster(reconstructed_raster, file_path, output_format):
+                        break
+                    del reconstructed_raster
+                    self.feedback.progress += progress_step
+
+                # Collecting the time steps reconstructed in the worker processes
+                pending = set(futures)
+                while pending and not self.killed:
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        t = futures[future]
+                        try:
+                            _, file_path = future.result()
+                        except Exception as e:
+                            self.feedback.error(f"There was an error while reconstructing raster to {t} Ma: {e}")
+                            self.kill()
+                            break
+                        self.feedback.info(f"Raster reconstructed to {t} Ma saved to {file_path}.")
+                        self.feedback.progress += progress_step
+            finally:
+                if pool is not None:
+                    if self.killed:
+                        # The running time steps would keep the processors busy and write their files after
+                        # the cancellation, so the workers are stopped and their incomplete files deleted
+                        unfinished = [t for future, t in futures.items() if future.running()]
+                        terminateProcessPool(pool)
+                        for t in unfinished:
+                            file_path = os.path.join(output_path, f"Topography_{model_name}_{t}.0Ma{extension}")
+                            try:
+                                os.unlink(file_path)
+                            except OSError:
+                                pass
+                    else:
+                        pool.shutdown()
+                    try:
+                        os.unlink(pool_input_path)
+                    except OSError:
+                        pass
+            if not self.killed:
+                if extent != GLOBAL_EXTENT:
+                    self.feedback.info("Rasters clipped to the specified bounds.")
+                self.feedback.info(f"All topography files saved to the output folder {output_path}.")
+        else:
+            # Reconstructing raster to desired age
+            cached_raster = None
+            if not self.killed:
+                cached_raster = self.loadFromCache(cache_keys.get(reconstruction_time)) if cached_times else None
+                if cached_raster is None and topo_raster is None:
+                    self.feedback.warning("The cached reconstructed raster could not be read.")
+                    topo_raster, partitioning_features = self.prepareInput(input_source, input_extent, input_time,
+                                                                           resampling_resolution, interpolationMethod,
+                                                                           model, partitioning)
+            if not self.killed:
+                try:
+                    if cached_raster is not None:
+                        self.feedback.info("Reconstructed raster loaded from the cache.")
+                        topo_raster = cached_raster
+                    elif reconstruction_time != input_time:
+                        self.feedback.info("Starting reconstruction...")
+                        topo_raster.reconstruct(reconstruction_time, threads=n_threads, inplace=True,
+                                            partitioning_features=partitioning_features)
+                        self.feedback.info("Reconstruction finished.")
+                        self.storeInCache(cache_keys.get(reconstruction_time), topo_raster)
+                    self.feedback.progress += 20
+                except Exception:
+                    self.feedback.error("There was an error while reconstructing raster to the desired age.")
+                    self.kill()
+
+            # Clip the raster according to the defined extent
+            if not self.killed:
+                try:
+                    if extent != GLOBAL_EXTENT:
+                        clipArrayToExtent(topo_raster, extent)
+                        self.feedback.info("Raster clipped to the specified bounds.")
+                    self.feedback.progress += 10
+                except Exception:
+                    self.feedback.error("There was an error while clipping the raster.")
+                    self.kill()
+
+            # Exporting the result
+            if not self.killed:
+                self.exportRaster(topo_raster, output_path, output_format)
+
+        return None if self.killed else output_path
+
+    def storeInCache(self, key, raster):
+        """Stores a reconstructed raster in the cache of reconstructed rasters, if a cache key was made for it."""
+        if key is None:
+            return
+        try:
+            cache_manager.reconstruction_cache.put(key, raster.data, raster.extent, raster.time)
+        except Exception:
+            self.feedback.warning("The reconstructed raster could not be stored in the cache.")
+
+    def loadFromCache(self, key):
+        """Returns the cached reconstructed raster for a cache key as a gplately.Raster, or None if it is not cached."""
+        if key is None:
+            return None
+        try:
+            cached = cache_manager.reconstruction_cache.get(key)
+        except Exception:
+            return None
+        if cached is None:
+            return None
+        data, extent, time = cached
+        return gplately.Raster(data=data, extent=extent, time=time)
+
+    def prepareInput(self, input_source, input_extent, input_time, resampling_resolution, interpolation,
+                     model=None, partitioning=None, input_data=None):
+        """
+        Reads the input raster, resamples it and parses the partitioning features of the model, which are
+        shared by all time steps.
+
+        :param input_source: Path of the input raster.
+        :type input_source: str.
+        :param input_extent: Extent of the input raster (west, east, north, south).
+        :type input_extent: tuple.
+        :param input_time: Age of the input raster in Ma.
+        :type input_time: float.
+        :param resampling_resolution: Resampling resolution, None to keep the resolution of the input.
+        :type resampling_resolution: float.
+        :param interpolation: Index of the resampling interpolation method.
+        :type interpolation: int.
+        :param model: Plate reconstruction, None if the raster is not reconstructed.
+        :type model: gplately.PlateReconstruction.
+        :param partitioning: Model name, layer name and files of the partitioning layer
+        (see cache_manager.parse_feature_collections), None if the raster is not reconstructed.
+        :type partitioning: tuple.
+        :param input_data: Content of the input raster, None to read it from input_source.
+        :type input_data: np.ndarray.
+
+        :return: The prepared raster and the partitioning features, or (None, None) if the input could not
+        be prepared.
+        :rtype: tuple.
+        """
+        # Reading the input raster
+        try:
+            self.feedback.info("Reading input raster...")
+            if input_data is None:
+                data = gdal.Open(input_source)
+                data = data.GetRasterBand(1).ReadAsArray()
+            else:
+                data = input_data
+            topo_raster = gplately.Raster(data=data, extent=input_extent, time=input_time)
+            del data
+            self.feedback.progress += 10
+        except Exception:
+            self.feedback.error("There was an error while reading the input raster.")
+            self.kill()
+            return None, None
+
+        # Resampling to desired resolution
+        try:
+            topo_raster._data = topo_raster._data.astype(np.float32)
+            if resampling_resolution is not None:
+                self.feedback.info("Resampling...")
+                topo_raster.resample(resampling_resolution, resampling_resolution, method=interpolation, inplace=True)
+            self.feedback.progress += 10
+        except Exception:
+            self.feedback.error("There was an error while resampling the input raster.")
+            self.kill()
+            return None, None
+
+        # Parsing the partitioning features once, so that they are shared by all time steps
+        partitioning_features = None
+        if partitioning is not None:
+            try:
+                partitioning_features = cache_manager.parse_feature_collections(*partitioning)
+                topo_raster.plate_reconstruction = model
+            except Exception:
+                self.feedback.error("There was an error while reading the partitioning features of the model.")
+                self.kill()
+                return None, None
+        return topo_raster, partitioning_features
+
+    def exportRaster(self, raster, file_path, output_format="netcdf"):
+        """
+        Saves a raster to a compressed NetCDF4 file or a Cloud-Optimized GeoTIFF (see raster_export),
+        replacing any existing file.
+
+        :return: False if the raster could not be saved.
+        :rtype: bool.
+        """
+        if os.path.exists(file_path):
+            try:
+                os.unlink(file_path)
+            except Exception:
+                self.feedback.error(f"Cannot save output file {file_path}. There is a file with the same name which is currently being used.")
+                self.kill()
+                return False
+        try:
+            writeGrid(file_path, raster.data, raster.lons, raster.lats, output_format)
+        except Exception:
+            self.feedback.error(f"There was an error while exporting the result to {file_path}.")
+            self.kill()
+            return False
+        return True
+
+    def startSlicePool(self, times, n_threads, topo_raster, input_time, model_files, partitioning_files,
+                       extent, output_path, output_format, model_name, cache_keys):
+        """
+        Starts reconstructing time steps of a sequence in worker processes (see reconstruction_worker).
+        The threads are split between the processes, which reconstruct different time steps, and the
+        reconstruction of each time step.
+
+        :param times: Time steps to reconstruct.
+        :type times: list.
+        :param n_threads: Total number of threads to use.
+        :type n_threads: int.
+        :param topo_raster: Prepared (resampled) input raster.
+        :type topo_raster: gplately.Raster.
+        :param input_time: Age of the input raster in Ma.
+        :type input_time: float.
+        :param model_files: Rotation, topology and static polygon files of the model.
+        :type model_files: tuple.
+        :param partitioning_files: Files of the partitioning layer.
+        :type partitioning_files: list.
+        :param extent: Extent to clip the rasters to, None to keep the whole globe.
+        :type extent: tuple.
+        :param output_path: Output folder.
+        :type output_path: str.
+        :param output_format: Format of the output files ("netcdf" or "cog").
+        :type output_format: str.
+        :param model_name: Name of the model, used in the names of the output files.
+        :type model_name: str.
+        :param cache_keys: Cache keys of the time steps.
+        :type cache_keys: dict.
+
+        :return: The process pool, the futures mapped to their time steps and the path of the temporary copy
+        of the input raster read by the workers. The pool is None if the worker processes cannot be started.
+        :rtype: tuple.
+        """
+        process_count = min(n_threads, len(times))
+        threads_per_process = max(n_threads // process_count, 1)
+        input_path = None
+        try:
+            fd, input_path = tempfile.mkstemp(suffix=".npy", dir=self.temp_dir)
+            with os.fdopen(fd, "wb") as input_file:
+                np.save(input_file, topo_raster.data)
+            pool = createProcessPool(process_count, initializer=initWorker,
+                                     initargs=(*model_files, partitioning_files, input_path, topo_raster.extent,
+                                               input_time, threads_per_process))
+        except Exception:
+            pool = None
+        if pool is None:
+            if input_path is not None and os.path.exists(input_path):
+                os.unlink(input_path)
+            self.feedback.warning("The worker processes could not be started. The time steps will be reconstructed one after another.")
+            return None, {}, None
+
+        self.feedback.info(f"Reconstructing {len(times)} time steps in {process_count} parallel processes "
+                           f"with {threads_per_process} threads each...")
+        reconstruction_cache = cache_manager.reconstruction_cache
+        cache_size_limit = reconstruction_cache.size_limit
+        futures = {}
+        for t in times:
+            task = {
+                "time": t,
+                "extent": extent,
+                "file_path": os.path.join(output_path, f"Topography_{model_name}_{t}.0Ma{outputExtension(output_format)}"),
+                "output_format": output_format,
+                "cache_key": cache_keys.get(t),
+                "cache_dir": reconstruction_cache.cache_dir,
+                "cache_size_limit": cache_size_limit,
+            }
+            futures[pool.submit(reconstructSlice, task)] = t
+        return pool, futures, input_path
+
+
+class TaReconstructRasters(TaReconstructRastersEngine, TaBaseAlgorithm):
 
     def __init__(self, dlg):
         super().__init__(dlg)
@@ -68,134 +526,29 @@ class TaReconstructRasters(TaBaseAlgorithm):
         maxlat = self.dlg.maxlat.value()
         
         n_threads = self.dlg.threads.spinBox.value()
+        output_format = self.dlg.outputFormat.currentData(QtCore.Qt.UserRole)
+        extension = outputExtension(output_format)
         output_path = self.dlg.outputPath.filePath()
         if not output_path:
             output_path = self.dlg.outputPath.lineEdit().placeholderText()
         
         if raster_type == 'Topography':
-            # Downloading rotation model files
-            if not self.killed:
-                try:
-                    if reconstruction_time != input_time or save_multiple_rasters:
-                        self.feedback.info(f"Downloading {model_name} model if needed...")
-                        rotation_model = cache_manager.download_model(model_name, self.feedback)
-                        cache_manager.download_all_layers(model_name, self.feedback)
-                        topology_features = cache_manager.get_layer(model_name, "Topologies", self.feedback)
-                        static_polygons = cache_manager.get_layer(model_name, "StaticPolygons", self.feedback)
-                        cobs = cache_manager.get_layer(model_name, "COBs", self.feedback)
-                        if cobs is None:
-                            self.feedback.info("Using static polygons instead.")
-                        model = gplately.PlateReconstruction(rotation_model, topology_features, static_polygons)
-                    else:
-                        model = None
-                except Exception:
-                    self.feedback.error(f"There was an error while downloading the {model_name} model files.")
-                    self.kill()
-            
-            # Obtaning input layer
             if not self.killed:
-                if not local:
-                    try:
-                        self.feedback.info("Downloading present day topography raster...")
-                        data = cache_manager.download_raster(raster, self.feedback)
-                        with gdal.config_option('GDAL_PAM_ENABLED', 'NO'):
-                            local_layer = QgsRasterLayer(data, data, 'gdal')
-                    except Exception:
-                        self.feedback.error("There was an error while downloading the input raster.")
-                        self.kill()
-                try:
-                    self.feedback.info("Reading input raster...")
-                    data = gdal.Open(local_layer.source())
-                    data = data.GetRasterBand(1).ReadAsArray()
-                    input_extent = local_layer.extent()
-                    input_extent = (input_extent.xMinimum(), input_extent.xMaximum(), input_extent.yMaximum(), input_extent.yMinimum())
-                    topo_raster = gplately.Raster(data=data, extent=input_extent, time=input_time)
-                    self.feedback.progress += 10
-                except Exception:
-                    self.feedback.error("There was an error while reading the input raster.")
-                    self.kill()
-                    
-            # Resampling to desired resolution
-            if not self.killed:
-                try:
-                    topo_raster._data = topo_raster._data.astype(float)
-                    if resampling:
-                        self.feedback.info("Resampling...")
-                        topo_raster.resample(resampling_resolution, resampling_resolution, method=interpolationMethod, inplace=True)
-                    self.feedback.progress += 10
-                except Exception:
-                    self.feedback.error("There was an error while resampling the input raster.")
-                    self.kill()
-            
-            # Reconstructing raster to desired age
-            if not self.killed:
-                try:
-                    if save_multiple_rasters:
-                        rasters = []
-                        for t in range(start_time, end_time + time_step, time_step):
-                            self.feedback.info(f"Reconstructing raster to {t} Ma...")
-                            topo_raster.plate_reconstruction = model
-                            partitioning_features = cobs if cobs else static_polygons
-                            reconstructed_raster = topo_raster.reconstruct(t, threads=n_threads,
-                                                    partitioning_features=partitioning_features)
-                            rasters.append(reconstructed_raster)
-                    else:
-                        if reconstruction_time != input_time:
-                            topo_raster.plate_reconstruction = model
-                            partitioning_features = cobs if cobs else static_polygons
-                            self.feedback.info("Starting reconstruction...")
-                            topo_raster.reconstruct(reconstruction_time, threads=n_threads, inplace=True,
-                                                partitioning_features=partitioning_features)
-                            self.feedback.info("Reconstruction finished.")
-                        rasters = [topo_raster]
-                        self.feedback.progress += 20
-                except Exception:
-                    self.feedback.error("There was an error while reconstructing raster to the desired age.")
-                    self.kill()
-            
-            # Clip the raster according to the defined extent
-            if not self.killed:
-                try:
-                    extent = (minlon, maxlon, minlat, maxlat)
-                    if extent != (-180, 180, -90, 90):
-                        for raster in rasters:
-                            clipArrayToExtent(raster, extent)
-                        self.feedback.info("Raster clipped to the specified bounds.")
-                    self.feedback.progress += 10
-                except Exception:
-                    self.feedback.error("There was an error while clipping the raster.")
-                    self.kill()
-                    
-            # Exporting result as NetCDF file
-            if not self.killed:
-                try:
-                    if save_multiple_rasters:
-                        if not os.path.exists(output_path):
-                            os.makedirs(output_path)
-                        for raster in rasters:
-                            filename = f"Topography_{model_name}_{raster.time}.0Ma.nc"
-                            file_path = os.path.join(output_path, filename)
-                            if os.path.exists(file_path):
-                                try:
-                                    os.unlink(file_path)
-                                except Exception:
-                                    self.feedback.error(f"Cannot save output file {file_path}. There is a file with the same name which is currently being used.")
-                                    self.kill()
-                            raster.save_to_netcdf4(os.path.join(output_path, filename))
-                        self.feedback.info(f"All topography files saved to the output folder {output_path}.")
-                    else:
-                        if os.path.exists(output_path):
-                            try:
-                                os.unlink(output_path)
-                            except Exception:
-                                self.feedback.error(f"Cannot save output file {output_path}. There is a file with the same name which is currently being used.")
-                                self.kill()
-                        rasters = [topo_raster]
-                        rasters[0].save_to_netcdf4(output_path)
-                except Exception:
-                    self.feedback.error("There was an error while exporting the result to NetCDF.")
-                    self.kill()
-                    
+                self.params = TaReconstructRasterParameters(
+                    model_name=model_name,
+                    input_raster=local_layer if local else raster,
+                    reconstruction_time=reconstruction_time,
+                    output_path=output_path,
+                    input_time=input_time,
+                    start_time=start_time if save_multiple_rasters else None,
+                    time_step=time_step if save_multiple_rasters else 10,
+                    resampling_resolution=resampling_resolution if resampling else None,
+                    interpolation=interpolationMethod,
+                    extent=(minlon, maxlon, minlat, maxlat),
+                    threads=n_threads,
+                    output_format=output_format)
+                self.reconstructTopography()
+
         elif raster_type == 'Agegrid/Bathymetry':
             # Downloading rotation model files
             if not self.killed:
@@ -221,6 +574,8 @@ class TaReconstructRasters(TaBaseAlgorithm):
             if not self.killed:
                 try:
                     self.feedback.info("Starting reconstruction...")
+                    # Imported here, as it is only needed for age grids and is slow to import
+                    from agegrid.run_paleo_age_grids import run_paleo_age_grids
                     shutil.rmtree(os.path.join(self.temp_dir, "grid_files"), ignore_errors=True)
                     model_dir = cache_manager.get_model(model_name).get_model_dir()
                     run_paleo_age_grids(model_name, model_dir, self.temp_dir, self.feedback,
@@ -256,37 +611,28 @@ class TaReconstructRasters(TaBaseAlgorithm):
                         self.feedback.error("There was an error while converting age raster to bathymetry.")
                         self.kill()
             
-            # Exporting result as NetCDF file
+            # Exporting the result
             if not self.killed:
-                try:
-                    if save_multiple_rasters:
+                if save_multiple_rasters:
+                    try:
                         if not os.path.exists(output_path):
                             os.makedirs(output_path)
-                        for raster in rasters:
-                            if convert:
-                                filename = f"Bathymetry_{model_name}_{raster.filename.rsplit('_', 1)[-1]}"
-                            else:
-                                filename = f"Agegrid_{model_name}_{raster.filename.rsplit('_', 1)[-1]}"
-                            file_path = os.path.join(output_path, filename)
-                            if os.path.exists(file_path):
-                                try:
-                                    os.unlink(file_path)
-                                except Exception:
-                                    self.feedback.error(f"Cannot save output file {file_path}. There is a file with the same name which is currently being used.")
-                                    self.kill()
-                            raster.save_to_netcdf4(file_path)
+                    except Exception:
+                        self.feedback.error(f"Cannot create the output folder {output_path}.")
+                        self.kill()
+                    for raster in rasters:
+                        if self.killed:
+                            break
+                        time_label = os.path.splitext(raster.filename.rsplit('_', 1)[-1])[0]
+                        if convert:
+                            filename = f"Bathymetry_{model_name}_{time_label}{extension}"
+                        else:
+                            filename = f"Agegrid_{model_name}_{time_label}{extension}"
+                        self.exportRaster(raster, os.path.join(output_path, filename), output_format)
+                    if not self.killed:
                         self.feedback.info(f"All agegrid files saved to the output folder {output_path}.")
-                    else:
-                        if os.path.exists(output_path):
-                            try:
-                                os.unlink(output_path)
-                            except Exception:
-                                self.feedback.error(f"Cannot save output file {output_path}. There is a file with the same name which is currently being used.")
-                                self.kill()
-                        rasters[0].save_to_netcdf4(output_path)
-                except Exception:
-                    self.feedback.error("There was an error while exporting the result to NetCDF.")
-                    self.kill()
+                else:
+                    self.exportRaster(rasters[0], output_path, output_format)
         
         # Saving the result
         if self.killed:
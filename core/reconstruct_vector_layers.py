@@ -6,36 +6,45 @@ from PyQt5 import QtCore
 from qgis.core import QgsVectorLayer
 from .base_algorithm import TaBaseAlgorithm
 from .cache_manager import cache_manager
+from .parameters import TaReconstructVectorLayerParameters
+from .utils import toVectorLayer
 import pygplates
 import os
 
-class TaReconstructVectorLayers(TaBaseAlgorithm):
+class TaReconstructVectorLayersEngine:
+    """
+    Reconstructs vector layers to past ages with pygplates, with the parameters of self.params
+    (TaReconstructVectorLayerParameters).
 
-    def __init__(self, dlg):
-        super().__init__(dlg)
+    The class that inherits it provides the feedback and the cancellation: TaReconstructVectorLayers in
+    the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
 
-    def run(self):
-        # Obtaining input from dialog
-        model_name = self.dlg.modelName.currentData(QtCore.Qt.UserRole)
-        layer_type = self.dlg.layerType.currentText()
-        if layer_type == "Local Layer":
-            local_layer = self.dlg.localLayer.currentLayer()
-            if not local_layer:
-                self.feedback.error("No input layer selected.")
-                self.kill()
-            input_time = self.dlg.inputTime.spinBox.value()
+    def reconstructVectorLayer(self):
+        """
+        :return: The path of the output file, or None if the reconstruction failed or was canceled.
+        :rtype: str.
+        """
+        model_name = self.params.model_name
+        # Layers of the model are given by their names, other layers as layers or files
+        local = isinstance(self.params.input_layer, QgsVectorLayer) or \
+            os.path.isfile(str(self.params.input_layer).split("|")[0])
+        if local:
+            layer_type = "Local Layer"
+            local_layer = toVectorLayer(self.params.input_layer)
+            input_time = self.params.input_time
         else:
+            layer_type = self.params.input_layer
             input_time = 0
-        reconstruction_time = self.dlg.reconstruction_time.spinBox.value()
-        output_path = self.dlg.outputPath.filePath()
-        if not output_path:
-            output_path = self.dlg.outputPath.lineEdit().placeholderText()
+        reconstruction_time = self.params.reconstruction_time
+        output_path = self.params.output_path
         
         # Downloading rotation model and input layer if needed
         if not self.killed:
             try:
                 self.feedback.info(f"Downloading {model_name} rotation model if needed...")
-                rotation_model = cache_manager.download_model(model_name, self.feedback)
+                rotation_model = cache_manager.get_rotation_model(model_name, self.feedback)
                 
             except Exception:
                 self.feedback.error(f"There was an error while downloading the {model_name} model files.")
@@ -49,7 +58,7 @@ class TaReconstructVectorLayers(TaBaseAlgorithm):
                 else:
                     self.feedback.info(f"Downloading {model_name} associated vector layers if needed...")
                     cache_manager.download_all_layers(model_name, self.feedback)
-                    layer = cache_manager.get_layer(model_name, layer_type, self.feedback)
+                    layer = cache_manager.get_feature_collections(model_name, layer_type, self.feedback)
                 
             except Exception:
                 self.feedback.error("There was an error while obtaining the input layer.")
@@ -84,16 +93,46 @@ class TaReconstructVectorLayers(TaBaseAlgorithm):
                 self.feedback.error("There was an error while reconstructing layer to the desired age.")
                 self.kill()
         
-        # Saving the result
-        vlayer = QgsVectorLayer(output_path, "Temp layer", "ogr")
-
+        # Checking the result
         if self.killed:
-            self.finished.emit(False, "")
-        elif not vlayer.isValid():
+            return None
+        vlayer = QgsVectorLayer(output_path, "Temp layer", "ogr")
+        if not vlayer.isValid():
             self.feedback.error("Layer failed to load!")
             self.kill()
-            self.finished.emit(False, "")
+            return None
+        self.feedback.progress = 100
+        return output_path
+
+
+class TaReconstructVectorLayers(TaReconstructVectorLayersEngine, TaBaseAlgorithm):
+
+    def __init__(self, dlg):
+        super().__init__(dlg)
+
+    def run(self):
+        # Obtaining input from dialog
+        layer_type = self.dlg.layerType.currentText()
+        if layer_type == "Local Layer":
+            input_layer = self.dlg.localLayer.currentLayer()
+            if not input_layer:
+                self.feedback.error("No input layer selected.")
+                self.kill()
         else:
+            input_layer = layer_type
+        output_path = self.dlg.outputPath.filePath()
+        if not output_path:
+            output_path = self.dlg.outputPath.lineEdit().placeholderText()
+        self.params = TaReconstructVectorLayerParameters(
+            model_name=self.dlg.modelName.currentData(QtCore.Qt.UserRole),
+            input_layer=input_layer,
+            reconstruction_time=self.dlg.reconstruction_time.spinBox.value(),
+            output_path=output_path,
+            input_time=self.dlg.inputTime.spinBox.value() if layer_type == "Local Layer" else 0)
+
+        output_path = self.reconstructVectorLayer() if not self.killed else None
+        if output_path:
             self.finished.emit(True, output_path)
-            self.feedback.progress = 100
+        else:
+            self.finished.emit(False, "")
         
@@ -0,0 +1,212 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Persistent cache of reconstructed rasters.
+
+Every reconstructed raster is stored as an uncompressed .npz file whose name is a hash of everything
+that determines the result: the rotation model files, the input raster, the input time, the resampling
+resolution and interpolation method, the partitioning layer and the target time. Files are identified by
+their path, size and modification time, and input rasters that are not plain files by a hash of their
+content, so an updated model or an edited input raster gives new keys and stale entries are simply
+never hit again.
+
+The cache is kept under a size cap (the "reconstruction_cache_mb" key of the Terra Antiqua settings) by
+evicting the least recently used entries. The modification time of an entry is refreshed on each hit and
+used as its last access time, so no index file is needed and several processes can share the cache.
+"""
+
+from PyQt5.QtCore import QSettings
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_SIZE_MB = 4096
+
+
+def fileFingerprint(paths):
+    """
+    Returns a description of one or several files that changes whenever one of them is modified.
+
+    :param paths: Path or list of paths. Falsy values give None.
+    :type paths: str or list.
+
+    :return: List of [path, size, modification time] entries.
+    :rtype: list.
+    """
+    if not paths:
+        return None
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    fingerprint = []
+    for path in paths:
+        path = os.path.realpath(str(path))
+        stat = os.stat(path)
+        fingerprint.append([path, stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+
+def arrayFingerprint(array):
+    """Returns the SHA-256 hash of the content of an array, for inputs that are not plain files."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256()
+    digest.update(str((array.dtype.str, array.shape)).encode())
+    digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+class TaReconstructionCache:
+    """Content-addressed cache of reconstructed rasters with LRU eviction."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def size_limit(self):
+        """Maximum size of the cache in bytes. A limit of 0 disables the cache."""
+        limit_mb = QSettings("TerraAntiqua", "Terra Antiqua").value(
+            "reconstruction_cache_mb", DEFAULT_CACHE_SIZE_MB, type=int)
+        return max(int(limit_mb), 0) * 1024 * 1024
+
+    @property
+    def enabled(self):
+        return self.size_limit > 0
+
+    def make_key(self, model_files, input_source, input_time, resolution, interpolation,
+                 partitioning_files, target_time):
+        """
+        Builds the cache key of a reconstructed raster.
+
+        :param model_files: Rotation file(s) of the model.
+        :type model_files: str or list.
+        :param input_source: Fingerprint of the input raster: fileFingerprint of its file, or arrayFingerprint of
+        its content if it is not stored in a plain file.
+        :type input_source: list or str.
+        :param input_time: Age of the input raster in Ma.
+        :type input_time: float.
+        :param resolution: Resampling resolution, or None if the input is not resampled.
+        :type resolution: float.
+        :param interpolation: Index of the resampling interpolation method, or None if the input is not resampled.
+        :type interpolation: int.
+        :param partitioning_files: File(s) of the partitioning layer.
+        :type partitioning_files: str or list.
+        :param target_time: Reconstruction time in Ma.
+        :type target_time: float.
+
+        :return: Hexadecimal key.
+        :rtype: str.
+        """
+        description = {
+            "version": CACHE_FORMAT_VERSION,
+            "model": fileFingerprint(model_files),
+            "input": input_source,
+            "input_time": float(input_time),
+            "resolution": None if resolution is None else float(resolution),
+            "interpolation": interpolation,
+            "partitioning": fileFingerprint(partitioning_files),
+            "time": float(target_time),
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def contains(self, key):
+        """Returns True if a raster is cached for the key."""
+        return self.enabled and os.path.isfile(self._entry_path(key))
+
+    def get(self, key):
+        """
+        Returns the cached raster for a key.
+
+        :return: Data, extent and time of the raster, or None if the key is not cached or the entry cannot be read.
+        :rtype: tuple.
+        """
+        path = self._entry_path(key)
+        if not self.enabled or not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                data = entry["data"]
+                extent = tuple(float(value) for value in entry["extent"])
+                time = float(entry["time"])
+            os.utime(path)
+        except OSError:
+            # Entry evicted by another process
+            return None
+        except (ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # Entry that cannot be read, deleted so that the raster is stored again
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return data, extent, time
+
+    def put(self, key, data, extent, time, size_limit=None):
+        """
+        Stores a reconstructed raster and evicts old entries if the cache grows beyond its limit.
+        The size limit (in bytes) defaults to the one in the settings; worker processes pass it explicitly.
+        """
+        if size_limit is None:
+            size_limit = self.size_limit
+        if size_limit <= 0 or data.nbytes > size_limit:
+            return
+        # Write to a temporary file first, so that other processes never see a partial entry
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                np.savez(temp_file, data=np.asarray(data), extent=np.asarray(extent, dtype=np.float64),
+                         time=np.float64(time))
+            os.replace(temp_path, self._entry_path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self.evict(size_limit)
+
+    def entries(self):
+        """Returns (path, size, last access time) of all cache entries, least recently used first."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".npz"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def size(self):
+        """Returns the total size of the cache in bytes."""
+        return sum(entry[1] for entry in self.entries())
+
+    def evict(self, size_limit=None):
+        """Deletes the least recently used entries until the cache fits into the size limit."""
+        if size_limit is None:
+            size_limit = self.size_limit
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        for path, size, _ in entries:
+            if total <= size_limit:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """Deletes all cache entries."""
+        self.evict(0)
@@ -0,0 +1,122 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+"""
+Reconstruction of the time steps of a topography sequence in worker processes.
+
+Each worker process builds its own plate reconstruction and reads the prepared (resampled) input raster
+once, when it starts (see initWorker). The time steps are then sent to the workers one by one
+(see reconstructSlice); each worker reconstructs, caches, clips and saves its time step, so that only
+the name of the output file is sent back.
+
+The module does not depend on QGIS, so it can be imported in the worker processes.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from .raster_export import writeGrid
+from .reconstruction_cache import TaReconstructionCache
+
+# Plate reconstruction, partitioning features and input raster of the worker process
+_worker = {}
+
+
+def importGplately():
+    try:
+        import gplately
+    except Exception:
+        # This fixes error on MacOS were gplately tries to create a log file in a protected directory
+        original_dir = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            import gplately
+        finally:
+            os.chdir(original_dir)
+    return gplately
+
+
+def clipArrayToExtent(raster, extent):
+    minlon, maxlon, minlat, maxlat = extent
+
+    lon_indices = np.where((raster.lons >= minlon) & (raster.lons <= maxlon))[0]
+    lat_indices = np.where((raster.lats >= minlat) & (raster.lats <= maxlat))[0]
+
+    raster._data = raster._data[np.min(lat_indices):np.max(lat_indices)+1,
+                                    np.min(lon_indices):np.max(lon_indices)+1]
+
+    raster.lons = raster.lons[np.min(lon_indices):np.max(lon_indices)+1]
+    raster.lats = raster.lats[np.min(lat_indices):np.max(lat_indices)+1]
+
+
+def loadFeatureCollections(files):
+    """Parses the file(s) of a layer of a model into pygplates feature collections."""
+    import pygplates
+    if isinstance(files, (list, tuple)):
+        return [pygplates.FeatureCollection(f) for f in files]
+    return pygplates.FeatureCollection(files)
+
+
+def initWorker(rotation_files, topology_files, static_polygon_files, partitioning_files,
+               input_path, input_extent, input_time, threads):
+    """
+    Initializes a worker process: builds the plate reconstruction and reads the input raster.
+
+    :param rotation_files, topology_files, static_polygon_files: Files of the rotation model.
+    :type rotation_files, topology_files, static_polygon_files: list.
+    :param partitioning_files: Files of the layer used to partition the raster into plates.
+    :type partitioning_files: list.
+    :param input_path: Path to the prepared input raster, saved with np.save.
+    :type input_path: str.
+    :param input_extent: Extent of the input raster (west, east, north, south).
+    :type input_extent: tuple.
+    :param input_time: Age of the input raster in Ma.
+    :type input_time: float.
+    :param threads: Number of threads each reconstruction uses.
+    :type threads: int.
+    """
+    gplately = importGplately()
+    model = gplately.PlateReconstruction(rotation_files, topology_files, static_polygon_files)
+    topo_raster = gplately.Raster(data=np.load(input_path), extent=input_extent, time=input_time)
+    topo_raster.plate_reconstruction = model
+    _worker.update({
+        "raster": topo_raster,
+        "partitioning_features": loadFeatureCollections(partitioning_files),
+        "threads": threads,
+    })
+
+
+def reconstructSlice(task):
+    """
+    Reconstructs the input raster of the worker to one time step and saves it.
+
+    :param task: Time step ("time"), clipping extent ("extent", None for the whole globe), output file
+    ("file_path") and format ("output_format", see raster_export.writeGrid), and the cache key
+    ("cache_key", None if the result should not be cached), directory ("cache_dir") and size limit
+    in bytes ("cache_size_limit") of the cache of reconstructed rasters.
+    :type task: dict.
+
+    :return: Time step and path of the saved file.
+    :rtype: tuple.
+    """
+    reconstructed_raster = _worker["raster"].reconstruct(task["time"], threads=_worker["threads"],
+                                                         partitioning_features=_worker["partitioning_features"])
+    if task["cache_key"] is not None:
+        try:
+            TaReconstructionCache(task["cache_dir"]).put(task["cache_key"], reconstructed_raster.data,
+                                                         reconstructed_raster.extent, reconstructed_raster.time,
+                                                         size_limit=task["cache_size_limit"])
+        except Exception:
+            # The cache is an optimization, the result is saved anyway
+            pass
+    if task["extent"] is not None:
+        clipArrayToExtent(reconstructed_raster, task["extent"])
+    if os.path.exists(task["file_path"]):
+        os.unlink(task["file_path"])
+    # The worker processes write at the same time, so each one only uses its share of the threads
+    writeGrid(task["file_path"], reconstructed_raster.data, reconstructed_raster.lons, reconstructed_raster.lats,
+              task["output_format"], threads=_worker["threads"])
+    return task["time"], task["file_path"]
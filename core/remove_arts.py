@@ -28,11 +28,11 @@ from numpy import *
 
 
 from .utils import (
-    vectorToRaster,
-    fillNoDataInPolygon,
+    fillNoDataInPolygonArray,
+    TaFeatureRasterizer,
     TaVectorFileWriter)
-from qgis._core import QgsRasterLayer
 from .base_algorithm import TaBaseAlgorithm
+from .raster_io import asFloat32, writeRaster
 
 
 class TaPolygonCreator(QgsMapToolEmitPoint):
@@ -137,12 +137,17 @@ class TaRemoveArtefacts(TaBaseAlgorithm):
                 self.feedback.warning(error[1])
         if not self.killed:
             topo_raster = gdal.Open(topo_layer.source())
-            H = topo_raster.GetRasterBand(1).ReadAsArray()
+            H = asFloat32(topo_raster.GetRasterBand(1).ReadAsArray())
         if not self.killed:
             total = 75 / self.vl.featureCount() if self.vl.featureCount() else 0
-            features = self.vl.getFeatures()
+            features = list(self.vl.getFeatures())
+            # Rasterize all the polygons at once
+            rasterizer = TaFeatureRasterizer(features,
+                                             topo_raster.GetGeoTransform(),
+                                             topo_layer.width(),
+                                             topo_layer.height())
             processed_successfuly = 0
-            for feature in features:
+            for index, feature in enumerate(features):
                 if self.killed:
                     break
                 if not feature.hasGeometry():
@@ -150,21 +155,19 @@ class TaRemoveArtefacts(TaBaseAlgorithm):
 
                 if feature.isValid():
 
-                    temp_layer = QgsVectorLayer(
-                        f"Polygon?crs={self.crs.authid()}", "Temporary vector layer for rasterization", "memory")
-                    temp_layer.dataProvider().addAttributes(feature.fields())
-                    temp_layer.updateFields()
-                    temp_layer.dataProvider().addFeatures([feature])
-                    temp_layer.updateExtents()
-                    mask_array = vectorToRaster(
-                        temp_layer, topo_layer, topo_layer.width(), topo_layer.height())
-                    temp_layer = None
+                    mask_array, window = rasterizer.mask(index)
+                    if mask_array is None:
+                        self.feedback.info(
+                            "The polygon of feature ID {} does not overlap the raster.".format(feature.id()))
+                        continue
+                    # The expression is evaluated only within the bounding box of the polygon
+                    H_window = H[window]
 
                     expr = feature["Expression"]
                     self.feedback.info(
                         "The expression for feature ID {0} is: {1}.".format(feature.id(), expr))
                     try:
-                        expr = self.prepareExpression(H, expr)
+                        expr = self.prepareExpression(H_window, expr)
                     except Exception as e:
                         self.feedback.warning(
                             "Expression evaluation failed for feature ID {}.".format(feature.id()))
@@ -173,7 +176,7 @@ class TaRemoveArtefacts(TaBaseAlgorithm):
                         continue
                     else:
                         try:
-                            H[expr*mask_array == 1] = np.nan
+                            H_window[expr*mask_array == 1] = np.nan
                         except Exception as e:
                             self.feedback.Warning(
                                 "Although the expression seems to be ok, during topography modification an exception was raised for feature id {}".format(feature.id()))
@@ -189,62 +192,30 @@ class TaRemoveArtefacts(TaBaseAlgorithm):
 
         if not self.killed:
             if self.dlg.interpolateCheckBox.isChecked():
-                # Create a temporary raster to store modified data for interpolation
-                out_file_path = os.path.join(
-                    self.temp_dir, "Raster_for_interpolation.tiff")
-                raster_for_interpolation = gdal.GetDriverByName('GTIFF').Create(
-                    out_file_path,
-                    topo_layer.width(),
-                    topo_layer.height(),
-                    1,  # number of bands
-                    gdal.GDT_Float32  # data type
-                )
-                raster_for_interpolation.SetGeoTransform(
-                    topo_raster.GetGeoTransform())
-                raster_for_interpolation.SetProjection(
-                    topo_raster.GetProjection())
-                band = raster_for_interpolation.GetRasterBand(1)
-                band.SetNoDataValue(np.nan)
-                band.WriteArray(H)
-                raster_for_interpolation = None
-                H = None
+                geotransform = topo_raster.GetGeoTransform()
+                projection = topo_raster.GetProjection()
                 topo_raster = None
 
                 self.feedback.progress += 10
 
                 if not self.killed:
-                    rlayer = QgsRasterLayer(
-                        out_file_path, "Raster Layer for interpolation", "gdal")
                     try:
-                        interpolated_raster = fillNoDataInPolygon(
-                            rlayer, self.vl, self.out_file_path)
+                        H = fillNoDataInPolygonArray(H, self.vl, geotransform)
+                        interpolated_raster = writeRaster(
+                            self.out_file_path, H, geotransform, projection)
                     except Exception as e:
                         self.feedback.Error(
                             "An error occured wile interpolating values for the artefact pixels: {}".format(e))
                         self.kill()
+                    H = None
 
                     self.feedback.progress = 100
 
                     self.finished.emit(True, interpolated_raster)
-                if os.path.exists(out_file_path):
-                    drv = gdal.GetDriverByName('GTIFF')
-                    drv.Delete(out_file_path)
             else:
-
-                output_raster = gdal.GetDriverByName('GTIFF').Create(
-                    self.out_file_path,
-                    topo_layer.width(),
-                    topo_layer.height(),
-                    1,  # number of bands
-                    gdal.GDT_Float32  # data type
-                )
-                output_raster.SetGeoTransform(topo_raster.GetGeoTransform())
-                output_raster.SetProjection(topo_raster.GetProjection())
-                band = output_raster.GetRasterBand(1)
-                band.SetNoDataValue(np.nan)
-                band.WriteArray(H)
-                band.FlushCache()
-                output_raster = None
+                writeRaster(self.out_file_path, H,
+                            topo_raster.GetGeoTransform(),
+                            topo_raster.GetProjection())
                 H = None
                 topo_raster = None
 
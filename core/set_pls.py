@@ -3,51 +3,64 @@
 #Full copyright notice in file: terra_antiqua.py
 
 import os
-from osgeo import gdal, osr, gdalconst
-from qgis.core import QgsRasterLayer
+from osgeo import gdal, osr
 
 import numpy as np
 
 from .utils import (
+    toRasterLayer,
+    toVectorLayer,
     polygonsToPolylines,
     vectorToRaster,
-    fillNoData,
+    vectorToRasterWindow,
+    fillNoDataInArray,
     modRescale
     )
 from .base_algorithm import TaBaseAlgorithm
-
-
-class TaSetPaleoshorelines(TaBaseAlgorithm):
-
-    def __init__(self, dlg):
-        super().__init__(dlg)
-
-    def run(self):
+from .raster_io import asFloat32, writeRaster, readRasterInTiles, processRasterInTiles
+from .parameters import TaSetPaleoshorelinesParameters
+
+
+class TaSetPaleoshorelinesEngine:
+    """
+    Sets the paleoshorelines of a topography raster with the parameters of self.params
+    (TaSetPaleoshorelinesParameters): the land areas below sea level are emerged and the sea areas above
+    sea level are submerged.
+
+    The class that inherits it provides the feedback, the crs and the cancellation: TaSetPaleoshorelines
+    in the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
+
+    def setPaleoshorelines(self):
+        """
+        :return: The path of the output raster, or None if processing failed or was canceled.
+        :rtype: str.
+        """
         self.feedback.info('Starting')
 
         self.feedback.info('Getting the raster layer')
-        topo_layer = self.dlg.baseTopoBox.currentLayer()
+        topo_layer = toRasterLayer(self.params.input_raster)
         topo_extent = topo_layer.extent()
         topo_ds = gdal.Open(topo_layer.dataProvider().dataSourceUri())
-        topo = topo_ds.GetRasterBand(1).ReadAsArray()
-        geotransform = topo_ds.GetGeoTransform()  # this geotransform is used to rasterize extracted masks below
-        nrows, ncols = np.shape(topo)
 
         # Get the elevation and depth constrains
-        max_elev = self.dlg.maxElevSpinBox.value()
-        max_depth = self.dlg.maxDepthSpinBox.value()
+        max_elev = self.params.max_elev
+        max_depth = self.params.max_depth
 
-        self.set_progress += 10
+        self.feedback.progress += 10
 
-        if topo is not None:
-            self.feedback.info(('Size of the Topography raster: {}'.format(topo.shape)))
+        if topo_ds is not None:
+            geotransform = topo_ds.GetGeoTransform()  # this geotransform is used to rasterize extracted masks below
+            nrows, ncols = topo_ds.RasterYSize, topo_ds.RasterXSize
+            self.feedback.info(('Size of the Topography raster: {}'.format((nrows, ncols))))
         else:
             self.feedback.info('There is a problem with reading the Topography raster')
             self.kill()
 
         # Get the vector masks
         self.feedback.info('Getting the vector layer')
-        vlayer = self.dlg.masksBox.currentLayer()
+        vlayer = toVectorLayer(self.params.mask_layer)
 
         if vlayer.isValid() and vlayer.featureCount()>0:
             self.feedback.info('The mask layer is loaded properly')
@@ -58,16 +71,20 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
             self.feedback.error('There is a problem with the mask layer - not loaded properly')
             self.kill()
 
-        self.set_progress += 10
+        self.feedback.progress += 10
 
         # Check which type of modification is chosen
 
-        if self.dlg.interpolateCheckBox.isChecked():
+        if self.params.mode == "interpolate":
             if not self.killed:
                 self.feedback.info('The interpolation mode is selected.')
                 self.feedback.info('In this mode the areas to emerge or submerge')
                 self.feedback.info('will be set to NAN values, after which the values of these cells will be interpolated from adjacent cells.')
 
+            if not self.killed:
+                topo = asFloat32(topo_ds.GetRasterBand(1).ReadAsArray())
+                topo_ds = None
+
             if not self.killed:
                 # Converting polygons to polylines in order to set the shoreline values to 0
                 try:
@@ -92,7 +109,7 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
                 # Setting shorelines to 0 m
                 topo[pshoreline_rmask == 1] = 0
 
-            self.set_progress += 10
+            self.feedback.progress += 10
 
             if not self.killed:
                 # Getting the raster masks of the land and sea area
@@ -114,51 +131,28 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
                 # Setting the inland values that are below sea level, and in-sea values that are above sea level to
                 # NAN (empty cell)
                 # Creating an empty matrix to copy values from topo before setting them to NaN
-                topo_values_copied = np.empty(topo.shape)
-                topo_values_copied[:] = np.nan
+                topo_values_copied = np.full(topo.shape, np.nan, dtype=np.float32)
                 topo_values_copied[(r_masks == 1) * (topo < 0) == 1] = topo[(r_masks == 1) * (topo < 0) == 1]
                 topo_values_copied[(r_masks == 0) * (topo > 0) == 1] = topo[(r_masks == 0) * (topo > 0) == 1]
                 topo[(r_masks == 1) * (topo < 0) == 1] = np.nan
                 topo[(r_masks == 0) * (topo > 0) == 1] = np.nan
 
-            self.set_progress += 10
+            self.feedback.progress += 10
 
             if not self.killed:
                 # Check if raster was modified. If the x matrix was assigned.
                 if 'topo' in locals():
 
-                    temp_out_file = os.path.join(os.path.dirname(self.out_file_path),
-                                                 "PaleoShorelines_without_theGaps_filled.tiff")
-                    driver = gdal.GetDriverByName('GTiff')
-                    if os.path.exists(temp_out_file):
-                        driver.Delete(temp_out_file)
-
-                    raster = driver.Create(temp_out_file, ncols, nrows, 1, gdal.GDT_Float32)
-                    raster.SetGeoTransform(geotransform)
-                    raster.SetProjection(self.crs.toWkt())
-                    raster.GetRasterBand(1).SetNoDataValue(np.nan)
-                    raster.GetRasterBand(1).WriteArray(topo)
-                    raster = None
-
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
-                    raster_layer = QgsRasterLayer(temp_out_file, "PaleoShorelines_without_theGaps_filled", "gdal")
+                    # The gaps are filled in memory, the raster is written to the disk only once at the end
+                    topo_modified = fillNoDataInArray(topo)
 
-                    ret = fillNoData(raster_layer, self.out_file_path)
+                    self.feedback.progress += 10
 
-                    #Delete the temporary layer stored before filling the gaps
-                    if os.path.exists(temp_out_file):
-                        driver.Delete(temp_out_file)
-                        driver = None
-
-                    self.set_progress += 10
-
-                    # Read the resulting raster to check if the interpolation was done correctly.
+                    # Check if the interpolation was done correctly.
                     # If some areas are interpolated between to zero values of shorelines (i.e. large areas were
                     # assigned zero values), the old values will used and rescaled below/above sea level
-                    raster_layer_ds = gdal.Open(self.out_file_path, gdalconst.GA_Update)
-                    topo_modified = raster_layer_ds.GetRasterBand(1).ReadAsArray()
-
                     array_to_rescale_bsl = topo_values_copied[np.isfinite(topo_values_copied) * (topo_modified == 0)
                                                               * (r_masks == 0) == 1]
 
@@ -172,7 +166,7 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
                         topo_modified[np.isfinite(topo_values_copied) * (topo_modified == 0) * (r_masks == 1) == 1] = \
                             modRescale(array_to_rescale_asl, 0.1, 5)
 
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
                     # Removing final artefacts from the sea and land. Some pixels that are close to the shoreline
                     # touch pixels on the other side of the shoreline and get wrong value during the interpolation
@@ -184,7 +178,7 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
                         topo_modified[(r_masks == 0) * (topo_modified > 0) * np.isfinite(topo_values_copied) == 1] \
                             = modRescale(data_to_fill_bsl, -5, -0.1)
 
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
                     # Pixel values of land that are bsl
                     data_to_fill_asl = topo_values_copied[(r_masks == 1) * (topo_modified < 0) *
@@ -193,93 +187,119 @@ class TaSetPaleoshorelines(TaBaseAlgorithm):
                         topo_modified[(r_masks == 1) * (topo_modified < 0) * np.isfinite(topo_values_copied) == 1] \
                             = modRescale(data_to_fill_asl, 0.1, 5)
 
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
                     # Still removing artifacts
                     topo_modified[(r_masks == 0) * (topo_modified > 0)] = np.nan
                     topo_modified[(r_masks == 1) * (topo_modified < 0)] = np.nan
 
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
-                    # Updating the raster with the modified values
-                    raster_layer_ds.GetRasterBand(1).WriteArray(topo_modified)
-                    raster_layer_ds = None
+                    # Writing the raster with the modified values
+                    writeRaster(self.params.output_path, topo_modified, geotransform, self.crs.toWkt())
 
-                    self.set_progress += 5
+                    self.feedback.progress += 5
 
                     self.feedback.info(
                         "The raster was modified successfully and saved at: <a href='file://{}'>{}</a>.".format(
-                            os.path.dirname(self.out_file_path), self.out_file_path))
+                            os.path.dirname(self.params.output_path), self.params.output_path))
 
-                    self.finished.emit(True, self.out_file_path)
-
-                    self.set_progress = 100
+                    self.feedback.progress = 100
+                    return self.params.output_path
 
                 else:
                     self.feedback.info("The plugin did not succeed because one or more parameters were set incorrectly.")
                     self.feedback.info("Please, check the log above.")
-                    self.finished.emit(False, "")
+                    return None
             else:
-                self.finished.emit(False, "")
+                return None
+
+
 
+        elif self.params.mode == "rescale":
+            topo_ds = None
+            # The raster is processed tile by tile in two passes: the first one finds the ranges of
+            # the values to rescale, the second one rescales them. Large rasters do not need to fit into memory.
+            bsl_range = [np.inf, -np.inf]
+            asl_range = [np.inf, -np.inf]
 
+            def landAndSeaMasks(window):
+                r_masks, _ = vectorToRasterWindow(vlayer, geotransform, ncols, nrows,
+                                                  no_data=0, window=window)
+                return r_masks
 
-        elif self.dlg.rescaleCheckBox.isChecked():
             if not self.killed:
                 try:
-                    r_masks = vectorToRaster(
-                        vlayer,
-                        geotransform,
-                        ncols,
-                        nrows,
-                        field_to_burn=None,
-                        no_data=0
-                        )
+                    for (topo,), window, inner in readRasterInTiles([topo_layer], bytes_per_pixel=12,
+                                                                        nodata_to_nan=False):
+                        if self.killed:
+                            break
+                        r_masks = landAndSeaMasks(window)
+                        # The bathymetry values that are above sea level
+                        to_rescale = topo[(r_masks == 0) * (topo > 0) == 1]
+                        if to_rescale.size > 0:
+                            bsl_range = [min(bsl_range[0], to_rescale.min()), max(bsl_range[1], to_rescale.max())]
+                        # The topography values that are below sea level
+                        to_rescale = topo[(r_masks == 1) * (topo < 0) == 1]
+                        if to_rescale.size > 0:
+                            asl_range = [min(asl_range[0], to_rescale.min()), max(asl_range[1], to_rescale.max())]
                 except Exception as e:
                     self.feedback.error(e)
                     self.kill()
-                # The bathymetry values that are above sea level are taken down below sea level
-                in_array = topo[(r_masks == 0) * (topo > 0) == 1]
-                topo[(r_masks == 0) * (topo > 0) == 1] = modRescale(in_array, max_depth, -0.1)
 
-                self.set_progress += 30
+                self.feedback.progress += 30
 
-            if not self.killed:
+            def rescaleTile(arrays, window):
+                topo = arrays[0]
+                r_masks = landAndSeaMasks(window)
+                # The bathymetry values that are above sea level are taken down below sea level
+                in_array = topo[(r_masks == 0) * (topo > 0) == 1]
+                if in_array.size > 0:
+                    topo[(r_masks == 0) * (topo > 0) == 1] = modRescale(in_array, max_depth, -0.1, *bsl_range)
                 # The topography values that are below sea level are taken up above sea level
                 in_array = topo[(r_masks == 1) * (topo < 0) == 1]
-                topo[(r_masks == 1) * (topo < 0) == 1] = modRescale(in_array, 0.1, max_elev)
-
-                self.set_progress += 30
+                if in_array.size > 0:
+                    topo[(r_masks == 1) * (topo < 0) == 1] = modRescale(in_array, 0.1, max_elev, *asl_range)
+                return topo
 
             if not self.killed:
-                # Check if raster was modified. If the x matrix was assigned.
-                if 'topo' in locals():
-
-                    driver = gdal.GetDriverByName('GTiff')
-                    if os.path.exists(self.out_file_path):
-                        driver.Delete(self.out_file_path)
-
-                    raster = driver.Create(self.out_file_path, ncols, nrows, 1, gdal.GDT_Float32)
-                    raster.SetGeoTransform(geotransform)
-                    raster.SetProjection(self.crs.toWkt())
-                    raster.GetRasterBand(1).WriteArray(topo)
-                    raster = None
+                try:
+                    processRasterInTiles([topo_layer], self.params.output_path, rescaleTile,
+                                         bytes_per_pixel=12,
+                                         projection=self.crs.toWkt(),
+                                         no_data_value=None,
+                                         nodata_to_nan=False,
+                                         feedback=self.feedback)
+                except Exception as e:
+                    self.feedback.error(e)
+                    self.kill()
 
-                    self.set_progress += 10
+                self.feedback.progress += 40
 
-                    self.feedback.info(
-                        "The raster was modified successfully and saved at: <a\
-                        href='file://{}/'>{}</a>.".format(
-                            os.path.dirname(self.out_file_path), self.out_file_path))
+            if not self.killed:
+                self.feedback.info(
+                    "The raster was modified successfully and saved at: <a\
+                    href='file://{}/'>{}</a>.".format(
+                        os.path.dirname(self.params.output_path), self.params.output_path))
 
-                    self.finished.emit(True, self.out_file_path)
+                self.feedback.progress = 100
+                return self.params.output_path
+            else:
+                return None
 
-                    self.set_progress = 100
 
-                else:
-                    self.feedback.info("The plugin did not succeed because one or more parameters were set incorrectly.")
-                    self.feedback.info("Please, check the log above.")
-                    self.finished.emit(False, "")
-            else:
-                self.finished.emit(False, "")
+class TaSetPaleoshorelines(TaSetPaleoshorelinesEngine, TaBaseAlgorithm):
 
+    def run(self):
+        self.params = TaSetPaleoshorelinesParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            mask_layer=self.dlg.masksBox.currentLayer(),
+            output_path=self.out_file_path,
+            mode="interpolate" if self.dlg.interpolateCheckBox.isChecked() else "rescale",
+            max_elev=self.dlg.maxElevSpinBox.value(),
+            max_depth=self.dlg.maxDepthSpinBox.value())
+        out_file_path = self.setPaleoshorelines()
+        if out_file_path:
+            self.finished.emit(True, out_file_path)
+        else:
+            self.finished.emit(False, "")
@@ -6,9 +6,9 @@ from .base_algorithm import TaBaseAlgorithm
 from.utils import (
     vectorToRaster,
     fillNoData,
+    fillNoDataInArray,
     fillNoDataInPolygon,
     setRasterSymbology,
-    TaProgressImitation,
     smoothArrayWithWrapping,
     polygonsToPolylines,
     modRescale,
@@ -16,9 +16,24 @@ from.utils import (
     rasterSmoothing,
     rasterSmoothingInPolygon,
     convertAgeToDepth,
-    partitionIntoPlates
+    partitionIntoPlates,
+    TaWindowRasterizer,
+    TaFeatureRasterizer,
+    toRasterLayer,
+    toVectorLayer,
+    featureValue
 )
 from .cache_manager import cache_manager
+from .raster_io import asFloat32, processRasterInTiles
+from .parameters import (
+    TaFillGapsParameters,
+    TaCopyPasteRasterParameters,
+    TaSmoothRasterParameters,
+    TaIsostaticCompensationParameters,
+    TaSetSeaLevelParameters,
+    TaCalculateBathymetryParameters,
+    TaAssignPlateIdsParameters
+)
 
 from qgis.core import (
     QgsVectorLayer,
@@ -33,131 +48,94 @@ import numpy as np
 from osgeo import gdal, gdalconst
 from PyQt5 import QtCore
 
-class TaStandardProcessing(TaBaseAlgorithm):
-
-    def __init__(self, dlg):
-        super().__init__(dlg)
-        self.getParameters()
-        self.dlg.dialog_name_changed.connect(self.getParameters)
-
-    def getParameters(self):
-        self.processing_type = self.dlg.processingTypeBox.currentText()
-
-        processing_alg_names = [("Fill gaps", "TaFillGaps"),
-                                ("Copy/Paste raster", "TaCopyPasteRaster"),
-                                ("Smooth raster", "TaSmoothRaster"),
-                                ("Isostatic compensation",
-                                 "TaIsostaticCompensation"),
-                                ("Set new sea level", "TaSetSeaLevel"),
-                                ("Calculate bathymetry", "TaCalculateBathymetry"),
-                                ("Change map symbology", "TaChangeMapSymbology"),
-                                ("Assign plate IDs", "TaAssignPlateIDs")]
-        for alg, name in processing_alg_names:
-            if alg == self.processing_type:
-                self.setName(name)
-
-    def run(self):
-        self.getParameters()
-        if self.processing_type == "Fill gaps":
-            self.fillGaps()
-        elif self.processing_type == "Copy/Paste raster":
-            self.copyPasteRaster()
-        elif self.processing_type == "Smooth raster":
-            self.smoothRaster()
-        elif self.processing_type == "Isostatic compensation":
-            self.isostaticCompensation()
-        elif self.processing_type == "Set new sea level":
-            self.setSeaLevel()
-        elif self.processing_type == "Calculate bathymetry":
-            self.calculateBathymetry()
-        elif self.processing_type == "Change map symbology":
-            self.changeMapSymbology()
-        elif self.processing_type == "Assign plate IDs":
-            self.assignPlateIDs()
-
-    def fillGaps(self):
+class TaStandardProcessingEngine:
+    """
+    Standard processing of rasters, with the parameters of self.params: gap filling (TaFillGapsParameters),
+    copying values between rasters (TaCopyPasteRasterParameters), smoothing (TaSmoothRasterParameters),
+    isostatic compensation (TaIsostaticCompensationParameters), sea level change (TaSetSeaLevelParameters),
+    bathymetry from ocean floor age (TaCalculateBathymetryParameters) and plate ID assignment
+    (TaAssignPlateIdsParameters).
+
+    The class that inherits it provides the feedback, the crs and the cancellation: TaStandardProcessing in
+    the plugin, api.TaHeadlessAlgorithm in scripts.
+    """
+    params = None
+
+    def fillRasterGaps(self):
+        """
+        Fills the gaps of the input raster and smoothes the result if a smoothing type is set.
+
+        :return: The path of the output raster, or None if filling the gaps failed or was canceled.
+        :rtype: str.
+        """
         if not self.killed:
-            base_raster_layer = self.dlg.baseTopoBox.currentLayer()
+            base_raster_layer = toRasterLayer(self.params.input_raster)
+            mask_layer = toVectorLayer(self.params.mask_layer) if self.params.mask_layer else None
+            out_file_path = self.params.output_path
             self.feedback.info("Filling the gaps in {}".format(
                 base_raster_layer.name()))
-            if self.dlg.fillingTypeBox.currentText() == "Interpolation":
-                self.feedback.info(
-                    "Inverse Distance Weighting Interpolation method is used.")
-                if all([self.dlg.interpInsidePolygonCheckBox.isChecked(),
-                        self.dlg.masksBox.currentLayer()]):
-                    mask_layer = self.dlg.masksBox.currentLayer()
-                    interpolated_raster = fillNoDataInPolygon(
-                        base_raster_layer, mask_layer, self.out_file_path)
+            try:
+                if self.params.filling_type == "interpolation":
+                    if self.params.method == "native":
+                        self.feedback.info(
+                            "Nearest neighbour interpolation with relaxation is used.")
+                    else:
+                        self.feedback.info(
+                            "Inverse Distance Weighting Interpolation method is used.")
+                    if mask_layer:
+                        fillNoDataInPolygon(base_raster_layer, mask_layer, out_file_path,
+                                            method=self.params.method)
+                    else:
+                        fillNoData(base_raster_layer, out_file_path, method=self.params.method)
+                    self.feedback.info("Interpolation finished.")
                 else:
-                    interpolated_raster = fillNoData(
-                        base_raster_layer, self.out_file_path)
-                self.feedback.info("Interpolation finished.")
-            elif self.dlg.fillingTypeBox.currentText() == "Fixed value":
-                mask_layer = None
-                value_to_fill = self.dlg.fillingValueSpinBox.value()
-                if all([self.dlg.interpInsidePolygonCheckBox.isChecked(),
-                        self.dlg.masksBox.currentLayer()]):
-                    mask_layer = self.dlg.masksBox.currentLayer()
-                try:
-                    interpolated_raster = fillNoDataWithAFixedValue(base_raster_layer,
-                                                                    value_to_fill,
-                                                                    mask_layer,
-                                                                    self.out_file_path
-                                                                    )
-                except Exception as e:
-                    self.feedback.warning(
-                        "Filling gaps failed due to the following error:")
-                    self.feedback.warning(f"{e}")
+                    fillNoDataWithAFixedValue(base_raster_layer,
+                                              self.params.fill_value,
+                                              mask_layer,
+                                              out_file_path
+                                              )
+            except Exception as e:
+                self.feedback.error(
+                    "Filling gaps failed due to the following error:")
+                self.feedback.error(f"{e}")
+                self.kill()
 
-            if self.dlg.smoothingBox.isChecked():
+            if self.params.smoothing_type:
                 self.feedback.progress += 20
             else:
                 self.feedback.progress += 40
 
-        if not self.killed:
-
-            if self.dlg.smoothingBox.isChecked():
-                self.feedback.info("Smoothing the interpolated raster.")
-                # Get the layer for smoothing
-                interpolated_raster_layer = QgsRasterLayer(
-                    interpolated_raster, 'Interpolated DEM', 'gdal')
+        if self.killed:
+            return None
 
-                # Get smoothing factor
-                sm_factor = self.dlg.smFactorSpinBox.value()
-                sm_type = self.dlg.smoothingTypeBox.currentText()
-
-                # Smooth the raster
-                if self.dlg.interpInsidePolygonCheckBox.isChecked():
-                    rasterSmoothing(interpolated_raster_layer, sm_type, sm_factor, mask_layer, feedback=self.feedback,
-                                    runtime_percentage=68)
-                else:
-                    rasterSmoothing(interpolated_raster_layer, sm_type, sm_factor, feedback=self.feedback,
-                                    runtime_percentage=68)
+        if self.params.smoothing_type:
+            self.feedback.info("Smoothing the interpolated raster.")
+            # Get the layer for smoothing
+            interpolated_raster_layer = QgsRasterLayer(
+                out_file_path, 'Interpolated DEM', 'gdal')
 
-                self.feedback.info("Smoothing has finished.")
+            # Smooth the raster
+            rasterSmoothing(interpolated_raster_layer, self.params.smoothing_type, self.params.smoothing_factor,
+                            mask_layer, feedback=self.feedback, runtime_percentage=68)
 
-                self.feedback.progress = 100
-                self.finished.emit(True, self.out_file_path)
+            self.feedback.info("Smoothing has finished.")
 
-            else:
-                self.feedback.progress = 100
-                self.finished.emit(True, self.out_file_path)
-        else:
-            self.finished.emit(False, "")
+        self.feedback.progress = 100
+        return out_file_path
 
-    def copyPasteRaster(self):
+    def pasteRasterValues(self):
         if not self.killed:
             # Get a raster layer to copy the elevation values FROM
-            from_raster_layer = self.dlg.copyFromRasterBox.currentLayer()
+            from_raster_layer = toRasterLayer(self.params.source_raster)
             from_raster = gdal.Open(
                 from_raster_layer.dataProvider().dataSourceUri())
-            from_array = from_raster.GetRasterBand(1).ReadAsArray()
+            from_array = asFloat32(from_raster.GetRasterBand(1).ReadAsArray())
         if not self.killed:
             # Get a raster layer to copy the elevation values TO
-            to_raster_layer = self.dlg.baseTopoBox.currentLayer()
+            to_raster_layer = toRasterLayer(self.params.input_raster)
             to_raster = gdal.Open(
                 to_raster_layer.dataProvider().dataSourceUri())
-            to_array = to_raster.GetRasterBand(1).ReadAsArray()
+            to_array = asFloat32(to_raster.GetRasterBand(1).ReadAsArray())
         self.feedback.progress += 20
 
         if not self.killed:
@@ -165,17 +143,18 @@ class TaStandardProcessing(TaBaseAlgorithm):
                                                                                              to_raster_layer.name()))
         if not self.killed:
             # Get a vector containing masks
-            if self.dlg.copyPasteSelectedFeaturesOnlyCheckBox.isChecked():
-                features = self.dlg.copyFromMaskBox.currentLayer().getSelectedFeatures()
-                fields = self.dlg.copyFromMaskBox.currentLayer().fields().toList()
-                layer_name = self.dlg.copyFromMaskBox.currentLayer().name()
+            mask_layer = toVectorLayer(self.params.mask_layer)
+            if self.params.selected_features_only:
+                features = mask_layer.getSelectedFeatures()
+                fields = mask_layer.fields().toList()
+                layer_name = mask_layer.name()
                 mask_vector_layer = QgsVectorLayer(
                     f"Polygon?crs={self.crs.authid()}", layer_name, "memory")
                 mask_vector_layer.dataProvider().addAttributes(fields)
                 mask_vector_layer.updateFields()
                 mask_vector_layer.dataProvider().addFeatures(features)
             else:
-                mask_vector_layer = self.dlg.copyFromMaskBox.currentLayer()
+                mask_vector_layer = mask_layer
 
             self.feedback.info("{} layer is used for masking the pixels to be copied.".format(
                 mask_vector_layer.name()))
@@ -205,7 +184,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
             self.feedback.info("Saving the resulting raster.")
             # Create a new raster for the result
             output_raster = gdal.GetDriverByName('GTiff').Create(
-                self.out_file_path, ncols, nrows, 1, gdal.GDT_Float32)
+                self.params.output_path, ncols, nrows, 1, gdal.GDT_Float32)
             output_raster.SetGeoTransform(geotransform)
             output_raster.SetProjection(self.crs.toWkt())
             output_band = output_raster.GetRasterBand(1)
@@ -215,27 +194,27 @@ class TaStandardProcessing(TaBaseAlgorithm):
             output_raster = None
 
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
+            return self.params.output_path
         else:
-            self.finished.emit(False, "")
+            return None
 
-    def smoothRaster(self):
+    def smoothRasterValues(self):
         if not self.killed:
-            raster_to_smooth_layer = self.dlg.baseTopoBox.currentLayer()
+            raster_to_smooth_layer = toRasterLayer(self.params.input_raster)
             raster_to_smooth_ds = gdal.Open(raster_to_smooth_layer.source())
             self.feedback.info(
                 "Smoothing toporaphy in the {} raster layer.".format(raster_to_smooth_layer))
-            smoothing_type = self.dlg.smoothingTypeBox2.currentText()
+            smoothing_type = self.params.smoothing_type
             self.feedback.info(
                 "Using {} for smoothing the elevation/bathymetry values.".format(smoothing_type))
 
         if not self.killed:
-            in_array = raster_to_smooth_ds.GetRasterBand(1).ReadAsArray()
+            in_array = asFloat32(raster_to_smooth_ds.GetRasterBand(1).ReadAsArray())
 
             # Check if data contains NaN values. If it contains, interpolate values for them first
             # If the pixels with NaN values are left empty they will cause part of the smoothed raster to get empty.
             # Gaussian filter removes all values under the kernel, which contain at least one NaN ValueError
-            nan_mask = np.zeros(in_array.shape)
+            nan_mask = np.zeros(in_array.shape, dtype=bool)
             no_data_value = raster_to_smooth_ds.GetRasterBand(
                 1).GetNoDataValue()
             # if the no_data_value is np.nan, band.GetNoDataValue returns nan,
@@ -247,27 +226,30 @@ class TaStandardProcessing(TaBaseAlgorithm):
 
             if np.isnan(in_array).any():
                 nan_mask[np.isnan(in_array)] = 1
-                filled_raster = fillNoData(raster_to_smooth_layer)
-                raster_to_smooth_ds = gdal.Open(
-                    filled_raster, gdalconst.GA_ReadOnly)
-                in_array = raster_to_smooth_ds.GetRasterBand(1).ReadAsArray()
+                in_array = fillNoDataInArray(in_array)
 
         if not self.killed:
             in_raster_extent = raster_to_smooth_layer.extent()
             xres = raster_to_smooth_layer.rasterUnitsPerPixelX()
             yres = raster_to_smooth_layer.rasterUnitsPerPixelY()
         if not self.killed:
-            if self.dlg.smoothInPolygonCheckBox.isChecked():
-                mask_layer = self.dlg.smoothingMaskBox.currentLayer()
+            if self.params.mask_layer:
+                mask_layer = toVectorLayer(self.params.mask_layer)
                 self.context = self.getExpressionContext(mask_layer)
-                if self.dlg.smoothInSelectedFeaturesOnlyCheckBox.isChecked():
-                    features = mask_layer.getSelectedFeatures()
+                if self.params.selected_features_only:
+                    features = list(mask_layer.getSelectedFeatures())
                     progress_unit = 100/mask_layer.selectedFeatureCount()
                 else:
-                    features = mask_layer.getFeatures()
+                    features = list(mask_layer.getFeatures())
                     progress_unit = 100/mask_layer.featureCount()
 
-                for feature in features:
+                # Rasterize all the mask polygons at once
+                rasterizer = TaFeatureRasterizer(features,
+                                                 raster_to_smooth_ds.GetGeoTransform(),
+                                                 in_array.shape[1],
+                                                 in_array.shape[0])
+
+                for index, feature in enumerate(features):
                     if self.killed:
                         break
                     try:
@@ -284,14 +266,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
                     self.context.setFeature(feature)
 
                     # Retrieve the smoothing factor for the feature
-                    smoothing_factor, ok = self.dlg.smFactorSpinBox2.overrideButton.toProperty(
-                    ).valueAsInt(self.context)
-                    if not ok:
-                        smoothing_factor = self.dlg.smFactorSpinBox2.spinBox.value()
-                        self.feedback.warning(
-                            f"Mask polygon {feature.id()} has no smoothing factor.")
-                        self.feedback.warning(
-                            "Therefore default smoothing value will be used.")
+                    smoothing_factor = featureValue(self.params.smoothing_factor, self.context, as_int=True)
                     self.feedback.info(
                         f"Smoothing factor: {smoothing_factor}.")
 
@@ -366,16 +341,9 @@ class TaStandardProcessing(TaBaseAlgorithm):
                     else:
                         xmax = xoff+win_xsize
 
-                    # convert mask feature polygon into an array mask
-                    geotransform = (xoff*xres-180-(xres/2), xres,
-                                    0, 90-(yoff*yres)+(yres/2), 0, (yres*-1))
-                    feature_layer = QgsVectorLayer(
-                        "Polygon?crs={self.crs.authid()}", "Smoothing mask layer", "memory")
-                    feature_layer.dataProvider().addAttributes(mask_layer.fields())
-                    feature_layer.updateFields()
-                    feature_layer.dataProvider().addFeature(feature)
-                    mask_array = vectorToRaster(
-                        feature_layer, geotransform, win_xsize, win_ysize, feedback=self.feedback)
+                    # Get the mask of the feature polygon within the subset array
+                    mask_array, _ = rasterizer.mask(
+                        index, (slice(yoff, ymax), slice(xoff, xmax)))
 
                     # Check if the subset array lies at the left or right edges and that the raster is a global one
                     # If so, the subset raster will be extended by wrapping around the edges
@@ -419,13 +387,13 @@ class TaStandardProcessing(TaBaseAlgorithm):
                 # Write the smoothed raster
                 # If the out_file argument is specified the smoothed raster will written in a new raster, otherwise the old raster will be updated
                 try:
-                    if os.path.exists(self.out_file_path):
+                    if os.path.exists(self.params.output_path):
                         driver = gdal.GetDriverByName('GTiff')
-                        driver.Delete(self.out_file_path)
+                        driver.Delete(self.params.output_path)
                 except Exception as e:
                     self.feedback.error(e)
 
-                smoothed_raster = gdal.GetDriverByName('GTiff').Create(self.out_file_path, in_array.shape[1],
+                smoothed_raster = gdal.GetDriverByName('GTiff').Create(self.params.output_path, in_array.shape[1],
                                                                        in_array.shape[0], 1, gdal.GDT_Float32)
                 smoothed_raster.SetGeoTransform(
                     raster_to_smooth_ds.GetGeoTransform())
@@ -441,7 +409,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
 
             else:
                 try:
-                    smoothing_factor = self.dlg.smFactorSpinBox2.spinBox.value()
+                    smoothing_factor = self.params.smoothing_factor.value
                     # check if the raster is global
                     if in_raster_extent.xMinimum() < (-179.95) and in_raster_extent.xMaximum() >= 179.95:
                         smoothing_mode = 'wrap'
@@ -449,15 +417,15 @@ class TaStandardProcessing(TaBaseAlgorithm):
                         smoothing_mode = 'reflect'
 
                     smoothed_raster_layer = rasterSmoothing(raster_to_smooth_layer, smoothing_type, smoothing_factor,
-                                                            smoothing_mode=smoothing_mode, out_file=self.out_file_path,
+                                                            smoothing_mode=smoothing_mode, out_file=self.params.output_path,
                                                             feedback=self.feedback)
                 except Exception as e:
                     self.feedback.warning(e)
 
             if not self.killed:
                 # Set paleoshorelines fixed
-                if self.dlg.fixedPaleoShorelinesCheckBox.isChecked() and self.dlg.paleoshorelinesMask.currentLayer():
-                    pls_vlayer = self.dlg.paleoshorelinesMask.currentLayer()
+                if self.params.paleoshorelines_layer:
+                    pls_vlayer = toVectorLayer(self.params.paleoshorelines_layer)
                     shorelines = polygonsToPolylines(pls_vlayer)
                     shorelines_array = vectorToRaster(shorelines,
                                                       raster_to_smooth_ds.GetGeoTransform(),
@@ -468,11 +436,11 @@ class TaStandardProcessing(TaBaseAlgorithm):
                                                            raster_to_smooth_ds.RasterXSize,
                                                            raster_to_smooth_ds.RasterYSize)
                     smoothed_raster = gdal.Open(
-                        self.out_file_path, gdalconst.GA_Update)
+                        self.params.output_path, gdalconst.GA_Update)
                     smoothed_array = smoothed_raster.GetRasterBand(
                         1).ReadAsArray()
                     # map NoData values to reset them after interpolation
-                    nan_mask = np.zeros(smoothed_array.shape, dtype=np.int8)
+                    nan_mask = np.zeros(smoothed_array.shape, dtype=bool)
                     nan_mask[np.isnan(smoothed_array)] = 1
                     # set paleoshorelines
                     smoothed_array[shorelines_array == 1] = 0
@@ -480,21 +448,13 @@ class TaStandardProcessing(TaBaseAlgorithm):
                                    * (smoothed_array < 0) == 1] = np.nan
                     smoothed_array[(shorelines_mask_array != 1)
                                    * (smoothed_array > 0) == 1] = np.nan
-                    smoothed_raster.GetRasterBand(1).WriteArray(smoothed_array)
-                    smoothed_array = None
                     shorelines_array = None
-                    smoothed_raster = None
                     # fill the resulting gaps
-                    layer_to_fill = QgsRasterLayer(
-                        self.out_file_path, "Smoothed raster", "gdal")
-                    self.out_file_path = fillNoData(
-                        layer_to_fill, self.out_file_path)
+                    final_array = fillNoDataInArray(smoothed_array)
+                    smoothed_array = None
                     # Make sure that values close to the shorelnes are interpolated correctly
                     # Pixels in touch with the shorelines can get wrong value if they diagonally touch
                     # any pixel on the other side of the shoreline
-                    final_raster = gdal.Open(
-                        self.out_file_path, gdalconst.GA_Update)
-                    final_array = final_raster.GetRasterBand(1).ReadAsArray()
                     array_to_rescale_asl = final_array[(
                         shorelines_mask_array == 1)*(final_array < 0) == 1]
                     rescaled = modRescale(array_to_rescale_asl, 0.1, 5)
@@ -506,28 +466,25 @@ class TaStandardProcessing(TaBaseAlgorithm):
                     final_array[(shorelines_mask_array != 1) *
                                 (final_array >= 0) == 1] = rescaled
                     final_array[nan_mask == 1] = np.nan
-                    final_raster.GetRasterBand(1).WriteArray(final_array)
+                    smoothed_raster.GetRasterBand(1).WriteArray(final_array)
+                    smoothed_raster = None
                     final_array = None
                     shorelines_mask_array = None
             else:
-                self.finished.emit(False, "")
+                return None
 
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
-        else:
-            self.finished.emit(False, "")
+            return self.params.output_path
+        return None
 
-    def isostaticCompensation(self):
+    def compensateIsostasy(self):
 
         self.feedback.info(
             "Correcting topography for ice load in Greenland and Antarctic...")
         # Get the bedrock topography raster
         if not self.killed:
             try:
-                topo_br_layer = self.dlg.baseTopoBox.currentLayer()
-                topo_br_ds = gdal.Open(
-                    topo_br_layer.dataProvider().dataSourceUri())
-                topo_br_data = topo_br_ds.GetRasterBand(1).ReadAsArray()
+                topo_br_layer = toRasterLayer(self.params.input_raster)
                 assert topo_br_layer, "The Berock topography raster layer is not loaded properly."
                 assert topo_br_layer.isValid(), "The Bedrock topography raster layer is not valid."
             except Exception as e:
@@ -542,10 +499,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
         if not self.killed:
             # Get the ice surface topography raster
             try:
-                topo_ice_layer = self.dlg.selectIceTopoBox.currentLayer()
-                topo_ice_ds = gdal.Open(
-                    topo_ice_layer.dataProvider().dataSourceUri())
-                topo_ice_data = topo_ice_ds.GetRasterBand(1).ReadAsArray()
+                topo_ice_layer = toRasterLayer(self.params.ice_raster)
                 assert topo_ice_layer, "The Ice topography raster layer is not loaded properly."
                 assert topo_ice_layer.isValid(), "The Ice topography raster layer is not valid."
             except Exception as e:
@@ -557,11 +511,11 @@ class TaStandardProcessing(TaBaseAlgorithm):
                     "Ice topography raster layer: {}.".format(topo_ice_layer.name()))
                 self.feedback.progress += 5
 
-        if self.dlg.isostatMaskBox.currentLayer():
+        if self.params.mask_layer:
             if not self.killed:
                 # Get the masks
                 try:
-                    vlayer = self.dlg.isostatMaskBox.currentLayer()
+                    vlayer = toVectorLayer(self.params.mask_layer)
                     assert vlayer is not None, "The Mask vector layer is not loaded properly."
                     assert vlayer.isValid(), "The Mask vector layer is not valid."
                     assert vlayer.featureCount() > 0, "The selected mask vector layer is empty."
@@ -574,7 +528,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
                         "Mask vector layer: {}.".format(vlayer.name()))
                     self.feedback.progress += 5
 
-            if self.dlg.masksFromCoastCheckBox.isChecked():
+            if self.params.polar_regions_only:
                 if not self.killed:
                     self.feedback.info(
                         "Retrieving the masks with the following names (case insensitive): ")
@@ -650,22 +604,11 @@ class TaStandardProcessing(TaBaseAlgorithm):
                         temp_layer = vlayer
 
                 if not self.killed:
-                    self.feedback.info("Rasterizing exrtacted masks.")
-                    # Rasterize extracted masks
-                    geotransform = topo_br_ds.GetGeoTransform()
-                    nrows, ncols = np.shape(topo_br_data)
-                    r_masks = vectorToRaster(
-                        temp_layer,
-                        geotransform,
-                        ncols,
-                        nrows,
-                        field_to_burn=None,
-                        no_data=0
-                    )
-
+                    # Extracted masks are rasterized tile by tile below
+                    mask_layer = temp_layer
                     self.feedback.progress += 10
 
-            elif self.dlg.isostatMaskSelectedFeaturesCheckBox.isChecked():
+            elif self.params.selected_features_only:
                 features = list(vlayer.getSelectedFeatures())
                 assert any(
                     True for _ in features), "No features with the above names are found in the input mask layer"
@@ -678,137 +621,97 @@ class TaStandardProcessing(TaBaseAlgorithm):
                 temp_prov.addFeatures(features)
                 temp_prov = None
                 if not self.killed:
-                    geotransform = topo_br_ds.GetGeoTransform()
-                    nrows, ncols = np.shape(topo_br_data)
-                    self.feedback.info("Rasterizing the masks.")
-                    r_masks = vectorToRaster(
-                        temp_layer,
-                        geotransform,
-                        ncols,
-                        nrows,
-                        field_to_burn=None,
-                        no_data=0
-                    )
-                    self.feedback.progress += 30
+                    mask_layer = temp_layer
+                    self.feedback.progress += 10
 
             else:
                 if not self.killed:
-                    geotransform = topo_br_ds.GetGeoTransform()
-                    nrows, ncols = np.shape(topo_br_data)
-                    self.feedback.info("Rasterizing the masks.")
-                    r_masks = vectorToRaster(
-                        vlayer,
-                        geotransform,
-                        ncols,
-                        nrows,
-                        field_to_burn=None,
-                        no_data=0
-                    )
-
-                    self.feedback.progress += 30
+                    mask_layer = vlayer
+                    self.feedback.progress += 10
         else:
-            r_masks = None
+            mask_layer = None
 
         if not self.killed:
             # Compensate for ice load
             self.feedback.info("Compensating for ice load.")
             # the amount of ice that needs to be removed.
-            rem_amount = self.dlg.iceAmountSpinBox.value()
-            if r_masks is not None:
-                comp_factor = 0.3 * \
-                    (topo_ice_data[r_masks == 1] -
-                     topo_br_data[r_masks == 1]) * rem_amount / 100
-                comp_factor[np.isnan(comp_factor)] = 0
-                comp_factor[comp_factor < 0] = 0
-                topo_br_data[r_masks ==
-                             1] = topo_br_data[r_masks == 1] + comp_factor
-            else:
-                comp_factor = 0.3 * \
-                    (topo_ice_data - topo_br_data) * rem_amount / 100
+            rem_amount = self.params.ice_amount
+            topo_br_ds = gdal.Open(topo_br_layer.dataProvider().dataSourceUri())
+            geotransform = topo_br_ds.GetGeoTransform()
+            topo_br_ds = None
+            # The mask features are copied into an OGR layer once, and only rasterized for each tile
+            mask_rasterizer = TaWindowRasterizer(mask_layer, geotransform, no_data=0) if mask_layer else None
+
+            def compensateIceLoad(arrays, window):
+                # NoData cells of the inputs are read as NaN. NoData cells of the bedrock topography
+                # stay NoData in the output, and NoData cells of the ice topography are not compensated.
+                topo_br_data, topo_ice_data = arrays
+                comp_factor = 0.3 * (topo_ice_data - topo_br_data) * rem_amount / 100
                 comp_factor[np.isnan(comp_factor)] = 0
                 comp_factor[comp_factor < 0] = 0
-                topo_br_data = topo_br_data + comp_factor
+                if mask_rasterizer is not None:
+                    comp_factor[mask_rasterizer.rasterize(window) != 1] = 0
+                return topo_br_data + comp_factor
 
-            self.feedback.progress += 30
-        if not self.killed:
-            # Create a new raster for the result
+            # The rasters are processed tile by tile to bound the memory used
             self.feedback.info("Saving the resulting layer.")
-            geotransform = topo_br_ds.GetGeoTransform()
-            nrows, ncols = np.shape(topo_br_data)
-            output_raster = gdal.GetDriverByName('GTiff').Create(
-                self.out_file_path, ncols, nrows, 1, gdal.GDT_Float32)
-            output_raster.SetGeoTransform(geotransform)
-            output_raster.SetProjection(self.crs.toWkt())
-            output_band = output_raster.GetRasterBand(1)
-            output_band.SetNoDataValue(np.nan)
-            output_band.WriteArray(topo_br_data)
-            output_band.FlushCache()
-            output_raster = None
+            try:
+                processRasterInTiles([topo_br_layer, topo_ice_layer], self.params.output_path,
+                                     compensateIceLoad,
+                                     bytes_per_pixel=20,
+                                     projection=self.crs.toWkt(),
+                                     feedback=self.feedback,
+                                     runtime_percentage=50)
+            except Exception as e:
+                self.feedback.error(e)
+                self.kill()
 
+        if not self.killed:
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
+            return self.params.output_path
         else:
-            self.finished.emit(False, "")
+            return None
 
-    def setSeaLevel(self):
-        progress = TaProgressImitation(100, 100, self.feedback)
-        progress.start()
+    def changeSeaLevel(self):
         if not self.killed:
-            topo_layer = self.dlg.baseTopoBox.currentLayer()
-            shiftAmount = self.dlg.seaLevelShiftBox.value()
+            topo_layer = toRasterLayer(self.params.input_raster)
+            shiftAmount = self.params.shift
             self.feedback.info("Setting new sea level...")
             self.feedback.info("The sea level will be "
                                f"{'raised' if shiftAmount>=0 else 'lowered'}"
                                f" by  {np.abs(shiftAmount)} meters.")
-            try:
-                topo_ds = gdal.Open(topo_layer.source())
-                input_topo_array = topo_ds.GetRasterBand(1).ReadAsArray()
-            except Exception as e:
-                self.feedback.error(
-                    f"Could not load the input raster layer {topo_layer.name()} properly.")
-                self.feedback.error(f"Following error occured: {e}.")
-                self.kill()
-        if not self.killed:
-            try:
-                modified_topo_array = np.empty(input_topo_array.shape)
-                modified_topo_array[:] = np.nan
-                modified_topo_array[np.isfinite(input_topo_array)] = input_topo_array[np.isfinite(
-                    input_topo_array)] - shiftAmount
-            except Exception as e:
-                self.feedback.warning(e)
-        if not self.killed:
-            nrows, ncols = input_topo_array.shape
-            geotransform = topo_ds.GetGeoTransform()
+
+            def shiftSeaLevel(arrays, window):
+                # NoData cells of the input are read as NaN, so they stay NoData in the output
+                # instead of being shifted like elevations
+                return arrays[0] - shiftAmount
 
             try:
-                raster = gdal.GetDriverByName('GTiff').Create(
-                    self.out_file_path, ncols, nrows, 1, gdal.GDT_Float32)
-                raster.SetGeoTransform(geotransform)
-                raster.SetProjection(self.crs.toWkt())
-                raster.GetRasterBand(1).WriteArray(modified_topo_array)
-                raster.GetRasterBand(1).SetNoDataValue(np.nan)
-                raster = None
+                # The raster is processed tile by tile to bound the memory used
+                processRasterInTiles([topo_layer], self.params.output_path, shiftSeaLevel,
+                                     bytes_per_pixel=8,
+                                     projection=self.crs.toWkt(),
+                                     feedback=self.feedback,
+                                     runtime_percentage=90)
             except Exception as e:
                 self.feedback.error(
-                    "Could not write the result to the output file.")
+                    f"Could not set the new sea level for the raster layer {topo_layer.name()}.")
                 self.feedback.error(f"Following error occured: {e}.")
                 self.kill()
 
         if not self.killed:
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
+            return self.params.output_path
         else:
-            self.finished.emit(False, '')
+            return None
 
-    def calculateBathymetry(self):
+    def ageToBathymetry(self):
         """Calculates ocean depth from its age."""
         if not self.killed:
-            age_layer = self.dlg.baseTopoBox.currentLayer()
+            age_layer = toRasterLayer(self.params.input_raster)
 
-            age_raster = gdal.Open(age_layer.dataProvider().dataSourceUri())
-            ocean_age = age_raster.GetRasterBand(1).ReadAsArray()
-            reconstruction_time = self.dlg.reconstructionTime.value()
-            age_raster_time = self.dlg.ageRasterTime.value()
+            reconstruction_time = self.params.reconstruction_time
+            age_raster_time = self.params.age_raster_time
             self.feedback.info("Calculating ocean depth from its age.")
             self.feedback.info(f"Input layer: {age_layer.name()}.")
             self.feedback.info(
@@ -816,23 +719,17 @@ class TaStandardProcessing(TaBaseAlgorithm):
             self.feedback.progress += 10
 
         if not self.killed:
-            ocean_depth = convertAgeToDepth(ocean_age, reconstruction_time, age_raster_time)
-            self.feedback.progress += 50
-        
-        if not self.killed:
-            nrows, ncols = ocean_depth.shape
-            geotransform = age_raster.GetGeoTransform()
+            def ageToDepth(arrays, window):
+                # NoData cells of the input are read as NaN, so they are not converted as ages
+                return convertAgeToDepth(arrays[0], reconstruction_time, age_raster_time)
 
             try:
-                raster = gdal.GetDriverByName('GTiff').Create(
-                    self.out_file_path, ncols, nrows, 1, gdal.GDT_Float32)
-                raster.SetGeoTransform(geotransform)
-                raster.SetProjection(self.crs.toWkt())
-                raster.GetRasterBand(1).WriteArray(ocean_depth)
-                raster.GetRasterBand(1).SetNoDataValue(np.nan)
-                raster.GetRasterBand(1).FlushCache()
-                raster = None
-                self.feedback.progress += 30
+                # The raster is processed tile by tile to bound the memory used
+                processRasterInTiles([age_layer], self.params.output_path, ageToDepth,
+                                     bytes_per_pixel=24,
+                                     projection=self.crs.toWkt(),
+                                     feedback=self.feedback,
+                                     runtime_percentage=80)
             except Exception as e:
                 self.feedback.error(
                     "Could not write the result to the output file.")
@@ -841,43 +738,22 @@ class TaStandardProcessing(TaBaseAlgorithm):
 
         if not self.killed:
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
+            return self.params.output_path
         else:
-            self.finished.emit(False, '')
-
-    def changeMapSymbology(self):
-        layer = self.dlg.baseTopoBox.currentLayer()
-        self.feedback.info(f"Changing map symbology for layer {layer.name()}.")
-        color_ramp_name = self.dlg.colorPalette.currentText()
+            return None
 
-        self.feedback.info(f"Color ramp selected: {color_ramp_name}")
-        try:
-            setRasterSymbology(layer, color_ramp_name)
-            self.feedback.info("Map symbology changed successfully.")
-            self.finished.emit(True, '')
-            # This is not a proper algorithm that processes much data
-            # Therefore we can close it after it is finished
-            # But closing it will delete a refernce to it and the finish event triggered above
-            # will not able to run properly. Therefore we hide it.
-            # self.dlg.hide()
-        except Exception as e:
-            self.feedback.warning(
-                f"Changing map symbology failed due to the following exception: {e}")
-            self.finished.emit(False, '')
-
-    def assignPlateIDs(self):
+    def partitionFeaturesIntoPlates(self):
         """Assigns plate IDs to features using pygplates.partition_into_plates."""
         if not self.killed:
-            input_layer = self.dlg.baseTopoBox.currentLayer()
+            input_layer = toVectorLayer(self.params.input_layer) if self.params.input_layer else None
             if not input_layer:
                 self.feedback.error("No input layer selected.")
                 self.kill()
 
         if not self.killed:
-            model_name = self.dlg.assignPlateIDsModelName.currentData(
-                QtCore.Qt.UserRole)
-            reconstruction_time = self.dlg.assignPlateIDsTime.spinBox.value()
-            partition_method = self.dlg.assignPlateIDsMethodBox.currentText()
+            model_name = self.params.model_name
+            reconstruction_time = self.params.reconstruction_time
+            partition_method = self.params.partition_method
             features_to_partition = input_layer.source().split("|")[0]
 
             self.feedback.info(f"Input layer: {input_layer.name()}.")
@@ -889,7 +765,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
         if not self.killed:
             try:
                 self.feedback.info(f"Downloading {model_name} rotation model if needed...")
-                rotation_model = cache_manager.download_model(model_name, self.feedback)
+                rotation_model = cache_manager.get_rotation_model(model_name, self.feedback)
             except Exception as e:
                 self.feedback.error(
                     f"Error downloading rotation model: {e}")
@@ -898,7 +774,7 @@ class TaStandardProcessing(TaBaseAlgorithm):
         if not self.killed:
             try:
                 self.feedback.info("Downloading static polygons if needed...")
-                static_polygons = cache_manager.get_layer(
+                static_polygons = cache_manager.get_feature_collections(
                     model_name, "Static Polygons", self.feedback)
             except Exception as e:
                 self.feedback.error(
@@ -908,15 +784,15 @@ class TaStandardProcessing(TaBaseAlgorithm):
         if not self.killed:
             try:
                 self.feedback.info("Partitioning features into plates...")
-                if os.path.exists(self.out_file_path):
-                    os.unlink(self.out_file_path)
+                if os.path.exists(self.params.output_path):
+                    os.unlink(self.params.output_path)
                 partitionIntoPlates(
                     static_polygons,
                     rotation_model,
                     features_to_partition,
                     reconstruction_time,
                     partition_method,
-                    self.out_file_path
+                    self.params.output_path
                 )
                 self.feedback.info("Plate ID assignment finished.")
                 self.feedback.progress += 70
@@ -927,6 +803,151 @@ class TaStandardProcessing(TaBaseAlgorithm):
 
         if not self.killed:
             self.feedback.progress = 100
-            self.finished.emit(True, self.out_file_path)
+            return self.params.output_path
+        else:
+            return None
+
+
+class TaStandardProcessing(TaStandardProcessingEngine, TaBaseAlgorithm):
+
+    def __init__(self, dlg):
+        super().__init__(dlg)
+        self.getParameters()
+        self.dlg.dialog_name_changed.connect(self.getParameters)
+
+    def getParameters(self):
+        self.processing_type = self.dlg.processingTypeBox.currentText()
+
+        processing_alg_names = [("Fill gaps", "TaFillGaps"),
+                                ("Copy/Paste raster", "TaCopyPasteRaster"),
+                                ("Smooth raster", "TaSmoothRaster"),
+                                ("Isostatic compensation",
+                                 "TaIsostaticCompensation"),
+                                ("Set new sea level", "TaSetSeaLevel"),
+                                ("Calculate bathymetry", "TaCalculateBathymetry"),
+                                ("Change map symbology", "TaChangeMapSymbology"),
+                                ("Assign plate IDs", "TaAssignPlateIDs")]
+        for alg, name in processing_alg_names:
+            if alg == self.processing_type:
+                self.setName(name)
+
+    def run(self):
+        self.getParameters()
+        if self.processing_type == "Fill gaps":
+            self.fillGaps()
+        elif self.processing_type == "Copy/Paste raster":
+            self.copyPasteRaster()
+        elif self.processing_type == "Smooth raster":
+            self.smoothRaster()
+        elif self.processing_type == "Isostatic compensation":
+            self.isostaticCompensation()
+        elif self.processing_type == "Set new sea level":
+            self.setSeaLevel()
+        elif self.processing_type == "Calculate bathymetry":
+            self.calculateBathymetry()
+        elif self.processing_type == "Change map symbology":
+            self.changeMapSymbology()
+        elif self.processing_type == "Assign plate IDs":
+            self.assignPlateIDs()
+
+    def fillGaps(self):
+        if self.dlg.interpInsidePolygonCheckBox.isChecked() and self.dlg.masksBox.currentLayer():
+            mask_layer = self.dlg.masksBox.currentLayer()
         else:
+            mask_layer = None
+        self.params = TaFillGapsParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            output_path=self.out_file_path,
+            filling_type="interpolation" if self.dlg.fillingTypeBox.currentText() == "Interpolation"
+            else "fixed_value",
+            method="native" if self.dlg.interpolationEngineBox.currentText().startswith("Native") else "gdal",
+            fill_value=self.dlg.fillingValueSpinBox.value(),
+            mask_layer=mask_layer,
+            smoothing_type=self.dlg.smoothingTypeBox.currentText() if self.dlg.smoothingBox.isChecked() else None,
+            smoothing_factor=self.dlg.smFactorSpinBox.value())
+        self.emitResult(self.fillRasterGaps())
+
+    def copyPasteRaster(self):
+        self.params = TaCopyPasteRasterParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            source_raster=self.dlg.copyFromRasterBox.currentLayer(),
+            mask_layer=self.dlg.copyFromMaskBox.currentLayer(),
+            output_path=self.out_file_path,
+            selected_features_only=self.dlg.copyPasteSelectedFeaturesOnlyCheckBox.isChecked())
+        self.emitResult(self.pasteRasterValues())
+
+    def smoothRaster(self):
+        self.params = TaSmoothRasterParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            output_path=self.out_file_path,
+            smoothing_type=self.dlg.smoothingTypeBox2.currentText(),
+            smoothing_factor=self.widgetValue(self.dlg.smFactorSpinBox2),
+            mask_layer=self.dlg.smoothingMaskBox.currentLayer() if self.dlg.smoothInPolygonCheckBox.isChecked()
+            else None,
+            selected_features_only=self.dlg.smoothInSelectedFeaturesOnlyCheckBox.isChecked(),
+            paleoshorelines_layer=self.dlg.paleoshorelinesMask.currentLayer()
+            if self.dlg.fixedPaleoShorelinesCheckBox.isChecked() else None)
+        self.emitResult(self.smoothRasterValues())
+
+    def isostaticCompensation(self):
+        self.params = TaIsostaticCompensationParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            ice_raster=self.dlg.selectIceTopoBox.currentLayer(),
+            output_path=self.out_file_path,
+            ice_amount=self.dlg.iceAmountSpinBox.value(),
+            mask_layer=self.dlg.isostatMaskBox.currentLayer(),
+            selected_features_only=self.dlg.isostatMaskSelectedFeaturesCheckBox.isChecked(),
+            polar_regions_only=self.dlg.masksFromCoastCheckBox.isChecked())
+        self.emitResult(self.compensateIsostasy())
+
+    def setSeaLevel(self):
+        self.params = TaSetSeaLevelParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            shift=self.dlg.seaLevelShiftBox.value(),
+            output_path=self.out_file_path)
+        self.emitResult(self.changeSeaLevel())
+
+    def calculateBathymetry(self):
+        self.params = TaCalculateBathymetryParameters(
+            input_raster=self.dlg.baseTopoBox.currentLayer(),
+            reconstruction_time=self.dlg.reconstructionTime.value(),
+            age_raster_time=self.dlg.ageRasterTime.value(),
+            output_path=self.out_file_path)
+        self.emitResult(self.ageToBathymetry())
+
+    def assignPlateIDs(self):
+        self.params = TaAssignPlateIdsParameters(
+            input_layer=self.dlg.baseTopoBox.currentLayer(),
+            model_name=self.dlg.assignPlateIDsModelName.currentData(QtCore.Qt.UserRole),
+            output_path=self.out_file_path,
+            reconstruction_time=self.dlg.assignPlateIDsTime.spinBox.value(),
+            partition_method=self.dlg.assignPlateIDsMethodBox.currentText())
+        self.emitResult(self.partitionFeaturesIntoPlates())
+
+    def emitResult(self, out_file_path):
+        """Emits the finished signal with the output path returned by the engine, None if it failed."""
+        if out_file_path:
+            self.finished.emit(True, out_file_path)
+        else:
+            self.finished.emit(False, "")
+
+    def changeMapSymbology(self):
+        layer = self.dlg.baseTopoBox.currentLayer()
+        self.feedback.info(f"Changing map symbology for layer {layer.name()}.")
+        color_ramp_name = self.dlg.colorPalette.currentText()
+
+        self.feedback.info(f"Color ramp selected: {color_ramp_name}")
+        try:
+            setRasterSymbology(layer, color_ramp_name)
+            self.feedback.info("Map symbology changed successfully.")
+            self.finished.emit(True, '')
+            # This is not a proper algorithm that processes much data
+            # Therefore we can close it after it is finished
+            # But closing it will delete a refernce to it and the finish event triggered above
+            # will not able to run properly. Therefore we hide it.
+            # self.dlg.hide()
+        except Exception as e:
+            self.feedback.warning(
+                f"Changing map symbology failed due to the following exception: {e}")
             self.finished.emit(False, '')
+
@@ -40,33 +40,56 @@ from PyQt5.QtCore import (
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QAction, QToolBar
 
+import importlib
 import os.path
 
-from .compile_tb import TaCompileTopoBathy
-from .create_tb import TaCreateTopoBathy
-from .prepare_masks import TaPrepareMasks
-from .set_pls import TaSetPaleoshorelines
-from .standard_proc import TaStandardProcessing
-from .modify_tb import TaModifyTopoBathy
-from .remove_arts_tooltip import TaRemoveArtefactsTooltip
-from .reconstruct_rasters import TaReconstructRasters
-from .reconstruct_vector_layers import TaReconstructVectorLayers
-from .algorithm_provider import TaAlgorithmProvider, TaRemoveArtefactsAlgProvider
 from .settings import TaSettings
 
-from ..gui.compile_tb_dlg import  TaCompileTopoBathyDlg
-from ..gui.modify_tb_dlg import  TaModifyTopoBathyDlg
-from ..gui.create_tb_dlg import  TaCreateTopoBathyDlg
-from ..gui.prepare_masks_dlg import  TaPrepareMasksDlg
-from ..gui.set_pls_dlg import  TaSetPaleoshorelinesDlg
-from ..gui.remove_arts_dlg import  TaRemoveArtefactsDlg
-from ..gui.standard_proc_dlg import  TaStandardProcessingDlg
-from ..gui.reconstruct_rasters_dlg import  TaReconstructRastersDlg
-from ..gui.reconstruct_vector_layers_dlg import TaReconstructVectorLayersDlg
-from ..gui.manage_input_files_dlg import TaManageInputFilesDlg
-from ..gui.welcome_dialog import TaWelcomeDialog
 from ..resources import *
 
+# Algorithm and dialog of each tool, as (module, class) pairs relative to this package. They are
+# imported when the tool is first opened (see loadTool), so that loading the plugin does not import
+# the heavy dependencies (gplately, pygplates, scipy, processing) of every tool
+TOOLS = {
+    "compile_tb": ((".compile_tb", "TaCompileTopoBathy"),
+                   ("..gui.compile_tb_dlg", "TaCompileTopoBathyDlg")),
+    "create_tb": ((".create_tb", "TaCreateTopoBathy"),
+                  ("..gui.create_tb_dlg", "TaCreateTopoBathyDlg")),
+    "prepare_masks": ((".prepare_masks", "TaPrepareMasks"),
+                      ("..gui.prepare_masks_dlg", "TaPrepareMasksDlg")),
+    "set_pls": ((".set_pls", "TaSetPaleoshorelines"),
+                ("..gui.set_pls_dlg", "TaSetPaleoshorelinesDlg")),
+    "standard_proc": ((".standard_proc", "TaStandardProcessing"),
+                      ("..gui.standard_proc_dlg", "TaStandardProcessingDlg")),
+    "modify_tb": ((".modify_tb", "TaModifyTopoBathy"),
+                  ("..gui.modify_tb_dlg", "TaModifyTopoBathyDlg")),
+    "remove_arts": ((".remove_arts_tooltip", "TaRemoveArtefactsTooltip"),
+                    ("..gui.remove_arts_dlg", "TaRemoveArtefactsDlg")),
+    "reconstruct_rasters": ((".reconstruct_rasters", "TaReconstructRasters"),
+                            ("..gui.reconstruct_rasters_dlg", "TaReconstructRastersDlg")),
+    "reconstruct_vector_layers": ((".reconstruct_vector_layers", "TaReconstructVectorLayers"),
+                                  ("..gui.reconstruct_vector_layers_dlg", "TaReconstructVectorLayersDlg")),
+}
+
+
+def importClass(module_name, class_name):
+    """Imports a class from a module given relative to this package."""
+    return getattr(importlib.import_module(module_name, __package__), class_name)
+
+
+def loadTool(tool_name):
+    """
+    Imports the algorithm and the dialog of a tool.
+
+    :param tool_name: Key of the tool in TOOLS.
+    :type tool_name: str.
+
+    :return: The algorithm and dialog classes.
+    :rtype: tuple.
+    """
+    return tuple(importClass(module_name, class_name) for module_name, class_name in TOOLS[tool_name])
+
+
 class TerraAntiqua:
 
     def __init__(self, iface):
@@ -79,8 +102,9 @@ class TerraAntiqua:
         """
         # Save reference to the QGIS interface
         self.iface = iface
-        # the reference to the Map canvas of the current project
-        self.canvas = self.iface.mapCanvas()
+        # the reference to the Map canvas of the current project. There is no interface when the plugin
+        # is loaded by qgis_process, which only calls initProcessing
+        self.canvas = self.iface.mapCanvas() if self.iface is not None else None
         # initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
         # initialize locale
@@ -102,10 +126,12 @@ class TerraAntiqua:
         self.menu = self.tr(u'&Terra Antiqua')
 
         # Create a separate toolbar for the plugin
-        self.ta_toolBar = iface.mainWindow().findChild(QToolBar, u'Terra Antiqua')
-        if not self.ta_toolBar:
-            self.ta_toolBar = iface.addToolBar(u'Terra Antiqua')
-            self.ta_toolBar.setObjectName(u'Terra Antiqua')
+        self.ta_toolBar = None
+        if self.iface is not None:
+            self.ta_toolBar = iface.mainWindow().findChild(QToolBar, u'Terra Antiqua')
+            if not self.ta_toolBar:
+                self.ta_toolBar = iface.addToolBar(u'Terra Antiqua')
+                self.ta_toolBar.setObjectName(u'Terra Antiqua')
 
         # Load the settings object. Read settings and passes them to the plugin
         self.settings = TaSettings("TerraAntiqua", "Terra Antiqua")
@@ -115,6 +141,9 @@ class TerraAntiqua:
         # Must be set in initGui() to survive plugin reloads
         self.first_start =None
 
+        # Processing provider of the tools, registered in initProcessing
+        self.provider = None
+
     # Create the tool dialog
 
     # noinspection PyMethodMayBeStatic
@@ -209,6 +238,16 @@ class TerraAntiqua:
 
         return action
 
+    def initProcessing(self):
+        """Registers the tools as algorithms of the processing framework."""
+        if self.provider is not None:
+            return
+        # Imported here, so that the processing framework is only loaded with the plugin when it is used
+        from qgis.core import QgsApplication
+        from .processing_provider import TaProcessingProvider
+        self.provider = TaProcessingProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
 
@@ -286,6 +325,8 @@ class TerraAntiqua:
             callback = self.initStandardProcessing,
             parent = self.iface.mainWindow())
 
+        self.initProcessing()
+
         # will be set False in run()
         self.first_start = True
         self.settings.setTempValue("first_start", True)
@@ -298,81 +339,67 @@ class TerraAntiqua:
                 action)
             self.iface.removeToolBarIcon(action)
             self.ta_toolBar.removeAction(action)
+        if self.provider is not None:
+            from qgis.core import QgsApplication
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
 
     def updatePluginSettings(self, key, value):
         if key == "first_start":
             self.first_start = False
 
 
+    def algorithmProvider(self, tool_name):
+        """Imports a tool and returns the provider that loads its dialog and runs its algorithm"""
+        from .algorithm_provider import TaAlgorithmProvider
+        algorithm, dialog = loadTool(tool_name)
+        return TaAlgorithmProvider(dialog, algorithm, self.iface, self.settings)
+
     def initCompileTopoBathy(self):
         """Initializes the Compile Topo/Bathymetry algorithm and loads it"""
-        self.compileTopoBathy = TaAlgorithmProvider(
-                                                        TaCompileTopoBathyDlg,
-                                                        TaCompileTopoBathy,
-                                                        self.iface,
-                                                        self.settings)
+        self.compileTopoBathy = self.algorithmProvider("compile_tb")
         self.compileTopoBathy.load()
 
     def initPrepareMasks(self):
         """Initializes the Prepare masks algorithm and loads it"""
-        self.prepareMasks = TaAlgorithmProvider(TaPrepareMasksDlg,
-                                                   TaPrepareMasks,
-                                                   self.iface,
-                                                   self.settings)
+        self.prepareMasks = self.algorithmProvider("prepare_masks")
         self.prepareMasks.load()
 
     def initModifyTopoBathy(self):
         """Initializes the Modify Topo/Bathymetry algorithm and loads it"""
-        self.modifyTopoBathy = TaAlgorithmProvider(TaModifyTopoBathyDlg,
-                                                      TaModifyTopoBathy,
-                                                      self.iface,
-                                                      self.settings)
+        self.modifyTopoBathy = self.algorithmProvider("modify_tb")
         self.modifyTopoBathy.load()
 
 
     def initSetPaleoShorelines(self):
         """Initializes the Set Paleoshorelines algorithm and loads it"""
-        self.setPaleoshorelines = TaAlgorithmProvider(
-                                                        TaSetPaleoshorelinesDlg,
-                                                        TaSetPaleoshorelines,
-                                                        self.iface,
-                                                        self.settings)
+        self.setPaleoshorelines = self.algorithmProvider("set_pls")
         self.setPaleoshorelines.load()
 
     def initStandardProcessing(self):
         """Initializes the Standard processing algorithm set and loads it"""
-        self.standardProcessing = TaAlgorithmProvider(TaStandardProcessingDlg,
-                                                         TaStandardProcessing,
-                                                         self.iface,
-                                                         self.settings)
+        self.standardProcessing = self.algorithmProvider("standard_proc")
         self.standardProcessing.load()
 
     def initCreateTopoBathy(self):
         """Initializes the Create Topography/Bathymetry algorithm and loads it"""
-        self.createTopoBathy = TaAlgorithmProvider(TaCreateTopoBathyDlg,
-                                                      TaCreateTopoBathy,
-                                                      self.iface,
-                                                      self.settings)
+        self.createTopoBathy = self.algorithmProvider("create_tb")
         self.createTopoBathy.load()
 
     def initReconstructRasters(self):
         """Initializes the Reconstruct rasters algorithm and loads it"""
-        self.reconstructRasters = TaAlgorithmProvider(TaReconstructRastersDlg,
-                                                      TaReconstructRasters,
-                                                      self.iface,
-                                                      self.settings)
+        self.reconstructRasters = self.algorithmProvider("reconstruct_rasters")
         self.reconstructRasters.load()
         
     def initReconstructVectorLayers(self):
         """Initializes the Reconstruct rasters algorithm and loads it"""
-        self.reconstructRasters = TaAlgorithmProvider(TaReconstructVectorLayersDlg,
-                                                      TaReconstructVectorLayers,
-                                                      self.iface,
-                                                      self.settings)
+        self.reconstructRasters = self.algorithmProvider("reconstruct_vector_layers")
         self.reconstructRasters.load()
     
     def initManageInputFiles(self):
         """Initializes the Manage Input Files dialog and loads it"""
+        from ..gui.manage_input_files_dlg import TaManageInputFilesDlg
+        from ..gui.welcome_dialog import TaWelcomeDialog
         self.welcome_page = TaWelcomeDialog()
         if self.settings.temporarySettings.get("first_start") != False:
             self.settings.setTempValue("first_start", False)
@@ -393,6 +420,8 @@ class TerraAntiqua:
             self.removeArtefacts.storeRubberbands(self.removeArtefacts.toolPoly.rubberband, self.removeArtefacts.toolPoly.vertices, self.removeArtefacts.toolPoly.points)
             self.removeArtefacts.clean()
         else:
+            from .algorithm_provider import TaRemoveArtefactsAlgProvider
+            TaRemoveArtefactsTooltip, TaRemoveArtefactsDlg = loadTool("remove_arts")
             self.settings.removeArtefactsChecked = True
             self.removeArtefacts = TaRemoveArtefactsAlgProvider(TaRemoveArtefactsTooltip, TaRemoveArtefactsDlg, self.iface, self.actions, self.settings)
             self.removeArtefacts.initiate()
@@ -25,7 +25,8 @@ class TerraAntiquaStub:
 
     def __init__(self, iface):
         self.iface = iface
-        self.canvas = self.iface.mapCanvas()
+        # There is no interface when the plugin is loaded by qgis_process
+        self.canvas = self.iface.mapCanvas() if self.iface is not None else None
         self.plugin_dir = os.path.dirname(__file__)
 
         locale = QSettings().value('locale/userLocale')[0:2]
@@ -43,10 +44,12 @@ class TerraAntiquaStub:
         self.actions = []
         self.menu = self.tr(u'&Terra Antiqua')
 
-        self.ta_toolBar = iface.mainWindow().findChild(QToolBar, u'Terra Antiqua')
-        if not self.ta_toolBar:
-            self.ta_toolBar = iface.addToolBar(u'Terra Antiqua')
-            self.ta_toolBar.setObjectName(u'Terra Antiqua')
+        self.ta_toolBar = None
+        if self.iface is not None:
+            self.ta_toolBar = iface.mainWindow().findChild(QToolBar, u'Terra Antiqua')
+            if not self.ta_toolBar:
+                self.ta_toolBar = iface.addToolBar(u'Terra Antiqua')
+                self.ta_toolBar.setObjectName(u'Terra Antiqua')
 
         # Will hold the real TerraAntiqua instance once deps are installed
         self._real_plugin = None
@@ -164,6 +167,11 @@ class TerraAntiquaStub:
             callback=lambda: self._ensure_deps_and_run('initStandardProcessing'),
             parent=self.iface.mainWindow())
 
+    def initProcessing(self):
+        """The tools are registered in the processing framework once their dependencies are installed."""
+        if self._real_plugin is not None:
+            self._real_plugin.initProcessing()
+
     # -----------------------------------------------------------------
     # Dependency gate
     # -----------------------------------------------------------------
@@ -203,6 +211,7 @@ class TerraAntiquaStub:
         # Run its init logic that doesn't touch the GUI (settings, first_start, etc.)
         self._real_plugin.first_start = True
         self._real_plugin.settings.setTempValue("first_start", True)
+        self._real_plugin.initProcessing()
 
     # -----------------------------------------------------------------
     # Cleanup
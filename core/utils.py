@@ -7,21 +7,31 @@
 
 import tempfile
 import os
+import sys
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from numpy import * #This to import math functions to be used in formula (modFormula)
-import random
 from random import randrange
 from typing import Tuple, Union
 from .logger import TaFeedback
+from .feature_patches import rasterizeGeometry
+from .raster_io import (
+    asFloat32,
+    readRaster,
+    nodataToNan,
+    createMemDataset,
+    writeRaster,
+    processRasterInTiles
+)
 
 from PyQt5.QtGui import QColor
 from PyQt5.QtCore import QVariant, QThread, QObject, pyqtSignal
 from PyQt5.QtWidgets import QDesktopWidget
 
 from osgeo import gdal, osr, ogr
-from osgeo import gdalconst
 from qgis.core import (
     QgsRasterLayer,
     QgsVectorLayer,
@@ -37,9 +47,10 @@ from qgis.core import (
     QgsProcessingContext,
     QgsGeometry,
     QgsPointXY,
-    QgsSpatialIndex,
+    QgsPoint,
     QgsFeature,
     QgsFeatureIterator,
+    QgsFeatureRequest,
     QgsFields,
     NULL,
     QgsMapLayerType,
@@ -52,6 +63,7 @@ from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsSimpleFillSymbolLayer,
     QgsProcessingException,
+    QgsProperty,
     QgsUnitTypes
 )
 
@@ -61,21 +73,22 @@ def install_package(package):
 
 try:
     from scipy.ndimage.filters import gaussian_filter, uniform_filter
+    from scipy.ndimage import distance_transform_edt, label, find_objects
 except Exception:
     install_package('scipy')
     from scipy.ndimage.filters import gaussian_filter, uniform_filter
+    from scipy.ndimage import distance_transform_edt, label, find_objects
 
 try:
     from plugins import processing
-    from plugins.processing.tools import vector
 except Exception:
     import processing
-    from processing.tools import vector
 
 
 def fillNoData(in_layer: QgsRasterLayer,
                out_file_path: str = None,
-               no_data_value: Union[float, int] = None) -> str:
+               no_data_value: Union[float, int] = None,
+               method: str = "gdal") -> str:
     """
     Fills the missing data by interpolating from edges.
 
@@ -83,88 +96,175 @@ def fillNoData(in_layer: QgsRasterLayer,
     :type in_layer: QgsRasterLayer.
     :param no_data_value: NoDataValue of the input layer. These values to be set to np.nan   during the interpolation.
     :type no_data_value: float|int
-    :param vlayer: A vector layer with masks for interpolating only inside masks
+    :param method: Interpolation engine: "gdal" (inverse distance weighting) or "native" (see fillNoDataNative).
+    :type method: str.
 
     :return: The path of the output file.
     :rtype: str.
 
     """
-    temp_dir = tempfile.gettempdir()
     if out_file_path is None:
-        out_file_path = os.path.join(temp_dir, "Interpolated_raster.tiff")
+        out_file_path = os.path.join(tempfile.gettempdir(), "Interpolated_raster.tiff")
 
-    # (1) Get the input raster dataset
     if not type(in_layer) == QgsRasterLayer:
         raise TypeError("The input layer must be QgsRasterLayer")
 
-    try:
-        raster_ds = gdal.Open(in_layer.dataProvider().dataSourceUri())
-    except FileNotFoundError:
-        print("Could not open the provided raster layer.")
-    else:
-        in_band = raster_ds.GetRasterBand(1)
-        in_array = in_band.ReadAsArray()
+    in_array, geotransform, _, band_no_data_value = readRaster(in_layer)
+    if no_data_value is None:
+        no_data_value = band_no_data_value
+    in_array = nodataToNan(in_array, no_data_value)
 
-    if no_data_value != None:
-        in_array[in_array == no_data_value] = np.nan
-    else:
-        no_data_value = in_band.GetNoDataValue()
-        if no_data_value != np.nan:
-            in_array[in_array == no_data_value] = np.nan
-
-    # (2) Define the parameters for creating a mask raster of valid values.
-    # TODO move this mask into the temporary directory of the OS
-    mask_path = os.path.join(
-        temp_dir, "Valid_data_mask_for_interpolation.tiff")
-    geotransform = raster_ds.GetGeoTransform()
-    width = in_layer.width()
-    height = in_layer.height()
+    out_array = fillNoDataInArray(in_array, method=method)
+    writeRaster(out_file_path, out_array, geotransform, in_layer.crs().toWkt())
 
-    raster_ds = None
+    return out_file_path
 
-    out_array = np.ones(in_array.shape)
 
-    out_array[np.isnan(in_array)] = np.nan
-    out_array[np.isfinite(in_array)] = 1
+def fillNoDataInArray(in_array: np.ndarray,
+                      max_distance: int = 100,
+                      smoothing_iterations: int = None,
+                      method: str = "gdal") -> np.ndarray:
+    """
+    Fills NaN cells of an array by interpolating from edges. The "gdal" method uses the same algorithm as
+    gdal:fillnodata (GDALFillNodata), but runs in memory on a MEM dataset instead of
+    going through temporary files. The "native" method is implemented with numpy/scipy (see fillNoDataNative).
 
-    # Create Target - TIFF
-    out_raster = gdal.GetDriverByName('GTiff').Create(
-        mask_path, width, height, 1, gdal.GDT_Byte)
-    out_raster.SetGeoTransform(geotransform)
-    crs = in_layer.crs().toWkt()
-    out_raster.SetProjection(crs)
-    out_band = out_raster.GetRasterBand(1)
-    out_band.SetNoDataValue(np.nan)
-    out_band.WriteArray(out_array)
-    out_band.FlushCache()
-    out_raster = None
+    :param in_array: Array with gaps (np.nan) to fill.
+    :type in_array: np.ndarray.
+    :param max_distance: Maximum distance (in pixels) to search for values to interpolate from.
+    :type max_distance: int.
+    :param smoothing_iterations: Number of 3x3 smoothing filter passes over the filled cells.
+    If None, the default of the selected method is used.
+    :type smoothing_iterations: int.
+    :param method: Interpolation engine: "gdal" or "native".
+    :type method: str.
+
+    :return: A new Float32 array with the gaps filled. Cells further than max_distance from valid data stay np.nan.
+    :rtype: np.ndarray.
+    """
+    if method == "native":
+        if smoothing_iterations is None:
+            return fillNoDataNative(in_array, max_distance)
+        return fillNoDataNative(in_array, max_distance, smoothing_iterations)
+    elif method != "gdal":
+        raise ValueError("Unknown interpolation method: {}.".format(method))
+    if smoothing_iterations is None:
+        smoothing_iterations = 0
+
+    in_array = np.asarray(in_array, dtype=np.float32)
+    valid_mask = np.isfinite(in_array).astype(np.uint8)
+
+    data_ds = createMemDataset(in_array)
+    mask_ds = createMemDataset(valid_mask, no_data_value=None, data_type=gdal.GDT_Byte)
+    data_band = data_ds.GetRasterBand(1)
+    gdal.FillNodata(data_band, mask_ds.GetRasterBand(1), max_distance, smoothing_iterations)
+    out_array = data_band.ReadAsArray()
+
+    data_band = None
+    data_ds = None
+    mask_ds = None
 
-    # interpolation with the processing module
-    input_layer = in_layer.dataProvider().dataSourceUri()
+    return out_array
 
-    # feedback = QgsProcessingFeedback()
-    # feedback.progressChanged.connect(self.send_progress_feedback)
-    # If the above two lines are uncommented, the feedback=feedback should be added to the processing algorithm below.
 
-    fill_params = {'INPUT': input_layer,
-                   'BAND': 1,
-                   'DISTANCE': 100,
-                   'ITERATIONS': 0,
-                   'NO_MASK': False,
-                   'MASK_LAYER': mask_path,
-                   'OUTPUT': out_file_path}
+def fillNoDataNative(in_array: np.ndarray,
+                     max_distance: int = 100,
+                     smoothing_iterations: int = 20,
+                     tile_size: int = 1024) -> np.ndarray:
+    """
+    Fills NaN cells of an array in process with numpy/scipy. Each gap cell is first seeded with the value of
+    the nearest valid cell (Euclidean distance transform), then the seeded cells are relaxed with a number of
+    3x3 averaging passes, while the valid cells are kept fixed. Each pass spreads the values by one cell, so
+    the passes remove the seams between the nearest-neighbour regions near the edges of the gaps, while the
+    cells deeper inside large gaps keep values close to those of their nearest valid cells.
+
+    The array is filled tile by tile. Each tile is filled from a window padded by max_distance (the furthest
+    a valid cell used for seeding can be) and by the number of averaging passes (the furthest the passes
+    spread), so the result is the same as for the whole array, while the index arrays of the distance
+    transform only cover one window at a time.
+
+    :param in_array: Array with gaps (np.nan) to fill.
+    :type in_array: np.ndarray.
+    :param max_distance: Maximum distance (in pixels) from valid data to fill. Cells further away stay np.nan.
+    :type max_distance: int.
+    :param smoothing_iterations: Number of averaging passes over the filled cells.
+    :type smoothing_iterations: int.
+    :param tile_size: Size (in pixels) of the tiles filled at a time.
+    :type tile_size: int.
+
+    :return: A new Float32 array with the gaps filled.
+    :rtype: np.ndarray.
+    """
+    out_array = np.array(in_array, dtype=np.float32)
+    gaps = np.isnan(out_array)
+    if not gaps.any() or gaps.all():
+        return out_array
+    height, width = out_array.shape
+
+    # Only the bounding box of the gaps is tiled
+    gap_rows = np.flatnonzero(gaps.any(axis=1))
+    gap_cols = np.flatnonzero(gaps.any(axis=0))
+    halo = max_distance + smoothing_iterations + 1
+    for row in range(gap_rows[0], gap_rows[-1] + 1, tile_size):
+        for col in range(gap_cols[0], gap_cols[-1] + 1, tile_size):
+            tile = (slice(row, min(row + tile_size, gap_rows[-1] + 1)),
+                    slice(col, min(col + tile_size, gap_cols[-1] + 1)))
+            if not gaps[tile].any():
+                continue
+            window = (slice(max(tile[0].start - halo, 0), min(tile[0].stop + halo, height)),
+                      slice(max(tile[1].start - halo, 0), min(tile[1].stop + halo, width)))
+            # The window is read from the input array, so that the tiles filled before are not used as data
+            filled = fillWindowNative(np.array(in_array[window], dtype=np.float32), gaps[window],
+                                      max_distance, smoothing_iterations)
+            out_array[tile] = filled[tile[0].start - window[0].start:tile[0].stop - window[0].start,
+                                     tile[1].start - window[1].start:tile[1].stop - window[1].start]
 
-    processing.run("gdal:fillnodata", fill_params)
+    return out_array
 
-    # (4) delete the validity mask file
-    driver = gdal.GetDriverByName('GTiff')
-    if os.path.exists(mask_path):
-        driver.Delete(mask_path)
 
-    return out_file_path
+def fillWindowNative(sub_array: np.ndarray,
+                     sub_gaps: np.ndarray,
+                     max_distance: int,
+                     smoothing_iterations: int) -> np.ndarray:
+    """
+    Fills the gaps of a window of an array in place, see fillNoDataNative.
 
+    :param sub_array: Float32 window with gaps (np.nan) to fill.
+    :type sub_array: np.ndarray.
+    :param sub_gaps: Gaps of the window.
+    :type sub_gaps: np.ndarray.
 
-def fillNoDataInPolygon(in_layer, poly_layer, out_file_path=None, no_data_value=None):
+    :return: The filled window.
+    :rtype: np.ndarray.
+    """
+    if sub_gaps.all():
+        # No valid cell within reach
+        return sub_array
+
+    # Nearest-neighbour seeding. Only the indices are returned by the transform, the distances are
+    # computed in Float32, to avoid a Float64 array of the size of the window.
+    nearest_rows, nearest_cols = distance_transform_edt(sub_gaps, return_distances=False, return_indices=True)
+    window_rows, window_cols = np.ogrid[0:sub_array.shape[0], 0:sub_array.shape[1]]
+    distances = np.hypot((nearest_rows - window_rows).astype(np.float32),
+                         (nearest_cols - window_cols).astype(np.float32))
+    sub_array[sub_gaps] = sub_array[nearest_rows[sub_gaps], nearest_cols[sub_gaps]]
+    sub_array[sub_gaps & (distances > max_distance)] = np.nan
+    to_relax = sub_gaps & np.isfinite(sub_array)
+    distances = None
+    nearest_rows = None
+    nearest_cols = None
+
+    # Relaxation of the filled cells. NaN cells (too far from data) are excluded from the averages.
+    for i in range(smoothing_iterations):
+        valid = np.isfinite(sub_array)
+        sums = uniform_filter(np.where(valid, sub_array, 0), size=3, mode='nearest')
+        counts = uniform_filter(valid.astype(np.float32), size=3, mode='nearest')
+        sub_array[to_relax] = sums[to_relax] / counts[to_relax]
+
+    return sub_array
+
+
+def fillNoDataInPolygon(in_layer, poly_layer, out_file_path=None, no_data_value=None, method="gdal"):
     """
     Fills the missing data by interpolating from edges.
 
@@ -172,98 +272,97 @@ def fillNoDataInPolygon(in_layer, poly_layer, out_file_path=None, no_data_value=
     :param poly_layer: A vector layer with polygon masks that are used to interpolate values inside them. Type: QgsVectorLayer.
     :param out_file_path: A path for the output raster layer, filled. Type: str.
     :param no_data_value: NoDataValue of the input layer. These values to be set to np.nan   during the interpolation. Type: Number (Double, Int, Float...) or numpy.nan.
+    :param method: Interpolation engine: "gdal" or "native". Type: str.
     :return: String - the path of the output file.
 
     """
-    temp_dir = tempfile.gettempdir()
     if out_file_path is None:
-        out_file_path = os.path.join(temp_dir, "Interpolated_raster.tiff")
+        out_file_path = os.path.join(tempfile.gettempdir(), "Interpolated_raster.tiff")
 
-    # (1) Get the input raster dataset
     if not type(in_layer) == QgsRasterLayer:
         raise TypeError("The input layer must be QgsRasterLayer")
 
-    try:
-        raster_ds = gdal.Open(
-            in_layer.dataProvider().dataSourceUri(), gdal.GA_Update)
-    except FileNotFoundError:
-        print("Could not open the provided raster layer.")
-    else:
-        in_band = raster_ds.GetRasterBand(1)
-        in_array = in_band.ReadAsArray()
-
-    if no_data_value != None:
-        in_array[in_array == no_data_value] = np.nan
-    else:
-        no_data_value = in_band.GetNoDataValue()
-        if no_data_value != np.nan:
-            in_array[in_array == no_data_value] = np.nan
-
-    # Get geotransform and raster size for rasterization
-    geotransform = raster_ds.GetGeoTransform()
-    width = in_layer.width()
-    height = in_layer.height()
+    in_array, geotransform, _, band_no_data_value = readRaster(in_layer)
+    if no_data_value is None:
+        no_data_value = band_no_data_value
+    in_array = nodataToNan(in_array, no_data_value)
 
-    # (2) Define the parameters for creating a mask raster of valid values.
+    out_array = fillNoDataInPolygonArray(in_array, poly_layer, geotransform, method=method)
+    writeRaster(out_file_path, out_array, geotransform, in_layer.crs().toWkt())
 
-    mask_path = os.path.join(
-        temp_dir, "Valid_data_mask_for_interpolation.tiff")
-
-    out_array = np.ones(in_array.shape)
+    return out_file_path
 
-    out_array[np.isnan(in_array)] = np.nan
-    out_array[np.isfinite(in_array)] = 1
 
-    # Create Target - TIFF
-    out_raster = gdal.GetDriverByName('GTiff').Create(
-        mask_path, width, height, 1, gdal.GDT_Byte)
-    out_raster.SetGeoTransform(geotransform)
-    crs = in_layer.crs().toWkt()
-    out_raster.SetProjection(crs)
-    out_band = out_raster.GetRasterBand(1)
-    out_band.SetNoDataValue(np.nan)
-    out_band.WriteArray(out_array)
-    out_band.FlushCache()
-    out_raster = None
+def fillNoDataInPolygonArray(in_array: np.ndarray,
+                             poly_layer: QgsVectorLayer,
+                             geotransform: tuple,
+                             method: str = "gdal",
+                             max_distance: int = 100) -> np.ndarray:
+    """
+    Fills NaN cells of an array by interpolating from edges, only inside the polygons of a vector layer.
+    Connected gap regions inside the polygons are labelled and each of them is interpolated only within its
+    bounding box padded by max_distance, so the cost scales with the area of the gaps, not with the raster.
 
-    # Set the no_data values outside the polygon to -99999
-    # Rasterize the input vector layer with polygon masks
-    poly_array = vectorToRaster(poly_layer, geotransform, width, height)
-    mapped_array = np.zeros((height, width))
-    mapped_array[np.isnan(in_array)*(poly_array != 1) == 1] = 1
-    raster_ds = None
-    in_array = None
-
-    # interpolation with the processing module
-    input_layer = in_layer.dataProvider().dataSourceUri()
-
-    fill_params = {'INPUT': input_layer,
-                   'BAND': 1,
-                   'DISTANCE': 100,
-                   'ITERATIONS': 0,
-                   'NO_MASK': False,
-                   'MASK_LAYER': mask_path,
-                   'OUTPUT': out_file_path}
-
-    processing.run("gdal:fillnodata", fill_params)
-
-    # Output raster
-    raster_ds = gdal.Open(out_file_path, gdal.GA_Update)
-    raster_array = raster_ds.GetRasterBand(1).ReadAsArray()
-    raster_array[mapped_array == 1] = np.nan
-    raster_ds.GetRasterBand(1).WriteArray(raster_array)
-    raster_ds.GetRasterBand(1).FlushCache()
-    raster_ds = None
-    raster_array = None
-    mapped_array = None
+    :param in_array: Array with gaps (np.nan) to fill.
+    :type in_array: np.ndarray.
+    :param poly_layer: A vector layer with polygon masks that are used to interpolate values inside them.
+    :type poly_layer: QgsVectorLayer.
+    :param geotransform: Geotransform of the array.
+    :type geotransform: tuple.
+    :param method: Interpolation engine: "gdal" or "native".
+    :type method: str.
+    :param max_distance: Maximum distance (in pixels) to search for values to interpolate from.
+    :type max_distance: int.
+
+    :return: A new Float32 array with the gaps inside the polygons filled.
+    :rtype: np.ndarray.
+    """
+    out_array = np.array(in_array, dtype=np.float32)
+    height, width = out_array.shape
+    poly_array, (row_off, col_off) = vectorToRaster(poly_layer, geotransform, width, height, windowed=True)
+    if poly_array.size == 0:
+        return out_array
+    poly_window = np.s_[row_off:row_off + poly_array.shape[0], col_off:col_off + poly_array.shape[1]]
+
+    # Label the connected gap regions (8-connectivity) inside the polygons
+    gaps_in_polygons = np.isnan(out_array[poly_window]) & (poly_array == 1)
     poly_array = None
+    gap_labels, n_regions = label(gaps_in_polygons, structure=np.ones((3, 3), dtype=bool))
+    gaps_in_polygons = None
+    if n_regions == 0:
+        return out_array
+
+    windows = []
+    for region_slice in find_objects(gap_labels):
+        rows, cols = region_slice
+        windows.append((slice(max(rows.start + row_off - max_distance, 0),
+                              min(rows.stop + row_off + max_distance, height)),
+                        slice(max(cols.start + col_off - max_distance, 0),
+                              min(cols.stop + col_off + max_distance, width))))
+
+    # If the padded windows together are larger than the raster, a single pass over the raster is cheaper
+    if sum((r.stop - r.start) * (c.stop - c.start) for r, c in windows) >= out_array.size:
+        filled = fillNoDataInArray(in_array, max_distance=max_distance, method=method)
+        region_cells = np.zeros(out_array.shape, dtype=bool)
+        region_cells[poly_window] = gap_labels > 0
+        out_array[region_cells] = filled[region_cells]
+        return out_array
+
+    for region_id, (rows, cols) in enumerate(windows, start=1):
+        filled = fillNoDataInArray(in_array[rows, cols], max_distance=max_distance, method=method)
+        # Cells of this region, in the coordinates of the padded window
+        label_rows = slice(rows.start - row_off, rows.stop - row_off)
+        label_cols = slice(cols.start - col_off, cols.stop - col_off)
+        region_cells = np.zeros(filled.shape, dtype=bool)
+        label_window = gap_labels[max(label_rows.start, 0):label_rows.stop,
+                                  max(label_cols.start, 0):label_cols.stop]
+        region_cells[max(-label_rows.start, 0):max(-label_rows.start, 0) + label_window.shape[0],
+                     max(-label_cols.start, 0):max(-label_cols.start, 0) + label_window.shape[1]] = \
+            label_window == region_id
+        out_window = out_array[rows, cols]
+        out_window[region_cells] = filled[region_cells]
 
-    # (4) delete the validity mask file
-    driver = gdal.GetDriverByName('GTiff')
-    if os.path.exists(mask_path):
-        driver.Delete(mask_path)
-
-    return out_file_path
+    return out_array
 
 def fillNoDataWithAFixedValue(in_layer:QgsRasterLayer,
                               value_to_fill:float,
@@ -286,7 +385,7 @@ def fillNoDataWithAFixedValue(in_layer:QgsRasterLayer,
         temp_dir = tempfile.gettempdir()
         out_file_path = os.path.join(temp_dir, "PaleoDEM_with_gaps_filled.tiff")
     ds = gdal.Open(in_layer.source())
-    in_array = ds.GetRasterBand(1).ReadAsArray()
+    in_array = asFloat32(ds.GetRasterBand(1).ReadAsArray())
     no_data_value = ds.GetRasterBand(1).GetNoDataValue()
     geotransform = ds.GetGeoTransform()
     width = in_layer.width()
@@ -340,89 +439,64 @@ def rasterSmoothing(in_layer, filter_type,
     """
     assert factor > 0, "The smoothing factor cannot be 0 or negative."
     assert factor <= 5, "In this version of Terra Antiqua the smoothing factor cannot be higher than 5."
-    raster_ds = gdal.Open(in_layer.source(), gdalconst.GA_Update)
-    in_band = raster_ds.GetRasterBand(1)
-    no_data_value = in_band.GetNoDataValue()
-    in_array = in_band.ReadAsArray()
-    in_array[in_array == no_data_value] = np.nan
-    nan_mask = np.isnan(in_array)
-    # Check if data contains NaN values. If it contains, interpolate values for them first
-    # If the pixels with NaN values are left empty they will cause part of the smoothed raster to get empty.
-    # Gaussian filter removes all values under the kernel, which contain at least one NaN value
-    if np.isnan(in_array).any():
-        in_array = None
-        filled_raster = fillNoData(in_layer)
-        raster_ds_filled = gdal.Open(filled_raster, gdalconst.GA_ReadOnly)
-        in_band_filled = raster_ds_filled.GetRasterBand(1)
-        in_array = in_band_filled.ReadAsArray()
-        raster_ds_filled = None
-        in_band_filled = None
-
-    if runtime_percentage:
-        total = runtime_percentage
-    else:
-        total = 100
-    total_time = (in_array.size * 0.32 / 6485401) * factor
-    imit_progress = TaProgressImitation(total, total_time, feedback)
-    imit_progress.start()
-
-    rows = in_array.shape[0]
-    cols = in_array.shape[1]
+    raster_ds = gdal.Open(in_layer.source())
     geotransform = raster_ds.GetGeoTransform()
+    raster_ds = None
+
     if filter_type == 'Gaussian filter':
-        out_array = gaussian_filter(in_array, factor / 2, mode=smoothing_mode)
+        sigma = factor / 2
+        # scipy truncates the gaussian kernel at 4 standard deviations
+        kernel_radius = int(4 * sigma + 0.5)
     elif filter_type == 'Uniform filter':
-        out_array = uniform_filter(
-            in_array, factor*3-(factor-1), mode=smoothing_mode)
-
-    # Rasterize mask layer and restore the initial values outside poligons if the smoothing is
-    # set to be done only inside  polygons
-    if mask_layer:
-        mask_array = vectorToRaster(mask_layer, geotransform, cols, rows)
-        out_array[mask_array != 1] = in_array[mask_array != 1]
-
-    # set the initial nan values back to nan
-    out_array[nan_mask] = np.nan
-
-    # Write the smoothed raster
+        size = factor*3-(factor-1)
+        kernel_radius = size // 2
+    # Gaps are filled tile by tile before smoothing. A filled cell only affects the smoothed
+    # values within the kernel radius of it, and the gap filling only looks up to 100 pixels away
+    # for values. With a halo of both, the pixels of a tile that keep their values (the gaps are set
+    # back to NaN) are the same as if the gaps of the whole raster had been filled at once.
+    halo = kernel_radius + 100
+    # The mask features are copied into an OGR layer once, and only rasterized for each tile
+    mask_rasterizer = TaWindowRasterizer(mask_layer, geotransform, no_data=0) if mask_layer else None
+
+    def smoothTile(arrays, window):
+        in_array = arrays[0]
+        nan_mask = np.isnan(in_array)
+        # Check if data contains NaN values. If it contains, interpolate values for them first
+        # If the pixels with NaN values are left empty they will cause part of the smoothed raster to get empty.
+        # Gaussian filter removes all values under the kernel, which contain at least one NaN value
+        if nan_mask.any():
+            in_array = fillNoDataInArray(in_array)
+
+        if filter_type == 'Gaussian filter':
+            out_array = gaussian_filter(in_array, sigma, mode=smoothing_mode)
+        elif filter_type == 'Uniform filter':
+            out_array = uniform_filter(in_array, size, mode=smoothing_mode)
+
+        # Rasterize mask layer and restore the initial values outside poligons if the smoothing is
+        # set to be done only inside  polygons
+        if mask_rasterizer is not None:
+            mask_array = mask_rasterizer.rasterize(window)
+            out_array[mask_array != 1] = in_array[mask_array != 1]
+
+        # set the initial nan values back to nan
+        out_array[nan_mask] = np.nan
+        return out_array
+
+    # The raster is smoothed tile by tile, so that large rasters do not need to fit into memory.
     # If the out_file argument is specified the smoothed raster will written in a new raster, otherwise the old raster will be updated
+    source = in_layer.dataProvider().dataSourceUri()
+    out_path = out_file if out_file is not None else source
+    processRasterInTiles([source], out_path, smoothTile,
+                         halo=halo,
+                         bytes_per_pixel=24,
+                         projection=in_layer.crs().toWkt(),
+                         feedback=feedback,
+                         runtime_percentage=runtime_percentage if runtime_percentage else 100)
+
     if out_file != None:
-        try:
-            if os.path.exists(out_file):
-                driver = gdal.GetDriverByName('GTiff')
-                driver.Delete(out_file)
-        except Exception as e:
-            raise e
-        smoothed_raster = gdal.GetDriverByName('GTiff').Create(
-            out_file, cols, rows, 1, gdal.GDT_Float32)
-        smoothed_raster.SetGeoTransform(geotransform)
-        crs = in_layer.crs()
-        smoothed_raster.SetProjection(crs.toWkt())
-        smoothed_band = smoothed_raster.GetRasterBand(1)
-        smoothed_band.WriteArray(out_array)
-        smoothed_band.FlushCache()
-
-        # Close datasets
-        raster_ds = None
-        smoothed_band = None
-        smoothed_raster = None
-
-        # Get the resulting layer to return
         smoothed_layer = QgsRasterLayer(out_file, 'Smoothed paleoDEM', 'gdal')
     else:
-        in_band.WriteArray(out_array)
-        in_band.FlushCache()
-
-        # Close the dataset
-        raster_ds = None
-
-        # Get the resulting layer to return
-        smoothed_layer = QgsRasterLayer(
-            in_layer.dataProvider().dataSourceUri(), 'Smoothed paleoDEM', 'gdal')
-
-    imit_progress.processingFinished.emit(True)
-    while not imit_progress.isFinished():
-        time.sleep(2)
+        smoothed_layer = QgsRasterLayer(source, 'Smoothed paleoDEM', 'gdal')
 
     return smoothed_layer
 
@@ -653,7 +727,7 @@ def setVectorSymbology(in_layer):
     layer.triggerRepaint()
 
 
-def vectorToRaster(in_layer, geotransform, width, height, feedback=None, field_to_burn=None, no_data=None, burn_value=None, output_path=None):
+def vectorToRaster(in_layer, geotransform, width, height, feedback=None, field_to_burn=None, no_data=None, burn_value=None, output_path=None, windowed=False):
     """
     Rasterizes a vector layer and returns a numpy array.
     :param in_layer: Accepted data types:
@@ -670,9 +744,32 @@ def vectorToRaster(in_layer, geotransform, width, height, feedback=None, field_t
     :param geotransform: geotransform for the resulting raster layer. Can accept geotransform (raster_ds.GetGeotransform()) extent (raster_layer.extent()) and QgsRasterLayer.
     :param width: number of columns in the raster. Should be consistent with the raster that the masks will deployed on.
     :param height: number of rows in the raster. Should be consistent with the raster that the masks will deployed on.
-    :return: Numpy array.
+    :param windowed: If True, only the pixel window covering the extent of in_layer (QgsVectorLayer) is rasterized,
+    in memory. Requires geotransform to be a geotransform tuple.
+    :return: Numpy array. In windowed mode a tuple of the array and its (row, column) offset in the full raster.
     """
 
+    if windowed:
+        return vectorToRasterWindow(in_layer, geotransform, width, height,
+                                    field_to_burn=field_to_burn,
+                                    no_data=no_data,
+                                    burn_value=burn_value)
+
+    if isinstance(geotransform, QgsRasterLayer):
+        extent = geotransform.extent()
+        geotransform = (extent.xMinimum(), extent.width() / width, 0,
+                        extent.yMaximum(), 0, -extent.height() / height)
+
+    # Vector layers are rasterized in memory over the full raster. Other inputs
+    # (layer IDs, names, sources, feature source definitions...) go through gdal:rasterize.
+    if isinstance(in_layer, QgsVectorLayer) and type(geotransform) == tuple and len(geotransform) == 6:
+        out_array, _ = vectorToRasterWindow(in_layer, geotransform, width, height,
+                                            field_to_burn=field_to_burn,
+                                            no_data=no_data,
+                                            burn_value=burn_value,
+                                            window=(slice(0, height), slice(0, width)))
+        return out_array
+
     # define the output path for the resulting raster file
     output = os.path.join(tempfile.gettempdir(
     ), "Rasterized_vector_layer.tiff") if output_path is None else output_path
@@ -781,6 +878,264 @@ def vectorToRasterOld(in_layer, geotransform, ncols, nrows):
     return raster_array
 
 
+def pointCoordinates(layer):
+    """
+    Reads the ids and coordinates of all features of a point layer into numpy arrays.
+
+    :param layer: Point vector layer.
+    :type layer: QgsVectorLayer.
+
+    :return: Feature ids, x and y coordinates.
+    :rtype: tuple.
+    """
+    request = QgsFeatureRequest().setNoAttributes()
+    ids = []
+    coordinates = []
+    for feature in layer.getFeatures(request):
+        point = feature.geometry().asPoint()
+        ids.append(feature.id())
+        coordinates.append((point.x(), point.y()))
+    coordinates = np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+    return np.array(ids, dtype=np.int64), coordinates[:, 0], coordinates[:, 1]
+
+
+def writeFieldValues(layer, field_name, ids, values, delete_missing=True):
+    """
+    Writes values to a new numeric field of a layer with a single call to the data provider.
+
+    :param layer: Vector layer to modify.
+    :type layer: QgsVectorLayer.
+    :param field_name: Name of the field to create.
+    :type field_name: str.
+    :param ids: Ids of the features to write the values to.
+    :type ids: np.ndarray.
+    :param values: Values to write.
+    :type values: np.ndarray.
+    :param delete_missing: If True, the features with a NaN value are deleted, otherwise they get a NULL value.
+    :type delete_missing: bool.
+    """
+    provider = layer.dataProvider()
+    provider.addAttributes([QgsField(field_name, QVariant.Double, "double")])
+    layer.updateFields()
+    field_index = layer.fields().indexOf(field_name)
+    missing = np.isnan(values)
+    provider.changeAttributeValues({int(feature_id): {field_index: float(value)}
+                                    for feature_id, value in zip(ids[~missing], values[~missing])})
+    if delete_missing and missing.any():
+        provider.deleteFeatures([int(feature_id) for feature_id in ids[missing]])
+
+
+def featuresToOgrLayer(features, value_field=None):
+    """
+    Copies the geometries of QGIS features into an in-memory OGR layer, so that they can be
+    rasterized with gdal.RasterizeLayer without going through the processing framework.
+    Each OGR feature gets a 'label' attribute holding the 1-based position of the feature in the input.
+
+    :param features: Features to copy. Features without geometry are skipped, but keep their label position.
+    :type features: list of QgsFeature.
+    :param value_field: Name of an attribute to copy into a 'value' field of the OGR layer (e.g. depth values to burn).
+    :type value_field: str.
+
+    :return: The OGR data source (must be kept alive as long as the layer is used) and the layer.
+    :rtype: tuple.
+    """
+    ogr_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+    ogr_layer = ogr_ds.CreateLayer('features', None, ogr.wkbUnknown)
+    ogr_layer.CreateField(ogr.FieldDefn('label', ogr.OFTInteger))
+    if value_field is not None:
+        ogr_layer.CreateField(ogr.FieldDefn('value', ogr.OFTReal))
+    layer_defn = ogr_layer.GetLayerDefn()
+    for position, feature in enumerate(features, start=1):
+        if not feature.hasGeometry():
+            continue
+        ogr_feature = ogr.Feature(layer_defn)
+        ogr_feature.SetField('label', position)
+        if value_field is not None:
+            value = feature[value_field]
+            if value != NULL and value is not None:
+                ogr_feature.SetField('value', float(value))
+        ogr_feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(feature.geometry().asWkb())))
+        ogr_layer.CreateFeature(ogr_feature)
+        ogr_feature = None
+    return ogr_ds, ogr_layer
+
+
+def rasterizeOgrLayer(ogr_layer, geotransform, width, height,
+                      data_type=gdal.GDT_Byte, burn_values=None, options=None, init_value=0):
+    """
+    Rasterizes an OGR layer into an in-memory (MEM) raster and returns the resulting array.
+
+    :param ogr_layer: The layer to rasterize. Attribute filters set on the layer are honoured.
+    :type ogr_layer: ogr.Layer.
+    :param geotransform: Geotransform of the target raster (or raster window).
+    :type geotransform: tuple.
+    :param width: Number of columns of the target raster.
+    :type width: int.
+    :param height: Number of rows of the target raster.
+    :type height: int.
+    :param data_type: GDAL data type of the target raster.
+    :param burn_values: Fixed values to burn. Not needed if an ATTRIBUTE option is given.
+    :type burn_values: list.
+    :param options: gdal.RasterizeLayer options (e.g. ['ATTRIBUTE=label'], ['MERGE_ALG=ADD']).
+    :type options: list.
+    :param init_value: Value of pixels not covered by any feature.
+
+    :return: Rasterized array.
+    :rtype: np.ndarray.
+    """
+    raster = gdal.GetDriverByName('MEM').Create('', width, height, 1, data_type)
+    raster.SetGeoTransform(geotransform)
+    band = raster.GetRasterBand(1)
+    band.Fill(init_value)
+    gdal.RasterizeLayer(raster, [1], ogr_layer,
+                        burn_values=burn_values if burn_values is not None else [],
+                        options=options if options is not None else [])
+    out_array = band.ReadAsArray()
+    band = None
+    raster = None
+    return out_array
+
+
+def boundingBoxToWindow(bounding_box, geotransform, width, height):
+    """
+    Finds the pixel window of a raster that covers a bounding box.
+
+    :param bounding_box: Bounding box in map units.
+    :type bounding_box: QgsRectangle.
+    :param geotransform: Geotransform of the raster (north-up, without rotation).
+    :type geotransform: tuple.
+    :param width: Number of columns in the raster.
+    :type width: int.
+    :param height: Number of rows in the raster.
+    :type height: int.
+
+    :return: Row and column slices of the window, or None if the box lies outside the raster.
+    :rtype: tuple.
+    """
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    col_from = int(np.floor((bounding_box.xMinimum() - upx) / xres))
+    col_to = int(np.ceil((bounding_box.xMaximum() - upx) / xres))
+    row_from = int(np.floor((bounding_box.yMaximum() - upy) / yres))
+    row_to = int(np.ceil((bounding_box.yMinimum() - upy) / yres))
+    # A box of zero width or height (e.g. a single point) still covers one pixel
+    col_to = max(col_to, col_from + 1)
+    row_to = max(row_to, row_from + 1)
+
+    col_from, col_to = max(col_from, 0), min(col_to, width)
+    row_from, row_to = max(row_from, 0), min(row_to, height)
+    if col_from >= col_to or row_from >= row_to:
+        return None
+    return (slice(row_from, row_to), slice(col_from, col_to))
+
+
+def windowGeotransform(geotransform, window):
+    """
+    Returns the geotransform of a pixel window of a raster.
+
+    :param geotransform: Geotransform of the full raster.
+    :type geotransform: tuple.
+    :param window: Row and column slices of the window.
+    :type window: tuple.
+
+    :return: Geotransform of the window.
+    :rtype: tuple.
+    """
+    rows, cols = window
+    upx, xres, xskew, upy, yskew, yres = geotransform
+    return (upx + cols.start * xres, xres, xskew,
+            upy + rows.start * yres, yskew, yres)
+
+
+def vectorToRasterWindow(in_layer, geotransform, width, height,
+                         field_to_burn=None, no_data=None, burn_value=None, window=None):
+    """
+    Rasterizes a vector layer only within the pixel window that covers its extent. The rasterization is
+    done in memory, so the memory used scales with the area of the layer's features, not with the size of the raster.
+
+    :param in_layer: Vector layer to rasterize.
+    :type in_layer: QgsVectorLayer.
+    :param geotransform: Geotransform of the full raster.
+    :type geotransform: tuple.
+    :param width: Number of columns in the full raster.
+    :type width: int.
+    :param height: Number of rows in the full raster.
+    :type height: int.
+    :param field_to_burn: A field from the attributes table to get values to burn.
+    :type field_to_burn: str.
+    :param no_data: Value of the pixels not covered by features. Defaults to np.nan.
+    :param burn_value: A fixed value to burn if field_to_burn is not specified. Defaults to 1.
+    :param window: Pixel window (rows, columns) to rasterize. Defaults to the window covering the layer's extent.
+    :type window: tuple of slices.
+
+    :return: Rasterized Float32 array of the window and its (row, column) offset in the full raster.
+    :rtype: tuple.
+    """
+    if not (type(geotransform) == tuple and len(geotransform) == 6):
+        raise ValueError("Windowed rasterization requires a geotransform tuple.")
+    assert (in_layer.featureCount(
+    ) > 0), "The Input vector layer does not contain any feature (polygon, polyline or point)."
+
+    if window is None:
+        window = boundingBoxToWindow(in_layer.extent(), geotransform, width, height)
+    if window is None:
+        return np.empty((0, 0), dtype=np.float32), (0, 0)
+    rows, cols = window
+
+    rasterizer = TaWindowRasterizer(in_layer, geotransform, field_to_burn, no_data, burn_value)
+    return rasterizer.rasterize(window), (rows.start, cols.start)
+
+
+class TaWindowRasterizer:
+    """Rasterizes a vector layer window by window (e.g. tile by tile in processRasterInTiles).
+
+    The features are copied into an in-memory OGR layer once, when the rasterizer is created,
+    and each call only rasterizes the requested window.
+    """
+
+    def __init__(self, in_layer, geotransform, field_to_burn=None, no_data=None, burn_value=None):
+        """
+        :param in_layer: Vector layer to rasterize.
+        :type in_layer: QgsVectorLayer.
+        :param geotransform: Geotransform of the full raster.
+        :type geotransform: tuple.
+        :param field_to_burn: A field from the attributes table to get values to burn.
+        :type field_to_burn: str.
+        :param no_data: Value of the pixels not covered by features. Defaults to np.nan.
+        :param burn_value: A fixed value to burn if field_to_burn is not specified. Defaults to 1.
+        """
+        assert (in_layer.featureCount(
+        ) > 0), "The Input vector layer does not contain any feature (polygon, polyline or point)."
+        self.geotransform = geotransform
+        self.no_data = no_data if no_data is not None else np.nan
+        if field_to_burn is not None:
+            self.burn_values = None
+            self.options = ['ATTRIBUTE=value']
+        else:
+            self.burn_values = [burn_value if burn_value is not None else 1]
+            self.options = None
+        self._ogr_ds, self._ogr_layer = featuresToOgrLayer(list(in_layer.getFeatures()), field_to_burn)
+
+    def rasterize(self, window):
+        """
+        Returns the rasterized features within a window of the raster.
+
+        :param window: Row and column slices of the raster.
+        :type window: tuple.
+
+        :return: Rasterized Float32 array of the window.
+        :rtype: np.ndarray.
+        """
+        rows, cols = window
+        return rasterizeOgrLayer(self._ogr_layer,
+                                 windowGeotransform(self.geotransform, window),
+                                 cols.stop - cols.start,
+                                 rows.stop - rows.start,
+                                 data_type=gdal.GDT_Float32,
+                                 burn_values=self.burn_values,
+                                 options=self.options,
+                                 init_value=self.no_data)
+
+
 def polygonsToPolylines(in_layer):
     """
     Converts polygons to polylines.
@@ -935,7 +1290,8 @@ def modMinMax(in_array, fmin: int, fmax: int):
     return out_array
 
 
-def modRescale(in_array: np.ndarray, min: int, max: int) -> np.ndarray:
+def modRescale(in_array: np.ndarray, min: int, max: int,
+               imin: float = None, imax: float = None) -> np.ndarray:
     """
     Modifies the elevation/bathimetry
     values based on the current and provided
@@ -948,6 +1304,11 @@ def modRescale(in_array: np.ndarray, min: int, max: int) -> np.ndarray:
     :type fmin: int.
     :param fmax: final maximum value of elevation/bathymetry.
     :type fmax: int.
+    :param imin: initial minimum value. Defaults to the minimum of the array (e.g. it is set to the minimum
+    of the whole raster when the raster is rescaled tile by tile).
+    :type imin: float.
+    :param imax: initial maximum value. Defaults to the maximum of the array.
+    :type imax: float.
 
     :return:rescaled array.
     :rtype:np.ndarray.
@@ -955,8 +1316,10 @@ def modRescale(in_array: np.ndarray, min: int, max: int) -> np.ndarray:
 
     # Define the initial minimum and maximum values of the array
     if in_array.size > 0 and np.isfinite(in_array).size > 0:
-        imax = in_array[np.isfinite(in_array)].max()
-        imin = in_array[np.isfinite(in_array)].min()
+        if imax is None:
+            imax = in_array[np.isfinite(in_array)].max()
+        if imin is None:
+            imin = in_array[np.isfinite(in_array)].min()
     else:
         raise ValueError("The input Array is empty.")
     out_array = in_array
@@ -978,8 +1341,7 @@ def modFormula(in_array, formula, min=None, max=None):
 
     topo = in_array
 
-    H = np.empty(topo.shape)
-    H.fill(np.nan)
+    H = np.full(topo.shape, np.nan, dtype=np.float32)
     if min != None and max != None:
         index = 'H[(H>min)*(H<max)==1]'
         H[(topo > min) * (topo < max) == 1] = topo[(topo > min) * (topo < max) == 1]
@@ -1006,6 +1368,60 @@ def modFormula(in_array, formula, min=None, max=None):
     return topo
 
 
+def toRasterLayer(layer) -> QgsRasterLayer:
+    """
+    Returns a raster layer given either as a layer or as the path to a file.
+
+    :param layer: The layer or the path of the file.
+    :type layer: QgsRasterLayer or str.
+
+    :return: The raster layer.
+    :rtype: QgsRasterLayer.
+    """
+    if isinstance(layer, QgsRasterLayer):
+        return layer
+    path = str(layer)
+    return QgsRasterLayer(path, os.path.splitext(os.path.basename(path))[0], 'gdal')
+
+
+def toVectorLayer(layer) -> QgsVectorLayer:
+    """
+    Returns a vector layer given either as a layer or as the path to a file.
+
+    :param layer: The layer or the path of the file.
+    :type layer: QgsVectorLayer or str.
+
+    :return: The vector layer.
+    :rtype: QgsVectorLayer.
+    """
+    if isinstance(layer, QgsVectorLayer):
+        return layer
+    path = str(layer)
+    return QgsVectorLayer(path, os.path.splitext(os.path.basename(path))[0], 'ogr')
+
+
+def featureValue(parameter, context, as_int: bool = False):
+    """
+    Returns the value of a parameter for the feature of an expression context: the value of its override
+    if it is set and gives a value for the feature, otherwise its default value.
+
+    :param parameter: The parameter.
+    :type parameter: TaFeatureValue.
+    :param context: Expression context with the feature set.
+    :type context: QgsExpressionContext.
+    :param as_int: Convert the value of the override to an integer.
+    :type as_int: bool.
+    """
+    override = parameter.override
+    if override is not None:
+        if not isinstance(override, QgsProperty):
+            override = QgsProperty.fromExpression(str(override))
+        value, ok = override.valueAsInt(context) if as_int else override.value(context)
+        if ok:
+            return value
+    return parameter.value
+
+
 # for now is used for output paths. Modify the raise texts to fit in other contexts.
 def isPathValid(path: str, output_type: str) -> tuple:
     """
@@ -1108,7 +1524,7 @@ def generateUniqueIds(vlayer, id_field) -> QgsVectorLayer:
     return vlayer
 
 
-def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime_percentage):
+def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime_percentage, rng=None):
     """
     Creates random points inside polygons.
 
@@ -1117,6 +1533,8 @@ def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime
     :param min_distance: Minimum distance that will be kept between created points.
     :param feedback: a feedback object to provide progress and other info to user. For now a Qthread object is passed to use its pyqtsignals, functions and attributes for feedback purposes.
     :param runtime_percentage: time that this part of the algorithm will take (this function is run inside an algorithm e.g. Feature Creator) in percent (e.g. 10%)
+    :param rng: Random number generator. A new unseeded one is used if not given.
+    :type rng: np.random.Generator.
     """
     progress_count = feedback.progress
 
@@ -1150,7 +1568,6 @@ def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime
         engine = QgsGeometry.createGeometryEngine(fGeom.constGet())
         engine.prepareGeometry()
 
-        bbox = fGeom.boundingBox()
         area = da.measureArea(fGeom)
         if da.areaUnits() != QgsUnitTypes.AreaSquareDegrees:
             area = da.convertAreaMeasurement(area, QgsUnitTypes.AreaSquareDegrees)
@@ -1162,17 +1579,6 @@ def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime
                 "Warning: Skip feature {} while creating random points as number of points for it is 0.".format(f.id()))
             continue
 
-        index = None
-        if min_distance:
-            index = QgsSpatialIndex()
-        points = dict()
-
-        nPoints = 0
-        nIterations = 0
-        maxIterations = pointCount * 200
-        feature_total = total / pointCount if pointCount else 1
-
-        random.seed()
         try:
             feedback.info(
                 "{0} random points being created inside feature <b>{1}</b>.".format(
@@ -1184,37 +1590,21 @@ def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime
             feedback.info("{0} random points being created inside feature ID {1}.".format(
                 pointCount, f.id()))
 
-        while nIterations < maxIterations and nPoints < pointCount:
-            if feedback.canceled:
-                break
-
-            rx = bbox.xMinimum() + bbox.width() * random.random()
-            ry = bbox.yMinimum() + bbox.height() * random.random()
-
-            p = QgsPointXY(rx, ry)
-            geom = QgsGeometry.fromPointXY(p)
-            if engine.contains(geom.constGet()) and \
-                    (not min_distance or vector.checkMinDistance(p, index, min_distance, points)):
-                f = QgsFeature(nPoints)
-                f.initAttributes(1)
-                f.setFields(fields)
-                f.setAttribute('id', pointId)
-                f.setGeometry(geom)
-                created_features.append(f)
-                if min_distance:
-                    index.addFeature(f)
-                points[nPoints] = p
-                nPoints += 1
-                pointId += 1
-                if int(progress_count) < int(nPoints*feature_total):
-                    progress_count += int(nPoints*feature_total)
-                    feedback.progress = progress_count
-            nIterations += 1
-
-        if nPoints < pointCount:
+        x, y = randomPointsInGeometry(fGeom, pointCount, min_distance, engine=engine, rng=rng)
+        if x.size < pointCount:
             feedback.info(
                 'Could not generate requested number of random points. Maximum number of attempts exceeded.')
 
+        for px, py in zip(x.tolist(), y.tolist()):
+            point_feature = QgsFeature(fields, pointId)
+            point_feature.setAttributes([pointId])
+            point_feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(px, py)))
+            created_features.append(point_feature)
+            pointId += 1
+
+        progress_count += total
+        feedback.progress = int(progress_count)
+
     points_layer_dp.addFeatures(created_features)
     points_layer_dp = None
     nPolygons = source.featureCount()
@@ -1224,6 +1614,158 @@ def randomPointsInPolygon(source, point_density, min_distance, feedback, runtime
     return points_layer
 
 
+def randomPointsInGeometry(geometry, point_count, min_distance=None, max_attempts=None,
+                           engine=None, batch_size=8192, rng=None):
+    """
+    Creates random points inside a polygon geometry. Candidate points are drawn in batches and tested in bulk
+    against a raster of the polygon: candidates in cells lying completely inside the polygon are accepted directly,
+    and only candidates in cells touched by the outline are tested against the exact geometry.
+
+    :param geometry: Polygon geometry.
+    :type geometry: QgsGeometry.
+    :param point_count: Number of points to create.
+    :type point_count: int.
+    :param min_distance: Minimum distance that will be kept between created points.
+    :type min_distance: float.
+    :param max_attempts: Maximum number of candidate points to draw. Defaults to 200 times the number of points.
+    :type max_attempts: int.
+    :param engine: Prepared geometry engine of the geometry. Created if not given.
+    :type engine: QgsGeometryEngine.
+    :param batch_size: Number of candidate points drawn at once.
+    :type batch_size: int.
+    :param rng: Random number generator. A new unseeded one is used if not given.
+    :type rng: np.random.Generator.
+
+    :return: x and y coordinates of the points. Fewer points than requested are returned if the maximum
+    number of attempts is exceeded.
+    :rtype: tuple.
+    """
+    bbox = geometry.boundingBox()
+    xmin, ymax = bbox.xMinimum(), bbox.yMaximum()
+    width, height = bbox.width(), bbox.height()
+    if point_count <= 0 or width <= 0 or height <= 0:
+        return np.empty(0), np.empty(0)
+    if engine is None:
+        engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+        engine.prepareGeometry()
+    if max_attempts is None:
+        max_attempts = point_count * 200
+
+    # Raster of the polygon used for bulk containment tests
+    cell_size = max(width, height) / 1024
+    ncols = max(int(np.ceil(width / cell_size)), 1)
+    nrows = max(int(np.ceil(height / cell_size)), 1)
+    cells_geotransform = (xmin, cell_size, 0, ymax, 0, -cell_size)
+    ogr_geometry = ogr.CreateGeometryFromWkb(bytes(geometry.asWkb()))
+    outline = rasterizeGeometry(ogr_geometry.Boundary(), cells_geotransform, ncols, nrows,
+                                options=['ALL_TOUCHED=TRUE'])
+    inside = rasterizeGeometry(ogr_geometry, cells_geotransform, ncols, nrows) * ~outline
+
+    point_grid = TaPointHashGrid(xmin, bbox.yMinimum(), min_distance) if min_distance else None
+    rng = rng if rng is not None else np.random.default_rng()
+    x_parts, y_parts = [], []
+    n_points = 0
+    n_attempts = 0
+    while n_points < point_count and n_attempts < max_attempts:
+        n = min(batch_size, max_attempts - n_attempts)
+        n_attempts += n
+        x = xmin + width * rng.random(n)
+        y = ymax - height * rng.random(n)
+
+        cols = np.minimum(((x - xmin) / cell_size).astype(np.int64), ncols - 1)
+        rows = np.minimum(((ymax - y) / cell_size).astype(np.int64), nrows - 1)
+        contained = inside[rows, cols]
+        for i in np.flatnonzero(outline[rows, cols]):
+            contained[i] = engine.contains(QgsPoint(x[i], y[i]))
+        x, y = x[contained], y[contained]
+
+        if point_grid is not None:
+            accepted = point_grid.add(x, y, point_count - n_points)
+            x, y = x[accepted], y[accepted]
+        else:
+            x, y = x[:point_count - n_points], y[:point_count - n_points]
+        x_parts.append(x)
+        y_parts.append(y)
+        n_points += x.size
+
+    return np.concatenate(x_parts), np.concatenate(y_parts)
+
+
+class TaPointHashGrid:
+    """Keeps a minimum distance between points using a grid hash.
+
+    The cell size of the grid is min_distance/sqrt(2), so each cell holds at most one point and only the
+    5x5 block of cells around a point can hold points closer than the minimum distance. The occupied cells
+    are stored as sorted keys, so the memory used depends on the number of points, not on the extent.
+    """
+
+    _ROW_STRIDE = 2 ** 32
+
+    def __init__(self, origin_x, origin_y, min_distance):
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.min_distance = min_distance
+        self.cell_size = min_distance / np.sqrt(2)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+    def _cells(self, x, y):
+        rows = np.floor((y - self.origin_y) / self.cell_size).astype(np.int64)
+        cols = np.floor((x - self.origin_x) / self.cell_size).astype(np.int64)
+        return rows, cols
+
+    def _isFarEnough(self, x, y, rows, cols):
+        far_enough = np.ones(x.shape, dtype=bool)
+        if self.keys.size == 0:
+            return far_enough
+        for row_offset in range(-2, 3):
+            for col_offset in range(-2, 3):
+                keys = (rows + row_offset) * self._ROW_STRIDE + cols + col_offset
+                positions = np.minimum(np.searchsorted(self.keys, keys), self.keys.size - 1)
+                occupied = self.keys[positions] == keys
+                distance_sq = (self.x[positions] - x) ** 2 + (self.y[positions] - y) ** 2
+                far_enough &= ~(occupied * (distance_sq < self.min_distance ** 2))
+        return far_enough
+
+    def add(self, x, y, max_count=None):
+        """
+        Adds the points that are not closer than the minimum distance to any point already in the grid or to
+        each other. Candidates are processed in nine phases of cells that are at least three cells apart,
+        so that the candidates of one phase cannot conflict with each other.
+
+        :param x, y: Coordinates of the candidate points.
+        :type x, y: np.ndarray.
+        :param max_count: Maximum number of points to add.
+        :type max_count: int.
+
+        :return: Mask of the accepted candidates.
+        :rtype: np.ndarray.
+        """
+        accepted = np.zeros(x.shape, dtype=bool)
+        rows, cols = self._cells(x, y)
+        # Only the first candidate in each cell can be accepted
+        _, candidates = np.unique(rows * self._ROW_STRIDE + cols, return_index=True)
+        candidates.sort()
+        n_accepted = 0
+        for phase in range(9):
+            in_phase = candidates[(rows[candidates] % 3 == phase // 3) * (cols[candidates] % 3 == phase % 3)]
+            in_phase = in_phase[self._isFarEnough(x[in_phase], y[in_phase], rows[in_phase], cols[in_phase])]
+            if max_count is not None:
+                in_phase = in_phase[:max_count - n_accepted]
+            if in_phase.size == 0:
+                continue
+            accepted[in_phase] = True
+            n_accepted += in_phase.size
+
+            keys = np.concatenate((self.keys, rows[in_phase] * self._ROW_STRIDE + cols[in_phase]))
+            order = np.argsort(keys, kind='stable')
+            self.keys = keys[order]
+            self.x = np.concatenate((self.x, x[in_phase]))[order]
+            self.y = np.concatenate((self.y, y[in_phase]))[order]
+        return accepted
+
+
 def bufferAroundGeometries(in_layer: Union[QgsVectorLayer, QgsFeatureIterator],
                            buf_dist: int,
                            num_segments: int,
@@ -1439,18 +1981,6 @@ def exportArrayToGeoTIFF(path, data, lons, lats, crs):
     # Close the output dataset and flush changes to disk
     out_raster = None
 
-def clipArrayToExtent(raster, extent):
-    minlon, maxlon, minlat, maxlat = extent
-    
-    lon_indices = np.where((raster.lons >= minlon) & (raster.lons <= maxlon))[0]
-    lat_indices = np.where((raster.lats >= minlat) & (raster.lats <= maxlat))[0]
-    
-    raster._data = raster._data[np.min(lat_indices):np.max(lat_indices)+1,
-                                    np.min(lon_indices):np.max(lon_indices)+1]
-    
-    raster.lons = raster.lons[np.min(lon_indices):np.max(lon_indices)+1]
-    raster.lats = raster.lats[np.min(lat_indices):np.max(lat_indices)+1]
-    
 def partitionIntoPlates(partitioning_features,
                         rotation_model,
                         features_to_partition,
@@ -1459,10 +1989,11 @@ def partitionIntoPlates(partitioning_features,
                         output_path):
     """Partitions features into plates using pygplates.partition_into_plates.
 
-    :param partitioning_features: Path to the partitioning features file (e.g. static polygons).
-    :type partitioning_features: str or list of str.
-    :param rotation_model: Path to the rotation model file(s).
-    :type rotation_model: str or list of str.
+    :param partitioning_features: Path to the partitioning features file (e.g. static polygons),
+        or the parsed features.
+    :type partitioning_features: str, list of str or list of pygplates.FeatureCollection.
+    :param rotation_model: Path to the rotation model file(s), or the parsed rotation model.
+    :type rotation_model: str, list of str or pygplates.RotationModel.
     :param features_to_partition: Path to the features file to be partitioned.
     :type features_to_partition: str.
     :param reconstruction_time: The geological time to reconstruct/resolve the partitioning features to.
@@ -1501,8 +2032,8 @@ def partitionIntoPlates(partitioning_features,
 
 def convertAgeToDepth(ocean_age, reconstruction_time, age_raster_time):
     # create an empty array to store calculated ocean depth from age.
-    ocean_depth = np.empty(ocean_age.shape)
-    ocean_depth[:] = np.nan
+    ocean_depth = np.full(ocean_age.shape, np.nan, dtype=np.float32)
+    ocean_age = asFloat32(ocean_age)
     
     # calculate ocean age
     time_difference = reconstruction_time - age_raster_time
@@ -1565,6 +2096,174 @@ class TaProgressImitation(QThread):
         self.ProgressStoped = True
 
 
+def pythonExecutable():
+    """
+    Finds the Python interpreter of the QGIS installation. Inside QGIS sys.executable may point to the
+    QGIS application itself, which cannot be used to start worker processes.
+
+    :return: Path to the Python interpreter, or None if it cannot be found.
+    :rtype: str.
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    names = ["python.exe", "pythonw.exe"] if os.name == "nt" else ["python3", "python"]
+    folders = [sys.exec_prefix,
+               os.path.join(sys.exec_prefix, "bin"),
+               os.path.dirname(sys.executable),
+               os.path.join(os.path.dirname(sys.executable), "bin")]
+    for folder in folders:
+        for name in names:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def createProcessPool(max_workers=None, initializer=None, initargs=()):
+    """
+    Creates a pool of worker processes. The workers are started with a fresh Python interpreter (spawn),
+    so that they do not inherit the state of QGIS, and can therefore only run functions that do not depend on QGIS.
+
+    :param max_workers: Number of worker processes. Defaults to the number of CPUs.
+    :type max_workers: int.
+    :param initializer: Function called with initargs when each worker process starts.
+    :type initializer: callable.
+    :param initargs: Arguments of the initializer.
+    :type initargs: tuple.
+
+    :return: The process pool, or None if the Python interpreter could not be found.
+    :rtype: ProcessPoolExecutor.
+    """
+    python = pythonExecutable()
+    if python is None:
+        return None
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(python)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                               initializer=initializer, initargs=initargs)
+
+
+def terminateProcessPool(pool, timeout=10):
+    """
+    Stops a pool of worker processes without waiting for the running tasks: the tasks that have not started
+    are canceled and the worker processes are terminated.
+
+    :param pool: Process pool created with createProcessPool.
+    :type pool: ProcessPoolExecutor.
+    :param timeout: Time to wait for each worker process to stop, in seconds.
+    :type timeout: float.
+    """
+    # The processes are taken before the shutdown, which releases them
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join(timeout)
+
+
+def currentMemoryUsage():
+    """
+    Returns the resident memory of the QGIS process. psutil is used if it is available,
+    otherwise /proc is read (Linux only).
+
+    :return: Resident memory in bytes, or None if it cannot be determined.
+    :rtype: int.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peakMemoryUsage():
+    """
+    Returns the peak resident memory (high-water mark) of the QGIS process, as recorded by the OS:
+    VmHWM on Linux, the peak working set on Windows (psutil is needed) and ru_maxrss on the other systems.
+
+    :return: Peak resident memory in bytes, or None if it cannot be determined.
+    :rtype: int.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    if sys.platform == 'win32':
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except (ImportError, AttributeError):
+            return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on the other systems
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def resetPeakMemoryUsage():
+    """
+    Resets the peak resident memory recorded by the OS to the current resident memory. This is only
+    possible on Linux (/proc/self/clear_refs).
+
+    :return: True if the peak was reset.
+    :rtype: bool.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class TaMemoryMonitor(QThread):
+    """
+    Measures the peak resident memory of the process while an algorithm runs.
+
+    The high-water mark recorded by the OS is used if it covers the run: on Linux it is reset when the
+    monitor is created, on the other systems it is used if the run raised it. Otherwise the memory is
+    sampled every interval seconds, and peaks shorter than that can be missed (sampled is True).
+    """
+
+    def __init__(self, interval=0.2):
+        super().__init__()
+        self.interval = interval
+        self.stopped = False
+        self.sampled = True
+        self.start_memory = currentMemoryUsage()
+        self.peak_memory = self.start_memory
+        self._peak_reset = resetPeakMemoryUsage()
+        self._start_peak = peakMemoryUsage()
+
+    def run(self):
+        while not self.stopped and self.peak_memory is not None:
+            memory = currentMemoryUsage()
+            if memory is not None and memory > self.peak_memory:
+                self.peak_memory = memory
+            time.sleep(self.interval)
+        peak = peakMemoryUsage()
+        if peak is not None and self.peak_memory is not None and \
+                (self._peak_reset or (self._start_peak is not None and peak > self._start_peak)):
+            self.peak_memory = max(peak, self.peak_memory)
+            self.sampled = False
+
+    def stop(self):
+        self.stopped = True
+
+
 class TaFeedbackOld(QObject):
     finished = pyqtSignal(bool)
 
@@ -1601,3 +2300,73 @@ class TaVectorFileWriter(QgsVectorFileWriter):
             result = TaVectorFileWriter.writeAsVectorFormat2(
                 layer, fileName, context, options)
         return result
+
+
+class TaFeatureRasterizer:
+    """Rasterizes a set of polygon features in a single pass and serves a mask for each of them.
+
+    All features are burned once into an in-memory label raster, in which each pixel holds the
+    (1-based) position of the feature covering it. A second pass counts how many features cover each
+    pixel. Masks of features that touch pixels covered by more than one feature are re-rasterized
+    individually within their own window, so that overlapping polygons still get complete masks.
+    """
+
+    def __init__(self, features, geotransform, width, height):
+        self.features = list(features)
+        self.geotransform = geotransform
+        self.width = width
+        self.height = height
+        self._ogr_ds, self._ogr_layer = featuresToOgrLayer(self.features)
+
+        label_type = gdal.GDT_UInt16 if len(self.features) < 65535 else gdal.GDT_UInt32
+        self.labels = rasterizeOgrLayer(self._ogr_layer, geotransform, width, height,
+                                        data_type=label_type,
+                                        options=['ATTRIBUTE=label'])
+        # The counts use the type of the labels, so that they do not wrap around before the labels do
+        self.coverage = rasterizeOgrLayer(self._ogr_layer, geotransform, width, height,
+                                          data_type=label_type,
+                                          burn_values=[1],
+                                          options=['MERGE_ALG=ADD'])
+
+    def __len__(self):
+        return len(self.features)
+
+    def window(self, index):
+        """Returns the pixel window (row and column slices) covering the bounding box of a feature,
+        or None if the feature has no geometry or lies outside the raster."""
+        feature = self.features[index]
+        if not feature.hasGeometry():
+            return None
+        return boundingBoxToWindow(feature.geometry().boundingBox(),
+                                   self.geotransform, self.width, self.height)
+
+    def mask(self, index, window=None):
+        """
+        Returns the mask of a feature within a window of the raster.
+
+        :param index: Position of the feature in the list of features passed to the rasterizer.
+        :type index: int.
+        :param window: Row and column slices of the raster to return the mask for. Defaults to the bounding box
+        window of the feature.
+        :type window: tuple.
+
+        :return: Boolean mask of the feature inside the window and the window itself. (None, None) if the
+        feature does not cover any pixel of the raster.
+        :rtype: tuple.
+        """
+        if window is None:
+            window = self.window(index)
+            if window is None:
+                return None, None
+
+        if self.coverage[window].max(initial=0) > 1:
+            rows, cols = window
+            self._ogr_layer.SetAttributeFilter("label = {}".format(index + 1))
+            mask_array = rasterizeOgrLayer(self._ogr_layer, windowGeotransform(self.geotransform, window),
+                                           cols.stop - cols.start, rows.stop - rows.start,
+                                           burn_values=[1]) == 1
+            self._ogr_layer.SetAttributeFilter(None)
+        else:
+            mask_array = self.labels[window] == index + 1
+
+        return mask_array, window
@@ -3,7 +3,8 @@
 #Full copyright notice in file: terra_antiqua.py
 
 
-from PyQt5.QtWidgets import QComboBox
+import os
+from PyQt5.QtWidgets import QComboBox, QSpinBox
 from .base_dialog import TaBaseDialog
 from .widgets import (
                         TaRasterLayerComboBox,
@@ -74,6 +75,21 @@ class TaCreateTopoBathyDlg(TaBaseDialog):
         self.keepHighTopoCheckBox = self.addAdvancedParameter(TaCheckBox,
                                                                 label="Keep higher topography",
                                                                 variant_index="Mountain range")
+
+        self.generationMethodBox = self.addAdvancedParameter(QComboBox, label="Generation method:")
+        self.generationMethodBox.addItems(["Random points and interpolation",
+                                           "Raster distance transform (no random points)"])
+        self.distanceMethodBox = self.addAdvancedParameter(QComboBox, label="Distance to feature outlines:")
+        self.distanceMethodBox.addItems(["Nearest outline vertex (KD-tree)",
+                                         "Raster distance transform"])
+
+        #Parameters for parallel processing
+        self.parallelProcessingCheckBox = self.addAdvancedParameter(TaCheckBox,
+                                                                     label="Create features in parallel processes")
+        self.processCountBox = self.addAdvancedParameter(QSpinBox, label="Number of processes:")
+        self.processCountBox.setRange(1, os.cpu_count() or 1)
+        self.processCountBox.setValue(os.cpu_count() or 1)
+        self.parallelProcessingCheckBox.registerEnabledWidgets([self.processCountBox])
         self.fillDialog()
         self.showVariantWidgets(self.featureTypeBox.currentText())
         self.featureTypeBox.currentTextChanged.connect(self.showVariantWidgets)
@@ -818,5 +818,14 @@ class TaManageInputFilesDlg(QtWidgets.QDialog):
                     rasters_groupbox.hide()
             cache_manager.signals.initialized.connect(_deferred_populate)
         
+        def _on_models_updated():
+            selected = model_list_view.currentIndex().data()
+            model_list.setStringList(cache_manager.get_available_models())
+            if selected in model_list.stringList():
+                model_list_view.setCurrentIndex(model_list.index(model_list.stringList().index(selected)))
+        # The models are repopulated when the model manifest is refreshed in the background
+        cache_manager.signals.models_updated.connect(_on_models_updated)
+        self.destroyed.connect(lambda: cache_manager.signals.models_updated.disconnect(_on_models_updated))
+        
         vertical_splitter.setSizes([400, 200])
         
@@ -8,6 +8,7 @@ from qgis.gui import QgsDoubleSpinBox, QgsFileWidget
 from .base_dialog import TaBaseDialog
 from .widgets import TaSpinBox, TaCheckBox, TaRasterLayerComboBox, TaComposedParameter
 from ..core.cache_manager import cache_manager
+from ..core.raster_export import outputExtension
 import tempfile
 import os
 
@@ -30,6 +31,17 @@ class TaReconstructRastersDlg(TaBaseDialog):
                 self.setDialogName(name)
         self.loadHelp()
 
+    def updateModels(self):
+        """
+        Repopulates the models when the model manifest is refreshed in the background, keeping the
+        selected model if it is still available.
+        """
+        previous = self.modelName.currentData(QtCore.Qt.UserRole)
+        self._set_available_models(self.rasterType.currentText())
+        index = self.modelName.findData(previous, QtCore.Qt.UserRole)
+        if index >= 0:
+            self.modelName.setCurrentIndex(index)
+
     def defineParameters(self):
         """ Adds parameters to a list object that is used by the TaBaseDialog
         class to create widgets and place them parameters tab.
@@ -72,6 +84,7 @@ class TaReconstructRastersDlg(TaBaseDialog):
                 self.modelName.setItemData(index, model, QtCore.Qt.UserRole)
         self._set_available_models = set_available_models
         self.rasterType.currentTextChanged.connect(set_available_models)
+        cache_manager.signals.models_updated.connect(self.updateModels)
         
         # Topography specific parameters:
         ## Input raster:
@@ -292,6 +305,11 @@ class TaReconstructRastersDlg(TaBaseDialog):
         self.spreading_rate.setMaximum(1000)
         self.spreading_rate.setValue(75.)
         
+        ## Output format
+        self.outputFormat = self.addAdvancedParameter(QComboBox, "Output format:")
+        self.outputFormat.addItem("NetCDF4 (compressed)", "netcdf")
+        self.outputFormat.addItem("Cloud-Optimized GeoTIFF", "cog")
+        
         # Fill the parameters' tab of the Dialog with the defined parameters
         self.fillDialog()
         self.showVariantWidgets(self.rasterType.currentText())
@@ -351,10 +369,11 @@ class TaReconstructRastersDlg(TaBaseDialog):
             else:
                 self.outputPathLabel.setText('Output file path:')
                 self.outputPath.setStorageMode(QgsFileWidget.StorageMode.SaveFile)
+                extension = outputExtension(self.outputFormat.currentData(QtCore.Qt.UserRole))
                 path = os.path.join(tempfile.gettempdir(),
-                                    f"{raster_type}_{reconstruction_time}.0_{model_name}.nc")
+                                    f"{raster_type}_{reconstruction_time}.0_{model_name}{extension}")
                 self.outputPath.lineEdit().setPlaceholderText(path)
-                self.outputPath.setFilter('*.nc')
+                self.outputPath.setFilter(f'*{extension}')
                        
         self.rasterType.currentTextChanged.connect(update_output_path)
         self.modelName.currentTextChanged.connect(update_output_path)
@@ -366,4 +385,5 @@ class TaReconstructRastersDlg(TaBaseDialog):
         self.endTime.spinBox.valueChanged.connect(update_output_path)
         self.convertToBathymetry.stateChanged.connect(update_output_path)
         self.saveAll.stateChanged.connect(update_output_path)
+        self.outputFormat.currentIndexChanged.connect(update_output_path)
         self.setDefaultOutFilePath = update_output_path
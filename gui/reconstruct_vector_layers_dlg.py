@@ -17,6 +17,18 @@ class TaReconstructVectorLayersDlg(TaBaseDialog):
         super(TaReconstructVectorLayersDlg, self).__init__(parent)
         self.defineParameters()
 
+    def updateModels(self):
+        """
+        Repopulates the models when the model manifest is refreshed in the background, keeping the
+        selected model if it is still available.
+        """
+        previous = self.modelName.currentData(QtCore.Qt.UserRole)
+        self._set_available_models()
+        index = self.modelName.findData(previous, QtCore.Qt.UserRole)
+        if index >= 0:
+            self.modelName.setCurrentIndex(index)
+        self._set_available_layers()
+
     def defineParameters(self):
         """ Adds parameters to a list object that is used by the TaBaseDialog
         class to create widgets and place them parameters tab.
@@ -42,6 +54,7 @@ class TaReconstructVectorLayersDlg(TaBaseDialog):
                 self.modelName.setItemData(index, tooltip, QtCore.Qt.ToolTipRole)
                 self.modelName.setItemData(index, model, QtCore.Qt.UserRole)
         self._set_available_models = set_available_models
+        cache_manager.signals.models_updated.connect(self.updateModels)
         if cache_manager.is_initialized:
             set_available_models()
         else:
@@ -89,6 +89,11 @@ class TaStandardProcessingDlg(TaBaseDialog):
 
         self.smoothingBox.registerEnabledWidgets([self.smoothingTypeBox,
                                                   self.smFactorSpinBox])
+        self.interpolationEngineBox = self.addAdvancedParameter(QComboBox,
+                                                                label="Interpolation engine:",
+                                                                variant_index="Fill gaps")
+        self.interpolationEngineBox.addItems(["GDAL (inverse distance weighting)",
+                                              "Native (nearest neighbour and relaxation)"])
 
         # Parameters for Copying and pasting raster data
         self.copyFromRasterBox = self.addVariantParameter(TaRasterLayerComboBox,
@@ -211,19 +216,9 @@ class TaStandardProcessingDlg(TaBaseDialog):
         self.assignPlateIDsModelName = self.addVariantParameter(
             QComboBox, "Assign plate IDs", "Name of rotation model:")
         self.assignPlateIDsModelName.setStyleSheet("combobox-popup: 0;")
-        model_list = cache_manager.get_available_models(
-            required_layers=["Static Polygons"])
-        for model in model_list:
-            self.assignPlateIDsModelName.addItem(model)
-            symbol, tooltip = cache_manager.get_icon_and_tooltip(model)
-            display_text = f"{model} {symbol}"
-            index = self.assignPlateIDsModelName.count() - 1
-            self.assignPlateIDsModelName.setItemData(
-                index, display_text, QtCore.Qt.DisplayRole)
-            self.assignPlateIDsModelName.setItemData(
-                index, tooltip, QtCore.Qt.ToolTipRole)
-            self.assignPlateIDsModelName.setItemData(
-                index, model, QtCore.Qt.UserRole)
+        self.setAssignPlateIDsModels()
+        # The models are repopulated when the model manifest is refreshed in the background
+        cache_manager.signals.models_updated.connect(self.setAssignPlateIDsModels)
 
         self.assignPlateIDsTime = self.addVariantParameter(
             TaSpinBox, "Assign plate IDs", "Time of the input layer (in Ma):")
@@ -317,6 +312,27 @@ class TaStandardProcessingDlg(TaBaseDialog):
         else:
             self.paleoshorelinesMask.setLayer(self.smoothingMaskBox.layer(0))
 
+    def setAssignPlateIDsModels(self):
+        """Populates the models of Assign plate IDs, keeping the selected model if it is still available."""
+        previous = self.assignPlateIDsModelName.currentData(QtCore.Qt.UserRole)
+        self.assignPlateIDsModelName.clear()
+        model_list = cache_manager.get_available_models(
+            required_layers=["Static Polygons"])
+        for model in model_list:
+            self.assignPlateIDsModelName.addItem(model)
+            symbol, tooltip = cache_manager.get_icon_and_tooltip(model)
+            display_text = f"{model} {symbol}"
+            index = self.assignPlateIDsModelName.count() - 1
+            self.assignPlateIDsModelName.setItemData(
+                index, display_text, QtCore.Qt.DisplayRole)
+            self.assignPlateIDsModelName.setItemData(
+                index, tooltip, QtCore.Qt.ToolTipRole)
+            self.assignPlateIDsModelName.setItemData(
+                index, model, QtCore.Qt.UserRole)
+        index = self.assignPlateIDsModelName.findData(previous, QtCore.Qt.UserRole)
+        if index >= 0:
+            self.assignPlateIDsModelName.setCurrentIndex(index)
+
     def addColorPalette(self) -> bool:
         """Adds a custom color palette to TA resources folder and to displays its name in the color palettes' combobox.
 
@@ -0,0 +1,75 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Benchmark of the gap filling engines (GDAL fill nodata vs native numpy/scipy).
+
+A synthetic surface is punched with circular gaps, filled with each engine, and
+the run time and the error against the original surface are reported.
+
+Run from the QGIS plugins directory (the plugin must be importable as a package)::
+
+    python -m terra_antiqua.test.benchmark_fill_nodata --rows 1800 --cols 3600
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+from ..core.utils import fillNoDataInArray  # noqa: E402
+
+
+def make_surface(rows, cols, n_gaps, max_radius, seed):
+    """Returns a smooth synthetic topography and a copy of it with circular gaps."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols].astype(np.float32)
+    surface = (2000 * np.sin(x / cols * 6 * np.pi) * np.cos(y / rows * 4 * np.pi)
+               + 0.5 * x - 0.3 * y).astype(np.float32)
+    with_gaps = surface.copy()
+    for _ in range(n_gaps):
+        row, col = rng.integers(0, rows), rng.integers(0, cols)
+        radius = rng.integers(2, max_radius)
+        r0, r1 = max(row - radius, 0), min(row + radius + 1, rows)
+        c0, c1 = max(col - radius, 0), min(col + radius + 1, cols)
+        disc = (y[r0:r1, c0:c1] - row) ** 2 + (x[r0:r1, c0:c1] - col) ** 2 <= radius ** 2
+        with_gaps[r0:r1, c0:c1][disc] = np.nan
+    return surface, with_gaps
+
+
+def run(rows, cols, n_gaps, max_radius, repeats, seed):
+    surface, with_gaps = make_surface(rows, cols, n_gaps, max_radius, seed)
+    gaps = np.isnan(with_gaps)
+    print("Raster: {}x{}, gap cells: {} ({:.2f}%)".format(
+        rows, cols, gaps.sum(), 100 * gaps.mean()))
+    print("{:<8} {:>10} {:>10} {:>10} {:>8}".format(
+        "engine", "best (s)", "mean (s)", "RMSE (m)", "unfilled"))
+    for method in ("gdal", "native"):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            filled = fillNoDataInArray(with_gaps, method=method)
+            timings.append(time.perf_counter() - start)
+        errors = filled[gaps] - surface[gaps]
+        rmse = np.sqrt(np.nanmean(errors ** 2))
+        print("{:<8} {:>10.3f} {:>10.3f} {:>10.2f} {:>8}".format(
+            method, min(timings), sum(timings) / len(timings), rmse,
+            int(np.isnan(filled[gaps]).sum())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=900)
+    parser.add_argument("--cols", type=int, default=1800)
+    parser.add_argument("--gaps", type=int, default=200,
+                        help="Number of circular gaps.")
+    parser.add_argument("--max-radius", type=int, default=40,
+                        help="Maximum gap radius in pixels.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, args.cols, args.gaps, args.max_radius, args.repeats, args.seed)
@@ -0,0 +1,272 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Benchmark of the time Terra Antiqua adds to QGIS startup and to the first use of each tool.
+
+The startup of the plugin is replayed headless against the QgisInterface stub:
+TerraAntiquaStub is created and its initGui called, the real plugin is loaded
+(_load_real_plugin), and each init* entry point of TerraAntiqua is called once,
+as on the first click on its toolbar button. The wall-clock time of every step
+is recorded, together with the modules imported during the step and their
+import times, in the same form as ``python -X importtime`` (self and cumulative
+time in microseconds, and the nesting level). Modules already imported (QGIS,
+PyQt) are not counted, so each step shows only what it adds.
+
+The report is written as JSON. Pass the report of an earlier release with
+--baseline to print the change of each step.
+
+Run from the QGIS plugins directory (the plugin must be importable as a package)::
+
+    python -m terra_antiqua.test.benchmark_startup --output startup.json
+"""
+
+import argparse
+import datetime
+import importlib
+import importlib.abc
+import json
+import os
+import platform
+import sys
+import time
+
+from .utilities import get_qgis_app
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+# Name of the plugin package (e.g. terra_antiqua)
+PLUGIN_PACKAGE = __package__.rsplit(".", 1)[0]
+
+
+class _TimedLoader:
+    """Loader wrapper that records the time spent executing a module."""
+
+    def __init__(self, loader, timer, name):
+        self._loader = loader
+        self._timer = timer
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+    def create_module(self, spec):
+        # Extension modules do most of their work when the module is created
+        return self._timer.timed(self._name, self._loader.create_module, spec)
+
+    def exec_module(self, module):
+        return self._timer.timed(self._name, self._loader.exec_module, module)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Import hook recording the self and cumulative import time of every module imported while
+    it is installed, like ``python -X importtime``.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self._finding = set()
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *args):
+        sys.meta_path.remove(self)
+
+    def find_spec(self, name, path=None, target=None):
+        if name in self._finding:
+            return None
+        self._finding.add(name)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(name)
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self, name)
+        return spec
+
+    def timed(self, name, function, *args):
+        """Calls a loader function, adding its time to the record of the module."""
+        frame = self._record(name)
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            frame["cumulative"] += elapsed
+            frame["self"] += elapsed - frame.pop("_children", 0)
+            if self._stack:
+                self._stack[-1]["_children"] = self._stack[-1].get("_children", 0) + elapsed
+
+    def _record(self, name):
+        for record in reversed(self.records):
+            if record["module"] == name:
+                return record
+        record = {"module": name, "self": 0.0, "cumulative": 0.0, "level": len(self._stack) + 1}
+        self.records.append(record)
+        return record
+
+    def report(self):
+        """Returns the import times of the modules in microseconds, slowest first."""
+        return sorted(({"module": record["module"],
+                        "self_us": int(record["self"] * 1e6),
+                        "cumulative_us": int(record["cumulative"] * 1e6),
+                        "level": record["level"]}
+                       for record in self.records),
+                      key=lambda record: record["cumulative_us"], reverse=True)
+
+
+def closeWindows(keep):
+    """Closes the dialogs opened by a step."""
+    for widget in QApplication.topLevelWidgets():
+        if widget.isVisible() and widget not in keep:
+            widget.close()
+    QApplication.processEvents()
+
+
+def runStep(name, function, steps):
+    """Runs a benchmark step, recording its wall-clock time, its imports and its error, if any."""
+    step = {"name": name, "error": None}
+    with ImportTimer() as timer:
+        start = time.perf_counter()
+        try:
+            result = function()
+        except Exception as e:
+            result = None
+            step["error"] = f"{type(e).__name__}: {e}"
+        step["seconds"] = time.perf_counter() - start
+    step["imports"] = timer.report()
+    step["import_seconds"] = sum(record["self_us"] for record in step["imports"]) / 1e6
+    steps.append(step)
+    print("{:<32} {:>9.3f} s {:>9.3f} s {:>6} modules{}".format(
+        name, step["seconds"], step["import_seconds"], len(step["imports"]),
+        "  ERROR: " + step["error"] if step["error"] else ""))
+    return result
+
+
+def qgisVersion():
+    try:
+        from qgis.core import Qgis
+        return Qgis.QGIS_VERSION
+    except ImportError:
+        return None
+
+
+def pluginVersion():
+    metadata_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "metadata.txt")
+    try:
+        with open(metadata_path) as f:
+            for line in f:
+                if line.startswith("version="):
+                    return line.split("=", 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+def run(entry_points=None, top=20):
+    """
+    Replays the startup of the plugin and the first use of its tools.
+
+    :param entry_points: Names of the init* methods of TerraAntiqua to call. Defaults to all of them.
+    :type entry_points: list.
+    :param top: Number of slowest imports printed for each step.
+    :type top: int.
+
+    :return: The report.
+    :rtype: dict.
+    """
+    if IFACE is None:
+        raise RuntimeError("QGIS is not available.")
+    keep = set(QApplication.topLevelWidgets())
+    steps = []
+    start = time.perf_counter()
+
+    stub_module = runStep("import stub", lambda: importlib.import_module(
+        PLUGIN_PACKAGE + ".core.terra_antiqua_stub"), steps)
+    stub = runStep("TerraAntiquaStub()", lambda: stub_module.TerraAntiquaStub(IFACE), steps)
+    keep.update(QApplication.topLevelWidgets())
+    # The steps are called through lambdas, so that the failure of a step is recorded in the following ones
+    runStep("TerraAntiquaStub.initGui", lambda: stub.initGui(), steps)
+    runStep("check_dependencies", lambda: stub_module.check_dependencies(), steps)
+    runStep("_load_real_plugin", lambda: stub._load_real_plugin(), steps)
+
+    plugin = getattr(stub, "_real_plugin", None)
+    if plugin is not None:
+        # The welcome page is modal, do not show it
+        plugin.settings.setTempValue("first_start", False)
+        if entry_points is None:
+            entry_points = sorted(name for name in dir(type(plugin))
+                                  if name.startswith("init") and name != "initGui")
+        for entry_point in entry_points:
+            runStep(entry_point, getattr(plugin, entry_point), steps)
+            closeWindows(keep)
+            if entry_point == "initRemoveArtefacts" and plugin.settings.removeArtefactsChecked:
+                # Deactivate the tool again
+                runStep(entry_point + " (close)", plugin.initRemoveArtefacts, steps)
+
+    report = {
+        "plugin_version": pluginVersion(),
+        "python": platform.python_version(),
+        "qgis": qgisVersion(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "total_seconds": time.perf_counter() - start,
+        "steps": steps,
+    }
+
+    for step in steps:
+        if step["imports"] and top:
+            print(f"\nSlowest imports of {step['name']} (cumulative, self in us):")
+            for record in step["imports"][:top]:
+                print("{:>10} {:>10}  {}{}".format(record["cumulative_us"], record["self_us"],
+                                                   "  " * (record["level"] - 1), record["module"]))
+    return report
+
+
+def compare(report, baseline):
+    """Prints the change of the time of each step against an earlier report."""
+    baseline_steps = {step["name"]: step for step in baseline["steps"]}
+    print("\nChange against {} ({}):".format(baseline.get("plugin_version"), baseline.get("date")))
+    print("{:<32} {:>10} {:>10} {:>8}".format("step", "baseline", "current", "change"))
+    for step in report["steps"]:
+        if step["name"] not in baseline_steps:
+            continue
+        before = baseline_steps[step["name"]]["seconds"]
+        change = (step["seconds"] - before) / before * 100 if before else 0
+        print("{:<32} {:>9.3f}s {:>9.3f}s {:>+7.1f}%".format(step["name"], before, step["seconds"], change))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="startup_benchmark.json",
+                        help="Path of the JSON report.")
+    parser.add_argument("--baseline",
+                        help="JSON report of an earlier run to compare with.")
+    parser.add_argument("--entry-points", nargs="*",
+                        help="init* methods to call (default: all).")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Number of slowest imports printed per step.")
+    args = parser.parse_args()
+    report = run(args.entry_points, args.top)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
@@ -25,8 +25,15 @@ __copyright__ = (
 
 import logging
 from PyQt5.QtCore import QObject, pyqtSlot, pyqtSignal
-from qgis.core import QgsMapLayerRegistry
-from qgis.gui import QgsMapCanvasLayer
+from PyQt5.QtWidgets import QMainWindow
+try:
+    from qgis.core import QgsMapLayerRegistry
+    from qgis.gui import QgsMapCanvasLayer
+except ImportError:
+    # QGIS 3 merged the layer registry into the project, and the canvas
+    # takes the layers directly
+    from qgis.core import QgsProject as QgsMapLayerRegistry, QgsMapLayer
+    QgsMapCanvasLayer = None
 LOGGER = logging.getLogger('QGIS')
 
 
@@ -37,7 +44,8 @@ class QgisInterface(QObject):
     This class is here for enabling us to run unit tests only,
     so most methods are simply stubs.
     """
-    currentLayerChanged = pyqtSignal(QgsMapCanvasLayer)
+    currentLayerChanged = pyqtSignal(
+        QgsMapCanvasLayer if QgsMapCanvasLayer is not None else QgsMapLayer)
 
     def __init__(self, canvas):
         """Constructor
@@ -57,6 +65,9 @@ class QgisInterface(QObject):
 
         # For processing module
         self.destCrs = None
+        # Main window holding the plugin toolbars, created when first needed
+        self._main_window = None
+        self.menus = {}
 
     @pyqtSlot('QStringList')
     def addLayers(self, layers):
@@ -71,6 +82,9 @@ class QgisInterface(QObject):
         #LOGGER.debug('Number of layers being added: %s' % len(layers))
         #LOGGER.debug('Layer Count Before: %s' % len(self.canvas.layers()))
         current_layers = self.canvas.layers()
+        if QgsMapCanvasLayer is None:
+            self.canvas.setLayers(current_layers + list(layers))
+            return
         final_layers = []
         for layer in current_layers:
             final_layers.append(QgsMapCanvasLayer(layer))
@@ -97,7 +111,10 @@ class QgisInterface(QObject):
     @pyqtSlot()
     def removeAllLayers(self):
         """Remove layers from the canvas before they get deleted."""
-        self.canvas.setLayerSet([])
+        if QgsMapCanvasLayer is None:
+            self.canvas.setLayers([])
+        else:
+            self.canvas.setLayerSet([])
 
     def newProject(self):
         """Create new project."""
@@ -176,7 +193,30 @@ class QgisInterface(QObject):
         :param name: Name for the toolbar.
         :type name: str
         """
-        pass
+        return self.mainWindow().addToolBar(name)
+
+    def addPluginToMenu(self, name, action):
+        """Add an action to a plugin menu.
+
+        :param name: Name of the menu.
+        :type name: str
+
+        :param action: Action to add to the menu.
+        :type action: QAction
+        """
+        self.menus.setdefault(name, []).append(action)
+
+    def removePluginMenu(self, name, action):
+        """Remove an action from a plugin menu.
+
+        :param name: Name of the menu.
+        :type name: str
+
+        :param action: Action to remove from the menu.
+        :type action: QAction
+        """
+        if action in self.menus.get(name, []):
+            self.menus[name].remove(action)
 
     def mapCanvas(self):
         """Return a pointer to the map canvas."""
@@ -187,7 +227,9 @@ class QgisInterface(QObject):
 
         In case of QGIS it returns an instance of QgisApp.
         """
-        pass
+        if self._main_window is None:
+            self._main_window = QMainWindow()
+        return self._main_window
 
     def addDockWidget(self, area, dock_widget):
         """Add a dock widget to the main window.
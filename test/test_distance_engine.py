@@ -0,0 +1,152 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the distance engine against brute-force distances."""
+
+import unittest
+
+import numpy as np
+
+from ..core.distance_engine import (EARTH_RADIUS_KM, distanceToOutline, distanceToVertices,
+                                    distanceTransform)
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Great circle distances in km between points (broadcast against each other)."""
+    lon1, lat1, lon2, lat2 = (np.radians(value) for value in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def nearest_haversine(x, y, target_x, target_y):
+    """Distance from each point to the nearest target, comparing all pairs."""
+    return haversine(x[:, None], y[:, None], target_x[None, :], target_y[None, :]).min(axis=1)
+
+
+def nearest_planar(x, y, target_x, target_y):
+    return np.hypot(x[:, None] - target_x[None, :], y[:, None] - target_y[None, :]).min(axis=1)
+
+
+def pixel_centres(shape, geotransform):
+    """Coordinates of the centres of all pixels of a raster, as arrays of the raster shape."""
+    upx, xres, _, upy, _, yres = geotransform
+    rows, cols = np.indices(shape)
+    return upx + (cols + 0.5) * xres, upy + (rows + 0.5) * yres
+
+
+# A 1 degree grid north of the equator, where the pixel-space search is close to the great circle one
+GEOGRAPHIC_GEOTRANSFORM = (10.0, 1.0, 0.0, 20.0, 0.0, -1.0)
+PLANAR_GEOTRANSFORM = (1000.0, 2.0, 0.0, 5000.0, 0.0, -3.0)
+
+
+def small_polygon(shape=(14, 16)):
+    """Mask of an L-shaped polygon, not touching the edges of the raster."""
+    mask = np.zeros(shape, dtype=bool)
+    mask[2:12, 3:8] = True
+    mask[8:12, 8:14] = True
+    return mask
+
+
+class TestDistanceToVertices(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.x = random.uniform(-180, 180, 200)
+        self.y = random.uniform(-80, 80, 200)
+        self.vertex_x = random.uniform(-180, 180, 50)
+        self.vertex_y = random.uniform(-80, 80, 50)
+
+    def test_geographic(self):
+        distances = distanceToVertices(self.x, self.y, self.vertex_x, self.vertex_y, geographic=True)
+        expected = nearest_haversine(self.x, self.y, self.vertex_x, self.vertex_y)
+        np.testing.assert_allclose(distances, expected, rtol=1e-6, atol=1e-6)
+
+    def test_geographic_across_the_antimeridian(self):
+        distances = distanceToVertices(np.array([179.5]), np.array([0.0]),
+                                       np.array([-179.5, 170.0]), np.array([0.0, 0.0]), geographic=True)
+        np.testing.assert_allclose(distances, haversine(179.5, 0.0, -179.5, 0.0), rtol=1e-6)
+
+    def test_planar(self):
+        distances = distanceToVertices(self.x, self.y, self.vertex_x, self.vertex_y,
+                                       geographic=False, km_per_unit=0.001)
+        expected = nearest_planar(self.x, self.y, self.vertex_x, self.vertex_y) * 0.001
+        np.testing.assert_allclose(distances, expected, rtol=1e-9)
+
+
+class TestDistanceTransform(unittest.TestCase):
+
+    def brute_force(self, coast_mask, geotransform, geographic):
+        x, y = pixel_centres(coast_mask.shape, geotransform)
+        nearest = nearest_haversine if geographic else nearest_planar
+        return nearest(x.ravel(), y.ravel(), x[coast_mask], y[coast_mask]).reshape(coast_mask.shape)
+
+    def test_planar_is_exact(self):
+        coast_mask = ~small_polygon()
+        distances = distanceTransform(coast_mask, PLANAR_GEOTRANSFORM, geographic=False, km_per_unit=0.001)
+        expected = self.brute_force(coast_mask, PLANAR_GEOTRANSFORM, geographic=False) * 0.001
+        np.testing.assert_allclose(distances, expected, rtol=1e-6)
+
+    def test_geographic_is_exact_along_meridians(self):
+        coast_mask = np.zeros((14, 16), dtype=bool)
+        coast_mask[0] = True
+        distances = distanceTransform(coast_mask, GEOGRAPHIC_GEOTRANSFORM, geographic=True)
+        expected = self.brute_force(coast_mask, GEOGRAPHIC_GEOTRANSFORM, geographic=True)
+        np.testing.assert_allclose(distances, expected, rtol=1e-5)
+
+    def test_geographic_close_to_brute_force(self):
+        coast_mask = ~small_polygon()
+        distances, (rows, cols) = distanceTransform(coast_mask, GEOGRAPHIC_GEOTRANSFORM, geographic=True,
+                                                    return_indices=True)
+        expected = self.brute_force(coast_mask, GEOGRAPHIC_GEOTRANSFORM, geographic=True)
+        # The nearest coast pixel is searched in pixel space, so the distance can only be overestimated
+        self.assertTrue(np.all(distances >= expected * (1 - 1e-5)))
+        np.testing.assert_allclose(distances, expected, rtol=0.05)
+        self.assertTrue(coast_mask[rows, cols].all())
+        self.assertTrue(np.all(distances[coast_mask] == 0))
+
+    def test_without_coast(self):
+        distances, indices = distanceTransform(np.zeros((3, 4), dtype=bool), GEOGRAPHIC_GEOTRANSFORM,
+                                               geographic=True, return_indices=True)
+        self.assertTrue(np.isinf(distances).all())
+        self.assertIsNone(indices)
+
+
+class TestDistanceToOutline(unittest.TestCase):
+
+    def setUp(self):
+        self.polygon_mask = small_polygon()
+
+    def brute_force(self, geotransform, geographic, x, y):
+        # The pixels around the mask count as outside the polygon
+        upx, xres, xskew, upy, yskew, yres = geotransform
+        padded = np.pad(self.polygon_mask, 1, constant_values=False)
+        outside_x, outside_y = pixel_centres(padded.shape, (upx - xres, xres, xskew, upy - yres, yskew, yres))
+        # The distance is measured from the centre of the pixel of each point
+        centre_x = upx + (np.floor((x - upx) / xres) + 0.5) * xres
+        centre_y = upy + (np.floor((y - upy) / yres) + 0.5) * yres
+        nearest = nearest_haversine if geographic else nearest_planar
+        return nearest(centre_x, centre_y, outside_x[~padded], outside_y[~padded])
+
+    def points_inside(self, geotransform):
+        x, y = pixel_centres(self.polygon_mask.shape, geotransform)
+        xres, yres = geotransform[1], geotransform[5]
+        # Points away from the pixel centres, but inside the same pixels
+        return x[self.polygon_mask] + 0.3 * xres, y[self.polygon_mask] - 0.2 * yres
+
+    def test_planar(self):
+        x, y = self.points_inside(PLANAR_GEOTRANSFORM)
+        distances = distanceToOutline(self.polygon_mask, PLANAR_GEOTRANSFORM, x, y, geographic=False)
+        np.testing.assert_allclose(distances, self.brute_force(PLANAR_GEOTRANSFORM, False, x, y), rtol=1e-6)
+
+    def test_geographic(self):
+        x, y = self.points_inside(GEOGRAPHIC_GEOTRANSFORM)
+        distances = distanceToOutline(self.polygon_mask, GEOGRAPHIC_GEOTRANSFORM, x, y, geographic=True)
+        expected = self.brute_force(GEOGRAPHIC_GEOTRANSFORM, True, x, y)
+        self.assertTrue(np.all(distances >= expected * (1 - 1e-5)))
+        np.testing.assert_allclose(distances, expected, rtol=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the download manager against a local HTTP server."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ..core.download_manager import (TaDownloadCanceled, TaDownloadError, TaDownloadJob,
+                                     TaDownloadManager, downloadFile)
+
+
+class FakeModelServer:
+    """HTTP server serving in-memory files, with support for Range and If-Range requests."""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                if self.path not in server.files:
+                    self.send_error(404)
+                    return
+                content = server.files[self.path]
+                etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header and self.headers.get("If-Range", etag) == etag:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(content) - start))
+                self.end_headers()
+                self.wfile.write(content[start:])
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.httpd.server_address[1])
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestDownloadManager(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeModelServer()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_resume_partial_download(self):
+        """An interrupted download continues from the end of the partial file."""
+        content = os.urandom(300000)
+        self.server.files["/raster.tif"] = content
+        path = os.path.join(self.temp_dir, "raster.tif")
+        job = TaDownloadJob(self.server.url + "/raster.tif", path,
+                            sha256=hashlib.sha256(content).hexdigest())
+
+        calls = []
+
+        def cancel_after_first_chunk():
+            calls.append(1)
+            return len(calls) > 1
+
+        with self.assertRaises(TaDownloadCanceled):
+            downloadFile(job, is_canceled=cancel_after_first_chunk, chunk_size=100000)
+        self.assertEqual(os.path.getsize(job.part_path), 100000)
+
+        downloadFile(job, chunk_size=100000)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(self.server.requests[-1][1].get("Range"), "bytes=100000-")
+        self.assertFalse(os.path.exists(job.part_path))
+
+    def test_restart_when_file_changed(self):
+        """A partial download is discarded if the file changed on the server."""
+        self.server.files["/raster.tif"] = b"a" * 1000
+        path = os.path.join(self.temp_dir, "raster.tif")
+        job = TaDownloadJob(self.server.url + "/raster.tif", path)
+        with self.assertRaises(TaDownloadCanceled):
+            downloadFile(job, is_canceled=lambda: os.path.exists(job.part_path), chunk_size=100)
+        self.server.files["/raster.tif"] = b"b" * 1000
+        downloadFile(job, chunk_size=100)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"b" * 1000)
+
+    def test_checksum_mismatch(self):
+        """A file with a wrong checksum is rejected and not kept."""
+        self.server.files["/raster.tif"] = b"corrupted"
+        path = os.path.join(self.temp_dir, "raster.tif")
+        job = TaDownloadJob(self.server.url + "/raster.tif", path, sha256="0" * 64)
+        with self.assertRaises(TaDownloadError):
+            downloadFile(job)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(job.part_path))
+
+    def test_parallel_progress(self):
+        """The progress reports the bytes of all files together."""
+        jobs = []
+        for i in range(4):
+            self.server.files[f"/file{i}"] = os.urandom(50000)
+            jobs.append(TaDownloadJob(self.server.url + f"/file{i}", os.path.join(self.temp_dir, f"file{i}")))
+        reports = []
+        TaDownloadManager(max_workers=4, chunk_size=10000).download(
+            jobs, progress=lambda done, total: reports.append((done, total)))
+        self.assertEqual(reports[-1], (200000, 200000))
+        for i, job in enumerate(jobs):
+            with open(job.path, "rb") as f:
+                self.assertEqual(f.read(), self.server.files[f"/file{i}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
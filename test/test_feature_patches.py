@@ -0,0 +1,166 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the per-feature computations of the Feature Creator."""
+
+import unittest
+
+import numpy as np
+from osgeo import ogr
+
+from ..core.feature_patches import (addRuggedness, createMountainPatch, createMountainRasterPatch,
+                                    createSeaPatch, createSeaRasterPatch, featureSeed, keepDeeper,
+                                    keepHigher, mountainElevations, randomPixels, seaDepths)
+
+# 20 x 20 pixels of 1 km
+GEOTRANSFORM = (0.0, 1.0, 0.0, 20.0, 0.0, -1.0)
+SQUARE = "POLYGON ((2 2, 2 18, 18 18, 18 2, 2 2))"
+
+
+def make_task(**changes):
+    """Task of a square feature in the middle of the raster (see createSeaPatch)."""
+    task = {
+        "wkb": bytes(ogr.CreateGeometryFromWkt(SQUARE).ExportToWkb()),
+        "window": (slice(0, 20), slice(0, 20)),
+        "geotransform": GEOTRANSFORM,
+        "initial_values": np.zeros((20, 20), dtype=np.float32),
+        "densify_interval": 1.0,
+        "point_density": 0.5,
+        "geographic": False,
+        "km_per_unit": 1.0,
+        "distance_method": "vertices",
+        "seed": 1,
+        "keep_initial": False,
+        "shelf_width": 1.0,
+        "slope_width": 1.0,
+        "min_depth": -1000.0,
+        "max_depth": -4000.0,
+        "max_shelf_depth": -200.0,
+        "min_elev": 500.0,
+        "max_elev": 3000.0,
+        "ruggedness": 30,
+    }
+    task.update(changes)
+    return task
+
+
+def assert_same_patch(test, patch, other):
+    for key in ("mask", "boundary"):
+        if patch[key] is None:
+            test.assertIsNone(other[key])
+        else:
+            np.testing.assert_array_equal(patch[key], other[key])
+    np.testing.assert_array_equal(patch["values"], other["values"])
+
+
+class TestProfiles(unittest.TestCase):
+
+    def test_sea_depths(self):
+        distances = np.array([0.0, 0.5, 1.0, 1.5, 2.5, 5.0])
+        depths = seaDepths(distances, 1.0, 1.0, -1000.0, -4000.0, -200.0)
+        # Shelf: linear from the coastline to the shelf edge
+        np.testing.assert_allclose(depths[:3], [0.0, -100.0, -200.0])
+        # Slope: left empty
+        self.assertTrue(np.isnan(depths[3]))
+        # Basin: from min_depth to max_depth at the farthest point, over the distances beyond the shelf
+        np.testing.assert_allclose(depths[4:], [-1000.0 - 3000.0 * 1.0 / 3.5, -4000.0])
+
+        filled = seaDepths(distances, 1.0, 1.0, -1000.0, -4000.0, -200.0, fill_slope=True)
+        slope_foot = -1000.0 - 3000.0 * 0.5 / 3.5
+        np.testing.assert_allclose(filled[3], -200.0 + (slope_foot + 200.0) * 0.5)
+        np.testing.assert_allclose(np.delete(filled, 3), np.delete(depths, 3))
+
+    def test_sea_narrower_than_shelf(self):
+        self.assertIsNone(seaDepths(np.array([0.2, 0.8]), 1.0, 1.0, -1000.0, -4000.0, -200.0))
+
+    def test_mountain_elevations(self):
+        distances = np.array([0.0, 0.5, 2.0, 4.0])
+        elevations = mountainElevations(distances, 1.0, 500.0, 3000.0)
+        self.assertTrue(np.isnan(elevations[:2]).all())
+        np.testing.assert_allclose(elevations[2:], [500.0, 3000.0])
+
+        edges = np.array([100.0, 100.0, 0.0, 0.0])
+        with_edges = mountainElevations(distances, 1.0, 500.0, 3000.0, edge_elevations=edges)
+        ridge_foot = 500.0 - 2500.0 * 1.0 / 2.0
+        np.testing.assert_allclose(with_edges[:2], [100.0, 100.0 + (ridge_foot - 100.0) * 0.5])
+        np.testing.assert_allclose(with_edges[2:], elevations[2:])
+
+    def test_keep_initial_values(self):
+        calculated = np.array([-100.0, -100.0, -100.0, -100.0])
+        initial = np.array([-50.0, -500.0, 0.0, np.nan])
+        np.testing.assert_array_equal(keepDeeper(calculated, initial), [-100.0, -500.0, -100.0, -100.0])
+        np.testing.assert_array_equal(keepHigher(-calculated, -initial), [100.0, 500.0, 100.0, 100.0])
+
+    def test_ruggedness_is_bounded(self):
+        elevations = np.linspace(100.0, 3000.0, 1000)
+        rugged = addRuggedness(elevations, 20, np.random.default_rng(0))
+        self.assertTrue(np.all(np.abs(rugged - elevations) <= elevations * 0.2 + 1))
+        self.assertFalse(np.array_equal(rugged, elevations))
+        np.testing.assert_array_equal(addRuggedness(elevations, 0, np.random.default_rng(0)), elevations)
+
+
+class TestRandomPixels(unittest.TestCase):
+
+    def test_pixels_inside_mask(self):
+        mask = np.zeros((30, 30), dtype=bool)
+        mask[5:25, 10:20] = True
+        rows, cols = randomPixels(mask, 0.25, 1.0, np.random.default_rng(3))
+        self.assertEqual(rows.size, 50)
+        self.assertTrue(mask[rows, cols].all())
+        # At most one point per pixel
+        self.assertEqual(len(set(zip(rows.tolist(), cols.tolist()))), 50)
+
+        same_rows, same_cols = randomPixels(mask, 0.25, 1.0, np.random.default_rng(3))
+        np.testing.assert_array_equal(rows, same_rows)
+        np.testing.assert_array_equal(cols, same_cols)
+
+    def test_feature_seed(self):
+        self.assertEqual(featureSeed(5), 5)
+        self.assertEqual(featureSeed(-1), 2 ** 64 - 1)
+        # Seeds of unsaved features are accepted by numpy
+        np.random.default_rng(featureSeed(-7))
+
+
+class TestPatches(unittest.TestCase):
+
+    def test_sea_patch(self):
+        patch = createSeaPatch(make_task())
+        self.assertIsNone(patch["warning"])
+        mask = patch["mask"]
+        self.assertEqual(mask.sum(), 16 * 16)
+        values = patch["values"]
+        self.assertFalse(np.isfinite(values[~mask]).any())
+        # One random point per two pixels, without values on the continental slope
+        self.assertTrue(0 < np.isfinite(values).sum() <= 0.5 * 16 * 16)
+        self.assertTrue(np.all(values[np.isfinite(values)] <= 0))
+        self.assertTrue(patch["boundary"].any())
+
+    def test_patches_are_reproducible(self):
+        for create_patch in (createSeaPatch, createMountainPatch, createMountainRasterPatch):
+            patch = create_patch(make_task())
+            assert_same_patch(self, patch, create_patch(make_task()))
+            other = create_patch(make_task(seed=2))
+            self.assertFalse(np.array_equal(patch["values"], other["values"], equal_nan=True),
+                             f"{create_patch.__name__} does not depend on the seed.")
+
+    def test_raster_patches_cover_the_feature(self):
+        sea = createSeaRasterPatch(make_task())
+        mask = sea["mask"]
+        self.assertTrue(np.isfinite(sea["values"][mask]).all())
+        self.assertFalse(np.isfinite(sea["values"][~mask]).any())
+        np.testing.assert_allclose(np.nanmin(sea["values"]), -4000.0)
+
+        mountain = createMountainRasterPatch(make_task(ruggedness=0))
+        self.assertTrue(np.isfinite(mountain["values"][mask]).all())
+        np.testing.assert_allclose(np.nanmax(mountain["values"]), 3000.0)
+
+    def test_feature_narrower_than_shelf(self):
+        patch = createSeaRasterPatch(make_task(shelf_width=20.0))
+        self.assertIsNotNone(patch["warning"])
+        self.assertIsNone(patch["values"])
+
+
+if __name__ == "__main__":
+    unittest.main()
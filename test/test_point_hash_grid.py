@@ -0,0 +1,84 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the grid hash that keeps a minimum distance between random points."""
+
+import unittest
+
+import numpy as np
+
+from ..core.utils import TaPointHashGrid
+
+
+def min_pairwise_distance(x, y):
+    """Smallest distance between two different points, comparing all pairs."""
+    distances = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+    np.fill_diagonal(distances, np.inf)
+    return distances.min()
+
+
+def nearest_distance(x, y, target_x, target_y):
+    return np.hypot(x[:, None] - target_x[None, :], y[:, None] - target_y[None, :]).min(axis=1)
+
+
+class TestPointHashGrid(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.default_rng(0)
+        self.x = random.uniform(-50, 50, 2000)
+        self.y = random.uniform(-20, 30, 2000)
+        self.min_distance = 3.0
+
+    def test_accepted_points_keep_the_minimum_distance(self):
+        grid = TaPointHashGrid(-50, -20, self.min_distance)
+        accepted = grid.add(self.x, self.y)
+        self.assertGreater(accepted.sum(), 1)
+        self.assertGreaterEqual(min_pairwise_distance(self.x[accepted], self.y[accepted]), self.min_distance)
+
+    def test_rejected_points_are_too_close(self):
+        grid = TaPointHashGrid(-50, -20, self.min_distance)
+        accepted = grid.add(self.x, self.y)
+        # Every rejected candidate is closer than the minimum distance to an accepted one, or shares its cell
+        # with an earlier candidate, which was either accepted or too close itself
+        distances = nearest_distance(self.x[~accepted], self.y[~accepted], self.x[accepted], self.y[accepted])
+        rows, cols = grid._cells(self.x, self.y)
+        _, first_in_cell = np.unique(rows * grid._ROW_STRIDE + cols, return_index=True)
+        is_first = np.zeros(self.x.shape, dtype=bool)
+        is_first[first_in_cell] = True
+        self.assertTrue(np.all(distances[is_first[~accepted]] < self.min_distance))
+
+    def test_points_added_in_batches(self):
+        grid = TaPointHashGrid(-50, -20, self.min_distance)
+        first = grid.add(self.x[:1000], self.y[:1000])
+        second = grid.add(self.x[1000:], self.y[1000:])
+        accepted = np.concatenate((first, second))
+        self.assertTrue(second.any())
+        self.assertGreaterEqual(min_pairwise_distance(self.x[accepted], self.y[accepted]), self.min_distance)
+        # The stored points are the accepted ones
+        self.assertEqual(grid.keys.size, accepted.sum())
+        self.assertTrue(np.all(np.diff(grid.keys) > 0))
+
+    def test_points_outside_the_origin(self):
+        # Negative cells, left of and below the origin, are hashed like the others
+        grid = TaPointHashGrid(0, 0, self.min_distance)
+        accepted = grid.add(self.x, self.y)
+        self.assertGreaterEqual(min_pairwise_distance(self.x[accepted], self.y[accepted]), self.min_distance)
+
+    def test_max_count(self):
+        grid = TaPointHashGrid(-50, -20, self.min_distance)
+        accepted = grid.add(self.x, self.y, max_count=25)
+        self.assertEqual(accepted.sum(), 25)
+        self.assertGreaterEqual(min_pairwise_distance(self.x[accepted], self.y[accepted]), self.min_distance)
+        self.assertFalse(grid.add(self.x, self.y, max_count=0).any())
+
+    def test_duplicate_points(self):
+        grid = TaPointHashGrid(0, 0, 1.0)
+        accepted = grid.add(np.array([0.5, 0.5, 0.5]), np.array([0.5, 0.5, 0.5]))
+        np.testing.assert_array_equal(accepted, [True, False, False])
+        self.assertFalse(grid.add(np.array([0.9]), np.array([0.9])).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the raster input/output helpers."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from osgeo import gdal
+
+from ..core.raster_io import processRasterInTiles, sampleArray, writeRaster
+
+GEOTRANSFORM = (0.0, 1.0, 0.0, 20.0, 0.0, -1.0)
+
+
+def sum_of_neighbour_rows(arrays, window):
+    """Sums the rows above and below each row. Needs a halo of one row."""
+    in_array = arrays[0]
+    out_array = np.zeros_like(in_array)
+    out_array[1:] += in_array[:-1]
+    out_array[:-1] += in_array[1:]
+    return out_array
+
+
+class FakeFeedback:
+    canceled = False
+    progress = 0
+
+
+class TestProcessRasterInTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.in_array = np.arange(20 * 5, dtype=np.float32).reshape(20, 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, in_array, no_data_value=np.nan):
+        return writeRaster(os.path.join(self.directory, name), in_array, GEOTRANSFORM, None, no_data_value)
+
+    def read(self, path):
+        raster_ds = gdal.Open(path)
+        band = raster_ds.GetRasterBand(1)
+        return band.ReadAsArray(), band.GetNoDataValue()
+
+    def test_halo_gives_the_same_result_as_a_single_tile(self):
+        path = self.write("in.tif", self.in_array)
+        out_path = os.path.join(self.directory, "out.tif")
+        # 3 rows of 5 pixels of 4 bytes: tiles of one row with a halo of one row
+        result = processRasterInTiles([path], out_path, sum_of_neighbour_rows,
+                                      halo=1, bytes_per_pixel=4, budget=3 * 5 * 4)
+        self.assertEqual(result, out_path)
+        out_array, _ = self.read(out_path)
+        np.testing.assert_array_equal(out_array, sum_of_neighbour_rows([self.in_array], None))
+
+    def test_in_place_reads_the_halo_before_it_is_overwritten(self):
+        path = self.write("in.tif", self.in_array)
+        result = processRasterInTiles([path], path, sum_of_neighbour_rows,
+                                      halo=1, bytes_per_pixel=4, budget=3 * 5 * 4)
+        self.assertEqual(result, path)
+        out_array, _ = self.read(path)
+        np.testing.assert_array_equal(out_array, sum_of_neighbour_rows([self.in_array], None))
+        self.assertEqual(os.listdir(self.directory), ["in.tif"])
+
+    def test_canceled_in_place_run_leaves_the_input_unchanged(self):
+        path = self.write("in.tif", self.in_array)
+        feedback = FakeFeedback()
+
+        def cancelAfterFirstTile(arrays, window):
+            feedback.canceled = True
+            return np.zeros_like(arrays[0])
+
+        result = processRasterInTiles([path], path, cancelAfterFirstTile,
+                                      bytes_per_pixel=4, feedback=feedback, budget=2 * 5 * 4)
+        self.assertIsNone(result)
+        out_array, _ = self.read(path)
+        np.testing.assert_array_equal(out_array, self.in_array)
+        self.assertEqual(os.listdir(self.directory), ["in.tif"])
+
+    def test_failed_in_place_run_leaves_the_input_unchanged(self):
+        path = self.write("in.tif", self.in_array)
+
+        def failOnSecondTile(arrays, window):
+            if window[0].start > 0:
+                raise RuntimeError("Failed")
+            return np.zeros_like(arrays[0])
+
+        with self.assertRaises(RuntimeError):
+            processRasterInTiles([path], path, failOnSecondTile, bytes_per_pixel=4, budget=2 * 5 * 4)
+        out_array, _ = self.read(path)
+        np.testing.assert_array_equal(out_array, self.in_array)
+        self.assertEqual(os.listdir(self.directory), ["in.tif"])
+
+    def test_nodata_of_the_input_stays_nodata(self):
+        in_array = np.full((4, 4), 10, dtype=np.float32)
+        in_array[1, 2] = -9999
+        path = self.write("in.tif", in_array, no_data_value=-9999)
+        out_path = os.path.join(self.directory, "out.tif")
+        processRasterInTiles([path], out_path, lambda arrays, window: arrays[0] - 5, budget=1024)
+        out_array, no_data_value = self.read(out_path)
+        self.assertTrue(np.isnan(no_data_value))
+        self.assertTrue(np.isnan(out_array[1, 2]))
+        out_array[1, 2] = 5
+        np.testing.assert_array_equal(out_array, np.full((4, 4), 5, dtype=np.float32))
+
+
+class TestSampleArray(unittest.TestCase):
+
+    def setUp(self):
+        # A plane, so that the bilinear interpolation between pixel centres is exact
+        rows, cols = np.indices((20, 5))
+        self.in_array = (10 * rows + cols).astype(np.float32)
+
+    def pixel_centre(self, row, col):
+        upx, xres, _, upy, _, yres = GEOTRANSFORM
+        return upx + (col + 0.5) * xres, upy + (row + 0.5) * yres
+
+    def test_nearest_takes_the_pixel_containing_the_point(self):
+        x = np.array([0.0, 0.99, 4.5, 2.2])
+        y = np.array([20.0, 19.01, 0.5, 10.7])
+        values = sampleArray(self.in_array, GEOTRANSFORM, x, y)
+        np.testing.assert_array_equal(values, [0, 0, 194, 92])
+
+    def test_bilinear_between_pixel_centres(self):
+        x, y = self.pixel_centre(np.array([3.0, 7.25, 12.5]), np.array([1.0, 2.5, 3.75]))
+        values = sampleArray(self.in_array, GEOTRANSFORM, x, y, method="bilinear")
+        np.testing.assert_allclose(values, [31.0, 75.0, 128.75])
+
+    def test_bilinear_uses_the_edge_pixels_near_the_edges(self):
+        x = np.array([0.1, 4.9, 2.5])
+        y = np.array([19.9, 0.1, 19.9])
+        values = sampleArray(self.in_array, GEOTRANSFORM, x, y, method="bilinear")
+        np.testing.assert_allclose(values, [0.0, 194.0, 2.0])
+
+    def test_points_outside_the_raster_are_nan(self):
+        x = np.array([-0.1, 5.0, 2.0, 2.0, 2.5])
+        y = np.array([10.0, 10.0, 20.1, 0.0, 10.5])
+        for method in ("nearest", "bilinear"):
+            values = sampleArray(self.in_array, GEOTRANSFORM, x, y, method=method)
+            self.assertTrue(np.isnan(values[:4]).all(), method)
+            self.assertTrue(np.isfinite(values[4]), method)
+
+    def test_nodata_is_nan(self):
+        in_array = self.in_array.copy()
+        in_array[3, 1] = -9999
+        x, y = self.pixel_centre(np.array([3.0, 3.0, 3.5, 10.0]), np.array([1.0, 2.0, 2.5, 1.0]))
+        values = sampleArray(in_array, GEOTRANSFORM, x, y, no_data_value=-9999)
+        self.assertTrue(np.isnan(values[0]))
+        np.testing.assert_array_equal(values[[1, 3]], [32, 101])
+
+        values = sampleArray(in_array, GEOTRANSFORM, x, y, method="bilinear", no_data_value=-9999)
+        # Only the interpolations that use the missing pixel are missing
+        self.assertTrue(np.isnan(values[0]))
+        np.testing.assert_allclose(values[1:], [32.0, 37.5, 101.0])
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            sampleArray(self.in_array, GEOTRANSFORM, np.array([1.0]), np.array([1.0]), method="cubic")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#Copyright (C) 2021 by Jovid Aminov, Diego Ruiz, Guillaume Dupont-Nivet
+# Terra Antiqua is a plugin for the software QGis that deals with the reconstruction of paleogeography.
+#Full copyright notice in file: terra_antiqua.py
+
+# coding=utf-8
+"""Tests of the cache of reconstructed rasters."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ..core.reconstruction_cache import TaReconstructionCache, arrayFingerprint, fileFingerprint
+
+
+class FixedSizeCache(TaReconstructionCache):
+    """Cache with a fixed size limit, so that the tests do not depend on the settings."""
+
+    def __init__(self, cache_dir, size_limit=1024 * 1024 * 1024):
+        super().__init__(cache_dir)
+        self._size_limit = size_limit
+
+    @property
+    def size_limit(self):
+        return self._size_limit
+
+
+class TestReconstructionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = FixedSizeCache(os.path.join(self.temp_dir, "cache"))
+        self.rotation_file = self.write_file("model.rot", "rotations")
+        self.partitioning_file = self.write_file("polygons.gpml", "polygons")
+        self.input_source = arrayFingerprint(np.zeros((4, 8), dtype=np.float32))
+        self.data = np.arange(32, dtype=np.float32).reshape(4, 8)
+        self.extent = (-180.0, 180.0, -90.0, 90.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def make_key(self, **changes):
+        arguments = {
+            "model_files": self.rotation_file,
+            "input_source": self.input_source,
+            "input_time": 0,
+            "resolution": 0.5,
+            "interpolation": 1,
+            "partitioning_files": self.partitioning_file,
+            "target_time": 100,
+        }
+        arguments.update(changes)
+        return self.cache.make_key(**arguments)
+
+    def entry_path(self, key):
+        return os.path.join(self.cache.cache_dir, f"{key}.npz")
+
+    def test_key_changes_with_each_input(self):
+        key = self.make_key()
+        self.assertEqual(key, self.make_key())
+        other_file = self.write_file("other.gpml", "other")
+        changes = {
+            "model_files": [self.rotation_file, other_file],
+            "input_source": arrayFingerprint(np.ones((4, 8), dtype=np.float32)),
+            "input_time": 10,
+            "resolution": 1.0,
+            "interpolation": 2,
+            "partitioning_files": other_file,
+            "target_time": 110,
+        }
+        keys = {key}
+        for name, value in changes.items():
+            changed_key = self.make_key(**{name: value})
+            self.assertNotIn(changed_key, keys, f"Changing {name} does not give a new key.")
+            keys.add(changed_key)
+
+        # An edited model file gives a new key
+        self.write_file("model.rot", "edited rotations")
+        self.assertNotEqual(self.make_key(), key)
+
+    def test_file_fingerprint_follows_the_files(self):
+        fingerprint = fileFingerprint(self.rotation_file)
+        self.assertEqual(fingerprint, fileFingerprint([self.rotation_file]))
+        self.write_file("model.rot", "edited rotations")
+        self.assertNotEqual(fileFingerprint(self.rotation_file), fingerprint)
+        self.assertIsNone(fileFingerprint(None))
+
+    def test_put_get_round_trip(self):
+        key = self.make_key()
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, self.data, self.extent, 100)
+        self.assertTrue(self.cache.contains(key))
+        data, extent, time = self.cache.get(key)
+        np.testing.assert_array_equal(data, self.data)
+        self.assertEqual(data.dtype, self.data.dtype)
+        self.assertEqual(extent, self.extent)
+        self.assertEqual(time, 100.0)
+
+    def test_disabled_cache_stores_nothing(self):
+        key = self.make_key()
+        self.cache.put(key, self.data, self.extent, 100, size_limit=0)
+        self.assertFalse(self.cache.contains(key))
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        keys = [self.make_key(target_time=time) for time in (10, 20, 30, 40)]
+        for key in keys[:3]:
+            self.cache.put(key, self.data, self.extent, 0)
+        # Deterministic access times: the first entry is the oldest
+        for age, key in zip((3000, 2000, 1000), keys[:3]):
+            access_time = os.path.getmtime(self.entry_path(key)) - age
+            os.utime(self.entry_path(key), (access_time, access_time))
+        entry_size = os.path.getsize(self.entry_path(keys[0]))
+
+        # Reading the first entry makes the second one the least recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.put(keys[3], self.data, self.extent, 0, size_limit=3 * entry_size)
+
+        self.assertTrue(self.cache.contains(keys[0]))
+        self.assertFalse(self.cache.contains(keys[1]))
+        self.assertTrue(self.cache.contains(keys[2]))
+        self.assertTrue(self.cache.contains(keys[3]))
+        self.assertLessEqual(self.cache.size(), 3 * entry_size)
+
+    def test_failed_write_leaves_no_entry(self):
+        key = self.make_key()
+        with mock.patch("numpy.savez", side_effect=OSError("Disk full")):
+            with self.assertRaises(OSError):
+                self.cache.put(key, self.data, self.extent, 100)
+        self.assertFalse(self.cache.contains(key))
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_incomplete_entry_is_a_miss(self):
+        key = self.make_key()
+        self.cache.put(key, self.data, self.extent, 100)
+        path = self.entry_path(key)
+        with open(path, "rb") as f:
+            content = f.read()
+        with open(path, "wb") as f:
+            f.write(content[:len(content) // 2])
+        self.assertIsNone(self.cache.get(key))
+        # The entry is deleted, so that the raster can be stored again
+        self.assertFalse(self.cache.contains(key))
+        self.cache.put(key, self.data, self.extent, 100)
+        self.assertIsNotNone(self.cache.get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()